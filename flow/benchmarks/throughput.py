@@ -0,0 +1,576 @@
+"""Simulator throughput benchmarks.
+
+Measures the performance of the simulation of the benchmarks in this folder,
+independently of any training algorithm. For every benchmark, the following
+quantities are reported:
+
+- the time needed to construct the environment (including the generation of
+  the network and the start of the simulator)
+- the latency of `reset`
+- the percentiles of the latency of `step`, and the number of steps per
+  second
+- the time spent in every phase of the steps (see flow.core.profiler)
+
+The suite also includes scaling curves, which report the same quantities on
+a ring road as the number of vehicles and the number of simulation steps per
+environment step (`sims_per_step`) increase.
+
+The results are saved in a JSON file, which may be used as a baseline that
+later results are compared against. Only SUMO is needed to run the suite.
+
+Usage
+    python -m flow.benchmarks.throughput --output baseline.json
+    python -m flow.benchmarks.throughput --compare baseline.json
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from copy import deepcopy
+from datetime import datetime
+
+import numpy as np
+
+from flow.controllers import IDMController, ContinuousRouter
+from flow.core.params import SumoParams, EnvParams, InitialConfig, NetParams
+from flow.core.params import VehicleParams, TrafficLightParams
+from flow.envs.ring.accel import AccelEnv, ADDITIONAL_ENV_PARAMS
+from flow.networks.ring import RingNetwork, ADDITIONAL_NET_PARAMS
+from flow.version import __version__
+
+# benchmarks of this folder
+BENCHMARKS = [
+    "bottleneck0", "bottleneck1", "bottleneck2",
+    "figureeight0", "figureeight1", "figureeight2",
+    "grid0", "grid1",
+    "merge0", "merge1", "merge2",
+]
+
+# number of vehicles of the points of the vehicle scaling curve
+SCALING_NUM_VEHICLES = [10, 20, 50, 100, 200]
+
+# number of simulation steps per environment step of the points of the
+# sims_per_step scaling curve
+SCALING_SIMS_PER_STEP = [1, 2, 5, 10]
+
+# metrics compared against a baseline, with the direction of an improvement
+# (1 if larger values are better, -1 otherwise)
+COMPARED_METRICS = {
+    "construction_time": -1,
+    "reset.mean": -1,
+    "step.p50": -1,
+    "step.p99": -1,
+    "steps_per_second": 1,
+}
+
+
+def get_flow_params(benchmark):
+    """Return a copy of the flow parameters of a benchmark.
+
+    Parameters
+    ----------
+    benchmark : str
+        name of the benchmark (see BENCHMARKS)
+
+    Returns
+    -------
+    dict
+        flow-specific parameters of the benchmark
+    """
+    module = importlib.import_module("flow.benchmarks." + benchmark)
+    return deepcopy(module.flow_params)
+
+
+def ring_flow_params(num_vehicles=22, spacing=260 / 22):
+    """Return the flow parameters of a ring road with IDM vehicles.
+
+    The length of the ring is proportional to the number of vehicles, so that
+    the density of vehicles is the same for any number of vehicles.
+
+    Parameters
+    ----------
+    num_vehicles : int, optional
+        number of vehicles on the ring
+    spacing : float, optional
+        length of the ring per vehicle (in meters)
+
+    Returns
+    -------
+    dict
+        flow-specific parameters of the ring road
+    """
+    vehicles = VehicleParams()
+    vehicles.add(
+        veh_id="idm",
+        acceleration_controller=(IDMController, {}),
+        routing_controller=(ContinuousRouter, {}),
+        num_vehicles=num_vehicles)
+
+    additional_net_params = ADDITIONAL_NET_PARAMS.copy()
+    additional_net_params["length"] = num_vehicles * spacing
+
+    return dict(
+        exp_tag="ring_{}".format(num_vehicles),
+        env_name=AccelEnv,
+        network=RingNetwork,
+        simulator="traci",
+        sim=SumoParams(sim_step=0.1, render=False),
+        env=EnvParams(
+            horizon=1500,
+            additional_params=ADDITIONAL_ENV_PARAMS.copy(),
+        ),
+        net=NetParams(additional_params=additional_net_params),
+        veh=vehicles,
+        initial=InitialConfig(),
+    )
+
+
+def benchmark(flow_params, num_steps=500, num_resets=3, warmup_steps=10,
+              seed=0):
+    """Measure the throughput of the simulation of an environment.
+
+    The actions of the RL agents (if any) are sampled uniformly from the
+    action space. The environment is reset whenever a rollout is done, these
+    resets being excluded from the step latencies.
+
+    Parameters
+    ----------
+    flow_params : dict
+        flow-specific parameters of the environment. They are not modified.
+    num_steps : int, optional
+        number of measured steps
+    num_resets : int, optional
+        number of measured resets, performed before the steps
+    warmup_steps : int, optional
+        number of steps performed before the measured steps
+    seed : int, optional
+        seed of the simulation and of the actions
+
+    Returns
+    -------
+    dict
+        JSON-serializable results, consisting of the following keys:
+
+        - construction_time: time needed to construct the environment (in s)
+        - reset: mean, min and max latency of the resets (in s)
+        - step: mean, percentiles and max latency of the steps (in s)
+        - steps_per_second: number of steps per second
+        - sim_steps_per_second: number of simulation steps per second
+        - num_vehicles: average number of vehicles in the network
+        - phases: mean and total time spent in every phase of the steps, as
+          well as the share of the time of the steps spent in the phase
+    """
+    flow_params = deepcopy(flow_params)
+    sim_params = flow_params["sim"]
+    sim_params.render = False
+    sim_params.emission_path = None
+    sim_params.seed = seed
+    sim_params.profile = True
+    sims_per_step = flow_params["env"].sims_per_step
+
+    # the environment is created as in flow.utils.registry.make_create_env,
+    # without registering it with gym
+    t = time.perf_counter()
+    network = flow_params["network"](
+        name=flow_params["exp_tag"],
+        vehicles=flow_params["veh"],
+        net_params=flow_params["net"],
+        initial_config=flow_params.get("initial", InitialConfig()),
+        traffic_lights=flow_params.get("tls", TrafficLightParams()))
+    env = flow_params["env_name"](
+        env_params=flow_params["env"],
+        sim_params=sim_params,
+        network=network,
+        simulator=flow_params["simulator"])
+    construction_time = time.perf_counter() - t
+
+    try:
+        reset_latencies = []
+        for _ in range(max(num_resets, 1)):
+            t = time.perf_counter()
+            env.reset()
+            reset_latencies.append(time.perf_counter() - t)
+
+        env.action_space.seed(seed)
+        profiler = env.k.profiler
+        step_latencies = []
+        num_vehicles = []
+        for i in range(warmup_steps + num_steps):
+            if i == warmup_steps:
+                profiler.reset()
+
+            rl_actions = env.action_space.sample()
+            t = time.perf_counter()
+            _, _, done, _ = env.step(rl_actions)
+            latency = time.perf_counter() - t
+
+            if i >= warmup_steps:
+                step_latencies.append(latency)
+                num_vehicles.append(env.k.vehicle.num_vehicles)
+            if done:
+                env.reset()
+
+        phases = profiler.summary()["phases"]
+    finally:
+        env.terminate()
+
+    step_latencies = np.array(step_latencies)
+    step_time = step_latencies.sum()
+    total = phases.get("step", {}).get("total", step_time)
+
+    return {
+        "construction_time": construction_time,
+        "reset": {
+            "mean": float(np.mean(reset_latencies)),
+            "min": float(np.min(reset_latencies)),
+            "max": float(np.max(reset_latencies)),
+        },
+        "step": {
+            "count": len(step_latencies),
+            "mean": float(np.mean(step_latencies)),
+            "p50": float(np.percentile(step_latencies, 50)),
+            "p90": float(np.percentile(step_latencies, 90)),
+            "p99": float(np.percentile(step_latencies, 99)),
+            "max": float(np.max(step_latencies)),
+        },
+        "steps_per_second": len(step_latencies) / step_time,
+        "sim_steps_per_second":
+            sims_per_step * len(step_latencies) / step_time,
+        "num_vehicles": float(np.mean(num_vehicles)),
+        "phases": {
+            name: {
+                "count": stats["count"],
+                "mean": stats["mean"],
+                "total": stats["total"],
+                "share": stats["total"] / total,
+            } for name, stats in phases.items()
+        },
+    }
+
+
+def vehicle_scaling(num_vehicles=None, **kwargs):
+    """Measure the throughput of a ring road for several numbers of vehicles.
+
+    Parameters
+    ----------
+    num_vehicles : list of int, optional
+        numbers of vehicles, defaults to SCALING_NUM_VEHICLES
+    kwargs : dict
+        additional parameters of the benchmarks (see `benchmark`)
+
+    Returns
+    -------
+    list of dict
+        the results of every number of vehicles (see `benchmark`), with an
+        additional "value" key containing the number of vehicles
+    """
+    curve = []
+    for n in num_vehicles or SCALING_NUM_VEHICLES:
+        results = benchmark(ring_flow_params(n), **kwargs)
+        results["value"] = n
+        curve.append(results)
+    return curve
+
+
+def sims_per_step_scaling(flow_params=None, sims_per_step=None, **kwargs):
+    """Measure the throughput of an environment for several sims_per_step.
+
+    Parameters
+    ----------
+    flow_params : dict, optional
+        flow-specific parameters of the environment, defaults to a ring road
+        with 22 vehicles
+    sims_per_step : list of int, optional
+        numbers of simulation steps per environment step, defaults to
+        SCALING_SIMS_PER_STEP
+    kwargs : dict
+        additional parameters of the benchmarks (see `benchmark`)
+
+    Returns
+    -------
+    list of dict
+        the results of every number of simulation steps per environment step
+        (see `benchmark`), with an additional "value" key containing it
+    """
+    if flow_params is None:
+        flow_params = ring_flow_params()
+
+    curve = []
+    for n in sims_per_step or SCALING_SIMS_PER_STEP:
+        params = deepcopy(flow_params)
+        params["env"].sims_per_step = n
+        results = benchmark(params, **kwargs)
+        results["value"] = n
+        curve.append(results)
+    return curve
+
+
+def metadata():
+    """Return a description of the machine and software the suite ran on."""
+    info = {
+        "date": datetime.now().isoformat(),
+        "flow": __version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+    # the version of sumo and the current commit of flow, if available
+    commands = {
+        "sumo": ["sumo", "--version"],
+        "commit": ["git", "-C", os.path.dirname(os.path.abspath(__file__)),
+                   "rev-parse", "HEAD"],
+    }
+    for key, command in commands.items():
+        try:
+            output = subprocess.check_output(
+                command, stderr=subprocess.DEVNULL, timeout=10)
+            info[key] = output.decode().splitlines()[0].strip()
+        except (OSError, subprocess.SubprocessError, IndexError):
+            info[key] = None
+
+    return info
+
+
+def run_suite(benchmarks=None, num_vehicles=None, sims_per_step=None,
+              **kwargs):
+    """Run the throughput benchmarks and the scaling curves.
+
+    Parameters
+    ----------
+    benchmarks : list of str, optional
+        names of the benchmarks, defaults to BENCHMARKS
+    num_vehicles : list of int, optional
+        numbers of vehicles of the vehicle scaling curve, defaults to
+        SCALING_NUM_VEHICLES. The curve is skipped if empty.
+    sims_per_step : list of int, optional
+        values of the sims_per_step scaling curve, defaults to
+        SCALING_SIMS_PER_STEP. The curve is skipped if empty.
+    kwargs : dict
+        additional parameters of the benchmarks (see `benchmark`)
+
+    Returns
+    -------
+    dict
+        JSON-serializable results, consisting of the metadata of the run, the
+        parameters of the benchmarks, the results of every benchmark, and
+        the scaling curves
+    """
+    if benchmarks is None:
+        benchmarks = BENCHMARKS
+    if num_vehicles is None:
+        num_vehicles = SCALING_NUM_VEHICLES
+    if sims_per_step is None:
+        sims_per_step = SCALING_SIMS_PER_STEP
+
+    results = {
+        "metadata": metadata(),
+        "params": kwargs,
+        "benchmarks": {},
+        "scaling": {},
+    }
+    for name in benchmarks:
+        results["benchmarks"][name] = benchmark(
+            get_flow_params(name), **kwargs)
+    if len(num_vehicles) > 0:
+        results["scaling"]["num_vehicles"] = vehicle_scaling(
+            num_vehicles, **kwargs)
+    if len(sims_per_step) > 0:
+        results["scaling"]["sims_per_step"] = sims_per_step_scaling(
+            None, sims_per_step, **kwargs)
+
+    return results
+
+
+def _metric(results, metric):
+    """Return the value of a (possibly nested) metric of a benchmark."""
+    for key in metric.split("."):
+        results = results[key]
+    return results
+
+
+def _flatten(results):
+    """Return the results of every benchmark and point of a scaling curve."""
+    flat = dict(results.get("benchmarks", {}))
+    for curve, points in results.get("scaling", {}).items():
+        for point in points:
+            flat["{}={}".format(curve, point["value"])] = point
+    return flat
+
+
+def compare(baseline, results, tolerance=0.1):
+    """Compare the results of the suite against a baseline.
+
+    Only the benchmarks (and points of the scaling curves) that are present in
+    both results are compared.
+
+    Parameters
+    ----------
+    baseline : dict
+        results of the baseline (see `run_suite`)
+    results : dict
+        results to compare
+    tolerance : float, optional
+        relative change of a metric above which it is considered to have
+        regressed or improved
+
+    Returns
+    -------
+    list of dict
+        the name of the benchmark, the metric, its value in the baseline and
+        in the results, its relative change, and its status ("regression",
+        "improvement" or "ok") for every compared metric
+    """
+    baseline = _flatten(baseline)
+    results = _flatten(results)
+
+    comparison = []
+    for name in sorted(set(baseline) & set(results)):
+        for metric, direction in COMPARED_METRICS.items():
+            old = _metric(baseline[name], metric)
+            new = _metric(results[name], metric)
+            change = (new - old) / old if old != 0 else 0.
+            if direction * change < -tolerance:
+                status = "regression"
+            elif direction * change > tolerance:
+                status = "improvement"
+            else:
+                status = "ok"
+            comparison.append({
+                "benchmark": name,
+                "metric": metric,
+                "baseline": old,
+                "value": new,
+                "change": change,
+                "status": status,
+            })
+
+    return comparison
+
+
+def report(results, comparison=None):
+    """Return a table of the main results of the suite.
+
+    Parameters
+    ----------
+    results : dict
+        results of the suite (see `run_suite`)
+    comparison : list of dict, optional
+        comparison of the results against a baseline (see `compare`). If
+        specified, the metrics that changed are reported as well.
+
+    Returns
+    -------
+    str
+        the table
+    """
+    lines = ["{:<24}{:>10}{:>12}{:>12}{:>12}{:>12}{:>10}".format(
+        "benchmark", "vehicles", "build (s)", "reset (ms)", "p50 (ms)",
+        "p99 (ms)", "steps/s")]
+    for name, res in _flatten(results).items():
+        lines.append(
+            "{:<24}{:>10.1f}{:>12.3f}{:>12.2f}{:>12.3f}{:>12.3f}{:>10.1f}"
+            .format(name, res["num_vehicles"], res["construction_time"],
+                    1e3 * res["reset"]["mean"], 1e3 * res["step"]["p50"],
+                    1e3 * res["step"]["p99"], res["steps_per_second"]))
+
+    changes = [c for c in comparison or [] if c["status"] != "ok"]
+    if len(changes) > 0:
+        lines.append("")
+        for c in changes:
+            lines.append("{:<12}{:<24}{:<20}{:>12.4g} -> {:<12.4g}{:+.1%}"
+                         .format(c["status"], c["benchmark"], c["metric"],
+                                 c["baseline"], c["value"], c["change"]))
+
+    return "\n".join(lines)
+
+
+def parse_args(args):
+    """Parse the command line arguments of the suite.
+
+    Returns
+    -------
+    argparse.Namespace
+        the output parser object
+    """
+    parser = argparse.ArgumentParser(
+        description="Measure the throughput of the simulation of the flow "
+                    "benchmarks.",
+        epilog="python -m flow.benchmarks.throughput --output baseline.json")
+
+    parser.add_argument(
+        '--benchmarks', type=str, nargs='*', default=BENCHMARKS,
+        help='Names of the benchmarks. Defaults to all benchmarks.')
+    parser.add_argument(
+        '--num_vehicles', type=int, nargs='*', default=SCALING_NUM_VEHICLES,
+        help='Numbers of vehicles of the vehicle scaling curve. The curve is '
+             'skipped if no value is given.')
+    parser.add_argument(
+        '--sims_per_step', type=int, nargs='*',
+        default=SCALING_SIMS_PER_STEP,
+        help='Values of the sims_per_step scaling curve. The curve is '
+             'skipped if no value is given.')
+    parser.add_argument(
+        '--num_steps', type=int, default=500,
+        help='Number of measured steps per benchmark.')
+    parser.add_argument(
+        '--num_resets', type=int, default=3,
+        help='Number of measured resets per benchmark.')
+    parser.add_argument(
+        '--warmup_steps', type=int, default=10,
+        help='Number of steps performed before the measured steps.')
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='Seed of the simulations and of the actions.')
+    parser.add_argument(
+        '--output', type=str, default=None,
+        help='Path to the JSON file the results are saved in.')
+    parser.add_argument(
+        '--compare', type=str, default=None,
+        help='Path to the JSON file of a baseline to compare the results '
+             'against. The script exits with an error if a metric '
+             'regressed.')
+    parser.add_argument(
+        '--tolerance', type=float, default=0.1,
+        help='Relative change of a metric above which it is considered to '
+             'have regressed.')
+
+    return parser.parse_args(args)
+
+
+def main(args):
+    """Run the suite from the command line."""
+    flags = parse_args(args)
+
+    results = run_suite(
+        benchmarks=flags.benchmarks,
+        num_vehicles=flags.num_vehicles,
+        sims_per_step=flags.sims_per_step,
+        num_steps=flags.num_steps,
+        num_resets=flags.num_resets,
+        warmup_steps=flags.warmup_steps,
+        seed=flags.seed)
+
+    if flags.output is not None:
+        with open(flags.output, "w") as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+    comparison = None
+    if flags.compare is not None:
+        with open(flags.compare) as f:
+            comparison = compare(json.load(f), results, flags.tolerance)
+
+    print(report(results, comparison))
+
+    if any(c["status"] == "regression" for c in comparison or []):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -6,6 +6,20 @@ PYTHON_COMMAND = "python"
 
 SUMO_SLEEP = 1.0  # Delay between initializing SUMO and connecting with TraCI
 
+# directory in which the network files generated by netconvert, and the edge
+# and connection data parsed from them, are cached. The cache is shared by the
+# processes of the current user, and is not used if the directory is owned by
+# another user or writable by others. It is disabled if this is set to None,
+# and may be cleared at any time by deleting the directory.
+NET_CACHE_PATH = os.environ.get(
+    "FLOW_NET_CACHE_PATH",
+    osp.join(os.environ.get("XDG_CACHE_HOME", osp.expanduser("~/.cache")),
+             'flow/net/'))
+
+# maximum size of the network cache, in bytes. The least recently used files
+# are removed from the cache when this size is exceeded.
+NET_CACHE_SIZE = int(os.environ.get("FLOW_NET_CACHE_SIZE", 256 * 2 ** 20))
+
 PROJECT_PATH = osp.abspath(osp.join(osp.dirname(__file__), '..'))
 
 LOG_DIR = PROJECT_PATH + "/data"
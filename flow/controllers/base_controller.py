@@ -76,6 +76,7 @@ class BaseController(metaclass=ABCMeta):
             'obey_speed_limit': self.get_obey_speed_limit_action
         }
         self.failsafes = []
+        self.failsafe_names = tuple(failsafe_list or ())
         if failsafe_list:
             for check in failsafe_list:
                 if check in failsafe_map:
@@ -379,3 +380,476 @@ class BaseController(metaclass=ABCMeta):
                     "=====================================".format(self.veh_id))
 
         return action
+
+    def get_batch_params(self):
+        """Return the parameters used by the batched acceleration method.
+
+        Controllers that implement `get_accel_batch` return a hashable tuple
+        of every parameter the batched computation depends on. Vehicles whose
+        controllers share a class, these parameters, and the noise/failsafe
+        settings are evaluated together with a single array computation.
+
+        Returns
+        -------
+        tuple or None
+            the batch parameters, or None if the controller does not support
+            batched evaluation (the default)
+        """
+        return None
+
+    def batch_key(self):
+        """Return the key of the group of controllers this one is batched in.
+
+        Returns
+        -------
+        tuple or None
+            the group key, or None if this controller should be evaluated
+            separately through `get_action`. This is the case if the class
+            does not implement `get_accel_batch`, or if it overrides
+            `get_accel`, `get_action` or any of the failsafes without a
+            matching batched implementation.
+        """
+        cls = type(self)
+        if cls not in _SUPPORTS_BATCH:
+            _SUPPORTS_BATCH[cls] = \
+                _defining_class(cls, "get_accel") is \
+                _defining_class(cls, "get_accel_batch") and \
+                all(_defining_class(cls, method) is BaseController
+                    for method in _BATCHED_METHODS)
+        if not _SUPPORTS_BATCH[cls]:
+            return None
+
+        params = self.get_batch_params()
+        if params is None:
+            return None
+
+        return (cls, params, self.failsafe_names, self.accel_noise,
+                self.delay, self.max_accel, self.max_deaccel,
+                self.display_warnings)
+
+    def get_accel_batch(self, env, state):
+        """Return the accelerations of a group of vehicles.
+
+        The parameters of this controller (see `get_batch_params`) are shared
+        by every vehicle in the group.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            state of the environment at the current time step
+        state : flow.controllers.base_controller.BatchState
+            state of the vehicles in the group
+
+        Returns
+        -------
+        np.ndarray
+            acceleration of every vehicle, NaN for vehicles that should be
+            controlled by the simulator during the current time step
+        """
+        raise NotImplementedError
+
+    def get_edge_accel_batch(self, env, state):
+        """Return the accelerations of a group of vehicles located on edges.
+
+        Vehicles in junctions are controlled by sumo (see `get_action`), and
+        are assigned a NaN acceleration.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            state of the environment at the current time step
+        state : flow.controllers.base_controller.BatchState
+            state of the vehicles in the group
+
+        Returns
+        -------
+        np.ndarray
+            acceleration of every vehicle, NaN for vehicles that should be
+            controlled by the simulator during the current time step
+        """
+        accel = np.full(len(state.veh_ids), np.nan)
+        on_edge = np.flatnonzero(
+            state.edge < len(env.k.network.get_edge_list()))
+        if len(on_edge) > 0:
+            accel[on_edge] = self.get_accel_batch(env, state.take(on_edge))
+        return accel
+
+    def get_action_batch(self, env, state, accel=None, noise=None):
+        """Convert the get_accel_batch() accelerations into actions.
+
+        This is the batched equivalent of `get_action`: it stores the four
+        acceleration variants of every vehicle, adds noise, and applies the
+        failsafes of this controller, all as array operations.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            state of the environment at the current time step
+        state : flow.controllers.base_controller.BatchState
+            state of the vehicles in the group
+        accel : np.ndarray, optional
+            accelerations returned by `get_edge_accel_batch`, computed if not
+            specified
+        noise : np.ndarray, optional
+            noise samples (with a standard deviation of `accel_noise`) of the
+            vehicles whose acceleration is not NaN, in the order of the
+            group. If not specified, they are drawn from np.random, which
+            produces the same samples as `get_action` for every vehicle of
+            the group in turn.
+
+        Returns
+        -------
+        np.ndarray
+            the modified accelerations, NaN for vehicles that sumo should
+            control for the current time step
+        """
+        veh_ids = state.veh_ids
+        if accel is None:
+            accel = self.get_edge_accel_batch(env, state)
+        accel = np.array(accel, dtype=float)
+
+        # store the acceleration without noise to each vehicle
+        # run fail safe if requested
+        env.k.vehicle.update_accel_array(
+            veh_ids, accel, noise=False, failsafe=False)
+
+        valid = np.flatnonzero(~np.isnan(accel))
+        sub_state = state.take(valid)
+
+        accel_no_noise_with_failsafe = accel.copy()
+        accel_no_noise_with_failsafe[valid] = self.get_failsafe_action_batch(
+            env, sub_state, accel[valid])
+        env.k.vehicle.update_accel_array(
+            veh_ids, accel_no_noise_with_failsafe, noise=False, failsafe=True)
+
+        # add noise to the accelerations, if requested
+        if self.accel_noise > 0:
+            if noise is None:
+                noise = np.random.normal(0, self.accel_noise, len(valid))
+            accel[valid] += np.sqrt(env.sim_step) * noise
+        env.k.vehicle.update_accel_array(
+            veh_ids, accel, noise=True, failsafe=False)
+
+        # run the fail-safes, if requested
+        accel[valid] = self.get_failsafe_action_batch(
+            env, sub_state, accel[valid])
+        env.k.vehicle.update_accel_array(
+            veh_ids, accel, noise=True, failsafe=True)
+
+        return accel
+
+    def get_failsafe_action_batch(self, env, state, action):
+        """Apply the failsafes of this controller to a group of vehicles.
+
+        The failsafes are applied in the order they were specified in, and
+        produce the same results as their per-vehicle counterparts.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            state of the environment at the current time step
+        state : flow.controllers.base_controller.BatchState
+            state of the vehicles in the group
+        action : np.ndarray
+            requested acceleration of every vehicle
+
+        Returns
+        -------
+        np.ndarray
+            the accelerations modified by the failsafes
+        """
+        action = np.array(action, dtype=float)
+        if len(action) == 0:
+            return action
+
+        speed = state.speed
+        sim_step = env.sim_step
+        single_vehicle = env.k.vehicle.num_vehicles == 1
+
+        for failsafe in self.failsafe_names:
+            if failsafe == 'instantaneous':
+                if single_vehicle:
+                    continue
+                next_vel = speed + action * sim_step
+                # see get_safe_action_instantaneous
+                crash = state.has_leader & (next_vel > 0) & (
+                    state.headway < sim_step * next_vel + speed * 1e-3 +
+                    0.5 * speed * sim_step)
+                self._warn(
+                    state, crash,
+                    "=====================================\n"
+                    "Vehicle {} is about to crash. Instantaneous acceleration "
+                    "clipping applied.\n"
+                    "=====================================")
+                action = np.where(crash, -speed / sim_step, action)
+
+            elif failsafe == 'safe_velocity':
+                if single_vehicle:
+                    continue
+                # see safe_velocity
+                v_safe = 2 * state.headway / sim_step \
+                    + (state.lead_speed - speed) - speed * (2 * self.delay)
+                self._warn(
+                    state, speed > v_safe,
+                    "=====================================\n"
+                    "Speed of vehicle {} is greater than safe speed. Safe "
+                    "velocity clipping applied.\n"
+                    "=====================================")
+                action = np.where(
+                    speed + action * sim_step > v_safe,
+                    np.where(v_safe > 0,
+                             (v_safe - speed) / sim_step,
+                             -speed / sim_step),
+                    action)
+
+            elif failsafe == 'feasible_accel':
+                self._warn(
+                    state, action > self.max_accel,
+                    "=====================================\n"
+                    "Acceleration of vehicle {} is greater than the max "
+                    "acceleration. Feasible acceleration clipping applied.\n"
+                    "=====================================")
+                action = np.minimum(action, self.max_accel)
+                self._warn(
+                    state, action < -self.max_deaccel,
+                    "=====================================\n"
+                    "Deceleration of vehicle {} is greater than the max "
+                    "deceleration. Feasible acceleration clipping applied.\n"
+                    "=====================================")
+                action = np.maximum(action, -self.max_deaccel)
+
+            elif failsafe == 'obey_speed_limit':
+                speed_limit = state.edge_values(env, env.k.network.speed_limit)
+                exceeds = speed + action * sim_step > speed_limit
+                self._warn(
+                    state, exceeds & (speed_limit > 0),
+                    "=====================================\n"
+                    "Speed of vehicle {} is greater than speed limit. Obey "
+                    "speed limit clipping applied.\n"
+                    "=====================================")
+                action = np.where(
+                    exceeds,
+                    np.where(speed_limit > 0,
+                             (speed_limit - speed) / sim_step,
+                             -speed / sim_step),
+                    action)
+
+        return action
+
+    def _warn(self, state, mask, message):
+        """Print a failsafe warning for every vehicle in mask."""
+        if self.display_warnings:
+            for i in np.flatnonzero(mask):
+                print(message.format(state.veh_ids[i]))
+
+    @staticmethod
+    def get_actions(env, veh_ids):
+        """Compute the actions of several controlled vehicles.
+
+        Vehicles whose controllers share a batch key (see `batch_key`) are
+        evaluated together through `get_action_batch`. All other vehicles, as
+        well as vehicles that are not yet located on a known edge, are
+        evaluated one at a time through `get_action`.
+
+        Random numbers (i.e. acceleration noise) are drawn in the order of
+        `veh_ids`, so that seeded simulations produce the same actions as if
+        every vehicle was evaluated through `get_action`.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            state of the environment at the current time step
+        veh_ids : list of str
+            ids of the vehicles whose actions should be computed
+
+        Returns
+        -------
+        list of float or None
+            the action of every vehicle, None if sumo should control the
+            vehicle for the current time step
+        """
+        veh_ids = list(veh_ids)
+        controllers = env.k.vehicle.get_acc_controller(veh_ids)
+        edge = env.k.vehicle.get_edge_index(veh_ids)
+        actions = [None] * len(veh_ids)
+
+        # group the vehicles by batch key
+        keys = [controller.batch_key() if edge[i] >= 0 else None
+                for i, controller in enumerate(controllers)]
+        groups = {}
+        for i, key in enumerate(keys):
+            if key is not None:
+                groups.setdefault(key, []).append(i)
+
+        # compute the accelerations of every group, which does not draw
+        # random numbers
+        states, accels = {}, {}
+        if len(groups) > 0:
+            index = [i for members in groups.values() for i in members]
+            state = BatchState.from_kernel(env, [veh_ids[i] for i in index])
+            start = 0
+            for key, members in groups.items():
+                end = start + len(members)
+                states[key] = state.take(np.arange(start, end))
+                accels[key] = controllers[members[0]].get_edge_accel_batch(
+                    env, states[key])
+                start = end
+
+        # compute the actions of the remaining vehicles one at a time, and
+        # draw the noise of the grouped vehicles, in the order of veh_ids
+        noise = {key: [] for key in groups}
+        num_visited = {key: 0 for key in groups}
+        for i, key in enumerate(keys):
+            if key is None:
+                actions[i] = controllers[i].get_action(env)
+                continue
+            j = num_visited[key]
+            num_visited[key] += 1
+            if controllers[i].accel_noise > 0 and \
+                    not np.isnan(accels[key][j]):
+                noise[key].append(
+                    np.random.normal(0, controllers[i].accel_noise))
+
+        for key, members in groups.items():
+            accel = controllers[members[0]].get_action_batch(
+                env, states[key], accels[key], np.array(noise[key]))
+            for i, acc in zip(members, accel.tolist()):
+                actions[i] = None if np.isnan(acc) else acc
+
+        return actions
+
+
+def _defining_class(cls, name):
+    """Return the class in the MRO of cls that defines an attribute."""
+    for base in cls.__mro__:
+        if name in base.__dict__:
+            return base
+    return None
+
+
+# methods of BaseController that are reproduced by get_action_batch
+_BATCHED_METHODS = (
+    "get_action",
+    "get_safe_action_instantaneous",
+    "get_safe_velocity_action",
+    "safe_velocity",
+    "get_obey_speed_limit_action",
+    "get_feasible_action",
+)
+
+# whether every controller class supports batched evaluation (see batch_key)
+_SUPPORTS_BATCH = {}
+
+
+class BatchState(object):
+    """State of a group of vehicles evaluated by a batched controller.
+
+    Attributes
+    ----------
+    veh_ids : list of str
+        ids of the vehicles in the group
+    speed : np.ndarray
+        speed of every vehicle
+    headway : np.ndarray
+        headway of every vehicle
+    position : np.ndarray
+        position of every vehicle relative to its edge
+    edge : np.ndarray
+        index of the edge of every vehicle, in the network kernel's
+        `get_edge_list() + get_junction_list()`
+    has_leader : np.ndarray
+        whether every vehicle has a leader
+    lead_speed : np.ndarray
+        speed of the leader of every vehicle, -1001 if there is no leader
+        (similar to calling `get_speed` on a missing leader)
+    """
+
+    def __init__(self, veh_ids, speed, headway, position, edge, has_leader,
+                 lead_speed):
+        """Instantiate the state of a group of vehicles."""
+        self.veh_ids = veh_ids
+        self.speed = speed
+        self.headway = headway
+        self.position = position
+        self.edge = edge
+        self.has_leader = has_leader
+        self.lead_speed = lead_speed
+
+    @classmethod
+    def from_kernel(cls, env, veh_ids):
+        """Collect the state of several vehicles from the vehicle kernel.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            state of the environment at the current time step
+        veh_ids : list of str
+            ids of the vehicles in the group
+
+        Returns
+        -------
+        BatchState
+            the state of the vehicles
+        """
+        vehicles = env.k.vehicle
+        leader = vehicles.get_leader_index(veh_ids)
+        has_leader = leader >= 0
+        lead_speed = np.where(
+            has_leader, vehicles.get_speed_array()[leader], -1001.)
+
+        return cls(
+            veh_ids=veh_ids,
+            speed=vehicles.get_speed_array(veh_ids),
+            headway=vehicles.get_headway_array(veh_ids),
+            position=vehicles.get_position_array(veh_ids),
+            edge=vehicles.get_edge_index(veh_ids),
+            has_leader=has_leader,
+            lead_speed=lead_speed,
+        )
+
+    def take(self, index):
+        """Return the state of a subset of the vehicles.
+
+        Parameters
+        ----------
+        index : array_like of int
+            indices of the vehicles in the subset
+
+        Returns
+        -------
+        BatchState
+            the state of the subset of vehicles
+        """
+        return BatchState(
+            veh_ids=[self.veh_ids[i] for i in index],
+            speed=self.speed[index],
+            headway=self.headway[index],
+            position=self.position[index],
+            edge=self.edge[index],
+            has_leader=self.has_leader[index],
+            lead_speed=self.lead_speed[index],
+        )
+
+    def edge_values(self, env, func):
+        """Evaluate a per-edge function for the edge of every vehicle.
+
+        The function is called once for every distinct edge.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            state of the environment at the current time step
+        func : callable
+            function taking the name of an edge as input, for example
+            `env.k.network.speed_limit`
+
+        Returns
+        -------
+        np.ndarray
+            the output of the function for the edge of every vehicle
+        """
+        edge_names = env.k.network.get_edge_list() + \
+            env.k.network.get_junction_list()
+        edges, inverse = np.unique(self.edge, return_inverse=True)
+        values = np.array([func(edge_names[e]) for e in edges])
+        return values[inverse.reshape(-1)]
@@ -25,8 +25,19 @@ class BaseRouter(metaclass=ABCMeta):
         ID of the vehicle this controller is used for
     router_params : dict
         Dictionary of router params
+
+    Attributes
+    ----------
+    event_driven : bool
+        whether the decisions of the router only depend on the edge and lane
+        of the vehicle (and on its route). If so, the router is only called
+        in the steps following a change of the edge or lane of the vehicle
+        (see the `get_edge_transitions` method of the vehicle kernel), instead
+        of every step. Defaults to False.
     """
 
+    event_driven = False
+
     def __init__(self, veh_id, router_params):
         """Instantiate the base class for routing controllers."""
         self.veh_id = veh_id
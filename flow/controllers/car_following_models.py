@@ -90,6 +90,18 @@ class CFMController(BaseController):
         return self.k_d*(d_l - self.d_des) + self.k_v*(lead_vel - this_vel) + \
             self.k_c*(self.v_des - this_vel)
 
+    def get_batch_params(self):
+        """See parent class."""
+        return self.k_d, self.k_v, self.k_c, self.d_des, self.v_des
+
+    def get_accel_batch(self, env, state):
+        """See parent class."""
+        this_vel = state.speed
+        accel = self.k_d * (state.headway - self.d_des) + \
+            self.k_v * (state.lead_speed - this_vel) + \
+            self.k_c * (self.v_des - this_vel)
+        return np.where(state.has_leader, accel, self.max_accel)
+
 
 class BCMController(BaseController):
     """Bilateral car-following model controller.
@@ -181,6 +193,24 @@ class BCMController(BaseController):
             self.k_v * ((lead_vel - this_vel) - (this_vel - trail_vel)) + \
             self.k_c * (self.v_des - this_vel)
 
+    def get_batch_params(self):
+        """See parent class."""
+        return self.k_d, self.k_v, self.k_c, self.d_des, self.v_des
+
+    def get_accel_batch(self, env, state):
+        """See parent class."""
+        this_vel = state.speed
+
+        trail_ids = env.k.vehicle.get_follower(state.veh_ids)
+        trail_vel = env.k.vehicle.get_speed_array(trail_ids, error=-1001)
+        footway = env.k.vehicle.get_headway_array(trail_ids, error=-1001)
+
+        accel = self.k_d * (state.headway - footway) + \
+            self.k_v * ((state.lead_speed - this_vel) -
+                        (this_vel - trail_vel)) + \
+            self.k_c * (self.v_des - this_vel)
+        return np.where(state.has_leader, accel, self.max_accel)
+
 
 class LACController(BaseController):
     """Linear Adaptive Cruise Control.
@@ -339,6 +369,26 @@ class OVMController(BaseController):
 
         return self.alpha * (v_h - this_vel) + self.beta * h_dot
 
+    def get_batch_params(self):
+        """See parent class."""
+        return self.alpha, self.beta, self.h_st, self.h_go, self.v_max
+
+    def get_accel_batch(self, env, state):
+        """See parent class."""
+        this_vel = state.speed
+        h = state.headway
+        h_dot = state.lead_speed - this_vel
+
+        # V function here - input: h, output : Vh
+        v_h = np.select(
+            [h <= self.h_st, h < self.h_go],
+            [0, self.v_max / 2 * (1 - np.cos(
+                np.pi * (h - self.h_st) / (self.h_go - self.h_st)))],
+            default=self.v_max)
+
+        accel = self.alpha * (v_h - this_vel) + self.beta * h_dot
+        return np.where(state.has_leader, accel, self.max_accel)
+
 
 class LinearOVM(BaseController):
     """Linear OVM controller.
@@ -411,6 +461,23 @@ class LinearOVM(BaseController):
 
         return (v_h - this_vel) / self.adaptation
 
+    def get_batch_params(self):
+        """See parent class."""
+        return self.v_max, self.adaptation, self.h_st
+
+    def get_accel_batch(self, env, state):
+        """See parent class."""
+        h = state.headway
+
+        # V function here - input: h, output : Vh
+        alpha = 1.689  # the average value from Nakayama paper
+        v_h = np.select(
+            [h < self.h_st, h <= self.h_st + self.v_max / alpha],
+            [0, alpha * (h - self.h_st)],
+            default=self.v_max)
+
+        return (v_h - state.speed) / self.adaptation
+
 
 class IDMController(BaseController):
     """Intelligent Driver Model (IDM) controller.
@@ -499,6 +566,24 @@ class IDMController(BaseController):
 
         return self.a * (1 - (v / self.v0)**self.delta - (s_star / h)**2)
 
+    def get_batch_params(self):
+        """See parent class."""
+        return self.v0, self.T, self.a, self.b, self.delta, self.s0
+
+    def get_accel_batch(self, env, state):
+        """See parent class."""
+        v = state.speed
+
+        # in order to deal with ZeroDivisionError
+        h = np.where(np.abs(state.headway) < 1e-3, 1e-3, state.headway)
+
+        s_star = self.s0 + np.maximum(
+            0, v * self.T + v * (v - state.lead_speed) /
+            (2 * np.sqrt(self.a * self.b)))
+        s_star = np.where(state.has_leader, s_star, 0)
+
+        return self.a * (1 - (v / self.v0)**self.delta - (s_star / h)**2)
+
 
 class SimCarFollowingController(BaseController):
     """Controller whose actions are purely defined by the simulator.
@@ -601,6 +686,28 @@ class GippsController(BaseController):
 
         return (v_next-v)/env.sim_step
 
+    def get_batch_params(self):
+        """See parent class."""
+        return self.v_desired, self.acc, self.b, self.b_l, self.s0, self.tau
+
+    def get_accel_batch(self, env, state):
+        """See parent class."""
+        v = state.speed
+        h = state.headway
+        v_l = state.lead_speed
+
+        # get velocity dynamics
+        v_acc = v + (2.5 * self.acc * self.tau * (
+                1 - (v / self.v_desired)) * np.sqrt(0.025 + (v / self.v_desired)))
+        with np.errstate(invalid='ignore'):
+            v_safe = (self.tau * self.b) + np.sqrt(((self.tau**2) * (self.b**2)) - (
+                    self.b * ((2 * (h-self.s0)) - (self.tau * v) - ((v_l**2) / self.b_l))))
+
+        # fmin ignores NaN safe velocities, similar to the builtin min
+        v_next = np.fmin(np.fmin(v_acc, v_safe), self.v_desired)
+
+        return (v_next-v)/env.sim_step
+
 
 class BandoFTLController(BaseController):
     """Bando follow-the-leader controller.
@@ -679,6 +786,18 @@ class BandoFTLController(BaseController):
         s = env.k.vehicle.get_headway(self.veh_id)
         return self.accel_func(v, v_l, s)
 
+    def get_batch_params(self):
+        """See parent class."""
+        return (self.alpha, self.beta, self.h_st, self.h_go, self.v_max,
+                self.want_max_accel)
+
+    def get_accel_batch(self, env, state):
+        """See parent class."""
+        accel = self.accel_func(state.speed, state.lead_speed, state.headway)
+        if self.want_max_accel:
+            accel = np.where(state.has_leader, accel, self.max_accel)
+        return accel
+
     def accel_func(self, v, v_l, s):
         """Compute the acceleration function."""
         v_h = self.v_max * ((np.tanh(s/self.h_st-2)+np.tanh(2))/(1+np.tanh(2)))
@@ -4,6 +4,88 @@ import numpy as np
 
 from flow.controllers.base_routing_controller import BaseRouter
 
+# alias tables of the lists of routes of the edges, keyed by the id of the
+# lists (see sample_route)
+_ALIAS_TABLES = {}
+# maximum number of lists of routes the alias tables are stored for
+_MAX_ALIAS_TABLES = 10000
+
+
+def alias_table(weights):
+    """Compute the alias table of a discrete distribution.
+
+    The table allows to sample the distribution in constant time, using a
+    single random number (see sample_route).
+
+    Parameters
+    ----------
+    weights : array_like
+        non-negative weight of every outcome, not necessarily normalized
+
+    Returns
+    -------
+    list of float
+        probability of keeping every outcome
+    list of int
+        alias of every outcome, sampled if it is not kept
+    """
+    weights = np.asarray(weights, dtype=float)
+    num_outcomes = len(weights)
+    prob = weights * num_outcomes / weights.sum()
+    alias = list(range(num_outcomes))
+
+    small = [i for i in range(num_outcomes) if prob[i] < 1]
+    large = [i for i in range(num_outcomes) if prob[i] >= 1]
+    while small and large:
+        i, j = small.pop(), large.pop()
+        alias[i] = j
+        prob[j] -= 1 - prob[i]
+        if prob[j] < 1:
+            small.append(j)
+        else:
+            large.append(j)
+    # remaining outcomes are only affected by rounding errors
+    for i in small + large:
+        prob[i] = 1
+
+    return prob.tolist(), alias
+
+
+def sample_route(routes):
+    """Sample one of the routes available from an edge.
+
+    The alias table of the routes is computed the first time they are sampled
+    from, so that routes are then sampled in constant time.
+
+    Parameters
+    ----------
+    routes : list of (list of str, float)
+        the routes available from the edge, and the fraction of vehicles that
+        adopt every route (see the `available_routes` attribute of the
+        environments)
+
+    Returns
+    -------
+    list of str
+        the edges of the sampled route
+    """
+    if len(routes) == 1:
+        return routes[0][0]
+
+    table = _ALIAS_TABLES.get(id(routes))
+    if table is None:
+        if len(_ALIAS_TABLES) >= _MAX_ALIAS_TABLES:
+            _ALIAS_TABLES.clear()
+        # the list of routes is stored with the table, so that its id is not
+        # reused by another list
+        table = _ALIAS_TABLES[id(routes)] = \
+            (routes,) + alias_table([val[1] for val in routes])
+
+    _, prob, alias = table
+    u = np.random.uniform() * len(prob)
+    i = int(u)
+    return routes[i if u - i < prob[i] else alias[i]][0]
+
 
 class ContinuousRouter(BaseRouter):
     """A router used to continuously re-route of the vehicle in a closed ring.
@@ -16,6 +98,8 @@ class ContinuousRouter(BaseRouter):
     See base class for usage example.
     """
 
+    event_driven = True
+
     def choose_route(self, env):
         """See parent class.
 
@@ -31,13 +115,7 @@ class ContinuousRouter(BaseRouter):
         elif edge == current_route[-1]:
             # choose one of the available routes based on the fraction of times
             # the given route can be chosen
-            num_routes = len(env.available_routes[edge])
-            frac = [val[1] for val in env.available_routes[edge]]
-            route_id = np.random.choice(
-                [i for i in range(num_routes)], size=1, p=frac)[0]
-
-            # pass the chosen route
-            return env.available_routes[edge][route_id][0]
+            return sample_route(env.available_routes[edge])
         else:
             return None
 
@@ -89,6 +167,8 @@ class GridRouter(BaseRouter):
     See base class for usage example.
     """
 
+    event_driven = True
+
     def choose_route(self, env):
         """See parent class."""
         if len(env.k.vehicle.get_route(self.veh_id)) == 0:
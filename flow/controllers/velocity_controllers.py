@@ -115,6 +115,50 @@ class FollowerStopper(BaseController):
             # compute the acceleration from the desired velocity
             return (v_cmd - this_vel) / env.sim_step
 
+    def get_batch_params(self):
+        """See parent class."""
+        return (self.v_des, self.dx_1_0, self.dx_2_0, self.dx_3_0, self.d_1,
+                self.d_2, self.d_3, frozenset(self.danger_edges))
+
+    def get_accel_batch(self, env, state):
+        """See parent class."""
+        this_vel = state.speed
+        lead_vel = state.lead_speed
+
+        if self.v_des is None:
+            return np.full(len(this_vel), np.nan)
+
+        dx = state.headway
+        dv_minus = np.minimum(lead_vel - this_vel, 0)
+
+        dx_1 = self.dx_1_0 + 1 / (2 * self.d_1) * dv_minus**2
+        dx_2 = self.dx_2_0 + 1 / (2 * self.d_2) * dv_minus**2
+        dx_3 = self.dx_3_0 + 1 / (2 * self.d_3) * dv_minus**2
+        v = np.minimum(np.maximum(lead_vel, 0), self.v_des)
+        # compute the desired velocity
+        v_cmd = np.select(
+            [dx <= dx_1, dx <= dx_2, dx <= dx_3],
+            [0,
+             v * (dx - dx_1) / (dx_2 - dx_1),
+             v + (self.v_des - this_vel) * (dx - dx_2) / (dx_3 - dx_2)],
+            default=self.v_des)
+        v_cmd = np.where(state.has_leader, v_cmd, self.v_des)
+
+        # compute the acceleration from the desired velocity
+        accel = (v_cmd - this_vel) / env.sim_step
+
+        if self.danger_edges:
+            # distance to the intersection, see find_intersection_dist
+            is_center = state.edge_values(env, lambda edge: 'center' in edge)
+            edge_len = state.edge_values(env, env.k.network.edge_length)
+            dist = np.where(is_center, 0, edge_len - state.position)
+
+            in_danger = state.edge_values(
+                env, lambda edge: edge in self.danger_edges)
+            accel[(dist <= 10) & in_danger] = np.nan
+
+        return accel
+
 
 class NonLocalFollowerStopper(FollowerStopper):
     """Follower stopper that uses the average system speed to compute its acceleration."""
@@ -0,0 +1,254 @@
+"""Streaming storage of the emission data generated during simulations.
+
+Emission data is written to disk in chunks ("shards") as the simulation
+proceeds, so that the memory used by the recorder is bounded regardless of
+the length of the simulation. Each shard is an uncompressed `.npz` file
+containing one fixed-width numpy array per column. A CSV file may optionally
+be generated from the shards once the simulation is complete.
+"""
+
+import csv
+import glob
+import os
+import shutil
+
+import numpy as np
+
+from flow.core.util import ensure_dir
+
+
+# names and types of the columns stored in emission files, in the order they
+# are written to csv files
+EMISSION_COLUMNS = (
+    ("time", float),
+    ("id", str),
+    ("x", float),
+    ("y", float),
+    ("speed", float),
+    ("headway", float),
+    ("leader_id", str),
+    ("target_accel_with_noise_with_failsafe", float),
+    ("target_accel_no_noise_no_failsafe", float),
+    ("target_accel_with_noise_no_failsafe", float),
+    ("target_accel_no_noise_with_failsafe", float),
+    ("realized_accel", float),
+    ("road_grade", float),
+    ("edge_id", str),
+    ("lane_number", int),
+    ("distance", float),
+    ("relative_position", float),
+    ("follower_id", str),
+    ("leader_rel_speed", float),
+)
+
+
+class EmissionRecorder(object):
+    """Streaming recorder of emission data.
+
+    Rows are appended one simulation step at a time, and buffered in memory
+    until `chunk_size` rows have been collected. The buffered rows are then
+    written to a new shard in the output directory, named
+    `part-<shard number>.npz`.
+
+    If several samples are appended for the same time, only the last one is
+    kept (e.g. when the simulation is reset).
+
+    Float columns store missing values (e.g. accelerations of vehicles
+    controlled by sumo) as NaN, and string columns store them as empty
+    strings.
+
+    Usage
+    -----
+    >>> recorder = EmissionRecorder("./data/ring-0_emission")
+    >>> recorder.append(time=0.1, id=["human_0"], speed=[5.0], ...)
+    >>> recorder.close()
+    >>> data = load_emission("./data/ring-0_emission")
+
+    Attributes
+    ----------
+    path : str
+        directory the shards are written to
+    chunk_size : int
+        minimum number of rows stored in every shard (except the last one)
+    num_rows : int
+        total number of rows appended to the recorder
+    num_shards : int
+        number of shards written to disk so far
+    """
+
+    def __init__(self, path, chunk_size=100000):
+        """Instantiate the recorder.
+
+        Parameters
+        ----------
+        path : str
+            directory the shards are written to. It is created if it does not
+            exist.
+        chunk_size : int, optional
+            number of rows after which the buffered rows are written to a
+            new shard
+        """
+        self.path = ensure_dir(path)
+        self.chunk_size = chunk_size
+        self.num_rows = 0
+        self.num_shards = 0
+        self._buffer = {name: [] for name, _ in EMISSION_COLUMNS}
+        self._buffered_rows = 0
+        self._last_time = None
+
+    def append(self, time, **columns):
+        """Append the data of all vehicles at a given time step.
+
+        Parameters
+        ----------
+        time : float
+            time of the sample (in seconds)
+        columns : array_like
+            the value of every other column in EMISSION_COLUMNS, for every
+            vehicle. None values are treated as missing.
+        """
+        n = len(columns["id"])
+        if n == 0:
+            return
+
+        if time == self._last_time:
+            # replace the previous sample. Shards are only written once a
+            # sample with a new time is appended, so it is still buffered.
+            last = len(self._buffer["time"][-1])
+            for name, _ in EMISSION_COLUMNS:
+                del self._buffer[name][-1]
+            self.num_rows -= last
+            self._buffered_rows -= last
+        elif self._buffered_rows >= self.chunk_size:
+            self.flush()
+
+        self._buffer["time"].append(np.full(n, time, dtype=float))
+        for name, dtype in EMISSION_COLUMNS[1:]:
+            self._buffer[name].append(_to_array(columns[name], dtype))
+
+        self.num_rows += n
+        self._buffered_rows += n
+        self._last_time = time
+
+    def flush(self):
+        """Write the buffered rows to a new shard."""
+        if self._buffered_rows == 0:
+            return
+
+        data = {name: np.concatenate(self._buffer[name])
+                for name, _ in EMISSION_COLUMNS}
+        np.savez(os.path.join(
+            self.path, "part-{:05d}.npz".format(self.num_shards)), **data)
+
+        self.num_shards += 1
+        self._buffer = {name: [] for name, _ in EMISSION_COLUMNS}
+        self._buffered_rows = 0
+
+    def close(self):
+        """Write any remaining rows to disk."""
+        self.flush()
+
+
+def _to_array(values, dtype):
+    """Convert the values of a column into an array of the specified type."""
+    if dtype is str:
+        return np.array(["" if v is None else v for v in values], dtype=str)
+    elif dtype is float:
+        return np.array([np.nan if v is None else v for v in values],
+                        dtype=float)
+    else:
+        return np.asarray(values, dtype=dtype)
+
+
+def emission_shards(path):
+    """Return the paths of the shards in an emission directory, in order.
+
+    Parameters
+    ----------
+    path : str
+        directory the shards were written to
+
+    Returns
+    -------
+    list of str
+        paths to the shards
+    """
+    return sorted(glob.glob(os.path.join(path, "part-*.npz")))
+
+
+def load_emission(path, columns=None):
+    """Load the emission data stored by an EmissionRecorder.
+
+    Parameters
+    ----------
+    path : str
+        directory the shards were written to
+    columns : list of str, optional
+        names of the columns to load, defaults to all columns
+
+    Returns
+    -------
+    dict <str, np.ndarray>
+        the values of every column, concatenated over all shards
+    """
+    if columns is None:
+        columns = [name for name, _ in EMISSION_COLUMNS]
+
+    data = {name: [] for name in columns}
+    for shard in emission_shards(path):
+        with np.load(shard) as f:
+            for name in columns:
+                data[name].append(f[name])
+
+    dtypes = dict(EMISSION_COLUMNS)
+    return {name: np.concatenate(data[name]) if len(data[name]) > 0
+            else np.array([], dtype=dtypes.get(name, float))
+            for name in columns}
+
+
+def emission_shards_to_csv(path, output_path=None, remove_shards=False):
+    """Convert the emission data stored by an EmissionRecorder into a csv.
+
+    Shards are converted one at a time, so that the memory used by the
+    conversion is bounded by the size of a single shard. Missing values are
+    written as empty fields.
+
+    Parameters
+    ----------
+    path : str
+        directory the shards were written to
+    output_path : str, optional
+        path to the csv file that will be generated, defaults to the name of
+        the directory with a ".csv" extension
+    remove_shards : bool, optional
+        whether to delete the directory of shards once the csv is written
+
+    Returns
+    -------
+    str
+        path to the generated csv file
+    """
+    if output_path is None:
+        output_path = os.path.normpath(path) + ".csv"
+
+    names = [name for name, _ in EMISSION_COLUMNS]
+    with open(output_path, "w") as f:
+        writer = csv.writer(f, delimiter=',')
+        writer.writerow(names)
+        for shard in emission_shards(path):
+            with np.load(shard) as data:
+                rows = zip(*[_csv_values(data[name]) for name in names])
+                writer.writerows(rows)
+
+    if remove_shards:
+        shutil.rmtree(path)
+
+    return output_path
+
+
+def _csv_values(column):
+    """Return the values of a column as a list, with NaN values emptied."""
+    values = column.tolist()
+    if column.dtype.kind == "f":
+        values = ["" if v != v else v for v in values]
+    return values
@@ -0,0 +1,484 @@
+"""Partitioned storage of the emission data of many rollouts.
+
+The emission data of every rollout is stored in a dataset directory,
+partitioned by experiment, run and time window:
+
+::
+
+    <dataset>/<experiment>/run-<run>/index.json
+    <dataset>/<experiment>/run-<run>/part-<window>-<chunk>/<column>.npy
+
+Every partition holds the rows of a time window of a run (split into several
+chunks if the window contains many rows), sorted by time. Every column is
+stored in a separate `.npy` file, so that columns may be memory-mapped, and
+only the columns needed by a query are read.
+
+The index of every run lists its partitions along with statistics on their
+content (time range, edges and vehicle ids), which are used to skip the
+partitions that are irrelevant to a query. For example, the speeds of the
+vehicles on edge "bottom" between 100 and 200 seconds of every run of an
+experiment are collected with:
+
+>>> dataset = EmissionDataset("./data/dataset")
+>>> data = dataset.query(columns=["time", "id", "speed"], experiment="ring",
+...                      edges=["bottom"], start_time=100, end_time=200)
+"""
+
+import glob
+import json
+import os
+
+import numpy as np
+
+from flow.core.emission import emission_shards
+from flow.core.util import ensure_dir
+
+# name of the index file of every run
+INDEX_FILE = "index.json"
+
+
+class EmissionDatasetWriter(object):
+    """Writer of the emission data of a run into a partitioned dataset.
+
+    Rows are buffered by time window, and a window is written to a new
+    partition once it contains `chunk_size` rows, or when the writer is
+    closed. The index of the run is updated after every partition that is
+    written, so that the partitions of interrupted runs remain readable.
+
+    Usage
+    -----
+    >>> writer = EmissionDatasetWriter("./data/dataset", "ring", run=0)
+    >>> writer.write({"time": [0.1, 0.1], "id": ["human_0", "human_1"], ...})
+    >>> writer.close()
+
+    Attributes
+    ----------
+    path : str
+        directory of the run
+    experiment : str
+        name of the experiment
+    run : int or str
+        identifier of the run
+    time_window : float
+        duration (in seconds) of the time windows the rows are partitioned by
+    chunk_size : int
+        maximum number of rows stored in a partition
+    """
+
+    def __init__(self, root, experiment, run, time_window=100.,
+                 chunk_size=100000):
+        """Instantiate the writer.
+
+        Any data previously stored for the same run is overwritten.
+
+        Parameters
+        ----------
+        root : str
+            directory of the dataset. It is created if it does not exist.
+        experiment : str
+            name of the experiment
+        run : int or str
+            identifier of the run
+        time_window : float, optional
+            duration (in seconds) of the time windows the rows are
+            partitioned by
+        chunk_size : int, optional
+            maximum number of rows stored in a partition
+        """
+        self.path = _run_path(root, experiment, run)
+        self.experiment = experiment
+        self.run = run
+        self.time_window = time_window
+        self.chunk_size = chunk_size
+
+        for part in glob.glob(os.path.join(self.path, "part-*")):
+            for column in glob.glob(os.path.join(part, "*.npy")):
+                os.remove(column)
+            os.rmdir(part)
+        ensure_dir(self.path)
+
+        self._columns = None
+        self._partitions = []
+        self._buffers = {}
+        self._chunks = {}
+        self._write_index()
+
+    def write(self, data):
+        """Add rows to the run.
+
+        Parameters
+        ----------
+        data : dict <str, array_like>
+            the value of every column for every row. The "time" column is
+            required, and every call must provide the same columns.
+
+        Raises
+        ------
+        ValueError
+            if the columns differ from the ones previously written
+        """
+        data = {name: np.asarray(values) for name, values in data.items()}
+        if self._columns is None:
+            self._columns = list(data.keys())
+        elif set(data.keys()) != set(self._columns):
+            raise ValueError("Expected the columns {}, got {}.".format(
+                self._columns, list(data.keys())))
+
+        if len(data["time"]) == 0:
+            return
+
+        windows = np.floor(data["time"] / self.time_window).astype(int)
+        for window in np.unique(windows):
+            rows = windows == window
+            buffer = self._buffers.setdefault(window, [])
+            buffer.append({name: data[name][rows] for name in self._columns})
+            if sum(len(chunk["time"]) for chunk in buffer) >= \
+                    self.chunk_size:
+                self._flush_window(window)
+
+    def flush(self):
+        """Write all buffered rows to new partitions."""
+        for window in sorted(self._buffers.keys()):
+            self._flush_window(window)
+
+    def close(self):
+        """Write any remaining rows to disk."""
+        self.flush()
+
+    def _flush_window(self, window):
+        """Write the buffered rows of a time window to new partitions."""
+        buffer = self._buffers.pop(window, [])
+        if len(buffer) == 0:
+            return
+
+        data = {name: np.concatenate([chunk[name] for chunk in buffer])
+                for name in self._columns}
+        order = np.argsort(data["time"], kind="stable")
+        data = {name: values[order] for name, values in data.items()}
+
+        for start in range(0, len(data["time"]), self.chunk_size):
+            chunk = {name: values[start:start + self.chunk_size]
+                     for name, values in data.items()}
+            self._write_partition(window, chunk)
+        self._write_index()
+
+    def _write_partition(self, window, data):
+        """Write the rows of a partition and collect its statistics."""
+        chunk = self._chunks.get(window, 0)
+        self._chunks[window] = chunk + 1
+
+        name = "part-{:05d}-{:03d}".format(window, chunk)
+        path = ensure_dir(os.path.join(self.path, name))
+        for column, values in data.items():
+            np.save(os.path.join(path, column + ".npy"), values)
+
+        stats = {
+            "name": name,
+            "window": int(window),
+            "num_rows": len(data["time"]),
+            "min_time": float(data["time"][0]),
+            "max_time": float(data["time"][-1]),
+        }
+        if "edge_id" in data:
+            stats["edges"] = np.unique(data["edge_id"]).tolist()
+        if "id" in data:
+            ids = np.unique(data["id"])
+            stats["num_ids"] = len(ids)
+            stats["min_id"] = str(ids[0])
+            stats["max_id"] = str(ids[-1])
+        self._partitions.append(stats)
+
+    def _write_index(self):
+        """Write the index of the run, replacing the previous one."""
+        index = {
+            "experiment": self.experiment,
+            "run": self.run,
+            "time_window": self.time_window,
+            "columns": self._columns,
+            "partitions": sorted(self._partitions,
+                                 key=lambda p: p["name"]),
+        }
+        tmp_path = os.path.join(self.path, INDEX_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, os.path.join(self.path, INDEX_FILE))
+
+
+class EmissionDataset(object):
+    """Reader of a partitioned emission dataset.
+
+    Queries may be restricted to experiments, runs, a time interval, edges
+    and vehicle ids. The partitions whose statistics do not match these
+    restrictions are not read.
+
+    Attributes
+    ----------
+    root : str
+        directory of the dataset
+    runs : list of dict
+        the index of every run in the dataset (see EmissionDatasetWriter)
+    """
+
+    def __init__(self, root):
+        """Instantiate the reader.
+
+        Parameters
+        ----------
+        root : str
+            directory of the dataset
+        """
+        self.root = root
+        self.runs = []
+        self.refresh()
+
+    def refresh(self):
+        """Reload the index of every run, e.g. after new runs are written."""
+        self.runs = []
+        for path in sorted(glob.glob(
+                os.path.join(self.root, "*", "run-*", INDEX_FILE))):
+            with open(path) as f:
+                index = json.load(f)
+            index["path"] = os.path.dirname(path)
+            self.runs.append(index)
+
+    @property
+    def experiments(self):
+        """Return the names of the experiments in the dataset."""
+        return sorted(set(index["experiment"] for index in self.runs))
+
+    def partitions(self, experiment=None, run=None, start_time=None,
+                   end_time=None, edges=None, ids=None):
+        """Return the partitions that may contain rows matching a query.
+
+        Parameters
+        ----------
+        experiment : str or list of str, optional
+            names of the experiments, defaults to all experiments
+        run : int or str or list, optional
+            identifiers of the runs, defaults to all runs
+        start_time : float, optional
+            start of the time interval (in seconds, inclusive)
+        end_time : float, optional
+            end of the time interval (in seconds, inclusive)
+        edges : list of str, optional
+            names of the edges
+        ids : list of str, optional
+            ids of the vehicles
+
+        Returns
+        -------
+        list of dict
+            the statistics of every partition, along with its "path", its
+            "columns", and the "experiment" and "run" it belongs to
+        """
+        experiments = _as_set(experiment)
+        runs = _as_set(run)
+        edges = None if edges is None else set(edges)
+        ids = None if ids is None else sorted(ids)
+
+        partitions = []
+        for index in self.runs:
+            if experiments is not None and \
+                    index["experiment"] not in experiments:
+                continue
+            if runs is not None and index["run"] not in runs:
+                continue
+
+            for stats in index["partitions"]:
+                if start_time is not None and stats["max_time"] < start_time:
+                    continue
+                if end_time is not None and stats["min_time"] > end_time:
+                    continue
+                if edges is not None and "edges" in stats and \
+                        edges.isdisjoint(stats["edges"]):
+                    continue
+                if ids is not None and "min_id" in stats and not any(
+                        stats["min_id"] <= veh_id <= stats["max_id"]
+                        for veh_id in ids):
+                    continue
+
+                partition = dict(stats)
+                partition.update(
+                    path=os.path.join(index["path"], stats["name"]),
+                    experiment=index["experiment"],
+                    run=index["run"],
+                    columns=index["columns"])
+                partitions.append(partition)
+
+        return partitions
+
+    @staticmethod
+    def load_partition(partition, columns, mmap_mode="r"):
+        """Load the columns of a partition.
+
+        Parameters
+        ----------
+        partition : dict
+            the partition (see `partitions`)
+        columns : list of str
+            names of the columns to load
+        mmap_mode : str or None, optional
+            mode the columns are memory-mapped with (see numpy.load). If set
+            to None, the columns are read into memory.
+
+        Returns
+        -------
+        dict <str, np.ndarray>
+            the value of every column for every row of the partition
+        """
+        return {name: np.load(os.path.join(partition["path"], name + ".npy"),
+                              mmap_mode=mmap_mode)
+                for name in columns}
+
+    def iter_query(self, columns=None, experiment=None, run=None,
+                   start_time=None, end_time=None, edges=None, ids=None):
+        """Yield the rows matching a query, one partition at a time.
+
+        See `query` for a description of the parameters.
+
+        Yields
+        ------
+        dict
+            the partition (see `partitions`)
+        dict <str, np.ndarray>
+            the value of every requested column for the matching rows of the
+            partition
+        """
+        for partition in self.partitions(
+                experiment, run, start_time, end_time, edges, ids):
+            names = columns if columns is not None else partition["columns"]
+            data = self.load_partition(partition, partition["columns"])
+
+            # the rows of a partition are sorted by time
+            time = data["time"]
+            start = 0 if start_time is None else \
+                np.searchsorted(time, start_time, side="left")
+            end = len(time) if end_time is None else \
+                np.searchsorted(time, end_time, side="right")
+
+            rows = slice(start, end)
+            mask = None
+            if edges is not None:
+                mask = np.isin(data["edge_id"][rows], list(edges))
+            if ids is not None:
+                id_mask = np.isin(data["id"][rows], list(ids))
+                mask = id_mask if mask is None else mask & id_mask
+
+            if mask is None:
+                yield partition, {name: np.array(data[name][rows])
+                                  for name in names}
+            elif mask.any():
+                yield partition, {name: data[name][rows][mask]
+                                  for name in names}
+
+    def query(self, columns=None, experiment=None, run=None, start_time=None,
+              end_time=None, edges=None, ids=None):
+        """Return the rows matching a query.
+
+        Parameters
+        ----------
+        columns : list of str, optional
+            names of the columns to return, defaults to all columns
+        experiment : str or list of str, optional
+            names of the experiments, defaults to all experiments
+        run : int or str or list, optional
+            identifiers of the runs, defaults to all runs
+        start_time : float, optional
+            start of the time interval (in seconds, inclusive)
+        end_time : float, optional
+            end of the time interval (in seconds, inclusive)
+        edges : list of str, optional
+            only return the rows of vehicles on these edges
+        ids : list of str, optional
+            only return the rows of these vehicles
+
+        Returns
+        -------
+        dict <str, np.ndarray>
+            the value of every requested column for the matching rows,
+            grouped by run and ordered by time within every run. The
+            "experiment" and "run" columns may also be requested.
+        """
+        extra = [name for name in ("experiment", "run")
+                 if columns is not None and name in columns]
+        names = None if columns is None else \
+            [name for name in columns if name not in extra]
+
+        data = {}
+        for partition, rows in self.iter_query(
+                names, experiment, run, start_time, end_time, edges, ids):
+            num_rows = len(rows["time"]) if "time" in rows else \
+                len(next(iter(rows.values())))
+            for name in extra:
+                rows[name] = np.full(num_rows, partition[name])
+            for name, values in rows.items():
+                data.setdefault(name, []).append(values)
+
+        return {name: np.concatenate(values) for name, values in data.items()}
+
+
+def add_emission(root, path, experiment, run, time_window=100.,
+                 chunk_size=100000):
+    """Add the emission data of a run to a dataset.
+
+    Parameters
+    ----------
+    root : str
+        directory of the dataset
+    path : str
+        emission data of the run, either a directory of shards (see
+        flow.core.emission.EmissionRecorder), or a .npz or .csv file (see
+        flow.core.util.emission_to_csv)
+    experiment : str
+        name of the experiment
+    run : int or str
+        identifier of the run
+    time_window : float, optional
+        duration (in seconds) of the time windows the rows are partitioned by
+    chunk_size : int, optional
+        maximum number of rows stored in a partition
+
+    Returns
+    -------
+    str
+        path to the directory of the run in the dataset
+    """
+    writer = EmissionDatasetWriter(
+        root, experiment, run, time_window=time_window, chunk_size=chunk_size)
+
+    if os.path.isdir(path):
+        for shard in emission_shards(path):
+            with np.load(shard) as data:
+                writer.write({name: data[name] for name in data.files})
+    elif path.endswith(".npz"):
+        with np.load(path) as data:
+            writer.write({name: data[name] for name in data.files})
+    else:
+        import pandas as pd
+        for chunk in pd.read_csv(path, chunksize=chunk_size):
+            writer.write({name: _column(chunk[name])
+                          for name in chunk.columns})
+
+    writer.close()
+    return writer.path
+
+
+def _column(series):
+    """Convert a column read from a csv file into a fixed-width array."""
+    if series.dtype.kind not in "biuf":
+        return series.fillna("").to_numpy(dtype=str)
+    return series.to_numpy()
+
+
+def _run_path(root, experiment, run):
+    """Return the directory of a run in a dataset."""
+    return os.path.join(root, str(experiment), "run-{}".format(run))
+
+
+def _as_set(values):
+    """Convert a value or a list of values into a set (None is kept)."""
+    if values is None:
+        return None
+    if isinstance(values, (list, tuple, set)):
+        return set(values)
+    return {values}
@@ -2,9 +2,14 @@
 from flow.utils.registry import make_create_env
 from datetime import datetime
 import logging
+import multiprocessing
+import random
 import time
 import numpy as np
 
+# environment and arguments of the worker processes of parallel experiments
+_worker = {}
+
 
 class Experiment:
     """
@@ -41,10 +46,23 @@ class Experiment:
 
         >>> exp.run(num_runs=1, convert_to_csv=True)
 
+    Rollouts may also be distributed over several worker processes, each of
+    which runs its own environment and simulator instance:
+
+        >>> exp.run(num_runs=100, num_workers=32)
+
     After the experiment is complete, look at the "./data" directory. There
-    will be two files, one with the suffix .xml and another with the suffix
-    .csv. The latter should be easily interpretable from any csv reader (e.g.
-    Excel), and can be parsed using tools such as numpy and pandas.
+    will be one file with the suffix .csv for every run, which should be easily
+    interpretable from any csv reader (e.g. Excel), and can be parsed using
+    tools such as numpy and pandas. If convert_to_csv is not set, the emission
+    data of every run is instead kept as a directory of binary .npz shards,
+    which can be loaded using flow.core.emission.load_emission.
+
+    The emission data of all runs may also be collected in a partitioned
+    dataset, which supports queries over many runs (see
+    flow.core.emission_dataset.EmissionDataset):
+
+        >>> exp.run(num_runs=100, emission_dataset="./data/dataset")
 
     Attributes
     ----------
@@ -55,6 +73,9 @@ class Experiment:
         keyed by the str.
     env : flow.envs.Env
         the environment object the simulator will run
+    flow_params : dict
+        flow-specific parameters, used to create the environments of the
+        worker processes of parallel runs
     """
 
     def __init__(self, flow_params, custom_callables=None):
@@ -71,6 +92,7 @@ class Experiment:
             in a dict keyed by the str.
         """
         self.custom_callables = custom_callables or {}
+        self.flow_params = flow_params
 
         # Get the env name and a creator for the environment.
         create_env, _ = make_create_env(flow_params)
@@ -83,9 +105,23 @@ class Experiment:
 
         logging.info("Initializing environment.")
 
-    def run(self, num_runs, rl_actions=None, convert_to_csv=False):
+    def run(self,
+            num_runs,
+            rl_actions=None,
+            convert_to_csv=False,
+            num_workers=1,
+            emission_dataset=None):
         """Run the given network for a set number of runs.
 
+        If several workers are requested, the runs are distributed over a
+        pool of processes, each with its own environment (and simulator
+        instance, on a distinct port). Every run then starts from a new
+        simulation, seeded with the seed in the simulation parameters (or 0 if
+        none is specified) plus the run number, so that the results only
+        depend on the number of runs. The results of the runs are merged in
+        the order of the runs, and emission data is stored under the name of
+        the network of this experiment, as in sequential runs.
+
         Parameters
         ----------
         num_runs : int
@@ -94,16 +130,26 @@ class Experiment:
             maps states to actions to be performed by the RL agents (if
             there are any)
         convert_to_csv : bool
-            Specifies whether to convert the emission file created by sumo
-            into a csv file
+            Specifies whether to convert the emission data of every run into
+            a csv file. Otherwise, the data is kept as binary shards (see
+            flow.core.emission)
+        num_workers : int, optional
+            number of processes the runs are distributed over. Worker
+            processes are forked, so that rl_actions and the custom callables
+            need not be picklable (their results must be). The environment
+            of the experiment is terminated before the workers are forked.
+        emission_dataset : str, optional
+            directory of a partitioned emission dataset the emission data of
+            every run is added to (see flow.core.emission_dataset)
 
         Returns
         -------
         info_dict : dict < str, Any >
-            contains returns, average speed per step
+            contains returns, average speed per step, and the timings of the
+            phases of the steps if profiling is enabled (see
+            flow.core.profiler.StepProfiler.summary). Timings are only
+            collected by sequential runs.
         """
-        num_steps = self.env.env_params.horizon
-
         # raise an error if convert_to_csv is set to True but no emission
         # file will be generated, to avoid getting an error at the end of the
         # simulation
@@ -135,44 +181,27 @@ class Experiment:
         t = time.time()
         times = []
 
-        for i in range(num_runs):
-            ret = 0
-            vel = []
-            custom_vals = {key: [] for key in self.custom_callables.keys()}
-            state = self.env.reset()
-            for j in range(num_steps):
-                t0 = time.time()
-                state, reward, done, _ = self.env.step(rl_actions(state))
-                t1 = time.time()
-                times.append(1 / (t1 - t0))
-
-                # Compute the velocity speeds and cumulative returns.
-                veh_ids = self.env.k.vehicle.get_ids()
-                vel.append(np.mean(self.env.k.vehicle.get_speed(veh_ids)))
-                ret += reward
-
-                # Compute the results for the custom callables.
-                for (key, lambda_func) in self.custom_callables.items():
-                    custom_vals[key].append(lambda_func(self.env))
-
-                if done:
-                    break
-
+        if num_workers > 1:
+            results = self._run_parallel(
+                num_runs, rl_actions, convert_to_csv, num_workers,
+                emission_dataset)
+        else:
+            results = (self.rollout(self.env, i, rl_actions, convert_to_csv,
+                                    emission_dataset=emission_dataset)
+                       for i in range(num_runs))
+
+        for i, (ret, vel, outflow, custom_vals, step_rates) in \
+                enumerate(results):
             # Store the information from the run in info_dict.
-            outflow = self.env.k.vehicle.get_outflow_rate(int(500))
             info_dict["returns"].append(ret)
-            info_dict["velocities"].append(np.mean(vel))
+            info_dict["velocities"].append(vel)
             info_dict["outflows"].append(outflow)
             for key in custom_vals.keys():
-                info_dict[key].append(np.mean(custom_vals[key]))
+                info_dict[key].append(custom_vals[key])
+            times.extend(step_rates)
 
             print("Round {0}, return: {1}".format(i, ret))
 
-            # Save emission data at the end of every rollout. This is skipped
-            # by the internal method if no emission path was specified.
-            if self.env.simulator == "traci":
-                self.env.k.simulation.save_emission(run_id=i)
-
         # Print the averages/std for all variables in the info_dict.
         for key in info_dict.keys():
             print("Average, std {}: {}, {}".format(
@@ -180,6 +209,161 @@ class Experiment:
 
         print("Total time:", time.time() - t)
         print("steps/second:", np.mean(times))
-        self.env.terminate()
+
+        # Print and return the timings of the phases of the steps (if the
+        # simulation was profiled).
+        profiler = self.env.k.profiler
+        if profiler.enabled:
+            print(profiler.report())
+            info_dict["profile"] = profiler.summary()
+
+        # the environment of parallel runs is terminated before the runs
+        if num_workers <= 1:
+            self.env.terminate()
 
         return info_dict
+
+    def rollout(self, env, run_id, rl_actions, convert_to_csv=False,
+                emission_name=None, emission_dataset=None):
+        """Perform a single run in an environment.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the environment the run is performed in
+        run_id : int
+            the run number, used to name the emission data
+        rl_actions : method
+            maps states to actions to be performed by the RL agents
+        convert_to_csv : bool, optional
+            whether to convert the emission data of the run into a csv file
+        emission_name : str, optional
+            the name the emission data is stored under, defaults to the name
+            of the network of the environment
+        emission_dataset : str, optional
+            directory of a partitioned emission dataset the emission data of
+            the run is added to
+
+        Returns
+        -------
+        float
+            the cumulative return of the run
+        float
+            the average speed of the vehicles during the run
+        float
+            the outflow rate at the end of the run
+        dict < str, float >
+            the average result of every custom callable during the run
+        list of float
+            the number of steps per second of every step
+        """
+        num_steps = env.env_params.horizon
+
+        ret = 0
+        vel = []
+        custom_vals = {key: [] for key in self.custom_callables.keys()}
+        times = []
+        state = env.reset()
+        for j in range(num_steps):
+            t0 = time.time()
+            state, reward, done, _ = env.step(rl_actions(state))
+            t1 = time.time()
+            times.append(1 / (t1 - t0))
+
+            # Compute the velocity speeds and cumulative returns.
+            veh_ids = env.k.vehicle.get_ids()
+            vel.append(np.mean(env.k.vehicle.get_speed(veh_ids)))
+            ret += reward
+
+            # Compute the results for the custom callables.
+            for (key, lambda_func) in self.custom_callables.items():
+                custom_vals[key].append(lambda_func(env))
+
+            if done:
+                break
+
+        outflow = env.k.vehicle.get_outflow_rate(int(500))
+
+        # Save emission data at the end of every rollout. This is skipped
+        # by the internal method if no emission path was specified.
+        if env.simulator == "traci":
+            env.k.simulation.save_emission(
+                run_id=run_id, to_csv=convert_to_csv, name=emission_name,
+                dataset=emission_dataset)
+
+        return ret, np.mean(vel), outflow, \
+            {key: np.mean(vals) for key, vals in custom_vals.items()}, times
+
+    def _run_parallel(self, num_runs, rl_actions, convert_to_csv,
+                      num_workers, emission_dataset=None):
+        """Perform runs in a pool of worker processes.
+
+        Returns
+        -------
+        list of tuple
+            the results of every run (see rollout), in the order of the runs
+        """
+        seed = self.flow_params['sim'].seed or 0
+
+        # the environment of this process is not used by the runs, and its
+        # simulation is closed before the workers are forked, so that they do
+        # not inherit it. The emission data it collected when it was
+        # initialized does not belong to any run.
+        if self.env.simulator == "traci":
+            self.env.k.simulation.discard_emission()
+        self.env.terminate()
+
+        ctx = multiprocessing.get_context("fork")
+        pool = ctx.Pool(
+            processes=min(num_workers, num_runs),
+            initializer=_init_worker,
+            initargs=(self, rl_actions, convert_to_csv, emission_dataset))
+        try:
+            results = pool.starmap(
+                _run_worker, [(i, seed + i) for i in range(num_runs)],
+                chunksize=1)
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            # wait for the workers to terminate their environments
+            pool.join()
+
+        return results
+
+
+def _init_worker(experiment, rl_actions, convert_to_csv,
+                 emission_dataset=None):
+    """Create the environment of a worker process of a parallel experiment."""
+    create_env, _ = make_create_env(experiment.flow_params)
+    env = create_env()
+
+    # every run starts from a new simulation, so that its results do not
+    # depend on the runs previously performed by the worker
+    env.sim_params.restart_instance = True
+
+    _worker.update(
+        experiment=experiment,
+        env=env,
+        rl_actions=rl_actions,
+        convert_to_csv=convert_to_csv,
+        emission_name=experiment.env.network.name,
+        emission_dataset=emission_dataset,
+    )
+
+    # terminate the environment when the worker exits
+    multiprocessing.util.Finalize(env, env.terminate, exitpriority=10)
+
+
+def _run_worker(run_id, seed):
+    """Perform a run in a worker process of a parallel experiment."""
+    # the seed of the simulation is drawn from the random module when the
+    # environment is reset
+    random.seed(seed)
+    np.random.seed(seed)
+
+    return _worker["experiment"].rollout(
+        _worker["env"], run_id, _worker["rl_actions"],
+        _worker["convert_to_csv"], _worker["emission_name"],
+        _worker["emission_dataset"])
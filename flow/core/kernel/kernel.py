@@ -6,6 +6,8 @@ from flow.core.kernel.network import TraCIKernelNetwork, AimsunKernelNetwork
 from flow.core.kernel.vehicle import TraCIVehicle, AimsunKernelVehicle
 from flow.core.kernel.traffic_light import TraCITrafficLight, \
     AimsunKernelTrafficLight
+from flow.core.kernel.metrics import StepMetrics
+from flow.core.profiler import StepProfiler, profiling_enabled
 from flow.utils.exceptions import FatalFlowError
 
 
@@ -43,6 +45,13 @@ class Kernel(object):
 
     These subclasses can be modified and recycled to support various different
     traffic simulators, e.g. SUMO, AIMSUN, TruckSim, etc...
+
+    Finally, the kernel holds the profiler used to time the different phases
+    of the simulation steps (see flow/core/profiler.py), and a cache of the
+    aggregate metrics of the current step, which may be shared by several
+    reward functions and observations (see flow/core/kernel/metrics.py):
+
+    >>> k.metrics.mean_speed  # computed once per simulation step
     """
 
     def __init__(self, simulator, sim_params):
@@ -62,6 +71,12 @@ class Kernel(object):
         """
         self.kernel_api = None
 
+        # timers of the phases of the simulation steps
+        self.profiler = StepProfiler(enabled=profiling_enabled(sim_params))
+
+        # aggregate metrics of the current step, cleared after every update
+        self.metrics = StepMetrics(self)
+
         if simulator == "traci":
             self.simulation = TraCISimulation(self)
             self.network = TraCIKernelNetwork(self, sim_params)
@@ -98,10 +113,34 @@ class Kernel(object):
             specifies whether the simulator was reset in the last simulation
             step
         """
-        self.vehicle.update(reset)
-        self.traffic_light.update(reset)
-        self.network.update(reset)
-        self.simulation.update(reset)
+        with self.profiler.phase("update.vehicle"):
+            self.vehicle.update(reset)
+        with self.profiler.phase("update.traffic_light"):
+            self.traffic_light.update(reset)
+        with self.profiler.phase("update.network"):
+            self.network.update(reset)
+        with self.profiler.phase("update.simulation"):
+            self.simulation.update(reset)
+        self.metrics.clear()
+
+    def load_state(self, path, veh_types):
+        """Restore a simulation state and the vehicles it contains.
+
+        The state is loaded by the simulation kernel (see
+        KernelSimulation.load_state), after which the traffic lights are
+        subscribed to again and the vehicles of the state are registered in
+        the vehicle kernel (see KernelVehicle.restore_vehicles).
+
+        Parameters
+        ----------
+        path : str
+            path to the state file
+        veh_types : dict
+            type of every vehicle in the saved state, keyed by vehicle id
+        """
+        self.simulation.load_state(path)
+        self.traffic_light.pass_api(self.kernel_api)
+        self.vehicle.restore_vehicles(veh_types)
 
     def close(self):
         """Terminate all components within the simulation and network."""
@@ -0,0 +1,195 @@
+"""Script containing the cache of aggregate metrics of a simulation step."""
+
+import numpy as np
+
+
+class StepMetrics(object):
+    """Cache of aggregate metrics of the network at the current time step.
+
+    Aggregates that are needed by several reward functions or observations
+    (e.g. by the reward of every RL vehicle of a multi-agent environment) are
+    computed from the vehicle kernel the first time they are requested, and
+    then reused until the state of the vehicles changes. The cache is cleared
+    by the kernel after every call to `update`.
+
+    Other values may be cached through `cached`, for example:
+
+    >>> k.metrics.cached("num_rl_on_edge", lambda: ...)
+
+    Attributes
+    ----------
+    master_kernel : flow.core.kernel.Kernel
+        the higher level kernel, used to collect the state of the vehicles
+    """
+
+    def __init__(self, master_kernel):
+        """Instantiate the cache.
+
+        Parameters
+        ----------
+        master_kernel : flow.core.kernel.Kernel
+            the higher level kernel
+        """
+        self.master_kernel = master_kernel
+        self._cache = {}
+
+    def clear(self):
+        """Remove all cached values."""
+        self._cache.clear()
+
+    def cached(self, key, func):
+        """Return a value that is computed at most once per time step.
+
+        Parameters
+        ----------
+        key : hashable
+            the name of the value (and any parameters it depends on)
+        func : callable
+            function computing the value, called without arguments if the
+            value is not in the cache
+
+        Returns
+        -------
+        Any
+            the cached value
+        """
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = self._cache[key] = func()
+            return value
+
+    @property
+    def speed(self):
+        """Return the speed of every vehicle, in the order of `get_ids()`.
+
+        Vehicles whose speed is not available are assigned a speed of -1001.
+        """
+        return self.cached("speed", lambda: self.master_kernel.vehicle.
+                           get_speed_array(error=-1001))
+
+    @property
+    def mean_speed(self):
+        """Return the average speed of all vehicles (0 if there are none)."""
+        def mean_speed():
+            speed = self.speed
+            return float(np.mean(speed)) if len(speed) > 0 else 0.
+        return self.cached("mean_speed", mean_speed)
+
+    @property
+    def max_speed(self):
+        """Return the maximum speed of all vehicles (0 if there are none)."""
+        def max_speed():
+            speed = self.speed
+            return float(np.max(speed)) if len(speed) > 0 else 0.
+        return self.cached("max_speed", max_speed)
+
+    @property
+    def edge_counts(self):
+        """Return the number of vehicles on every edge.
+
+        Edges are indexed as in the vehicle kernel's `get_edge_index`, i.e.
+        by their position in the network kernel's `get_edge_list() +
+        get_junction_list()`.
+        """
+        def edge_counts():
+            edge, _ = self._edge_speeds()
+            return np.bincount(edge, minlength=len(self._edge_index()))
+        return self.cached("edge_counts", edge_counts)
+
+    @property
+    def edge_mean_speeds(self):
+        """Return the average speed of the vehicles on every edge.
+
+        Edges are indexed as in `edge_counts`. Edges without vehicles are
+        assigned an average speed of 0.
+        """
+        def edge_mean_speeds():
+            edge, speed = self._edge_speeds()
+            total = np.bincount(
+                edge, weights=speed, minlength=len(self._edge_index()))
+            counts = self.edge_counts
+            return np.divide(total, counts, out=np.zeros(len(total)),
+                             where=counts > 0)
+        return self.cached("edge_mean_speeds", edge_mean_speeds)
+
+    def edge_count(self, edge):
+        """Return the number of vehicles on an edge (or junction).
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+
+        Returns
+        -------
+        int
+            number of vehicles on the edge
+        """
+        index = self._edge_index().get(edge)
+        return 0 if index is None else int(self.edge_counts[index])
+
+    def edge_mean_speed(self, edge):
+        """Return the average speed of the vehicles on an edge (or junction).
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+
+        Returns
+        -------
+        float
+            average speed of the vehicles on the edge, or 0 if the edge is
+            empty
+        """
+        index = self._edge_index().get(edge)
+        return 0. if index is None else float(self.edge_mean_speeds[index])
+
+    def outflow_rate(self, time_span):
+        """Return the outflow rate of the network (see get_outflow_rate).
+
+        Parameters
+        ----------
+        time_span : int
+            time span (in seconds) the outflow rate is computed over
+
+        Returns
+        -------
+        float
+            outflow rate (in veh/hr)
+        """
+        return self.cached(("outflow_rate", time_span), lambda: self.
+                           master_kernel.vehicle.get_outflow_rate(time_span))
+
+    def inflow_rate(self, time_span):
+        """Return the inflow rate of the network (see get_inflow_rate).
+
+        Parameters
+        ----------
+        time_span : int
+            time span (in seconds) the inflow rate is computed over
+
+        Returns
+        -------
+        float
+            inflow rate (in veh/hr)
+        """
+        return self.cached(("inflow_rate", time_span), lambda: self.
+                           master_kernel.vehicle.get_inflow_rate(time_span))
+
+    def _edge_index(self):
+        """Return the index of every edge and junction, keyed by name."""
+        def edge_index():
+            network = self.master_kernel.network
+            edges = network.get_edge_list() + network.get_junction_list()
+            return {edge: i for i, edge in enumerate(edges)}
+        return self.cached("edge_index", edge_index)
+
+    def _edge_speeds(self):
+        """Return the edge index and speed of vehicles on known edges."""
+        def edge_speeds():
+            edge = np.asarray(self.master_kernel.vehicle.get_edge_index())
+            known = edge >= 0
+            return edge[known], self.speed[known]
+        return self.cached("edge_speeds", edge_speeds)
@@ -234,6 +234,7 @@ class AimsunKernelNetwork(BaseKernelNetwork):
         self.total_edgestarts.sort(key=lambda tup: tup[1])
 
         self.total_edgestarts_dict = dict(self.total_edgestarts)
+        self._index_edgestarts()
 
         # specify routes vehicles can take  # TODO: move into a method
         self.rts = self.network.routes
@@ -317,12 +318,6 @@ class AimsunKernelNetwork(BaseKernelNetwork):
         """See parent class."""
         return self._junction_list
 
-    def get_edge(self, x):  # TODO: maybe remove
-        """See parent class."""
-        for (edge, start_pos) in reversed(self.total_edgestarts):
-            if x >= start_pos:
-                return edge, x - start_pos
-
     def get_x(self, edge, position):  # TODO: maybe remove
         """See parent class."""
         # if there was a collision which caused the vehicle to disappear,
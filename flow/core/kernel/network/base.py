@@ -1,5 +1,6 @@
 """Script containing the base network kernel class."""
 
+import bisect
 import logging
 import random
 import numpy as np
@@ -73,6 +74,12 @@ class BaseKernelNetwork(object):
         self.total_edgestarts = None
         self.total_edgestarts_dict = None
 
+        # sorted index of total_edgestarts, see _index_edgestarts
+        self._edgestart_names = None
+        self._edgestart_positions = None
+        self._edgestart_array = None
+        self._edgestart_order = None
+
     def generate_network(self, network):
         """Generate the necessary prerequisites for the simulating a network.
 
@@ -135,6 +142,22 @@ class BaseKernelNetwork(object):
         """
         raise NotImplementedError
 
+    def speed_limit_array(self):
+        """Return the speed limits of all edges and junctions as an array.
+
+        The speed limits are ordered as `get_edge_list() +
+        get_junction_list()`, so that they may be indexed by the edge indices
+        of the vehicle kernel (see `get_edge_index`).
+
+        Returns
+        -------
+        np.ndarray
+            speed limit of every edge and junction
+        """
+        edges = self.get_edge_list() + self.get_junction_list()
+        return np.array([self.speed_limit(edge) for edge in edges],
+                        dtype=float)
+
     def max_speed(self):
         """Return the maximum achievable speed on any edge in the network."""
         raise NotImplementedError
@@ -167,8 +190,47 @@ class BaseKernelNetwork(object):
         tup
             1st element: edge name (such as bottom, right, etc.)
             2nd element: relative position on edge
+
+            None is returned if the position is before the start of the first
+            edge.
         """
-        raise NotImplementedError
+        starts = self._edgestart_positions
+        # positions before the first edge (or not a number) are on no edge
+        if not x >= starts[0]:
+            return None
+        i = bisect.bisect_right(starts, x) - 1
+        return self._edgestart_names[i], x - starts[i]
+
+    def get_edge_array(self, x):
+        """Compute the edges and relative positions of absolute positions.
+
+        This is a vectorized version of `get_edge`.
+
+        Parameters
+        ----------
+        x : array_like
+            absolute positions in the network
+
+        Returns
+        -------
+        np.ndarray
+            name of the edge of every position, or an empty string if the
+            position is before the start of the first edge
+        np.ndarray
+            relative position on the edge, or NaN if the position is before
+            the start of the first edge
+        """
+        x = np.asarray(x, dtype=float)
+        starts = self._edgestart_array
+        valid = x >= starts[0]
+        i = np.where(
+            valid, np.searchsorted(starts, x, side='right') - 1, 0)
+
+        edges = np.where(
+            valid, np.array(self._edgestart_names, dtype=object)[i], '')
+        positions = np.where(valid, x - starts[i], np.nan)
+
+        return edges, positions
 
     def get_x(self, edge, position):  # TODO: maybe remove
         """Return the absolute position on the track.
@@ -187,6 +249,39 @@ class BaseKernelNetwork(object):
         """
         raise NotImplementedError
 
+    def get_x_array(self, edges, positions):
+        """Return the absolute positions of several edge/position pairs.
+
+        This is a vectorized version of `get_x`, which is only called once
+        for every distinct edge.
+
+        Parameters
+        ----------
+        edges : array_like of str
+            names of the edges
+        positions : array_like
+            relative positions on the edges
+
+        Returns
+        -------
+        np.ndarray
+            positions with respect to some global reference
+        """
+        positions = np.asarray(positions, dtype=float)
+        if positions.size == 0:
+            return np.zeros(0)
+
+        names, inverse = np.unique(
+            np.asarray(edges, dtype=str), return_inverse=True)
+        starts = np.array([self.get_x(edge, 0) for edge in names], dtype=float)
+        # edges whose absolute position is not offset by the relative
+        # position (e.g. empty edges, which are mapped to -1001)
+        offset = np.array([self.get_x(edge, 1) != self.get_x(edge, 0)
+                           for edge in names])
+
+        inverse = inverse.reshape(-1)
+        return starts[inverse] + np.where(offset[inverse], positions, 0)
+
     def next_edge(self, edge, lane):
         """Return the next edge/lane pair from the given edge/lane.
 
@@ -203,6 +298,24 @@ class BaseKernelNetwork(object):
         """
         raise NotImplementedError
 
+    def _index_edgestarts(self):
+        """Index the start positions of the edges for fast position lookups.
+
+        This method must be called by subclasses once `total_edgestarts` is
+        set (and sorted by position) in `generate_network`.
+        """
+        self._edgestart_names = [edge for edge, _ in self.total_edgestarts]
+        self._edgestart_positions = [
+            pos for _, pos in self.total_edgestarts]
+        self._edgestart_array = np.array(
+            self._edgestart_positions, dtype=float)
+
+        # position of every edge in total_edgestarts (the first one, if an
+        # edge appears several times)
+        self._edgestart_order = {}
+        for i, edge in enumerate(self._edgestart_names):
+            self._edgestart_order.setdefault(edge, i)
+
     ###########################################################################
     #            Methods for generating initial vehicle positions.            #
     ###########################################################################
@@ -325,16 +438,14 @@ class BaseKernelNetwork(object):
             pos = self.get_edge(x)
 
             # ensures that vehicles are not placed in an internal junction
-            while pos[0] in dict(self.internal_edgestarts).keys():
+            while pos[0] in self.internal_edgestarts_dict:
                 # find the location of the internal edge in total_edgestarts,
                 # which has the edges ordered by position
-                edges = [tup[0] for tup in self.total_edgestarts]
-                indx_edge = next(
-                    i for i, edge in enumerate(edges) if edge == pos[0])
+                indx_edge = self._edgestart_order[pos[0]]
 
                 # take the next edge in the list, and place the car at the
                 # beginning of this edge
-                if indx_edge == len(edges) - 1:
+                if indx_edge == len(self.total_edgestarts) - 1:
                     next_edge_pos = self.total_edgestarts[0]
                 else:
                     next_edge_pos = self.total_edgestarts[indx_edge + 1]
@@ -371,11 +482,12 @@ class BaseKernelNetwork(object):
         # add a perturbation to each vehicle, while not letting the vehicle
         # leave its current edge
         if initial_config.perturbation > 0:
-            for i in range(num_vehicles):
-                perturb = np.random.normal(0, initial_config.perturbation)
-                edge, pos = startpositions[i]
-                pos = max(0, min(self.edge_length(edge), pos + perturb))
-                startpositions[i] = (edge, pos)
+            edges = [edge for edge, _ in startpositions]
+            pos = np.array([pos for _, pos in startpositions], dtype=float)
+            pos += np.random.normal(
+                0, initial_config.perturbation, num_vehicles)
+            pos = np.clip(pos, 0, [self.edge_length(edge) for edge in edges])
+            startpositions = list(zip(edges, pos.tolist()))
 
         return startpositions, startlanes
 
@@ -430,48 +542,43 @@ class BaseKernelNetwork(object):
         # that is smaller than min_gap
         efs = min_gap + VEHICLE_LENGTH  # extra front space
 
-        for edge in available_edges:
-            available_length -= efs * min([self.num_lanes(edge), lanes_distr])
+        # length of the edges (minus the extra front space) and number of
+        # lanes vehicles can be placed on
+        edge_lengths = np.array(
+            [self.edge_length(edge) - efs for edge in available_edges])
+        edge_lanes = np.array(
+            [min([self.num_lanes(edge), lanes_distr])
+             for edge in available_edges])
+        available_length -= efs * np.sum(edge_lanes)
 
         # choose random positions for each vehicle
-        init_absolute_pos = [random.random() * available_length
-                             for _ in range(num_vehicles)]
-        init_absolute_pos.sort()
+        init_absolute_pos = np.sort(
+            [random.random() * available_length for _ in range(num_vehicles)])
 
         # these positions do not include the length of the vehicle, which need
         # to be added
-        for i in range(num_vehicles):
-            init_absolute_pos[i] += (VEHICLE_LENGTH + min_gap) * i
-
-        decrement = 0
-        edge_indx = 0
-        startpositions = []
-        startlanes = []
-        for i in range(num_vehicles):
-            edge_i = available_edges[edge_indx]
-            pos_i = (init_absolute_pos[i] - decrement) % (
-                    self.edge_length(edge_i) - efs)
-            lane_i = int(((init_absolute_pos[i] - decrement) - pos_i) /
-                         (self.edge_length(edge_i) - efs))
-
-            pos_i += efs
-
-            while lane_i > min([self.num_lanes(edge_i), lanes_distr]) - 1:
-                decrement += min([self.num_lanes(edge_i), lanes_distr]) \
-                             * (self.edge_length(edge_i) - efs)
-                edge_indx += 1
-
-                edge_i = available_edges[edge_indx]
-                pos_i = (init_absolute_pos[i] - decrement) % (
-                        self.edge_length(edge_i) - efs)
-
-                lane_i = int(((init_absolute_pos[i] - decrement) - pos_i) /
-                             (self.edge_length(edge_i) - efs))
-
-                pos_i += efs
-
-            startpositions.append((edge_i, pos_i))
-            startlanes.append(lane_i)
+        init_absolute_pos += (VEHICLE_LENGTH + min_gap) * np.arange(
+            num_vehicles)
+
+        # the available space of the edges is laid end to end, with every lane
+        # of an edge following the previous one
+        space_end = np.cumsum(edge_lanes * edge_lengths)
+        space_start = space_end - edge_lanes * edge_lengths
+
+        edge_indx = np.searchsorted(space_end, init_absolute_pos, side='right')
+        if num_vehicles > 0 and edge_indx[-1] >= len(available_edges):
+            raise IndexError('The vehicles do not fit in the available edges.')
+
+        rel_pos = init_absolute_pos - space_start[edge_indx]
+        pos = rel_pos % edge_lengths[edge_indx]
+        lanes = ((rel_pos - pos) / edge_lengths[edge_indx]).astype(int)
+        # protect against rounding errors at the end of an edge
+        lanes = np.minimum(lanes, edge_lanes[edge_indx] - 1)
+        pos += efs
+
+        startpositions = [(available_edges[i], pos_i) for i, pos_i in
+                          zip(edge_indx.tolist(), pos.tolist())]
+        startlanes = lanes.tolist()
 
         return startpositions, startlanes
 
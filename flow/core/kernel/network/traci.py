@@ -3,6 +3,11 @@ import tempfile
 
 from flow.core.kernel.network import BaseKernelNetwork
 from flow.core.util import makexml, printxml, ensure_dir
+import flow.config as config
+import functools
+import hashlib
+import json
+import shutil
 import time
 import os
 import subprocess
@@ -73,11 +78,13 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         self.addfn = None
         self.sumfn = None
         self.guifn = None
+        self.statefn = None
         self._edges = None
         self._connections = None
         self._edge_list = None
         self._junction_list = None
         self.__max_speed = None
+        self.__speed_limits = None
         self.__length = None  # total length
         self.__non_internal_length = None  # total length of non-internal edges
         self.rts = None
@@ -112,6 +119,7 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         self.addfn = '%s.add.xml' % self.network.name
         self.sumfn = '%s.sumo.cfg' % self.network.name
         self.guifn = '%s.gui.cfg' % self.network.name
+        self.statefn = '%s.state.xml' % self.network.name
 
         # can only provide one of osm path or template path to the network
         assert self.network.net_params.template is None \
@@ -152,6 +160,9 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         self._junction_list = list(
             set(self._edges.keys()) - set(self._edge_list))
 
+        # speed limits of all edges and junctions, computed when first needed
+        self.__speed_limits = None
+
         # maximum achievable speed on any edge in the network
         self.__max_speed = max(
             self.speed_limit(edge) for edge in self.get_edge_list())
@@ -189,6 +200,7 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         self.total_edgestarts.sort(key=lambda tup: tup[1])
 
         self.total_edgestarts_dict = dict(self.total_edgestarts)
+        self._index_edgestarts()
 
         self.__length = sum(
             self._edges[edge_id]['length'] for edge_id in self._edges
@@ -224,7 +236,8 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         files = [self.cfg_path + self.guifn,
                  self.cfg_path + self.addfn,
                  self.cfg_path + self.roufn,
-                 self.cfg_path + self.sumfn]
+                 self.cfg_path + self.sumfn,
+                 self.cfg_path + self.statefn]
 
         if self.network.net_params.template is None:
             files += [self.net_path + self.nodfn,
@@ -243,12 +256,6 @@ class TraCIKernelNetwork(BaseKernelNetwork):
                 # neither is the type file
                 continue
 
-    def get_edge(self, x):
-        """See parent class."""
-        for (edge, start_pos) in reversed(self.total_edgestarts):
-            if x >= start_pos:
-                return edge, x - start_pos
-
     def get_x(self, edge, position):
         """See parent class."""
         # if there was a collision which caused the vehicle to disappear,
@@ -299,6 +306,18 @@ class TraCIKernelNetwork(BaseKernelNetwork):
             print('Error in num lanes with key', edge_id)
             return -1001
 
+    def speed_limit_array(self):
+        """See parent class.
+
+        The array is computed once every time the network is generated.
+        """
+        if self.__speed_limits is None:
+            self.__speed_limits = \
+                super(TraCIKernelNetwork, self).speed_limit_array()
+            # the array is shared by all callers
+            self.__speed_limits.flags.writeable = False
+        return self.__speed_limits
+
     def max_speed(self):
         """See parent class."""
         return self.__max_speed
@@ -505,14 +524,31 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         x.append(t)
         printxml(x, self.net_path + self.cfgfn)
 
-        subprocess.call(
-            [
-                'netconvert -c ' + self.net_path + self.cfgfn +
-                ' --output-file=' + self.cfg_path + self.netfn +
-                ' --no-internal-links="false"'
-            ],
-            stdout=subprocess.DEVNULL,
-            shell=True)
+        # reuse the .net.xml file generated for identical input files, if it
+        # was already generated by netconvert
+        input_files = [self.nodfn, self.edgfn]
+        if types is not None:
+            input_files.append(self.typfn)
+        if connections is not None:
+            input_files.append(self.confn)
+        cache_key = _hash_files(
+            [self.net_path + fn for fn in input_files],
+            extra=_netconvert_version())
+
+        if not self._load_cached_file(cache_key + '.net.xml',
+                                      self.cfg_path + self.netfn):
+            subprocess.call(
+                [
+                    'netconvert -c ' + self.net_path + self.cfgfn +
+                    ' --output-file=' + self.cfg_path + self.netfn +
+                    ' --no-internal-links="false"'
+                ],
+                stdout=subprocess.DEVNULL,
+                shell=True)
+
+            if os.path.isfile(self.cfg_path + self.netfn):
+                with open(self.cfg_path + self.netfn, 'rb') as f:
+                    self._store_cached_file(cache_key + '.net.xml', f.read())
 
         # collect data from the generated network configuration file
         error = None
@@ -754,8 +790,10 @@ class TraCIKernelNetwork(BaseKernelNetwork):
                     edges=' '.join(r)
                 ))
 
-        # add the inflows from various edges to the xml file
-        if self.network.net_params.inflows is not None:
+        # add the inflows from various edges to the xml file, unless they are
+        # added by the vehicle kernel during the simulation
+        if self.network.net_params.inflows is not None and \
+                not getattr(self.sim_params, 'runtime_inflows', False):
             total_inflows = self.network.net_params.inflows.get()
             for inflow in total_inflows:
                 # do not want to affect the original values
@@ -832,10 +870,37 @@ class TraCIKernelNetwork(BaseKernelNetwork):
                     Element = list of edge/lane pairs preceding or following
                     the edge/lane pairs
         """
-        # import the .net.xml file containing all edge/type data
-        parser = etree.XMLParser(recover=True)
         net_path = os.path.join(self.cfg_path, self.netfn) \
             if net_params.template is None else self.netfn
+
+        # reuse the data parsed from identical .net.xml files (if available)
+        cache_key = _hash_files([net_path]) + '.edges.json'
+        cached_path = self._cached_path(cache_key)
+        if cached_path is not None and os.path.isfile(cached_path):
+            try:
+                with open(cached_path) as f:
+                    net_data, connection_data = json.load(f)
+                os.utime(cached_path)
+                return net_data, _connections_from_json(connection_data)
+            except (OSError, ValueError):
+                # the file was evicted or is invalid, so parse the network
+                pass
+
+        net_data, connection_data = self._parse_edges_from_net(net_path)
+
+        if cached_path is not None:
+            self._store_cached_file(cache_key, json.dumps(
+                [net_data, connection_data]).encode())
+
+        return net_data, connection_data
+
+    def _parse_edges_from_net(self, net_path):
+        """Parse the edges and connections of a .net.xml file.
+
+        See _import_edges_from_net for a description of the returned data.
+        """
+        # import the .net.xml file containing all edge/type data
+        parser = etree.XMLParser(recover=True)
         tree = ElementTree.parse(net_path, parser=parser)
         root = tree.getroot()
 
@@ -931,3 +996,162 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         connection_data = {'next': next_conn_data, 'prev': prev_conn_data}
 
         return net_data, connection_data
+
+    @staticmethod
+    def _cached_path(name):
+        """Return the path to a file in the network cache.
+
+        Returns None if caching is disabled (see flow.config.NET_CACHE_PATH),
+        or if the cache directory cannot be trusted.
+        """
+        cache_dir = _cache_dir()
+        if cache_dir is None:
+            return None
+        return os.path.join(cache_dir, name)
+
+    def _load_cached_file(self, name, path):
+        """Copy a file from the network cache to the specified path.
+
+        Returns
+        -------
+        bool
+            True if the file was available in the cache, False otherwise
+        """
+        cached_path = self._cached_path(name)
+        if cached_path is None or not os.path.isfile(cached_path):
+            return False
+        try:
+            shutil.copyfile(cached_path, path)
+            # mark the file as recently used (see _evict_cached_files)
+            os.utime(cached_path)
+        except OSError:
+            # the file was evicted by another process
+            return False
+        return True
+
+    def _store_cached_file(self, name, data):
+        """Add a file with the specified contents to the network cache.
+
+        The file is first written to a temporary file, and then renamed, so
+        that processes sharing the cache never read partially written files.
+        """
+        cached_path = self._cached_path(name)
+        if cached_path is None:
+            return
+
+        cache_dir = os.path.dirname(cached_path)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, cached_path)
+        except OSError:
+            # caching is only an optimization
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        _evict_cached_files(cache_dir, config.NET_CACHE_SIZE)
+
+
+def _cache_dir():
+    """Return the directory of the network cache, creating it if needed.
+
+    The directory is created with permissions restricted to the current user.
+    None is returned if caching is disabled, or if the directory is owned by
+    another user or writable by other users, in which case its files may have
+    been written by someone else and are not used.
+    """
+    path = config.NET_CACHE_PATH
+    if path is None:
+        return None
+
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    if hasattr(os, 'getuid') and stat.st_uid != os.getuid():
+        return None
+    if stat.st_mode & 0o022:
+        return None
+
+    return path
+
+
+def _evict_cached_files(cache_dir, max_size):
+    """Remove the least recently used files of the cache above a total size.
+
+    Files are marked as used by updating their modification time whenever
+    they are read from the cache.
+    """
+    files = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.startswith('.tmp') or not entry.is_file():
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_size = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            # the file was removed by another process
+            pass
+        total_size -= size
+
+
+def _connections_from_json(data):
+    """Convert the connection data read from the network cache.
+
+    JSON stores the lane indices as strings and the edge/lane pairs as lists,
+    so they are converted back to the types returned by
+    _parse_edges_from_net.
+    """
+    return {
+        direction: {
+            edge: {
+                int(lane): [tuple(pair) for pair in pairs]
+                for lane, pairs in lanes.items()
+            }
+            for edge, lanes in edges.items()
+        }
+        for direction, edges in data.items()
+    }
+
+
+def _hash_files(paths, extra=''):
+    """Return a hash of the contents of several files."""
+    sha = hashlib.sha1(extra.encode())
+    for path in paths:
+        with open(path, 'rb') as f:
+            sha.update(f.read())
+        # separate the contents of consecutive files
+        sha.update(b'\0')
+    return sha.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _netconvert_version():
+    """Return the version of netconvert, e.g. "Eclipse SUMO netconvert 1.8.0".
+
+    This is included in the keys of the cached .net.xml files, so that files
+    generated by another version of sumo are not reused. The version is read
+    once per process from the first line of `netconvert --version`.
+    """
+    try:
+        output = subprocess.run(
+            ['netconvert', '--version'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True).stdout
+    except OSError:
+        return ''
+    lines = output.splitlines()
+    return lines[0].strip() if lines else ''
@@ -70,6 +70,29 @@ class KernelSimulation(object):
         """
         raise NotImplementedError
 
+    def save_state(self, path):
+        """Save the current state of the simulation to a file.
+
+        Parameters
+        ----------
+        path : str
+            path to the state file
+        """
+        raise NotImplementedError
+
+    def load_state(self, path):
+        """Restore a state of the simulation saved by `save_state`.
+
+        All vehicles in the simulation are replaced by the ones of the saved
+        state in a single operation.
+
+        Parameters
+        ----------
+        path : str
+            path to the state file
+        """
+        raise NotImplementedError
+
     def check_collision(self):
         """Determine if a collision occurred in the last time step.
 
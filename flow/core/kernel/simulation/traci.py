@@ -1,17 +1,20 @@
 """Script containing the TraCI simulation kernel class."""
 
 from flow.core.kernel.simulation import KernelSimulation
+from flow.core.emission import EmissionRecorder, emission_shards_to_csv
+from flow.core.emission_dataset import add_emission
 from flow.core.util import ensure_dir
 import flow.config as config
 import traci.constants as tc
 import traci
 import traceback
+import numpy as np
 import os
 import time
 import logging
 import subprocess
 import signal
-import csv
+import shutil
 
 
 # Number of retries on restarting SUMO before giving up
@@ -34,20 +37,16 @@ class TraCISimulation(KernelSimulation):
         output is not generated if this value is not specified
     time : float
         used to internally keep track of the simulation time
-    stored_data : dict <str, dict <float, dict <str, Any>>>
-        a dict object used to store additional data if an emission file is
-        provided. The first key corresponds to the name of the vehicle, the
-        second corresponds to the time the sample was issued, and the final
-        keys represent the additional data stored at every given time for every
-        vehicle, and consists of the following keys:
-
-        * acceleration (no noise): the accelerations issued to the vehicle,
-          excluding noise
-        * acceleration (requested): the requested acceleration by the vehicle,
-          including noise
-        * acceleration (actual): the actual acceleration by the vehicle,
-          collected by computing the difference between the speeds of the
-          vehicle and dividing it by the sim_step term
+    emission_recorder : flow.core.emission.EmissionRecorder or None
+        recorder used to stream the emission data of the current rollout to
+        disk if an emission path is provided (see flow.core.emission.
+        EMISSION_COLUMNS for the list of stored data). The data is written
+        to a temporary directory in the emission path, which is renamed once
+        `save_emission` is called. None if no data was recorded since the
+        last call to `save_emission`.
+    sumo_call : list of str
+        command used to start the current sumo instance. Used to check
+        whether the instance can be reused by `reload_simulation`.
     """
 
     def __init__(self, master_kernel):
@@ -62,10 +61,11 @@ class TraCISimulation(KernelSimulation):
         KernelSimulation.__init__(self, master_kernel)
 
         self.sumo_proc = None
+        self.sumo_call = None
         self.sim_step = None
         self.emission_path = None
         self.time = 0
-        self.stored_data = dict()
+        self.emission_recorder = None
 
     def pass_api(self, kernel_api):
         """See parent class.
@@ -73,7 +73,10 @@ class TraCISimulation(KernelSimulation):
         Also initializes subscriptions.
         """
         KernelSimulation.pass_api(self, kernel_api)
+        self._subscribe()
 
+    def _subscribe(self):
+        """Subscribe to the simulation variables used by the kernels."""
         # subscribe some simulation parameters needed to check for entering,
         # exiting, and colliding vehicles
         self.kernel_api.simulation.subscribe([
@@ -91,6 +94,21 @@ class TraCISimulation(KernelSimulation):
         """See parent class."""
         self.kernel_api.simulationStep()
 
+    def save_state(self, path):
+        """See parent class."""
+        self.kernel_api.simulation.saveState(path)
+
+    def load_state(self, path):
+        """See parent class.
+
+        The simulation time is set back to the time of the saved state. Note
+        that sumo drops all subscriptions when loading a state; the simulation
+        variables are subscribed to again, while vehicle subscriptions are
+        renewed by the vehicle kernel (see TraCIVehicle.restore_vehicles).
+        """
+        self.kernel_api.simulation.loadState(path)
+        self._subscribe()
+
     def update(self, reset):
         """See parent class."""
         if reset:
@@ -100,47 +118,53 @@ class TraCISimulation(KernelSimulation):
 
         # Collect the additional data to store in the emission file.
         if self.emission_path is not None:
-            kv = self.master_kernel.vehicle
-            for veh_id in self.master_kernel.vehicle.get_ids():
-                t = round(self.time, 2)
-
-                # some miscellaneous pre-processing
-                position = kv.get_2d_position(veh_id)
-
-                # Make sure dictionaries corresponding to the vehicle and
-                # time are available.
-                if veh_id not in self.stored_data.keys():
-                    self.stored_data[veh_id] = dict()
-                if t not in self.stored_data[veh_id].keys():
-                    self.stored_data[veh_id][t] = dict()
-
-                # Add the speed, position, and lane data.
-                self.stored_data[veh_id][t].update({
-                    "speed": kv.get_speed(veh_id),
-                    "lane_number": kv.get_lane(veh_id),
-                    "edge_id": kv.get_edge(veh_id),
-                    "relative_position": kv.get_position(veh_id),
-                    "x": position[0],
-                    "y": position[1],
-                    "headway": kv.get_headway(veh_id),
-                    "leader_id": kv.get_leader(veh_id),
-                    "follower_id": kv.get_follower(veh_id),
-                    "leader_rel_speed":
-                        kv.get_speed(kv.get_leader(veh_id))
-                        - kv.get_speed(veh_id),
-                    "target_accel_with_noise_with_failsafe":
-                        kv.get_accel(veh_id, noise=True, failsafe=True),
-                    "target_accel_no_noise_no_failsafe":
-                        kv.get_accel(veh_id, noise=False, failsafe=False),
-                    "target_accel_with_noise_no_failsafe":
-                        kv.get_accel(veh_id, noise=True, failsafe=False),
-                    "target_accel_no_noise_with_failsafe":
-                        kv.get_accel(veh_id, noise=False, failsafe=True),
-                    "realized_accel":
-                        kv.get_realized_accel(veh_id),
-                    "road_grade": kv.get_road_grade(veh_id),
-                    "distance": kv.get_distance(veh_id),
-                })
+            self._record_emission()
+
+    def _record_emission(self):
+        """Append the current state of all vehicles to the emission data."""
+        kv = self.master_kernel.vehicle
+        veh_ids = kv.get_ids()
+        if len(veh_ids) == 0:
+            return
+
+        if self.emission_recorder is None:
+            self.emission_recorder = EmissionRecorder(os.path.join(
+                self.emission_path, "{}-current_emission".format(
+                    self.master_kernel.network.network.name)))
+
+        speed = np.array(kv.get_speed(veh_ids), dtype=float)
+        leader_ids = kv.get_leader(veh_ids)
+        position = [kv.get_2d_position(veh_id) for veh_id in veh_ids]
+        distance = [kv.get_distance(veh_id) for veh_id in veh_ids]
+        accel = {
+            (noise, failsafe): [kv.get_accel(veh_id, noise, failsafe)
+                                for veh_id in veh_ids]
+            for noise in (True, False) for failsafe in (True, False)
+        }
+
+        self.emission_recorder.append(
+            time=round(self.time, 2),
+            id=veh_ids,
+            x=[pos[0] for pos in position],
+            y=[pos[1] for pos in position],
+            speed=speed,
+            headway=kv.get_headway(veh_ids),
+            leader_id=leader_ids,
+            target_accel_with_noise_with_failsafe=accel[True, True],
+            target_accel_no_noise_no_failsafe=accel[False, False],
+            target_accel_with_noise_no_failsafe=accel[True, False],
+            target_accel_no_noise_with_failsafe=accel[False, True],
+            realized_accel=[kv.get_realized_accel(veh_id)
+                            for veh_id in veh_ids],
+            road_grade=[kv.get_road_grade(veh_id) for veh_id in veh_ids],
+            edge_id=kv.get_edge(veh_ids),
+            lane_number=kv.get_lane(veh_ids),
+            distance=distance,
+            relative_position=kv.get_position(veh_ids),
+            follower_id=kv.get_follower(veh_ids),
+            leader_rel_speed=np.array(
+                kv.get_speed(leader_ids), dtype=float) - speed,
+        )
 
     def close(self):
         """See parent class."""
@@ -181,50 +205,11 @@ class TraCISimulation(KernelSimulation):
                 # port number the sumo instance will be run on
                 port = sim_params.port
 
-                sumo_binary = "sumo-gui" if sim_params.render is True \
-                    else "sumo"
-
                 # command used to start sumo
-                sumo_call = [
-                    sumo_binary, "-c", network.cfg,
+                sumo_call = self._sumo_binary(sim_params) + [
                     "--remote-port", str(sim_params.port),
                     "--num-clients", str(sim_params.num_clients),
-                    "--step-length", str(sim_params.sim_step)
-                ]
-
-                # use a ballistic integration step (if request)
-                if sim_params.use_ballistic:
-                    sumo_call.append("--step-method.ballistic")
-
-                # ignore step logs (if requested)
-                if sim_params.no_step_log:
-                    sumo_call.append("--no-step-log")
-
-                # add the lateral resolution of the sublanes (if requested)
-                if sim_params.lateral_resolution is not None:
-                    sumo_call.append("--lateral-resolution")
-                    sumo_call.append(str(sim_params.lateral_resolution))
-
-                if sim_params.overtake_right:
-                    sumo_call.append("--lanechange.overtake-right")
-                    sumo_call.append("true")
-
-                # specify a simulation seed (if requested)
-                if sim_params.seed is not None:
-                    sumo_call.append("--seed")
-                    sumo_call.append(str(sim_params.seed))
-
-                if not sim_params.print_warnings:
-                    sumo_call.append("--no-warnings")
-                    sumo_call.append("true")
-
-                # set the time it takes for a gridlock teleport to occur
-                sumo_call.append("--time-to-teleport")
-                sumo_call.append(str(int(sim_params.teleport_time)))
-
-                # check collisions at intersections
-                sumo_call.append("--collision.check-junctions")
-                sumo_call.append("true")
+                ] + self._sumo_options(network, sim_params)
 
                 logging.info(" Starting SUMO on port " + str(port))
                 logging.debug(" Cfg file: " + str(network.cfg))
@@ -251,6 +236,7 @@ class TraCISimulation(KernelSimulation):
                 traci_connection.setOrder(0)
                 traci_connection.simulationStep()
 
+                self.sumo_call = sumo_call
                 return traci_connection
             except Exception as e:
                 print("Error during start: {}".format(traceback.format_exc()))
@@ -258,6 +244,146 @@ class TraCISimulation(KernelSimulation):
                 self.teardown_sumo()
         raise error
 
+    def can_reload(self, sim_params):
+        """Check whether the current sumo instance can run a new simulation.
+
+        The instance may be reused if it is still running and was started with
+        the same sumo binary, port, and number of clients. Moreover, warm
+        restarts must be enabled in the simulation parameters.
+
+        Parameters
+        ----------
+        sim_params : flow.core.params.SumoParams
+            simulation-specific parameters of the new simulation
+
+        Returns
+        -------
+        bool
+            True if `reload_simulation` may be used in place of
+            `start_simulation`
+        """
+        if not sim_params.warm_restart or self.kernel_api is None \
+                or self.sumo_proc is None or self.sumo_proc.poll() is not None:
+            return False
+
+        # the number of clients cannot change once sumo is started
+        if sim_params.num_clients != 1:
+            return False
+
+        return self.sumo_call[:5] == self._sumo_binary(sim_params) + [
+            "--remote-port", str(sim_params.port), "--num-clients", "1"]
+
+    def reload_simulation(self, network, sim_params):
+        """Start a new simulation in the current sumo instance.
+
+        This is a faster alternative to restarting sumo via
+        `start_simulation`. The configuration files created by the network
+        class are loaded again by the running sumo instance (through the
+        TraCI "load" command), and the current TraCI connection is kept, so
+        that a new process does not need to be started and connected to.
+        If the simulation cannot be loaded, the instance is torn down and a
+        new one is started instead.
+
+        Note that the emission data of the previous simulation is saved
+        before the new simulation is loaded.
+
+        Parameters
+        ----------
+        network : flow.core.kernel.network.TraCIKernelNetwork
+            the network kernel, containing the paths to the regenerated
+            configuration files
+        sim_params : flow.core.params.SumoParams
+            simulation-specific parameters
+
+        Returns
+        -------
+        traci.connection.Connection
+            the connection to the sumo instance
+        """
+        if self.emission_path is not None:
+            self.save_emission()
+
+        self.sim_step = sim_params.sim_step
+        self.emission_path = sim_params.emission_path
+        if self.emission_path is not None:
+            ensure_dir(self.emission_path)
+
+        try:
+            options = self._sumo_options(network, sim_params)
+            self.kernel_api.load(options)
+            self.kernel_api.simulationStep()
+            self.sumo_call = self.sumo_call[:5] + options
+            return self.kernel_api
+        except Exception:
+            logging.warning(" Unable to reload SUMO, restarting it instead: "
+                            "{}".format(traceback.format_exc()))
+            try:
+                self.kernel_api.close()
+            except Exception:
+                pass
+            self.teardown_sumo()
+            return self.start_simulation(network, sim_params)
+
+    @staticmethod
+    def _sumo_binary(sim_params):
+        """Return the sumo binary used to run a simulation."""
+        return ["sumo-gui" if sim_params.render is True else "sumo"]
+
+    @staticmethod
+    def _sumo_options(network, sim_params):
+        """Return the command line options of a sumo simulation.
+
+        The options consist of the configuration files created by the network
+        class and the simulation parameters. The options that are needed to
+        connect with TraCI are not included.
+        """
+        sumo_options = [
+            "-c", network.cfg,
+            "--step-length", str(sim_params.sim_step)
+        ]
+
+        # use a ballistic integration step (if request)
+        if sim_params.use_ballistic:
+            sumo_options.append("--step-method.ballistic")
+
+        # ignore step logs (if requested)
+        if sim_params.no_step_log:
+            sumo_options.append("--no-step-log")
+
+        # add the lateral resolution of the sublanes (if requested)
+        if sim_params.lateral_resolution is not None:
+            sumo_options.append("--lateral-resolution")
+            sumo_options.append(str(sim_params.lateral_resolution))
+
+        if sim_params.overtake_right:
+            sumo_options.append("--lanechange.overtake-right")
+            sumo_options.append("true")
+
+        # specify a simulation seed (if requested)
+        if sim_params.seed is not None:
+            sumo_options.append("--seed")
+            sumo_options.append(str(sim_params.seed))
+
+        if not sim_params.print_warnings:
+            sumo_options.append("--no-warnings")
+            sumo_options.append("true")
+
+        # set the time it takes for a gridlock teleport to occur
+        sumo_options.append("--time-to-teleport")
+        sumo_options.append(str(int(sim_params.teleport_time)))
+
+        # check collisions at intersections
+        sumo_options.append("--collision.check-junctions")
+        sumo_options.append("true")
+
+        # the saved states are loaded upon reset (see SumoParams.bulk_reset).
+        # Validating the xml of a state dominates the time needed to load it
+        if sim_params.bulk_reset:
+            sumo_options.append("--xml-validation")
+            sumo_options.append("never")
+
+        return sumo_options
+
     def teardown_sumo(self):
         """Kill the sumo subprocess instance."""
         try:
@@ -265,65 +391,60 @@ class TraCISimulation(KernelSimulation):
         except Exception as e:
             print("Error during teardown: {}".format(e))
 
-    def save_emission(self, run_id=0):
-        """Save any collected emission data to a csv file.
+    def save_emission(self, run_id=0, to_csv=False, name=None, dataset=None):
+        """Save any collected emission data.
 
-        If not data was collected, nothing happens. Moreover, any internally
-        stored data by this class is clear whenever data is stored.
+        The data of the current rollout is stored in a directory of `.npz`
+        shards named "<network name>-<run_id>_emission" in the emission path,
+        and may be loaded through flow.core.emission.load_emission. If no data
+        was collected, nothing happens. Moreover, the recorder is reset
+        whenever data is stored.
 
         Parameters
         ----------
         run_id : int
             the rollout number, appended to the name of the emission file. Used
             to store emission files from multiple rollouts run sequentially.
+        to_csv : bool
+            whether to also convert the emission data into a csv file named
+            "<network name>-<run_id>_emission.csv". The shards are removed in
+            this case.
+        name : str, optional
+            the name used in place of the name of the network. Used to store
+            emission files from rollouts run by several environments.
+        dataset : str, optional
+            directory of a partitioned emission dataset the data is also added
+            to, as run `run_id` of the experiment named after the network (see
+            flow.core.emission_dataset)
         """
         # If there is no stored data, ignore this operation. This is to ensure
         # that data isn't deleted if the operation is called twice.
-        if len(self.stored_data) == 0:
+        if self.emission_recorder is None:
             return
 
-        # Get a csv name for the emission file.
-        name = "{}-{}_emission.csv".format(
-            self.master_kernel.network.network.name, run_id)
-
-        # The name of all stored data-points (excluding id and time)
-        stored_ids = [
-            "x",
-            "y",
-            "speed",
-            "headway",
-            "leader_id",
-            "target_accel_with_noise_with_failsafe",
-            "target_accel_no_noise_no_failsafe",
-            "target_accel_with_noise_no_failsafe",
-            "target_accel_no_noise_with_failsafe",
-            "realized_accel",
-            "road_grade",
-            "edge_id",
-            "lane_number",
-            "distance",
-            "relative_position",
-            "follower_id",
-            "leader_rel_speed",
-        ]
+        self.emission_recorder.close()
+
+        # Move the data to a directory named after the run.
+        if name is None:
+            name = self.master_kernel.network.network.name
+        path = os.path.join(
+            self.emission_path, "{}-{}_emission".format(name, run_id))
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.rename(self.emission_recorder.path, path)
+
+        if dataset is not None:
+            add_emission(dataset, path, experiment=name, run=run_id)
+
+        if to_csv:
+            emission_shards_to_csv(path, remove_shards=True)
+
+        # Start a new recorder the next time data is collected. This is useful
+        # if this function is called in between resets.
+        self.emission_recorder = None
 
-        # Update the stored data to push to the csv file.
-        final_data = {"time": [], "id": []}
-        final_data.update({key: [] for key in stored_ids})
-
-        for veh_id in self.stored_data.keys():
-            for t in self.stored_data[veh_id].keys():
-                final_data['time'].append(t)
-                final_data['id'].append(veh_id)
-                for key in stored_ids:
-                    final_data[key].append(self.stored_data[veh_id][t][key])
-
-        with open(os.path.join(self.emission_path, name), "w") as f:
-            print(os.path.join(self.emission_path, name), self.emission_path)
-            writer = csv.writer(f, delimiter=',')
-            writer.writerow(final_data.keys())
-            writer.writerows(zip(*final_data.values()))
-
-        # Clear all memory from the stored data. This is useful if this
-        # function is called in between resets.
-        self.stored_data.clear()
+    def discard_emission(self):
+        """Remove any emission data collected since it was last saved."""
+        if self.emission_recorder is not None:
+            shutil.rmtree(self.emission_recorder.path, ignore_errors=True)
+            self.emission_recorder = None
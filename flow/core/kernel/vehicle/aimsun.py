@@ -195,49 +195,32 @@ class AimsunKernelVehicle(KernelVehicle):
 
         # start = time.time()
 
-        for veh_id in self.__ids:
-            aimsun_id = self._id_flow2aimsun[veh_id]
-
+        # collect the tracking info of all tracked vehicles, as well as their
+        # leaders and next sections, in a single command
+        tracking_infos = self.kernel_api.get_vehicles_tracking_info(
+            [self._id_flow2aimsun[veh_id] for veh_id in self.__ids],
+            self.tracked_info_bitmap)
+
+        for veh_id, (inf_veh, lead_id_aimsun, _, next_section,
+                     inf_veh_leader, leader_length) in zip(self.__ids,
+                                                           tracking_infos):
             # update the vehicle's tracking information
-            self.__vehicles[veh_id]['tracking_info'] = \
-                self.kernel_api.get_vehicle_tracking_info(
-                    aimsun_id, self.tracked_info_bitmap
-                )
+            self.__vehicles[veh_id]['tracking_info'] = inf_veh
 
             # get the leader, follower, and headway for each tracked vehicle
-            lead_id_aimsun = self.kernel_api.get_vehicle_leader(aimsun_id)
             if lead_id_aimsun < -1:
                 self.__vehicles[veh_id]['leader'] = None
                 self.__vehicles[veh_id]['headway'] = 1000
             else:
-                inf_veh = self.__vehicles[veh_id]['tracking_info']
-
                 if lead_id_aimsun in self._id_aimsun2flow:
                     lead_id = self._id_aimsun2flow[lead_id_aimsun]
-                    inf_veh_leader = self.__vehicles[lead_id]['tracking_info']
-                    leader_length = self.__vehicles[lead_id]['static_info'].\
-                        length
                     self.__vehicles[veh_id]['leader'] = lead_id
                     self.__vehicles[lead_id]['follower'] = veh_id
                 else:
-                    # TODO can be hardcoded when we won't change it anymore
-                    tracked_info_leader = self.make_bitmap_for_tracking({
-                        'CurrentPos', 'distance2End',
-                        'idSection', 'idJunction',
-                        'idSectionFrom', 'idSectionTo'
-                    })
-
-                    inf_veh_leader = self.kernel_api.get_vehicle_tracking_info(
-                        lead_id_aimsun, tracked_info_leader, tracked=False
-                    )
-                    leader_length = self.kernel_api.\
-                        get_vehicle_length(lead_id_aimsun)
                     self.__vehicles[veh_id]['leader'] = -1
 
                 # FIXME can be simplified
                 if inf_veh.idSection != -1:  # vehicle is in a section
-                    next_section = self.kernel_api.get_next_section(
-                        aimsun_id, inf_veh.idSection)
                     # leader is in a section
                     if inf_veh_leader.idSection != -1:
                         # veh in section and leader in same section
@@ -454,7 +437,7 @@ class AimsunKernelVehicle(KernelVehicle):
                 this_vel = self.get_speed(veh_id)
                 next_vel = max(this_vel + acc[i] * self.sim_step, 0)
                 aimsun_id = self._id_flow2aimsun[veh_id]
-                self.kernel_api.set_speed(aimsun_id, next_vel)
+                self.kernel_api.queue_speed(aimsun_id, next_vel)
 
     def apply_lane_change(self, veh_id, direction):
         """Apply an instantaneous lane-change to a set of vehicles.
@@ -506,7 +489,7 @@ class AimsunKernelVehicle(KernelVehicle):
             # perform the requested lane action action in Aimsun
             if target_lane != this_lane:
                 aimsun_id = self._id_flow2aimsun[veh_id]
-                self.kernel_api.apply_lane_change(aimsun_id, int(target_lane))
+                self.kernel_api.queue_lane_change(aimsun_id, int(target_lane))
 
                 if veh_id in self.get_rl_ids():
                     self.prev_last_lc[veh_id] = \
@@ -2,6 +2,8 @@
 
 from abc import ABCMeta, abstractmethod
 
+import numpy as np
+
 
 class KernelVehicle(object, metaclass=ABCMeta):
     """Flow vehicle kernel.
@@ -109,6 +111,37 @@ class KernelVehicle(object, metaclass=ABCMeta):
         """Reset any additional state that needs to be reset."""
         pass
 
+    def restore_vehicles(self, veh_types):
+        """Replace the vehicles of the kernel after a state was loaded.
+
+        This is called once the simulator restored a previously saved
+        simulation state (see flow.core.kernel.simulation.KernelSimulation.
+        load_state), and registers the vehicles of this state in the kernel
+        at once. The vehicles that were previously in the kernel are removed
+        from it, without being removed from the simulator.
+
+        Parameters
+        ----------
+        veh_types : dict
+            type of every vehicle in the network, keyed by vehicle id
+        """
+        raise NotImplementedError
+
+    def set_inflows(self, inflows):
+        """Replace the inflows of vehicles in the running simulation.
+
+        The vehicles of the new inflows are added by the kernel at every time
+        step, so that inflow rates, departure parameters and vehicle types
+        may be changed without regenerating the network or restarting the
+        simulator.
+
+        Parameters
+        ----------
+        inflows : flow.core.params.InFlows
+            the new inflows
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def remove(self, veh_id):
         """Remove a vehicle.
@@ -746,6 +779,253 @@ class KernelVehicle(object, metaclass=ABCMeta):
         """
         pass
 
+    ###########################################################################
+    #                      Bulk (array-based) state methods                   #
+    ###########################################################################
+
+    # The methods below return the state of several vehicles as numpy arrays.
+    # They default to the per-vehicle getters, and may be overridden by
+    # kernels that store their state in arrays (see TraCIVehicle).
+
+    def get_speed_array(self, veh_ids=None, error=np.nan):
+        """Return the speeds of several vehicles as an array.
+
+        Parameters
+        ----------
+        veh_ids : list of str, optional
+            vehicle ids, defaults to all vehicles in the network (in the order
+            of `get_ids()`)
+        error : float, optional
+            value that is returned for vehicles that are not found
+
+        Returns
+        -------
+        np.ndarray
+            speed of every vehicle
+        """
+        return self._get_array(self.get_speed, veh_ids, error, float)
+
+    def get_position_array(self, veh_ids=None, error=np.nan):
+        """Return the positions of several vehicles relative to their edges.
+
+        Parameters
+        ----------
+        veh_ids : list of str, optional
+            vehicle ids, defaults to all vehicles in the network (in the order
+            of `get_ids()`)
+        error : float, optional
+            value that is returned for vehicles that are not found
+
+        Returns
+        -------
+        np.ndarray
+            position of every vehicle
+        """
+        return self._get_array(self.get_position, veh_ids, error, float)
+
+    def get_lane_array(self, veh_ids=None, error=-1):
+        """Return the lane indices of several vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of str, optional
+            vehicle ids, defaults to all vehicles in the network (in the order
+            of `get_ids()`)
+        error : int, optional
+            value that is returned for vehicles that are not found
+
+        Returns
+        -------
+        np.ndarray
+            lane index of every vehicle
+        """
+        return self._get_array(self.get_lane, veh_ids, error, int)
+
+    def get_headway_array(self, veh_ids=None, error=np.nan):
+        """Return the headways of several vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of str, optional
+            vehicle ids, defaults to all vehicles in the network (in the order
+            of `get_ids()`)
+        error : float, optional
+            value that is returned for vehicles that are not found
+
+        Returns
+        -------
+        np.ndarray
+            headway of every vehicle
+        """
+        return self._get_array(self.get_headway, veh_ids, error, float)
+
+    def get_length_array(self, veh_ids=None, error=np.nan):
+        """Return the lengths of several vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of str, optional
+            vehicle ids, defaults to all vehicles in the network (in the order
+            of `get_ids()`)
+        error : float, optional
+            value that is returned for vehicles that are not found
+
+        Returns
+        -------
+        np.ndarray
+            length of every vehicle
+        """
+        return self._get_array(self.get_length, veh_ids, error, float)
+
+    def get_x_array(self, veh_ids=None):
+        """Return the 1-D positions of several vehicles (see `get_x_by_id`).
+
+        Parameters
+        ----------
+        veh_ids : list of str, optional
+            vehicle ids, defaults to all vehicles in the network (in the order
+            of `get_ids()`)
+
+        Returns
+        -------
+        np.ndarray
+            absolute position of every vehicle
+        """
+        if veh_ids is None:
+            veh_ids = self.get_ids()
+        return np.array([self.get_x_by_id(veh_id) for veh_id in veh_ids],
+                        dtype=float)
+
+    def get_edge_index(self, veh_ids=None):
+        """Return the index of the edge every vehicle is located on.
+
+        Edges are indexed by their position in the network kernel's
+        `get_edge_list() + get_junction_list()`. Vehicles that are not found,
+        or located on unknown edges, are assigned an index of -1.
+
+        Parameters
+        ----------
+        veh_ids : list of str, optional
+            vehicle ids, defaults to all vehicles in the network (in the order
+            of `get_ids()`)
+
+        Returns
+        -------
+        np.ndarray
+            edge index of every vehicle
+        """
+        if veh_ids is None:
+            veh_ids = self.get_ids()
+        network = self.master_kernel.network
+        edges = network.get_edge_list() + network.get_junction_list()
+        edge_index = {edge: i for i, edge in enumerate(edges)}
+        return np.array([edge_index.get(edge, -1)
+                         for edge in self.get_edge(list(veh_ids))], dtype=int)
+
+    def get_edge_transitions(self):
+        """Return the vehicles whose edge or lane changed in the last update.
+
+        This includes the vehicles that departed in the last update. The
+        default implementation returns all vehicles in the network.
+
+        Returns
+        -------
+        list of str
+            vehicle ids, in the order of `get_ids()`
+        """
+        return self.get_ids()
+
+    def get_routing_ids(self):
+        """Return the vehicles whose routing controllers act in this step.
+
+        Event-driven routing controllers (see BaseRouter.event_driven) only
+        act on the vehicles returned by `get_edge_transitions`, while other
+        routing controllers act every step.
+
+        Returns
+        -------
+        list of str
+            vehicle ids, in the order of `get_ids()`
+        """
+        transitions = set(self.get_edge_transitions())
+        routing_ids = []
+        for veh_id in self.get_ids():
+            router = self.get_routing_controller(veh_id)
+            if router is not None and (
+                    not router.event_driven or veh_id in transitions):
+                routing_ids.append(veh_id)
+        return routing_ids
+
+    def get_leader_index(self, veh_ids=None):
+        """Return the index of the leader of every vehicle in `get_ids()`.
+
+        Parameters
+        ----------
+        veh_ids : list of str, optional
+            vehicle ids, defaults to all vehicles in the network (in the order
+            of `get_ids()`)
+
+        Returns
+        -------
+        np.ndarray
+            index of the leader of every vehicle in `get_ids()`, or -1 if the
+            vehicle has no leader or is not found
+        """
+        if veh_ids is None:
+            veh_ids = self.get_ids()
+        index = {veh_id: i for i, veh_id in enumerate(self.get_ids())}
+        return np.array([index.get(leader, -1)
+                         for leader in self.get_leader(list(veh_ids))],
+                        dtype=int)
+
+    def get_follower_index(self, veh_ids=None):
+        """Return the index of the follower of every vehicle in `get_ids()`.
+
+        Parameters
+        ----------
+        veh_ids : list of str, optional
+            vehicle ids, defaults to all vehicles in the network (in the order
+            of `get_ids()`)
+
+        Returns
+        -------
+        np.ndarray
+            index of the follower of every vehicle in `get_ids()`, or -1 if
+            the vehicle has no follower or is not found
+        """
+        if veh_ids is None:
+            veh_ids = self.get_ids()
+        index = {veh_id: i for i, veh_id in enumerate(self.get_ids())}
+        return np.array([index.get(follower, -1)
+                         for follower in self.get_follower(list(veh_ids))],
+                        dtype=int)
+
+    def update_accel_array(self, veh_ids, accel, noise=True, failsafe=True):
+        """Update the stored accelerations of several vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            vehicle identifiers
+        accel : array_like
+            accelerations of the vehicles, NaN values are stored as None
+            (i.e. no acceleration was specified)
+        noise : bool
+            see update_accel
+        failsafe : bool
+            see update_accel
+        """
+        for veh_id, acc in zip(veh_ids, accel):
+            self.update_accel(veh_id, None if np.isnan(acc) else float(acc),
+                              noise=noise, failsafe=failsafe)
+
+    def _get_array(self, getter, veh_ids, error, dtype):
+        """Collect the output of a per-vehicle getter into an array."""
+        if veh_ids is None:
+            veh_ids = self.get_ids()
+        values = [getter(veh_id, error=error) for veh_id in veh_ids]
+        return np.array(values, dtype=dtype)
+
     ###########################################################################
     #                        Methods for Datapipeline                         #
     ###########################################################################
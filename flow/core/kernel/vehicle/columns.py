@@ -0,0 +1,190 @@
+"""Script containing the columnar (struct-of-arrays) vehicle state store."""
+
+import numpy as np
+
+
+# name, dtype, and fill value of every column stored by VehicleColumns
+COLUMNS = (
+    ("speed", np.float64, np.nan),
+    ("position", np.float64, np.nan),
+    ("lane", np.int64, -1),
+    ("edge", np.int64, -1),
+    ("headway", np.float64, np.nan),
+    ("leader", np.int64, -1),
+    ("length", np.float64, np.nan),
+)
+
+
+class VehicleColumns(object):
+    """Struct-of-arrays store of per-vehicle state.
+
+    Each state variable is kept in a contiguous numpy array, and the ith row
+    of every array corresponds to the ith vehicle in `ids`. Row indices are
+    stable in between calls to `update` and `remove`, so that the arrays may
+    be gathered or sliced without any per-vehicle Python calls.
+
+    The following columns are stored:
+
+    * speed: speed of the vehicle (m/s)
+    * position: position of the vehicle relative to its current edge (m)
+    * lane: lane index of the vehicle
+    * edge: index of the vehicle's current edge in `edge_names`, -1 if the
+      edge is unknown
+    * headway: headway of the vehicle (m)
+    * leader: row of the vehicle's leader, -1 if it has no leader (or if the
+      leader is not stored in the columns)
+    * length: length of the vehicle (m)
+
+    Attributes
+    ----------
+    ids : list of str
+        the ids of the vehicles, sorted by row
+    num_rows : int
+        number of valid rows in each column
+    edge_names : list of str
+        names of the edges (and junctions), sorted by edge index
+    """
+
+    def __init__(self, capacity=64):
+        """Instantiate an empty set of columns.
+
+        Parameters
+        ----------
+        capacity : int, optional
+            number of rows that are initially allocated. The columns are
+            automatically resized if more vehicles need to be stored.
+        """
+        self.ids = []
+        self.num_rows = 0
+        self.edge_names = []
+        self._row = {}
+        self._edge_index = {}
+        self._data = {name: np.full(capacity, fill, dtype=dtype)
+                      for name, dtype, fill in COLUMNS}
+
+    def set_edges(self, edge_names):
+        """Specify the names of the edges that may be occupied by vehicles.
+
+        Parameters
+        ----------
+        edge_names : list of str
+            names of the edges and junctions in the network
+        """
+        self.edge_names = list(edge_names)
+        self._edge_index = {edge: i for i, edge in enumerate(edge_names)}
+
+    def edge_index(self, edges):
+        """Return the edge index of one or several edge names.
+
+        Edges that are not known to the columns are assigned an index of -1.
+        """
+        if isinstance(edges, str):
+            return self._edge_index.get(edges, -1)
+        get = self._edge_index.get
+        return np.fromiter((get(edge, -1) for edge in edges),
+                           dtype=np.int64, count=len(edges))
+
+    def update(self, ids, speed, position, lane, edge, headway, leader,
+               length):
+        """Replace the content of the columns.
+
+        Parameters
+        ----------
+        ids : list of str
+            ids of the vehicles, each element is assigned a row in the order
+            provided
+        speed : array_like
+            speed of every vehicle
+        position : array_like
+            position of every vehicle relative to its current edge
+        lane : array_like
+            lane index of every vehicle
+        edge : list of str
+            name of the edge every vehicle is located on
+        headway : array_like
+            headway of every vehicle
+        leader : list of str or None
+            id of the leader of every vehicle, None if there is no leader
+        length : array_like
+            length of every vehicle
+        """
+        n = len(ids)
+        self._reserve(n)
+        self.ids = list(ids)
+        self.num_rows = n
+        self._row = dict(zip(self.ids, range(n)))
+
+        data = self._data
+        data["speed"][:n] = speed
+        data["position"][:n] = position
+        data["lane"][:n] = lane
+        data["edge"][:n] = self.edge_index(edge)
+        data["headway"][:n] = headway
+        data["length"][:n] = length
+        get = self._row.get
+        data["leader"][:n] = np.fromiter(
+            (get(lead, -1) for lead in leader), dtype=np.int64, count=n)
+
+    def remove(self, veh_id):
+        """Remove the row of a vehicle, shifting all subsequent rows by one.
+
+        This matches the ordering of the list returned by `get_ids` in the
+        vehicle kernel, in which the vehicle is removed in place as well.
+        """
+        row = self._row.pop(veh_id, None)
+        if row is None:
+            return
+
+        n = self.num_rows
+        for arr in self._data.values():
+            arr[row:n - 1] = arr[row + 1:n]
+
+        # update the leader column to point to the shifted rows
+        leader = self._data["leader"][:n - 1]
+        leader[leader == row] = -1
+        leader[leader > row] -= 1
+
+        del self.ids[row]
+        self.num_rows = n - 1
+        self._row = dict(zip(self.ids, range(self.num_rows)))
+
+    def set(self, name, veh_id, value):
+        """Set the value of a single vehicle in the specified column.
+
+        This is ignored if the vehicle is not stored in the columns.
+        """
+        row = self._row.get(veh_id)
+        if row is not None:
+            if name == "edge":
+                value = self.edge_index(value)
+            self._data[name][row] = value
+
+    def column(self, name):
+        """Return a view of the valid rows of the specified column."""
+        return self._data[name][:self.num_rows]
+
+    def rows(self, veh_ids):
+        """Return the row of every vehicle in veh_ids (-1 if not stored)."""
+        get = self._row.get
+        return np.fromiter((get(veh_id, -1) for veh_id in veh_ids),
+                           dtype=np.int64, count=len(veh_ids))
+
+    def take(self, name, rows):
+        """Return the values of a column at the specified rows.
+
+        Rows with an index of -1 are assigned meaningless values, and should
+        be filtered out by the caller.
+        """
+        return self._data[name][rows]
+
+    def _reserve(self, n):
+        """Grow all columns so that they may store at least n rows."""
+        capacity = len(self._data["speed"])
+        if n <= capacity:
+            return
+        while capacity < n:
+            capacity *= 2
+        for name, dtype, fill in COLUMNS:
+            arr = np.full(capacity, fill, dtype=dtype)
+            arr[:self.num_rows] = self._data[name][:self.num_rows]
+            self._data[name] = arr
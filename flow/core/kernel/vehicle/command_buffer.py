@@ -0,0 +1,119 @@
+"""Script containing the TraCI command buffer."""
+
+
+# private attributes of traci.connection.Connection that the buffer relies on.
+# These are present in the traci versions distributed with sumo 1.x.
+_CONNECTION_ATTRIBUTES = ("_sendExact", "_string", "_queue", "_lock")
+
+
+class TraCICommandBuffer(object):
+    """Buffer that pipelines TraCI commands into as few messages as possible.
+
+    By default, the TraCI client sends every command in a separate message,
+    and waits for SUMO's response before returning. Commands issued within a
+    `with` block of this buffer are instead only appended to the pending
+    message of the TraCI connection, and are sent together, in a single
+    message (and a single socket write), when the block exits.
+
+    Only commands whose responses are not needed (e.g. `slowDown`,
+    `changeLane` or `setRoute`) may be issued within the buffer. An error
+    produced by a buffered command (e.g. for an unknown vehicle) is raised
+    when the block exits, and the remaining commands of the block are
+    dropped. If the block is exited with an exception, its pending commands
+    are dropped as well. Blocks may be nested, in which case the commands are
+    sent when the outermost block exits.
+
+    The buffer replaces the private `_sendExact` method of the connection
+    while it is active. If the connection does not have the private
+    attributes the buffer relies on (e.g. libsumo, or an incompatible version
+    of traci), commands are sent immediately instead.
+
+    Usage
+    -----
+    >>> with TraCICommandBuffer(kernel_api):
+    ...     kernel_api.vehicle.slowDown("human_0", 10, 1e-3)
+    ...     kernel_api.vehicle.slowDown("human_1", 12, 1e-3)
+    >>> # both commands were sent to SUMO in one message
+
+    Attributes
+    ----------
+    connection : traci.connection.Connection
+        the TraCI connection whose commands are buffered
+    enabled : bool
+        whether commands are buffered
+    """
+
+    def __init__(self, connection):
+        """Instantiate the buffer.
+
+        Parameters
+        ----------
+        connection : traci.connection.Connection
+            the TraCI connection whose commands are buffered
+        """
+        self.connection = connection
+        self.enabled = all(hasattr(connection, attr)
+                           for attr in _CONNECTION_ATTRIBUTES) \
+            and isinstance(connection._string, bytes) \
+            and isinstance(connection._queue, list)
+        # whether each of the active blocks of this buffer started buffering
+        # (False for blocks nested in another active block)
+        self._outermost = []
+
+    def __enter__(self):
+        """Start buffering commands."""
+        if self.enabled:
+            outermost = not self.active()
+            if outermost:
+                # the commands are appended to the pending message by the
+                # connection, which then calls _sendExact to transmit it
+                self.connection._sendExact = self._defer
+            self._outermost.append(outermost)
+        return self
+
+    def __exit__(self, exc_type, *args):
+        """Stop buffering commands, and send the pending commands."""
+        if self.enabled and self._outermost.pop():
+            del self.connection._sendExact
+            if exc_type is None:
+                self.flush()
+            else:
+                self._clear()
+
+    def active(self):
+        """Return whether the commands of the connection are being buffered."""
+        return self.enabled and \
+            vars(self.connection).get("_sendExact") is self._defer
+
+    def flush(self):
+        """Send all pending commands to SUMO, and check for errors.
+
+        Raises
+        ------
+        traci.exceptions.TraCIException
+            if one of the pending commands failed
+        """
+        if self.enabled and self.num_pending() > 0:
+            try:
+                # the connection holds this lock while it sends commands
+                with self.connection._lock:
+                    type(self.connection)._sendExact(self.connection)
+            finally:
+                # the commands that follow an error are not processed
+                self._clear()
+
+    def num_pending(self):
+        """Return the number of commands that have not been sent yet."""
+        if not self.enabled:
+            return 0
+        return len(self.connection._queue)
+
+    def _clear(self):
+        """Drop the pending commands."""
+        self.connection._string = bytes()
+        self.connection._queue = []
+
+    @staticmethod
+    def _defer():
+        """Replace _sendExact while buffering, leaving the message pending."""
+        return None
@@ -0,0 +1,293 @@
+"""Script containing the batched multi-lane leader/follower computation."""
+
+import numpy as np
+
+
+class MultiLaneHeadways(object):
+    """Batched computation of lane leaders, followers, headways and tailways.
+
+    Every simulation step, all vehicles are sorted once by (edge, lane,
+    position). The lane leaders and followers of any number of queried
+    vehicles are then collected in a vectorized manner, first on the edge the
+    vehicles are located on, and then by following precomputed successor and
+    predecessor tables of the (edge, lane) pairs in the network.
+
+    Edge/lane pairs are represented by "slots", where the slot of lane `l` of
+    the edge with index `e` is `e * max_lanes + l`.
+
+    Attributes
+    ----------
+    edge_names : list of str
+        names of the edges (and junctions) in the network, sorted by edge index
+    num_lanes : np.ndarray
+        number of lanes on every edge
+    max_lanes : int
+        maximum number of lanes on any edge
+    next_slot : np.ndarray
+        slot of the first (edge, lane) pair succeeding every slot, -1 if there
+        is none
+    next_length : np.ndarray
+        length that is added to the headway when moving to the next slot
+        (i.e. the length of the current edge)
+    prev_slot : np.ndarray
+        slot of the first (edge, lane) pair preceding every slot, -1 if there
+        is none
+    prev_length : np.ndarray
+        length that is added to the tailway when moving to the previous slot
+        (i.e. the length of the previous edge)
+    """
+
+    def __init__(self, network, edge_names):
+        """Precompute the successor/predecessor tables of the network.
+
+        Parameters
+        ----------
+        network : flow.core.kernel.network.KernelNetwork
+            the network kernel, used to collect the number of lanes, lengths,
+            and connections of every edge
+        edge_names : list of str
+            names of the edges and junctions in the network, sorted by edge
+            index
+        """
+        self.edge_names = list(edge_names)
+        edge_index = {edge: i for i, edge in enumerate(self.edge_names)}
+
+        num_edges = len(self.edge_names)
+        self.num_lanes = np.array(
+            [max(network.num_lanes(edge), 0) for edge in self.edge_names],
+            dtype=np.int64)
+        self.max_lanes = int(max(self.num_lanes.max(initial=0), 1))
+        edge_length = [network.edge_length(edge) for edge in self.edge_names]
+
+        num_slots = num_edges * self.max_lanes
+        self.next_slot = np.full(num_slots, -1, dtype=np.int64)
+        self.next_length = np.zeros(num_slots)
+        self.prev_slot = np.full(num_slots, -1, dtype=np.int64)
+        self.prev_length = np.zeros(num_slots)
+
+        for i, edge in enumerate(self.edge_names):
+            for lane in range(self.max_lanes):
+                slot = i * self.max_lanes + lane
+
+                next_edge = network.next_edge(edge, lane)
+                if len(next_edge) > 0:
+                    j = edge_index.get(next_edge[0][0])
+                    if j is not None and next_edge[0][1] < self.max_lanes:
+                        self.next_slot[slot] = \
+                            j * self.max_lanes + next_edge[0][1]
+                        self.next_length[slot] = edge_length[i]
+
+                prev_edge = network.prev_edge(edge, lane)
+                if len(prev_edge) > 0:
+                    j = edge_index.get(prev_edge[0][0])
+                    if j is not None and prev_edge[0][1] < self.max_lanes:
+                        self.prev_slot[slot] = \
+                            j * self.max_lanes + prev_edge[0][1]
+                        self.prev_length[slot] = edge_length[j]
+
+        # variables updated by the `sort` method
+        self.sorted_rows = np.zeros(0, dtype=np.int64)
+        self.sorted_slots = np.zeros(0, dtype=np.int64)
+        self.sorted_pos = np.zeros(0)
+        self._start = np.zeros(num_slots, dtype=np.int64)
+        self._end = np.zeros(num_slots, dtype=np.int64)
+
+    def sort(self, edge, lane, position):
+        """Sort all vehicles by (edge, lane, position).
+
+        Vehicles with an unknown edge (index of -1) are ignored.
+
+        Parameters
+        ----------
+        edge : np.ndarray
+            edge index of every vehicle
+        lane : np.ndarray
+            lane index of every vehicle
+        position : np.ndarray
+            position of every vehicle relative to its edge
+        """
+        rows = np.flatnonzero(
+            (edge >= 0) & (lane >= 0) & (lane < self.max_lanes))
+        slots = edge[rows] * self.max_lanes + lane[rows]
+
+        # vehicles with equal positions are kept in their original order
+        order = np.lexsort((position[rows], slots))
+        self.sorted_rows = rows[order]
+        self.sorted_slots = slots[order]
+        self.sorted_pos = position[self.sorted_rows]
+
+        all_slots = np.arange(len(self.next_slot))
+        self._start = np.searchsorted(self.sorted_slots, all_slots, 'left')
+        self._end = np.searchsorted(self.sorted_slots, all_slots, 'right')
+
+    def edge_partition(self):
+        """Return the vehicles located on every occupied edge.
+
+        Returns
+        -------
+        np.ndarray
+            edge index of every occupied edge
+        list of np.ndarray
+            rows of the vehicles on every occupied edge, sorted by lane and
+            position
+        """
+        sorted_edges = self.sorted_slots // self.max_lanes
+        edges, first = np.unique(sorted_edges, return_index=True)
+        return edges, np.split(self.sorted_rows, first[1:])
+
+    def query(self, rows, edge, lane, position, length, default=1000):
+        """Compute the lane leaders/followers of the specified vehicles.
+
+        This must be called after `sort`, with the same state arrays.
+
+        Parameters
+        ----------
+        rows : np.ndarray
+            rows of the queried vehicles in the state arrays
+        edge : np.ndarray
+            edge index of every vehicle
+        lane : np.ndarray
+            lane index of every vehicle
+        position : np.ndarray
+            position of every vehicle relative to its edge
+        length : np.ndarray
+            length of every vehicle
+        default : float, optional
+            headway/tailway assigned to lanes without a leader/follower
+
+        Returns
+        -------
+        np.ndarray
+            number of lanes on the edge of every queried vehicle
+        np.ndarray
+            lane headways, of shape (len(rows), max_lanes)
+        np.ndarray
+            lane tailways, of shape (len(rows), max_lanes)
+        np.ndarray
+            rows of the lane leaders (-1 if there are none), of shape
+            (len(rows), max_lanes)
+        np.ndarray
+            rows of the lane followers (-1 if there are none), of shape
+            (len(rows), max_lanes)
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        num_queries = len(rows)
+        num_lanes = self.num_lanes[edge[rows]]
+
+        headway = np.full((num_queries, self.max_lanes), default, dtype=float)
+        tailway = np.full((num_queries, self.max_lanes), default, dtype=float)
+        leader = np.full((num_queries, self.max_lanes), -1, dtype=np.int64)
+        follower = np.full((num_queries, self.max_lanes), -1, dtype=np.int64)
+
+        if num_queries == 0:
+            return num_lanes, headway, tailway, leader, follower
+
+        # one element for every (queried vehicle, lane) pair
+        q = np.repeat(np.arange(num_queries), num_lanes)
+        q_lane = np.arange(len(q)) - np.repeat(
+            np.cumsum(num_lanes) - num_lanes, num_lanes)
+        q_row = rows[q]
+        q_slot = edge[q_row] * self.max_lanes + q_lane
+        q_pos = position[q_row]
+
+        # index of the first vehicle in the sorted list whose (slot, position)
+        # is not smaller than that of the query (similar to bisect_left)
+        index = self._search(q_slot, q_pos)
+        start = self._start[q_slot]
+        count = self._end[q_slot] - start
+        local = index - start
+
+        # --- leaders on the current edge ---
+        same_lane = q_lane == lane[q_row]
+        has_leader = (same_lane & (local < count - 1)) | \
+            (~same_lane & (local < count))
+        i = np.flatnonzero(has_leader)
+        lead = index[i]
+        # skip the queried vehicle itself
+        lead = lead + (self.sorted_rows[lead] == q_row[i])
+        lead_row = self.sorted_rows[lead]
+        leader[q[i], q_lane[i]] = lead_row
+        headway[q[i], q_lane[i]] = \
+            self.sorted_pos[lead] - q_pos[i] - length[lead_row]
+
+        # --- followers on the current edge ---
+        has_follower = local > 0
+        i = np.flatnonzero(has_follower)
+        follow = index[i] - 1
+        follower[q[i], q_lane[i]] = self.sorted_rows[follow]
+        tailway[q[i], q_lane[i]] = \
+            q_pos[i] - self.sorted_pos[follow] - length[q_row[i]]
+
+        # --- leaders on the next edges ---
+        i = np.flatnonzero(~has_leader)
+        slot = q_slot[i]
+        add_length = np.zeros(len(i))
+        for _ in range(len(self.edge_names)):
+            # stop for pairs with no (edge, lane) pairs in front of them
+            has_next = self.next_slot[slot] >= 0
+            i, slot, add_length = i[has_next], slot[has_next], \
+                add_length[has_next]
+            if len(i) == 0:
+                break
+
+            add_length += self.next_length[slot]
+            slot = self.next_slot[slot]
+
+            found = self._end[slot] > self._start[slot]
+            j = i[found]
+            first = self._start[slot[found]]
+            lead_row = self.sorted_rows[first]
+            leader[q[j], q_lane[j]] = lead_row
+            headway[q[j], q_lane[j]] = self.sorted_pos[first] - q_pos[j] \
+                + add_length[found] - length[lead_row]
+
+            i, slot, add_length = i[~found], slot[~found], add_length[~found]
+
+        # --- followers on the previous edges ---
+        i = np.flatnonzero(~has_follower)
+        slot = q_slot[i]
+        add_length = np.zeros(len(i))
+        for _ in range(len(self.edge_names)):
+            # stop for pairs with no (edge, lane) pairs behind them
+            has_prev = self.prev_slot[slot] >= 0
+            i, slot, add_length = i[has_prev], slot[has_prev], \
+                add_length[has_prev]
+            if len(i) == 0:
+                break
+
+            add_length += self.prev_length[slot]
+            slot = self.prev_slot[slot]
+
+            found = self._end[slot] > self._start[slot]
+            j = i[found]
+            last = self._end[slot[found]] - 1
+            follower[q[j], q_lane[j]] = self.sorted_rows[last]
+            tailway[q[j], q_lane[j]] = q_pos[j] - self.sorted_pos[last] \
+                + add_length[found] - length[q_row[j]]
+
+            i, slot, add_length = i[~found], slot[~found], add_length[~found]
+
+        return num_lanes, headway, tailway, leader, follower
+
+    def _search(self, slots, positions):
+        """Locate (slot, position) pairs in the sorted list of vehicles.
+
+        Returns, for every pair, the number of sorted vehicles whose (slot,
+        position) is strictly smaller than the pair.
+        """
+        num_sorted = len(self.sorted_slots)
+        all_slots = np.concatenate((self.sorted_slots, slots))
+        all_pos = np.concatenate((self.sorted_pos, positions))
+        # queries are placed before vehicles with identical (slot, position)
+        is_vehicle = np.concatenate(
+            (np.ones(num_sorted, dtype=np.int64),
+             np.zeros(len(slots), dtype=np.int64)))
+
+        order = np.lexsort((is_vehicle, all_pos, all_slots))
+        ordered = is_vehicle[order]
+        num_before = np.cumsum(ordered) - ordered
+
+        index = np.empty(len(slots), dtype=np.int64)
+        is_query = ordered == 0
+        index[order[is_query] - num_sorted] = num_before[is_query]
+        return index
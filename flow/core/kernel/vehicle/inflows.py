@@ -0,0 +1,187 @@
+"""Script containing the scheduler of runtime inflows."""
+
+import numpy as np
+
+# inflow parameters that are forwarded to the simulator with every departure
+DEPARTURE_PARAMS = ['departLane', 'departPos', 'departSpeed', 'arrivalLane',
+                    'arrivalPos', 'arrivalSpeed']
+
+
+class InflowScheduler(object):
+    """Python-side scheduler of the departures of inflows.
+
+    This class reproduces the departures of the <flow> elements of sumo route
+    files (see flow.core.params.InFlows), so that the vehicles of the inflows
+    can be injected into a running simulation by the vehicle kernel. Unlike
+    route file flows, the inflows of the scheduler may be replaced at any
+    time (see `set_inflows`), without regenerating the network or restarting
+    the simulation.
+
+    The departures of an inflow are generated as in sumo:
+
+    * "vehsPerHour" and "period": equally spaced departures, the first one
+      being at time "begin"
+    * "probability": a vehicle departs every step with probability
+      `probability * sim_step`
+
+    Departures start at time "begin" and stop at time "end", or once
+    "number" vehicles departed. Times are measured from the last call to
+    `reset`. Inflows without a "route" are split across the routes starting
+    at their edge, with the route fractions scaling the rates (similarly to
+    the route files generated by the network kernel).
+
+    Vehicles are named "<inflow name>.<index>", as are the vehicles of sumo
+    flows.
+
+    Usage
+    -----
+    >>> scheduler = InflowScheduler(inflows, routes, sim_step=0.1)
+    >>> scheduler.reset()
+    >>> for _ in range(num_steps):
+    ...     for veh_id, route_id, veh_type, params in scheduler.step():
+    ...         pass  # add the vehicle to the simulation
+
+    Attributes
+    ----------
+    sim_step : float
+        duration of a simulation step (in seconds)
+    time : float
+        time since the last reset (in seconds)
+    """
+
+    def __init__(self, inflows, routes, sim_step):
+        """Instantiate the scheduler.
+
+        Parameters
+        ----------
+        inflows : flow.core.params.InFlows or list of dict
+            the inflows to schedule
+        routes : dict
+            routes of the network, keyed by starting edge (see the `rts`
+            attribute of the network kernel)
+        sim_step : float
+            duration of a simulation step (in seconds)
+        """
+        self.sim_step = sim_step
+        self.time = 0
+        self._routes = routes
+        self._flows = []
+        # number of vehicles created by each inflow name, kept when the
+        # inflows are replaced so that vehicle names remain unique
+        self._counts = {}
+        self.set_inflows(inflows)
+
+    def set_inflows(self, inflows):
+        """Replace the scheduled inflows.
+
+        The new inflows take effect at the next step. Their departure times
+        are measured from the last reset, so that inflows whose "begin" time
+        has passed start at the next step.
+
+        Parameters
+        ----------
+        inflows : flow.core.params.InFlows or list of dict
+            the new inflows
+        """
+        if hasattr(inflows, 'get'):
+            inflows = inflows.get()
+
+        self._flows = []
+        for inflow in inflows or []:
+            if 'route' in inflow:
+                self._flows.append(self._flow(inflow, inflow['route'], 1))
+            else:
+                # distribute the inflow across all routes from its edge
+                edge = inflow['edge']
+                routes = self._routes[edge]
+                if isinstance(routes[0], str):
+                    routes = [(routes, 1)]
+                for i, (_, frac) in enumerate(routes):
+                    flow = self._flow(
+                        inflow, 'route{}_{}'.format(edge, i), frac)
+                    flow['name'] += str(i)
+                    self._flows.append(flow)
+
+        for flow in self._flows:
+            self._counts.setdefault(flow['name'], 0)
+            self._start(flow)
+
+    def reset(self):
+        """Restart the departures of all inflows from time 0."""
+        self.time = 0
+        for flow in self._flows:
+            self._start(flow)
+
+    def step(self):
+        """Advance the scheduler by one simulation step.
+
+        Returns
+        -------
+        list of (str, str, str, dict)
+            the id, route and type of the vehicles departing in the step, as
+            well as their departure parameters (see DEPARTURE_PARAMS)
+        """
+        self.time += self.sim_step
+        # small tolerance on the accumulated time
+        time = self.time + 1e-6 * self.sim_step
+
+        departures = []
+        for flow in self._flows:
+            if time < flow['begin'] or time >= flow['end']:
+                continue
+
+            if flow['period'] is not None:
+                num_departures = 0
+                while flow['next'] <= time:
+                    num_departures += 1
+                    flow['next'] += flow['period']
+            else:
+                num_departures = int(np.random.uniform() <
+                                     flow['probability'] * self.sim_step)
+
+            if flow['number'] is not None:
+                num_departures = min(num_departures,
+                                     flow['number'] - flow['total'])
+
+            for _ in range(num_departures):
+                veh_id = '{}.{}'.format(flow['name'],
+                                        self._counts[flow['name']])
+                self._counts[flow['name']] += 1
+                flow['total'] += 1
+                departures.append(
+                    (veh_id, flow['route'], flow['vtype'], flow['params']))
+
+        return departures
+
+    def _flow(self, inflow, route, frac):
+        """Create the internal representation of an inflow."""
+        flow = {
+            'name': inflow['name'],
+            'vtype': inflow['vtype'],
+            'route': route,
+            'begin': float(inflow.get('begin') or 0),
+            'end': float(inflow.get('end') or float('inf')),
+            'number': None,
+            'period': None,
+            'probability': None,
+            'params': {key: str(inflow[key]) for key in DEPARTURE_PARAMS
+                       if key in inflow},
+        }
+        if 'number' in inflow:
+            # the end of the inflow is ignored if a number is specified
+            flow['number'] = int(float(inflow['number']) * frac)
+            flow['end'] = float('inf')
+        if 'vehsPerHour' in inflow:
+            rate = float(inflow['vehsPerHour']) * frac
+            flow['period'] = 3600 / rate if rate > 0 else None
+        elif 'period' in inflow:
+            period = float(inflow['period'])
+            flow['period'] = period / frac if frac > 0 else None
+        if flow['period'] is None:
+            flow['probability'] = float(inflow.get('probability', 0)) * frac
+        return flow
+
+    def _start(self, flow):
+        """Start the departures of an inflow from the current time."""
+        flow['next'] = max(flow['begin'], self.time + self.sim_step)
+        flow['total'] = 0
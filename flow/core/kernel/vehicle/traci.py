@@ -2,6 +2,10 @@
 import traceback
 
 from flow.core.kernel.vehicle import KernelVehicle
+from flow.core.kernel.vehicle.columns import VehicleColumns
+from flow.core.kernel.vehicle.headways import MultiLaneHeadways
+from flow.core.kernel.vehicle.command_buffer import TraCICommandBuffer
+from flow.core.kernel.vehicle.inflows import InflowScheduler
 import traci.constants as tc
 from traci.exceptions import FatalTraCIError, TraCIException
 import numpy as np
@@ -10,9 +14,6 @@ import warnings
 from flow.controllers.car_following_models import SimCarFollowingController
 from flow.controllers.rlcontroller import RLController
 from flow.controllers.lane_change_controllers import SimLaneChangeController
-from bisect import bisect_left
-import itertools
-from copy import deepcopy
 
 # colors for vehicles
 WHITE = (255, 255, 255)
@@ -39,6 +40,7 @@ class TraCIVehicle(KernelVehicle):
         KernelVehicle.__init__(self, master_kernel, sim_params)
 
         self.__ids = []  # ids of all vehicles
+        self.__id_set = set()  # ids of all vehicles, for membership checks
         self.__human_ids = []  # ids of human-driven vehicles
         self.__controlled_ids = []  # ids of flow-controlled vehicles
         self.__controlled_lc_ids = []  # ids of flow lc-controlled vehicles
@@ -53,6 +55,22 @@ class TraCIVehicle(KernelVehicle):
         # on the state of the vehicles for a given time step
         self.__sumo_obs = {}
 
+        # vehicles whose edge or lane changed in the last update (see
+        # get_edge_transitions)
+        self._edge_transitions = []
+        # vehicles whose routing controllers act every step, i.e. that are not
+        # event-driven (see get_routing_ids)
+        self._polled_router_ids = set()
+
+        # struct-of-arrays copy of the most commonly accessed state variables,
+        # used to collect the state of several vehicles without per-vehicle
+        # Python calls
+        self.__columns = VehicleColumns()
+
+        # batched lane leader/follower computation, created once the network
+        # is available
+        self._lane_headways = None
+
         # total number of vehicles in the network
         self.num_vehicles = 0
         # number of rl vehicles in the network
@@ -88,6 +106,18 @@ class TraCIVehicle(KernelVehicle):
         # old speeds used to compute accelerations
         self.previous_speeds = {}
 
+        # inflows whose vehicles are added by the kernel (see set_inflows)
+        self._runtime_inflows = getattr(sim_params, 'runtime_inflows', False)
+        self._inflows = None
+        # vehicles of these inflows that did not depart yet
+        self._pending_inflow_ids = set()
+        # number of vehicles of these inflows loaded in the last step, which
+        # are not counted as loaded vehicles by sumo
+        self._num_inflow_loaded = 0
+
+        # length of the vehicles of every type, collected from sumo
+        self._type_lengths = {}
+
     def initialize(self, vehicles):
         """Initialize vehicle state information.
 
@@ -107,6 +137,8 @@ class TraCIVehicle(KernelVehicle):
         self.num_not_departed = 0
 
         self.__vehicles.clear()
+        self._polled_router_ids.clear()
+        self._type_lengths.clear()
         for typ in vehicles.initial:
             for i in range(typ['num_vehicles']):
                 veh_id = '{}_{}'.format(typ['veh_id'], i)
@@ -161,7 +193,8 @@ class TraCIVehicle(KernelVehicle):
 
         # add entering vehicles into the vehicles class
         for veh_id in sim_obs[tc.VAR_DEPARTED_VEHICLES_IDS]:
-            if veh_id in self.get_ids() and vehicle_obs[veh_id] is not None:
+            self._pending_inflow_ids.discard(veh_id)
+            if veh_id in self.__id_set and vehicle_obs[veh_id] is not None:
                 # this occurs when a vehicle is actively being removed and
                 # placed again in the network to ensure a constant number of
                 # total vehicles (e.g. TrafficLightGridEnv). In this case, the vehicle
@@ -190,18 +223,7 @@ class TraCIVehicle(KernelVehicle):
             self.num_not_departed = 0
 
             # add vehicles from a network template, if applicable
-            if hasattr(self.master_kernel.network.network,
-                       "template_vehicles"):
-                for veh_id in self.master_kernel.network.network. \
-                        template_vehicles:
-                    vals = deepcopy(self.master_kernel.network.network.
-                                    template_vehicles[veh_id])
-                    # a step is executed during initialization, so add this sim
-                    # step to the departure time of vehicles
-                    vals['depart'] = str(
-                        float(vals['depart']) + 2 * self.sim_step)
-                    self.kernel_api.vehicle.addFull(
-                        veh_id, 'route{}_0'.format(veh_id), **vals)
+            self._add_template_vehicles()
         else:
             self.time_counter += 1
             # update the "last_lc" variable
@@ -211,13 +233,15 @@ class TraCIVehicle(KernelVehicle):
                     self.__vehicles[veh_id]["last_lc"] = self.time_counter
 
             # updated the list of departed and arrived vehicles
-            self._num_departed.append(sim_obs[tc.VAR_LOADED_VEHICLES_NUMBER])
+            num_loaded = sim_obs[tc.VAR_LOADED_VEHICLES_NUMBER] + \
+                self._num_inflow_loaded
+            self._num_departed.append(num_loaded)
             self._num_arrived.append(sim_obs[tc.VAR_ARRIVED_VEHICLES_NUMBER])
             self._departed_ids = sim_obs[tc.VAR_DEPARTED_VEHICLES_IDS]
             self._arrived_ids = sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS]
 
             # update the number of not departed vehicles
-            self.num_not_departed += sim_obs[tc.VAR_LOADED_VEHICLES_NUMBER] - \
+            self.num_not_departed += num_loaded - \
                 sim_obs[tc.VAR_DEPARTED_VEHICLES_NUMBER]
 
         # update the "headway", "leader", and "follower" variables
@@ -254,15 +278,216 @@ class TraCIVehicle(KernelVehicle):
                         leader["follower"] = veh_id
                         leader["follower_headway"] = headway[1] + min_gap
 
+        # collect the vehicles event-driven routers act on
+        self._update_edge_transitions(vehicle_obs, reset)
+
         # update the sumo observations variable
         self.__sumo_obs = vehicle_obs.copy()
 
+        # update the columnar copy of the vehicle states
+        self._update_columns(reset)
+
         # update the lane leaders data for each vehicle
         self._multi_lane_headways()
 
         # make sure the rl vehicle list is still sorted
         self.__rl_ids.sort()
 
+        # add the vehicles of the runtime inflows departing in the next step
+        self._add_inflow_vehicles(reset)
+
+    def _add_template_vehicles(self):
+        """Add the vehicles of the network template, if applicable."""
+        template_vehicles = getattr(
+            self.master_kernel.network.network, "template_vehicles", {})
+
+        # the vehicles are sent to sumo in a single message
+        with TraCICommandBuffer(self.kernel_api):
+            for veh_id, vals in template_vehicles.items():
+                # a step is executed during initialization, so add this sim
+                # step to the departure time of vehicles
+                vals = dict(vals, depart=str(float(vals['depart']) +
+                                             2 * self.sim_step))
+                self.kernel_api.vehicle.addFull(
+                    veh_id, 'route{}_0'.format(veh_id), **vals)
+
+    def restore_vehicles(self, veh_types):
+        """See parent class.
+
+        The vehicles are subscribed to again, as sumo drops the subscriptions
+        when a state is loaded.
+        """
+        # the previous vehicles were removed from the network by sumo
+        for veh_id in list(self.__ids):
+            self._remove_from_kernel(veh_id)
+
+        for veh_id, veh_type in veh_types.items():
+            self._add_departed(veh_id, veh_type)
+
+    def _update_edge_transitions(self, vehicle_obs, reset):
+        """Collect the vehicles whose edge or lane changed in the last step.
+
+        The edges and lanes are compared to the ones of the previous update.
+        Vehicles whose route was not known in the previous update (e.g.
+        vehicles that just departed) are included as well, so that routers
+        act on them once their route is available.
+
+        Parameters
+        ----------
+        vehicle_obs : dict
+            subscription results of every vehicle in the current step
+        reset : bool
+            specifies whether the simulator was reset in the last simulation
+            step. In this case, all vehicles are included.
+        """
+        if reset:
+            self._edge_transitions = list(self.__ids)
+            return
+
+        transitions = []
+        for veh_id in self.__ids:
+            obs = vehicle_obs.get(veh_id) or {}
+            prev_obs = self.__sumo_obs.get(veh_id) or {}
+            if not prev_obs.get(tc.VAR_EDGES) or \
+                    obs.get(tc.VAR_ROAD_ID) != prev_obs.get(tc.VAR_ROAD_ID) or \
+                    obs.get(tc.VAR_LANE_INDEX) != \
+                    prev_obs.get(tc.VAR_LANE_INDEX):
+                transitions.append(veh_id)
+        self._edge_transitions = transitions
+
+    def _add_inflow_vehicles(self, reset):
+        """Add the vehicles departing from the runtime inflows.
+
+        If `runtime_inflows` is set in the simulation parameters, the inflows
+        of the network are scheduled by the kernel instead of being written in
+        the route file, and are restored upon reset.
+
+        Parameters
+        ----------
+        reset : bool
+            specifies whether the simulator was reset in the last simulation
+            step. In this case, the departures of the inflows restart.
+        """
+        if reset:
+            if self._runtime_inflows:
+                self.set_inflows(
+                    self.master_kernel.network.network.net_params.inflows)
+            if self._inflows is not None:
+                self._inflows.reset()
+
+        self._num_inflow_loaded = 0
+        if self._inflows is None:
+            return
+
+        for veh_id, route_id, type_id, params in self._inflows.step():
+            self.kernel_api.vehicle.addFull(
+                veh_id, route_id, typeID=str(type_id), **params)
+            self._pending_inflow_ids.add(veh_id)
+            self._num_inflow_loaded += 1
+
+    def set_inflows(self, inflows):
+        """See parent class.
+
+        The inflows are scheduled in Python (see
+        flow.core.kernel.vehicle.inflows.InflowScheduler), and their vehicles
+        are added through TraCI. The departure times of the new inflows are
+        measured from the last reset.
+
+        Note that the inflows written in the route file of the network are not
+        affected. In order to change the inflows of the network, the
+        `runtime_inflows` simulation parameter must be set, in which case the
+        inflows of the network are only scheduled by the kernel, and are
+        restored upon reset.
+        """
+        if self._inflows is None:
+            self._inflows = InflowScheduler(
+                inflows, self.master_kernel.network.rts, self.sim_step)
+        else:
+            self._inflows.set_inflows(inflows)
+
+    def _update_columns(self, reset):
+        """Copy the current state of all vehicles into the columnar store.
+
+        Parameters
+        ----------
+        reset : bool
+            specifies whether the simulator was reset in the last simulation
+            step. In this case, the edge indices are recomputed from the
+            network kernel.
+        """
+        if reset or self._lane_headways is None:
+            network = self.master_kernel.network
+            edge_names = network.get_edge_list() + network.get_junction_list()
+            self.__columns.set_edges(edge_names)
+            self._lane_headways = MultiLaneHeadways(network, edge_names)
+
+        ids = [veh_id for veh_id in self.__ids if self.__sumo_obs.get(veh_id)]
+        obs = [self.__sumo_obs[veh_id] for veh_id in ids]
+        vehicles = [self.__vehicles[veh_id] for veh_id in ids]
+
+        self.__columns.update(
+            ids,
+            speed=[o[tc.VAR_SPEED] for o in obs],
+            position=[o[tc.VAR_LANEPOSITION] for o in obs],
+            lane=[o[tc.VAR_LANE_INDEX] for o in obs],
+            edge=[o[tc.VAR_ROAD_ID] for o in obs],
+            headway=[veh.get("headway", np.nan) for veh in vehicles],
+            leader=[veh.get("leader") for veh in vehicles],
+            length=[veh.get("length", np.nan) for veh in vehicles],
+        )
+
+    def _column_rows(self, veh_ids):
+        """Return the rows of the specified vehicles in the columnar store.
+
+        Vehicles that are not stored in the columns are assigned a row of -1.
+        """
+        if veh_ids is self.__ids and \
+                self.__columns.num_rows == len(self.__ids):
+            # the columns are sorted similarly to the list of ids
+            return np.arange(len(self.__ids))
+        return self.__columns.rows(veh_ids)
+
+    def _get_column(self, name, veh_ids, error, getter=None):
+        """Collect the values of several vehicles from the columnar store.
+
+        Parameters
+        ----------
+        name : str
+            name of the column
+        veh_ids : list of str or None
+            vehicle ids, defaults to all vehicles in the network
+        error : any
+            value that is returned for vehicles that are not found
+        getter : callable, optional
+            per-vehicle getter that is used for vehicles that are not stored
+            in the columns. If not specified, these vehicles are assigned the
+            error value.
+
+        Returns
+        -------
+        np.ndarray
+            the values of every vehicle
+        """
+        if veh_ids is None:
+            veh_ids = self.__ids
+            if self.__columns.num_rows == len(self.__ids):
+                view = self.__columns.column(name)
+                view.flags.writeable = False
+                return view
+
+        rows = self._column_rows(veh_ids)
+        values = self.__columns.take(name, rows)
+        missing = np.flatnonzero(rows < 0)
+        if len(missing) > 0:
+            if getter is None:
+                values = values.astype(np.result_type(values, error))
+                values[missing] = error
+            else:
+                values = values.astype(object)
+                for i in missing:
+                    values[i] = getter(veh_ids[i], error)
+        return values
+
     def _add_departed(self, veh_id, veh_type):
         """Add a vehicle that entered the network from an inflow or reset.
 
@@ -281,8 +506,9 @@ class TraCIVehicle(KernelVehicle):
         if veh_type not in self.type_parameters:
             raise KeyError("Entering vehicle is not a valid type.")
 
-        if veh_id not in self.__ids:
+        if veh_id not in self.__id_set:
             self.__ids.append(veh_id)
+            self.__id_set.add(veh_id)
         if veh_id not in self.__vehicles:
             self.num_vehicles += 1
             self.__vehicles[veh_id] = dict()
@@ -312,6 +538,8 @@ class TraCIVehicle(KernelVehicle):
         if rt_controller is not None:
             self.__vehicles[veh_id]["router"] = \
                 rt_controller[0](veh_id=veh_id, router_params=rt_controller[1])
+            if not self.__vehicles[veh_id]["router"].event_driven:
+                self._polled_router_ids.add(veh_id)
         else:
             self.__vehicles[veh_id]["router"] = None
 
@@ -327,7 +555,18 @@ class TraCIVehicle(KernelVehicle):
                 if lc_controller[0] != SimLaneChangeController:
                     self.__controlled_lc_ids.append(veh_id)
 
-        # subscribe the new vehicle
+        # set the speed mode and lane changing mode for the vehicle. These
+        # commands are sent to sumo in a single message
+        with TraCICommandBuffer(self.kernel_api):
+            speed_mode = self.type_parameters[veh_type][
+                "car_following_params"].speed_mode
+            self.kernel_api.vehicle.setSpeedMode(veh_id, speed_mode)
+
+            lc_mode = self.type_parameters[veh_type][
+                "lane_change_params"].lane_change_mode
+            self.kernel_api.vehicle.setLaneChangeMode(veh_id, lc_mode)
+
+        # subscribe the new vehicle (including its leader)
         self.kernel_api.vehicle.subscribe(veh_id, [
             tc.VAR_LANE_INDEX, tc.VAR_LANEPOSITION,
             tc.VAR_ROAD_ID,
@@ -337,13 +576,15 @@ class TraCIVehicle(KernelVehicle):
             tc.VAR_ANGLE,
             tc.VAR_SPEED_WITHOUT_TRACI,
             tc.VAR_FUELCONSUMPTION,
-            tc.VAR_DISTANCE
-        ])
-        self.kernel_api.vehicle.subscribeLeader(veh_id, 2000)
+            tc.VAR_DISTANCE,
+            tc.VAR_LEADER
+        ], parameters={tc.VAR_LEADER: ("d", 2000)})
 
         # some constant vehicle parameters to the vehicles class
-        self.__vehicles[veh_id]["length"] = self.kernel_api.vehicle.getLength(
-            veh_id)
+        if veh_type not in self._type_lengths:
+            self._type_lengths[veh_type] = \
+                self.kernel_api.vehicle.getLength(veh_id)
+        self.__vehicles[veh_id]["length"] = self._type_lengths[veh_type]
 
         # set the "last_lc" parameter of the vehicle
         self.__vehicles[veh_id]["last_lc"] = -float("inf")
@@ -352,42 +593,35 @@ class TraCIVehicle(KernelVehicle):
         self.__vehicles[veh_id]["initial_speed"] = \
             self.type_parameters[veh_type]["initial_speed"]
 
-        # set the speed mode for the vehicle
-        speed_mode = self.type_parameters[veh_type][
-            "car_following_params"].speed_mode
-        self.kernel_api.vehicle.setSpeedMode(veh_id, speed_mode)
-
-        # set the lane changing mode for the vehicle
-        lc_mode = self.type_parameters[veh_type][
-            "lane_change_params"].lane_change_mode
-        self.kernel_api.vehicle.setLaneChangeMode(veh_id, lc_mode)
-
-        # get initial state info
-        self.__sumo_obs[veh_id] = dict()
-        self.__sumo_obs[veh_id][tc.VAR_ROAD_ID] = \
-            self.kernel_api.vehicle.getRoadID(veh_id)
-        self.__sumo_obs[veh_id][tc.VAR_LANEPOSITION] = \
-            self.kernel_api.vehicle.getLanePosition(veh_id)
-        self.__sumo_obs[veh_id][tc.VAR_LANE_INDEX] = \
-            self.kernel_api.vehicle.getLaneIndex(veh_id)
-        self.__sumo_obs[veh_id][tc.VAR_SPEED] = \
-            self.kernel_api.vehicle.getSpeed(veh_id)
-        self.__sumo_obs[veh_id][tc.VAR_FUELCONSUMPTION] = \
-            self.kernel_api.vehicle.getFuelConsumption(veh_id)
-
         # make sure that the order of rl_ids is kept sorted
         self.__rl_ids.sort()
         self.num_rl_vehicles = len(self.__rl_ids)
 
-        # get the subscription results from the new vehicle
+        # get the subscription results from the new vehicle, which also
+        # provide its initial state info
         new_obs = self.kernel_api.vehicle.getSubscriptionResults(veh_id)
+        self.__sumo_obs[veh_id] = {
+            var: new_obs[var] for var in (
+                tc.VAR_ROAD_ID, tc.VAR_LANEPOSITION, tc.VAR_LANE_INDEX,
+                tc.VAR_SPEED, tc.VAR_FUELCONSUMPTION)
+        } if new_obs else {}
 
         return new_obs
 
     def reset(self):
-        """See parent class."""
+        """See parent class.
+
+        The vehicles of the runtime inflows that have not been inserted in the
+        network yet are removed.
+        """
         self.previous_speeds = {}
 
+        if self._pending_inflow_ids:
+            pending = self.kernel_api.simulation.getPendingVehicles()
+            for veh_id in self._pending_inflow_ids.intersection(pending):
+                self.kernel_api.vehicle.remove(veh_id)
+            self._pending_inflow_ids.clear()
+
     def remove(self, veh_id):
         """See parent class."""
         # remove from sumo
@@ -395,12 +629,22 @@ class TraCIVehicle(KernelVehicle):
             self.kernel_api.vehicle.unsubscribe(veh_id)
             self.kernel_api.vehicle.remove(veh_id)
 
-        if veh_id in self.__ids:
+        self._remove_from_kernel(veh_id)
+
+    def _remove_from_kernel(self, veh_id):
+        """Remove all traces of a vehicle from the vehicles kernel.
+
+        The vehicle is not removed from sumo.
+        """
+        if veh_id in self.__id_set:
             self.__ids.remove(veh_id)
+            self.__id_set.discard(veh_id)
+            self.__columns.remove(veh_id)
 
         # remove from the vehicles kernel
         if veh_id in self.__vehicles:
             del self.__vehicles[veh_id]
+        self._polled_router_ids.discard(veh_id)
 
         if veh_id in self.__sumo_obs:
             del self.__sumo_obs[veh_id]
@@ -424,10 +668,14 @@ class TraCIVehicle(KernelVehicle):
     def test_set_speed(self, veh_id, speed):
         """Set the speed of the specified vehicle."""
         self.__sumo_obs[veh_id][tc.VAR_SPEED] = speed
+        self.__columns.set("speed", veh_id, speed)
+        self.master_kernel.metrics.clear()
 
     def test_set_edge(self, veh_id, edge):
         """Set the speed of the specified vehicle."""
         self.__sumo_obs[veh_id][tc.VAR_ROAD_ID] = edge
+        self.__columns.set("edge", veh_id, edge)
+        self.master_kernel.metrics.clear()
 
     def set_follower(self, veh_id, follower):
         """Set the follower of the specified vehicle."""
@@ -436,6 +684,7 @@ class TraCIVehicle(KernelVehicle):
     def set_headway(self, veh_id, headway):
         """Set the headway of the specified vehicle."""
         self.__vehicles[veh_id]["headway"] = headway
+        self.__columns.set("headway", veh_id, headway)
 
     def get_orientation(self, veh_id):
         """See parent class."""
@@ -556,7 +805,8 @@ class TraCIVehicle(KernelVehicle):
     def get_speed(self, veh_id, error=-1001):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_speed(vehID, error) for vehID in veh_id]
+            return self._get_column(
+                "speed", veh_id, error, self.get_speed).tolist()
         return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_SPEED, error)
 
     def get_default_speed(self, veh_id, error=-1001):
@@ -569,7 +819,8 @@ class TraCIVehicle(KernelVehicle):
     def get_position(self, veh_id, error=-1001):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_position(vehID, error) for vehID in veh_id]
+            return self._get_column(
+                "position", veh_id, error, self.get_position).tolist()
         return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_LANEPOSITION, error)
 
     def get_edge(self, veh_id, error=""):
@@ -581,7 +832,8 @@ class TraCIVehicle(KernelVehicle):
     def get_lane(self, veh_id, error=-1001):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_lane(vehID, error) for vehID in veh_id]
+            return self._get_column(
+                "lane", veh_id, error, self.get_lane).tolist()
         return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_LANE_INDEX, error)
 
     def get_route(self, veh_id, error=None):
@@ -613,9 +865,68 @@ class TraCIVehicle(KernelVehicle):
     def get_headway(self, veh_id, error=-1001):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_headway(vehID, error) for vehID in veh_id]
+            return self._get_column(
+                "headway", veh_id, error, self.get_headway).tolist()
         return self.__vehicles.get(veh_id, {}).get("headway", error)
 
+    def get_speed_array(self, veh_ids=None, error=np.nan):
+        """See parent class."""
+        return self._get_column("speed", veh_ids, error)
+
+    def get_position_array(self, veh_ids=None, error=np.nan):
+        """See parent class."""
+        return self._get_column("position", veh_ids, error)
+
+    def get_lane_array(self, veh_ids=None, error=-1):
+        """See parent class."""
+        return self._get_column("lane", veh_ids, error)
+
+    def get_headway_array(self, veh_ids=None, error=np.nan):
+        """See parent class."""
+        return self._get_column("headway", veh_ids, error)
+
+    def get_length_array(self, veh_ids=None, error=np.nan):
+        """See parent class."""
+        return self._get_column("length", veh_ids, error)
+
+    def get_x_array(self, veh_ids=None):
+        """See parent class."""
+        if veh_ids is None:
+            veh_ids = self.__ids
+        edges = self.get_edge(list(veh_ids))
+        x = self.master_kernel.network.get_x_array(
+            edges, self.get_position_array(veh_ids))
+        # vehicles that crashed or were teleported
+        x[np.asarray(edges, dtype=str) == ''] = 0.
+        return x
+
+    def get_edge_index(self, veh_ids=None):
+        """See parent class."""
+        return self._get_column("edge", veh_ids, -1)
+
+    def get_leader_index(self, veh_ids=None):
+        """See parent class."""
+        return self._row_index(self._get_column("leader", veh_ids, -1))
+
+    def get_follower_index(self, veh_ids=None):
+        """See parent class."""
+        if veh_ids is None:
+            veh_ids = self.__ids
+        return self._row_index(
+            self.__columns.rows(self.get_follower(list(veh_ids))))
+
+    def _row_index(self, rows):
+        """Convert rows of the columnar store to indices in get_ids()."""
+        if self.__columns.num_rows != len(self.__ids):
+            # the rows of the columnar store only coincide with the indices
+            # in get_ids() when all vehicles are stored
+            index = {veh_id: i for i, veh_id in enumerate(self.__ids)}
+            row_index = np.array(
+                [index[veh_id] for veh_id in self.__columns.ids] + [-1],
+                dtype=np.int64)
+            rows = row_index[rows]
+        return rows
+
     def get_last_lc(self, veh_id, error=-1001):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
@@ -651,6 +962,26 @@ class TraCIVehicle(KernelVehicle):
             ]
         return self.__vehicles.get(veh_id, {}).get("router", error)
 
+    def get_edge_transitions(self):
+        """See parent class.
+
+        The transitions are collected from the edge and lane subscriptions of
+        the vehicles whenever the kernel is updated.
+        """
+        return self._edge_transitions
+
+    def get_routing_ids(self):
+        """See parent class."""
+        if self._polled_router_ids:
+            transitions = set(self._edge_transitions)
+            return [veh_id for veh_id in self.__ids
+                    if veh_id in self._polled_router_ids or (
+                        veh_id in transitions and
+                        self.__vehicles[veh_id].get("router") is not None)]
+
+        return [veh_id for veh_id in self._edge_transitions
+                if self.__vehicles.get(veh_id, {}).get("router") is not None]
+
     def set_lane_headways(self, veh_id, lane_headways):
         """Set the lane headways of the specified vehicle."""
         self.__vehicles[veh_id]["lane_headways"] = lane_headways
@@ -712,246 +1043,52 @@ class TraCIVehicle(KernelVehicle):
         return self.__vehicles.get(veh_id, {}).get("lane_followers", error)
 
     def _multi_lane_headways(self):
-        """Compute multi-lane data for all vehicles.
+        """Compute multi-lane data for all RL vehicles.
 
-        This includes the lane leaders/followers/headways/tailways/
-        leader velocity/follower velocity for all
-        vehicles in the network.
-        """
-        edge_list = self.master_kernel.network.get_edge_list()
-        junction_list = self.master_kernel.network.get_junction_list()
-        tot_list = edge_list + junction_list
-        num_edges = (len(self.master_kernel.network.get_edge_list()) + len(
-            self.master_kernel.network.get_junction_list()))
-
-        # maximum number of lanes in the network
-        max_lanes = max([self.master_kernel.network.num_lanes(edge_id)
-                         for edge_id in tot_list])
-
-        # Key = edge id
-        # Element = list, with the ith element containing tuples with the name
-        #           and position of all vehicles in lane i
-        edge_dict = dict.fromkeys(tot_list)
-
-        # add the vehicles to the edge_dict element
-        for veh_id in self.get_ids():
-            edge = self.get_edge(veh_id)
-            lane = self.get_lane(veh_id)
-            pos = self.get_position(veh_id)
-            if edge:
-                if edge_dict[edge] is None:
-                    edge_dict[edge] = [[] for _ in range(max_lanes)]
-                edge_dict[edge][lane].append((veh_id, pos))
-
-        # sort all lanes in each edge by position
-        for edge in tot_list:
-            if edge_dict[edge] is None:
-                del edge_dict[edge]
-            else:
-                for lane in range(max_lanes):
-                    edge_dict[edge][lane].sort(key=lambda x: x[1])
+        This includes the lane leaders/followers/headways/tailways of all RL
+        vehicles in the network, as well as the ids of the vehicles located on
+        every edge. All vehicles are sorted once by (edge, lane, position),
+        and the lane leaders and followers of all RL vehicles are then
+        computed in a single batch (see MultiLaneHeadways).
 
-        for veh_id in self.get_rl_ids():
-            # collect the lane leaders, followers, headways, and tailways for
-            # each vehicle
-            edge = self.get_edge(veh_id)
-            if edge:
-                headways, tailways, leaders, followers = \
-                    self._multi_lane_headways_util(veh_id, edge_dict,
-                                                   num_edges)
-
-                # add the above values to the vehicles class
-                self.set_lane_headways(veh_id, headways)
-                self.set_lane_tailways(veh_id, tailways)
-                self.set_lane_leaders(veh_id, leaders)
-                self.set_lane_followers(veh_id, followers)
-
-        self._ids_by_edge = dict().fromkeys(edge_list)
-
-        for edge_id in edge_dict:
-            edges = list(itertools.chain.from_iterable(edge_dict[edge_id]))
-            # check for edges with no vehicles
-            if len(edges) > 0:
-                edges, _ = zip(*edges)
-                self._ids_by_edge[edge_id] = list(edges)
-            else:
-                self._ids_by_edge[edge_id] = []
-
-    def _multi_lane_headways_util(self, veh_id, edge_dict, num_edges):
-        """Compute multi-lane data for the specified vehicle.
-
-        Parameters
-        ----------
-        veh_id : str
-            name of the vehicle
-        edge_dict : dict < list<tuple> >
-            Key = Edge name
-                Index = lane index
-                Element = list sorted by position of (vehicle id, position)
-
-        Returns
-        -------
-        headway : list<float>
-            Index = lane index
-            Element = headway at this lane
-        tailway : list<float>
-            Index = lane index
-            Element = tailway at this lane
-        lead_speed : list<str>
-            Index = lane index
-            Element = speed of leader at this lane
-        follow_speed : list<str>
-            Index = lane index
-            Element = speed of follower at this lane
-        leader : list<str>
-            Index = lane index
-            Element = leader at this lane
-        follower : list<str>
-            Index = lane index
-            Element = follower at this lane
+        Lane leaders (followers) that are not located on the vehicle's current
+        edge are searched for in the edges in front of (behind) it.
         """
-        this_pos = self.get_position(veh_id)
-        this_edge = self.get_edge(veh_id)
-        this_lane = self.get_lane(veh_id)
-        num_lanes = self.master_kernel.network.num_lanes(this_edge)
-
-        # set default values for all output values
-        headway = [1000] * num_lanes
-        tailway = [1000] * num_lanes
-        leader = [""] * num_lanes
-        follower = [""] * num_lanes
-
-        for lane in range(num_lanes):
-            # check the vehicle's current  edge for lane leaders and followers
-            if len(edge_dict[this_edge][lane]) > 0:
-                ids, positions = zip(*edge_dict[this_edge][lane])
-                ids = list(ids)
-                positions = list(positions)
-                index = bisect_left(positions, this_pos)
-
-                # if you are at the end or the front of the edge, the lane
-                # leader is in the edges in front of you
-                if (lane == this_lane and index < len(positions) - 1) \
-                        or (lane != this_lane and index < len(positions)):
-                    # check if the index does not correspond to the current
-                    # vehicle
-                    if ids[index] == veh_id:
-                        leader[lane] = ids[index + 1]
-                        headway[lane] = (positions[index + 1] - this_pos -
-                                         self.get_length(leader[lane]))
-                    else:
-                        leader[lane] = ids[index]
-                        headway[lane] = (positions[index] - this_pos
-                                         - self.get_length(leader[lane]))
-
-                # you are in the back of the queue, the lane follower is in the
-                # edges behind you
-                if index > 0:
-                    follower[lane] = ids[index - 1]
-                    tailway[lane] = (this_pos - positions[index - 1]
-                                     - self.get_length(veh_id))
-
-            # if lane leader not found, check next edges
-            if leader[lane] == "":
-                headway[lane], leader[lane] = self._next_edge_leaders(
-                    veh_id, edge_dict, lane, num_edges)
-
-            # if lane follower not found, check previous edges
-            if follower[lane] == "":
-                tailway[lane], follower[lane] = self._prev_edge_followers(
-                    veh_id, edge_dict, lane, num_edges)
-
-        return headway, tailway, leader, follower
-
-    def _next_edge_leaders(self, veh_id, edge_dict, lane, num_edges):
-        """Search for leaders in the next edge.
-
-        Looks to the edges/junctions in front of the vehicle's current edge
-        for potential leaders. This is currently done by only looking one
-        edge/junction forwards.
-
-        Returns
-        -------
-        headway : float
-            lane headway for the specified lane
-        leader : str
-            lane leader for the specified lane
-        """
-        pos = self.get_position(veh_id)
-        edge = self.get_edge(veh_id)
-
-        headway = 1000  # env.network.length
-        leader = ""
-        add_length = 0  # length increment in headway
-
-        for _ in range(num_edges):
-            # break if there are no edge/lane pairs behind the current one
-            if len(self.master_kernel.network.next_edge(edge, lane)) == 0:
-                break
-
-            add_length += self.master_kernel.network.edge_length(edge)
-            edge, lane = self.master_kernel.network.next_edge(edge, lane)[0]
-
-            try:
-                if len(edge_dict[edge][lane]) > 0:
-                    leader = edge_dict[edge][lane][0][0]
-                    headway = edge_dict[edge][lane][0][1] - pos + add_length \
-                        - self.get_length(leader)
-            except KeyError:
-                # current edge has no vehicles, so move on
-                # print(traceback.format_exc())
-                continue
-
-            # stop if a lane follower is found
-            if leader != "":
-                break
-
-        return headway, leader
-
-    def _prev_edge_followers(self, veh_id, edge_dict, lane, num_edges):
-        """Search for followers in the previous edge.
-
-        Looks to the edges/junctions behind the vehicle's current edge for
-        potential followers. This is currently done by only looking one
-        edge/junction backwards.
-
-        Returns
-        -------
-        tailway : float
-            lane tailway for the specified lane
-        follower : str
-            lane follower for the specified lane
-        """
-        pos = self.get_position(veh_id)
-        edge = self.get_edge(veh_id)
-
-        tailway = 1000  # env.network.length
-        follower = ""
-        add_length = 0  # length increment in headway
-
-        for _ in range(num_edges):
-            # break if there are no edge/lane pairs behind the current one
-            if len(self.master_kernel.network.prev_edge(edge, lane)) == 0:
-                break
-
-            edge, lane = self.master_kernel.network.prev_edge(edge, lane)[0]
-            add_length += self.master_kernel.network.edge_length(edge)
-
-            try:
-                if len(edge_dict[edge][lane]) > 0:
-                    tailway = pos - edge_dict[edge][lane][-1][1] + add_length \
-                              - self.get_length(veh_id)
-                    follower = edge_dict[edge][lane][-1][0]
-            except KeyError:
-                # current edge has no vehicles, so move on
-                # print(traceback.format_exc())
-                continue
-
-            # stop if a lane follower is found
-            if follower != "":
-                break
-
-        return tailway, follower
+        columns = self.__columns
+        edge = columns.column("edge")
+        lane = columns.column("lane")
+        pos = columns.column("position")
+
+        engine = self._lane_headways
+        engine.sort(edge, lane, pos)
+
+        # collect the lane leaders, followers, headways, and tailways of every
+        # RL vehicle located on a known edge
+        rl_rows = columns.rows(self.__rl_ids)
+        rl_rows = rl_rows[rl_rows >= 0]
+        rl_rows = rl_rows[edge[rl_rows] >= 0]
+        num_lanes, headways, tailways, leaders, followers = engine.query(
+            rl_rows, edge, lane, pos, columns.column("length"))
+
+        ids = columns.ids
+        for i, row in enumerate(rl_rows):
+            veh_id = ids[row]
+            n = num_lanes[i]
+            self.set_lane_headways(veh_id, headways[i, :n].tolist())
+            self.set_lane_tailways(veh_id, tailways[i, :n].tolist())
+            self.set_lane_leaders(
+                veh_id, ["" if r < 0 else ids[r] for r in leaders[i, :n]])
+            self.set_lane_followers(
+                veh_id, ["" if r < 0 else ids[r] for r in followers[i, :n]])
+
+        # collect the ids of the vehicles on every edge, sorted by lane and
+        # position
+        self._ids_by_edge = dict().fromkeys(
+            self.master_kernel.network.get_edge_list())
+        occupied, rows = engine.edge_partition()
+        for edge_index, edge_rows in zip(occupied, rows):
+            self._ids_by_edge[engine.edge_names[edge_index]] = \
+                [ids[r] for r in edge_rows]
 
     def apply_acceleration(self, veh_ids, acc, smooth=True):
         """See parent class."""
@@ -960,15 +1097,17 @@ class TraCIVehicle(KernelVehicle):
             veh_ids = [veh_ids]
             acc = [acc]
 
-        for i, vid in enumerate(veh_ids):
-            if acc[i] is not None and vid in self.get_ids():
-                self.__vehicles[vid]["accel"] = acc[i]
-                this_vel = self.get_speed(vid)
-                next_vel = max([this_vel + acc[i] * self.sim_step, 0])
-                if smooth:
-                    self.kernel_api.vehicle.slowDown(vid, next_vel, 1e-3)
-                else:
-                    self.kernel_api.vehicle.setSpeed(vid, next_vel)
+        # the commands are sent to sumo in a single message
+        with TraCICommandBuffer(self.kernel_api):
+            for i, vid in enumerate(veh_ids):
+                if acc[i] is not None and vid in self.__id_set:
+                    self.__vehicles[vid]["accel"] = acc[i]
+                    this_vel = self.get_speed(vid)
+                    next_vel = max([this_vel + acc[i] * self.sim_step, 0])
+                    if smooth:
+                        self.kernel_api.vehicle.slowDown(vid, next_vel, 1e-3)
+                    else:
+                        self.kernel_api.vehicle.setSpeed(vid, next_vel)
 
     def apply_lane_change(self, veh_ids, direction):
         """See parent class."""
@@ -982,27 +1121,31 @@ class TraCIVehicle(KernelVehicle):
             raise ValueError(
                 "Direction values for lane changes may only be: -1, 0, or 1.")
 
-        for i, veh_id in enumerate(veh_ids):
-            # check for no lane change
-            if direction[i] == 0:
-                continue
+        rl_ids = set(self.__rl_ids)
 
-            # compute the target lane, and clip it so vehicle don't try to lane
-            # change out of range
-            this_lane = self.get_lane(veh_id)
-            this_edge = self.get_edge(veh_id)
-            target_lane = min(
-                max(this_lane + direction[i], 0),
-                self.master_kernel.network.num_lanes(this_edge) - 1)
+        # the commands are sent to sumo in a single message
+        with TraCICommandBuffer(self.kernel_api):
+            for i, veh_id in enumerate(veh_ids):
+                # check for no lane change
+                if direction[i] == 0:
+                    continue
 
-            # perform the requested lane action action in TraCI
-            if target_lane != this_lane:
-                self.kernel_api.vehicle.changeLane(
-                    veh_id, int(target_lane), self.sim_step)
+                # compute the target lane, and clip it so vehicle don't try to
+                # lane change out of range
+                this_lane = self.get_lane(veh_id)
+                this_edge = self.get_edge(veh_id)
+                target_lane = min(
+                    max(this_lane + direction[i], 0),
+                    self.master_kernel.network.num_lanes(this_edge) - 1)
 
-                if veh_id in self.get_rl_ids():
-                    self.prev_last_lc[veh_id] = \
-                        self.__vehicles[veh_id]["last_lc"]
+                # perform the requested lane action action in TraCI
+                if target_lane != this_lane:
+                    self.kernel_api.vehicle.changeLane(
+                        veh_id, int(target_lane), self.sim_step)
+
+                    if veh_id in rl_ids:
+                        self.prev_last_lc[veh_id] = \
+                            self.__vehicles[veh_id]["last_lc"]
 
     def choose_routes(self, veh_ids, route_choices):
         """See parent class."""
@@ -1011,15 +1154,17 @@ class TraCIVehicle(KernelVehicle):
             veh_ids = [veh_ids]
             route_choices = [route_choices]
 
-        for i, veh_id in enumerate(veh_ids):
-            if route_choices[i] is not None:
-                self.kernel_api.vehicle.setRoute(
-                    vehID=veh_id, edgeList=route_choices[i])
+        # the commands are sent to sumo in a single message
+        with TraCICommandBuffer(self.kernel_api):
+            for i, veh_id in enumerate(veh_ids):
+                if route_choices[i] is not None:
+                    self.kernel_api.vehicle.setRoute(
+                        vehID=veh_id, edgeList=route_choices[i])
 
     def get_x_by_id(self, veh_id):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_x_by_id(vehID) for vehID in veh_id]
+            return self.get_x_array(veh_id).tolist()
         if self.get_edge(veh_id) == '':
             # occurs when a vehicle crashes is teleported for some other reason
             return 0.
@@ -1159,6 +1304,22 @@ class TraCIVehicle(KernelVehicle):
 
         self.__vehicles[veh_id][metric_name] = accel
 
+    def update_accel_array(self, veh_ids, accel, noise=True, failsafe=True):
+        """See parent class."""
+        metric_name = 'accel'
+        if noise:
+            metric_name += '_with_noise'
+        else:
+            metric_name += '_no_noise'
+        if failsafe:
+            metric_name += '_with_falsafe'
+        else:
+            metric_name += '_no_failsafe'
+
+        for veh_id, acc in zip(veh_ids, np.asarray(accel).tolist()):
+            # NaN accelerations (acc != acc) are stored as None
+            self.__vehicles[veh_id][metric_name] = None if acc != acc else acc
+
     def get_realized_accel(self, veh_id):
         """See parent class."""
         if self.get_distance(veh_id) == 0:
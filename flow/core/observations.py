@@ -0,0 +1,159 @@
+"""Utility methods for building observations in preallocated buffers.
+
+The observations of the environments are written into float32 buffers that
+are allocated once (see ObservationBuffer), from the arrays returned by the
+bulk state methods of the vehicle kernel (e.g. `get_speed_array`). This
+avoids collecting the state of the vehicles into Python lists every step.
+"""
+
+import numpy as np
+
+
+class ObservationBuffer(object):
+    """Preallocated float32 buffer in which observations are written.
+
+    An observation is split into named segments, each of which is a view of a
+    contiguous block of the buffer. The segments are filled in place, e.g.
+    with the `out` argument of numpy functions, and the buffer is only
+    reallocated if the layout of the observation changes (for instance, if
+    the number of vehicles in the network changes).
+
+    If a number of rows is specified, the buffer is two-dimensional and every
+    segment spans all rows, which is used to write the observations of
+    several agents at once.
+
+    Note that the buffer is overwritten every time it is allocated. Callers
+    that keep observations across steps must copy them, as is done by
+    Env.step and Env.reset.
+
+    Usage
+    -----
+    >>> obs = ObservationBuffer()
+    >>> state = obs.allocate([("speed", n), ("pos", n)])
+    >>> np.divide(speeds, max_speed, out=obs["speed"])
+    >>> np.divide(positions, length, out=obs["pos"])
+
+    Attributes
+    ----------
+    data : np.ndarray or None
+        the buffer, None until it is first allocated
+    """
+
+    def __init__(self):
+        """Instantiate an empty buffer."""
+        self.data = None
+        self._layout = None
+        self._segments = {}
+
+    def allocate(self, segments, num_rows=None, fill=0.):
+        """Prepare the buffer for a new observation.
+
+        Parameters
+        ----------
+        segments : list of (str, int)
+            name and size of every segment, in the order in which they are
+            stored in the buffer
+        num_rows : int, optional
+            number of rows of a two-dimensional buffer. If not specified, the
+            buffer is one-dimensional.
+        fill : float or None, optional
+            value that the buffer is filled with. If None, the buffer is not
+            cleared, and all its values must be written by the caller.
+
+        Returns
+        -------
+        np.ndarray
+            the buffer, of shape (size,) or (num_rows, size), with size the
+            sum of the sizes of the segments
+        """
+        layout = (tuple(segments), num_rows)
+        if layout != self._layout:
+            size = sum(seg_size for _, seg_size in segments)
+            shape = (size,) if num_rows is None else (num_rows, size)
+            self.data = np.empty(shape, dtype=np.float32)
+            self._layout = layout
+
+            self._segments = {}
+            start = 0
+            for name, seg_size in segments:
+                self._segments[name] = self.data[..., start:start + seg_size]
+                start += seg_size
+
+        if fill is not None:
+            self.data.fill(fill)
+
+        return self.data
+
+    def __getitem__(self, name):
+        """Return the view of the buffer that corresponds to a segment."""
+        return self._segments[name]
+
+
+def lead_follow_observations(env, veh_ids, out):
+    """Write the state of vehicles relative to their leaders and followers.
+
+    The following features are written in every row of `out`:
+
+    * the speed of the vehicle, normalized by the maximum speed of the network
+    * the speed of the leader minus that of the vehicle, normalized by the
+      maximum speed. Missing leaders are assigned the maximum speed.
+    * the bumper-to-bumper distance to the leader, normalized by the length of
+      the network. This distance is computed from the absolute positions of
+      the vehicles, and is set to the length of the network if there is no
+      leader.
+    * the speed of the vehicle minus that of the follower, normalized by the
+      maximum speed. Missing followers are assigned a speed of 0.
+    * the headway of the follower, normalized by the length of the network,
+      which is also the value for missing followers.
+
+    Parameters
+    ----------
+    env : flow.envs.Env
+        the environment variable, which contains information on the current
+        state of the system.
+    veh_ids : list of str
+        the vehicles whose observations are written
+    out : np.ndarray
+        array of shape (len(veh_ids), 5) in which the observations are
+        written
+
+    Returns
+    -------
+    list of str
+        ids of the leaders of the vehicles, if any
+    list of str
+        ids of the followers of the vehicles, if any
+    """
+    veh = env.k.vehicle
+    max_speed = env.k.network.max_speed()
+    max_length = env.k.network.length()
+
+    ids = veh.get_ids()
+    lead = veh.get_leader_index(veh_ids)
+    follow = veh.get_follower_index(veh_ids)
+    has_lead = lead >= 0
+    has_follow = follow >= 0
+    leader_ids = [ids[i] for i in lead[has_lead]]
+    follower_ids = [ids[i] for i in follow[has_follow]]
+
+    all_speeds = veh.get_speed_array()
+    speed = veh.get_speed_array(veh_ids)
+    lead_speed = np.where(has_lead, all_speeds[lead], max_speed)
+    follow_speed = np.where(has_follow, all_speeds[follow], 0)
+
+    # distance to the leaders, from the absolute positions of the vehicles
+    num_veh = len(veh_ids)
+    x = veh.get_x_array(list(veh_ids) + leader_ids)
+    lead_head = np.full(num_veh, max_length, dtype=float)
+    lead_head[has_lead] = x[num_veh:] - x[:num_veh][has_lead] \
+        - veh.get_length_array(veh_ids)[has_lead]
+    follow_head = np.where(
+        has_follow, veh.get_headway_array()[follow], max_length)
+
+    np.divide(speed, max_speed, out=out[:, 0])
+    np.divide(lead_speed - speed, max_speed, out=out[:, 1])
+    np.divide(lead_head, max_length, out=out[:, 2])
+    np.divide(speed - follow_speed, max_speed, out=out[:, 3])
+    np.divide(follow_head, max_length, out=out[:, 4])
+
+    return leader_ids, follower_ids
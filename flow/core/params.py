@@ -411,6 +411,23 @@ class SimParams(object):
         specifies rendering resolution (pixel / meter)
     force_color_update : bool, optional
         whether or not to automatically color vehicles according to their types
+    profile : bool, optional
+        whether to time the different phases of every simulation step (see
+        flow/core/profiler.py). Profiling may also be enabled by setting the
+        FLOW_PROFILE environment variable.
+    render_backend : str, optional
+        renderer used by the "gray", "dgray", "rgb" and "drgb" render modes
+
+        * "pyglet": OpenGL rendering in a pyglet window (requires a display)
+        * "numpy": offscreen rendering with numpy, which does not require a
+          display (see flow/renderer/numpy_renderer.py)
+
+    render_buffer_length : int, optional
+        number of past frames stored by the environment in the "gray",
+        "dgray", "rgb" and "drgb" render modes
+    render_buffer_stride : int, optional
+        number of steps between the frames stored by the environment,
+        defaults to one frame per simulated second
     """
 
     def __init__(self,
@@ -422,7 +439,11 @@ class SimParams(object):
                  sight_radius=25,
                  show_radius=False,
                  pxpm=2,
-                 force_color_update=False):
+                 force_color_update=False,
+                 profile=False,
+                 render_backend="pyglet",
+                 render_buffer_length=5,
+                 render_buffer_stride=None):
         """Instantiate SimParams."""
         self.sim_step = sim_step
         self.render = render
@@ -433,6 +454,10 @@ class SimParams(object):
         self.pxpm = pxpm
         self.show_radius = show_radius
         self.force_color_update = force_color_update
+        self.profile = profile
+        self.render_backend = render_backend
+        self.render_buffer_length = render_buffer_length
+        self.render_buffer_stride = render_buffer_stride
 
 
 class AimsunParams(SimParams):
@@ -490,6 +515,10 @@ class AimsunParams(SimParams):
         Aimsun template containing a subnetwork in order to only load
         the objects contained in this subnetwork. If set to None or if the
         specified subnetwork does not exist, the whole network will be loaded.
+    profile : bool, optional
+        whether to time the different phases of every simulation step (see
+        flow/core/profiler.py). Profiling may also be enabled by setting the
+        FLOW_PROFILE environment variable.
     """
 
     def __init__(self,
@@ -508,11 +537,12 @@ class AimsunParams(SimParams):
                  # set to match Flow_Aimsun.ang's replication name
                  replication_name="Replication 870",
                  centroid_config_name=None,
-                 subnetwork_name=None):
+                 subnetwork_name=None,
+                 profile=False):
         """Instantiate AimsunParams."""
         super(AimsunParams, self).__init__(
             sim_step, render, restart_instance, emission_path, save_render,
-            sight_radius, show_radius, pxpm)
+            sight_radius, show_radius, pxpm, profile=profile)
         self.network_name = network_name
         self.experiment_name = experiment_name
         self.replication_name = replication_name
@@ -588,6 +618,44 @@ class SumoParams(SimParams):
         current time step
     use_ballistic: bool, optional
         If true, use a ballistic integration step instead of an euler step
+    profile : bool, optional
+        whether to time the different phases of every simulation step (see
+        flow/core/profiler.py). Profiling may also be enabled by setting the
+        FLOW_PROFILE environment variable.
+    render_backend : str, optional
+        renderer used by the "gray", "dgray", "rgb" and "drgb" render modes,
+        one of "pyglet" (requires a display) or "numpy" (offscreen)
+    render_buffer_length : int, optional
+        number of past frames stored by the environment in the "gray",
+        "dgray", "rgb" and "drgb" render modes
+    render_buffer_stride : int, optional
+        number of steps between the frames stored by the environment,
+        defaults to one frame per simulated second
+    warm_restart : bool, optional
+        specifies whether to reuse the running sumo instance when the
+        simulation is restarted (see `restart_instance`), by loading the new
+        simulation into it instead of starting a new instance. This avoids
+        the cost of starting sumo and connecting to it with TraCI after
+        every reset. The instance is only reused if the sumo binary, port,
+        and number of clients (which must be 1) are unchanged.
+    bulk_reset : bool, optional
+        specifies whether the initial vehicles are restored from a saved
+        sumo state upon reset. The state is saved the first time the initial
+        vehicles are inserted, and is loaded by the following resets, which
+        replaces all vehicles of the network at once instead of adding them
+        one at a time. The vehicles of network templates are still added
+        after every reset, in a single message to sumo. Note that
+        the routes and the properties sampled by sumo (e.g. speed factors) of
+        the initial vehicles are then the same after every reset, until the
+        initial state of the vehicles changes (e.g. if "shuffle" is set in
+        InitialConfig).
+    runtime_inflows : bool, optional
+        specifies whether the inflows of the network are added by the vehicle
+        kernel during the simulation, instead of being written in the route
+        file. In this case, the inflows may be changed without restarting the
+        simulation, either through the vehicle kernel (see
+        `KernelVehicle.set_inflows`) or by replacing the inflows of the
+        NetParams object, which are applied upon reset.
     """
 
     def __init__(self,
@@ -609,15 +677,26 @@ class SumoParams(SimParams):
                  teleport_time=-1,
                  num_clients=1,
                  color_by_speed=False,
-                 use_ballistic=False):
+                 use_ballistic=False,
+                 profile=False,
+                 render_backend="pyglet",
+                 render_buffer_length=5,
+                 render_buffer_stride=None,
+                 warm_restart=True,
+                 bulk_reset=False,
+                 runtime_inflows=False):
         """Instantiate SumoParams."""
         super(SumoParams, self).__init__(
             sim_step, render, restart_instance, emission_path, save_render,
-            sight_radius, show_radius, pxpm, force_color_update)
+            sight_radius, show_radius, pxpm, force_color_update, profile,
+            render_backend, render_buffer_length, render_buffer_stride)
         self.port = port
         self.lateral_resolution = lateral_resolution
         self.no_step_log = no_step_log
         self.seed = seed
+        self.warm_restart = warm_restart
+        self.bulk_reset = bulk_reset
+        self.runtime_inflows = runtime_inflows
         self.overtake_right = overtake_right
         self.print_warnings = print_warnings
         self.teleport_time = teleport_time
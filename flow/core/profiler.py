@@ -0,0 +1,303 @@
+"""Low-overhead timers for the different phases of a simulation step.
+
+The profiler aggregates the time spent in every phase of `Env.step` (e.g.
+computing the actions of the controllers, advancing the simulation, or
+computing the reward) into histograms, which can be exported as JSON files
+and compared between runs. The individual timings can also be exported in
+the Chrome trace format, and inspected in chrome://tracing or Perfetto.
+
+Profiling is disabled by default. It is enabled by setting `profile=True` in
+the simulation parameters, or by setting the FLOW_PROFILE environment
+variable to a non-empty value other than "0".
+
+Usage
+-----
+>>> profiler = StepProfiler(enabled=True)
+>>> with profiler.phase("simulation_step"):
+...     env.k.simulation.simulation_step()
+>>> profiler.save("profile.json")
+>>> profiler.save("trace.json", trace=True)
+"""
+
+import bisect
+import json
+import os
+import time
+
+import numpy as np
+
+# upper edges of the bins of the histograms, in seconds (four bins per decade
+# between one microsecond and ten seconds)
+HISTOGRAM_BINS = tuple(10 ** (k / 4) for k in range(-24, 5))
+
+
+def profiling_enabled(sim_params=None):
+    """Return whether profiling is requested.
+
+    Parameters
+    ----------
+    sim_params : flow.core.params.SimParams, optional
+        simulation parameters, whose `profile` attribute enables profiling
+
+    Returns
+    -------
+    bool
+        True if either the simulation parameters or the FLOW_PROFILE
+        environment variable enable profiling
+    """
+    if getattr(sim_params, "profile", False):
+        return True
+    return os.environ.get("FLOW_PROFILE", "") not in ("", "0")
+
+
+class _NullTimer(object):
+    """Timer that does nothing, used when profiling is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _PhaseTimer(object):
+    """Timer measuring a single execution of a phase."""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class PhaseStats(object):
+    """Aggregated timings of a phase.
+
+    Attributes
+    ----------
+    count : int
+        number of times the phase was executed
+    total : float
+        total time spent in the phase, in seconds
+    min : float
+        shortest execution of the phase, in seconds
+    max : float
+        longest execution of the phase, in seconds
+    histogram : list of int
+        number of executions that lasted at most HISTOGRAM_BINS[i] seconds
+        (and more than HISTOGRAM_BINS[i-1] seconds). The last element counts
+        the executions longer than the last bin.
+    """
+
+    __slots__ = ("count", "total", "min", "max", "histogram")
+
+    def __init__(self):
+        """Instantiate empty statistics."""
+        self.count = 0
+        self.total = 0.
+        self.min = float("inf")
+        self.max = 0.
+        self.histogram = [0] * (len(HISTOGRAM_BINS) + 1)
+
+    def add(self, duration):
+        """Add a single execution of the phase."""
+        self.count += 1
+        self.total += duration
+        if duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+        self.histogram[bisect.bisect_left(HISTOGRAM_BINS, duration)] += 1
+
+    def percentile(self, q):
+        """Return an estimate of a percentile of the durations.
+
+        The estimate is the upper edge of the histogram bin that contains the
+        percentile, clipped to the range of observed durations.
+
+        Parameters
+        ----------
+        q : float
+            percentile, between 0 and 100
+
+        Returns
+        -------
+        float
+            estimated percentile, in seconds
+        """
+        if self.count == 0:
+            return 0.
+        index = int(np.searchsorted(
+            np.cumsum(self.histogram), q / 100 * self.count))
+        upper = HISTOGRAM_BINS[index] if index < len(HISTOGRAM_BINS) \
+            else self.max
+        return min(max(upper, self.min), self.max)
+
+    def to_dict(self):
+        """Return the statistics as a JSON-serializable dict."""
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count > 0 else 0.,
+            "min": self.min if self.count > 0 else 0.,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "histogram": self.histogram,
+        }
+
+
+class StepProfiler(object):
+    """Profiler of the phases of the simulation steps.
+
+    Attributes
+    ----------
+    enabled : bool
+        whether timings are recorded. If disabled, `phase` returns a timer
+        that does nothing.
+    stats : dict <str, PhaseStats>
+        aggregated timings of every phase, keyed by the name of the phase
+    events : list of tuple
+        (name, start, end) of the most recent executions of the phases, used
+        to generate Chrome traces
+    max_events : int
+        maximum number of events that are stored. Events that exceed this
+        number are only included in the aggregated timings.
+    """
+
+    def __init__(self, enabled=False, max_events=100000):
+        """Instantiate the profiler.
+
+        Parameters
+        ----------
+        enabled : bool, optional
+            whether timings are recorded
+        max_events : int, optional
+            maximum number of events stored for Chrome traces
+        """
+        self.enabled = enabled
+        self.max_events = max_events
+        self.stats = {}
+        self.events = []
+        self._origin = time.perf_counter()
+
+    def phase(self, name):
+        """Return a context manager that times a phase of the step.
+
+        Parameters
+        ----------
+        name : str
+            name of the phase. Sub-phases are typically named as
+            "<phase>.<sub-phase>" (e.g. "update.vehicle").
+
+        Returns
+        -------
+        context manager
+            timer of the phase
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _PhaseTimer(self, name)
+
+    def record(self, name, start, end):
+        """Record a single execution of a phase.
+
+        Parameters
+        ----------
+        name : str
+            name of the phase
+        start : float
+            time the phase started, as returned by time.perf_counter
+        end : float
+            time the phase ended, as returned by time.perf_counter
+        """
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = PhaseStats()
+        stats.add(end - start)
+
+        if len(self.events) < self.max_events:
+            self.events.append((name, start, end))
+
+    def reset(self):
+        """Remove all recorded timings."""
+        self.stats = {}
+        self.events = []
+        self._origin = time.perf_counter()
+
+    def summary(self):
+        """Return the aggregated timings of every phase.
+
+        Returns
+        -------
+        dict
+            JSON-serializable dict containing the bins of the histograms, and
+            the statistics of every phase (see PhaseStats.to_dict)
+        """
+        return {
+            "histogram_bins": list(HISTOGRAM_BINS),
+            "phases": {name: self.stats[name].to_dict()
+                       for name in sorted(self.stats)},
+        }
+
+    def chrome_trace(self):
+        """Return the recorded events in the Chrome trace format.
+
+        Returns
+        -------
+        dict
+            JSON-serializable trace, with one complete ("X") event per
+            recorded execution of a phase
+        """
+        pid = os.getpid()
+        return {
+            "traceEvents": [{
+                "name": name,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": pid,
+                "tid": 0,
+            } for name, start, end in self.events],
+            "displayTimeUnit": "ms",
+        }
+
+    def save(self, path, trace=False):
+        """Save the recorded timings to a JSON file.
+
+        Parameters
+        ----------
+        path : str
+            path to the output file
+        trace : bool, optional
+            whether to save the individual events in the Chrome trace format
+            instead of the aggregated timings
+        """
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace() if trace else self.summary(), f)
+
+    def report(self):
+        """Return a table of the mean and total time spent in every phase."""
+        lines = ["{:<28}{:>10}{:>14}{:>14}{:>12}".format(
+            "phase", "count", "mean (ms)", "p99 (ms)", "total (s)")]
+        for name in sorted(self.stats):
+            stats = self.stats[name]
+            lines.append("{:<28}{:>10}{:>14.4f}{:>14.4f}{:>12.3f}".format(
+                name, stats.count, 1e3 * stats.total / stats.count,
+                1e3 * stats.percentile(99), stats.total))
+        return "\n".join(lines)
@@ -1,7 +1,32 @@
-"""A series of reward functions."""
+"""A series of reward functions.
+
+The functions in this module collect the state of the vehicles from the
+environment, and compute the rewards with the array-based implementations in
+flow.core.vectorized_rewards.
+
+The state of all vehicles in the network, as well as the rewards that do not
+depend on any particular vehicle, are cached in the kernel's metrics (see
+flow.core.kernel.metrics.StepMetrics) until the next simulation step. Reward
+functions can therefore be called once per RL vehicle (e.g. in multi-agent
+environments) without collecting the state of the network every time.
+"""
 
 import numpy as np
 
+from flow.core import vectorized_rewards as vr
+from flow.core.vectorized_rewards import RewardState
+
+
+def _step_state(env, veh_ids=None):
+    """Return the state of a set of vehicles at the current time step.
+
+    The state of all vehicles (veh_ids=None) is shared by all the reward
+    functions called during a time step.
+    """
+    if veh_ids is None:
+        return env.k.metrics.cached("reward_state", lambda: RewardState(env))
+    return RewardState(env, veh_ids)
+
 
 def desired_velocity(env, fail=False, edge_list=None):
     r"""Encourage proximity to a desired velocity.
@@ -35,28 +60,17 @@ def desired_velocity(env, fail=False, edge_list=None):
     float
         reward value
     """
-    if edge_list is None:
-        veh_ids = env.k.vehicle.get_ids()
-    else:
-        veh_ids = env.k.vehicle.get_ids_by_edge(edge_list)
-
-    vel = np.array(env.k.vehicle.get_speed(veh_ids))
-    num_vehicles = len(veh_ids)
-
-    if any(vel < -100) or fail or num_vehicles == 0:
+    if fail:
         return 0.
 
     target_vel = env.env_params.additional_params['target_velocity']
-    max_cost = np.array([target_vel] * num_vehicles)
-    max_cost = np.linalg.norm(max_cost)
-
-    cost = vel - target_vel
-    cost = np.linalg.norm(cost)
-
-    # epsilon term (to deal with ZeroDivisionError exceptions)
-    eps = np.finfo(np.float32).eps
+    if edge_list is None:
+        return env.k.metrics.cached(
+            ("desired_velocity", target_vel), lambda: vr.desired_velocity(
+                _step_state(env).speed, target_vel))
 
-    return max(max_cost - cost, 0) / (max_cost + eps)
+    state = RewardState(env, env.k.vehicle.get_ids_by_edge(edge_list))
+    return vr.desired_velocity(state.speed, target_vel)
 
 
 def average_velocity(env, fail=False):
@@ -78,14 +92,10 @@ def average_velocity(env, fail=False):
     float
         reward value
     """
-    vel = np.array(env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
-
-    if any(vel < -100) or fail:
-        return 0.
-    if len(vel) == 0:
+    if fail:
         return 0.
-
-    return np.mean(vel)
+    return env.k.metrics.cached("average_velocity", lambda: vr.
+                                average_velocity(_step_state(env).speed))
 
 
 def rl_forward_progress(env, gain=0.1):
@@ -131,21 +141,8 @@ def min_delay(env):
     float
         reward value
     """
-    vel = np.array(env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
-
-    vel = vel[vel >= -1e-6]
-    v_top = max(
-        env.k.network.speed_limit(edge)
-        for edge in env.k.network.get_edge_list())
-    time_step = env.sim_step
-
-    max_cost = time_step * sum(vel.shape)
-
-    # epsilon term (to deal with ZeroDivisionError exceptions)
-    eps = np.finfo(np.float32).eps
-
-    cost = time_step * sum((v_top - vel) / v_top)
-    return max((max_cost - cost) / (max_cost + eps), 0)
+    state = _step_state(env)
+    return vr.min_delay(state.speed, state.max_speed, state.sim_step)
 
 
 def avg_delay_specified_vehicles(env, veh_ids):
@@ -163,18 +160,16 @@ def avg_delay_specified_vehicles(env, veh_ids):
     float
         average delay
     """
-    sum = 0
-    for edge in env.k.network.get_edge_list():
-        for veh_id in env.k.vehicle.get_ids_by_edge(edge):
-            v_top = env.k.network.speed_limit(edge)
-            sum += (v_top - env.k.vehicle.get_speed(veh_id)) / v_top
-    time_step = env.sim_step
-    try:
-        cost = time_step * sum
-        return cost / len(veh_ids)
-    except ZeroDivisionError:
+    if len(veh_ids) == 0:
         return 0
 
+    # the delay is computed over all vehicles located on edges of the network
+    state = _step_state(env)
+    on_edge = state.on_edge
+    cost = vr.total_delay(
+        state.speed[on_edge], state.speed_limit[on_edge], state.sim_step)
+    return cost / len(veh_ids)
+
 
 def min_delay_unscaled(env):
     """Return the average delay for all vehicles in the system.
@@ -190,19 +185,9 @@ def min_delay_unscaled(env):
     float
         reward value
     """
-    vel = np.array(env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
-
-    vel = vel[vel >= -1e-6]
-    v_top = max(
-        env.k.network.speed_limit(edge)
-        for edge in env.k.network.get_edge_list())
-    time_step = env.sim_step
-
-    # epsilon term (to deal with ZeroDivisionError exceptions)
-    eps = np.finfo(np.float32).eps
-
-    cost = time_step * sum((v_top - vel) / v_top)
-    return cost / (env.k.vehicle.num_vehicles + eps)
+    state = _step_state(env)
+    return vr.min_delay_unscaled(state.speed, state.max_speed, state.sim_step,
+                                 env.k.vehicle.num_vehicles)
 
 
 def penalize_standstill(env, gain=1):
@@ -225,11 +210,7 @@ def penalize_standstill(env, gain=1):
     float
         reward value
     """
-    veh_ids = env.k.vehicle.get_ids()
-    vel = np.array(env.k.vehicle.get_speed(veh_ids))
-    num_standstill = len(vel[vel == 0])
-    penalty = gain * num_standstill
-    return -penalty
+    return vr.penalize_standstill(_step_state(env).speed, gain)
 
 
 def penalize_near_standstill(env, thresh=0.3, gain=1):
@@ -249,11 +230,7 @@ def penalize_near_standstill(env, thresh=0.3, gain=1):
     gain : float
         multiplicative factor on the action penalty
     """
-    veh_ids = env.k.vehicle.get_ids()
-    vel = np.array(env.k.vehicle.get_speed(veh_ids))
-    penalize = len(vel[vel < thresh])
-    penalty = gain * penalize
-    return -penalty
+    return vr.penalize_near_standstill(_step_state(env).speed, thresh, gain)
 
 
 def penalize_headway_variance(vehicles,
@@ -277,11 +254,9 @@ def penalize_headway_variance(vehicles,
     penalty_exponent : float, optional
         used to allow exponential punishing of smaller headways
     """
-    headways = penalty_gain * np.power(
-        np.array(
-            [vehicles.get_headway(veh_id) / normalization
-             for veh_id in vids]), penalty_exponent)
-    return -np.var(headways)
+    headways = np.array(vehicles.get_headway(list(vids)), dtype=float)
+    return vr.headway_variance(
+        headways, normalization, penalty_gain, penalty_exponent)
 
 
 def punish_rl_lane_changes(env, penalty=1):
@@ -313,23 +288,9 @@ def energy_consumption(env, gain=.001):
     The power calculated here is the lower bound of the actual power consumed
     by a vehicle.
     """
-    power = 0
-
-    M = 1200  # mass of average sized vehicle (kg)
-    g = 9.81  # gravitational acceleration (m/s^2)
-    Cr = 0.005  # rolling resistance coefficient
-    Ca = 0.3  # aerodynamic drag coefficient
-    rho = 1.225  # air density (kg/m^3)
-    A = 2.6  # vehicle cross sectional area (m^2)
-    for veh_id in env.k.vehicle.get_ids():
-        speed = env.k.vehicle.get_speed(veh_id)
-        prev_speed = env.k.vehicle.get_previous_speed(veh_id)
-
-        accel = abs(speed - prev_speed) / env.sim_step
-
-        power += M * speed * accel + M * g * Cr * speed + 0.5 * rho * A * Ca * speed ** 3
-
-    return -gain * power
+    state = _step_state(env)
+    return vr.energy_consumption(
+        state.speed, state.prev_speed, state.sim_step, gain)
 
 
 def veh_energy_consumption(env, veh_id, gain=.001):
@@ -339,22 +300,9 @@ def veh_energy_consumption(env, veh_id, gain=.001):
     The power calculated here is the lower bound of the actual power consumed
     by a vehicle.
     """
-    power = 0
-
-    M = 1200  # mass of average sized vehicle (kg)
-    g = 9.81  # gravitational acceleration (m/s^2)
-    Cr = 0.005  # rolling resistance coefficient
-    Ca = 0.3  # aerodynamic drag coefficient
-    rho = 1.225  # air density (kg/m^3)
-    A = 2.6  # vehicle cross sectional area (m^2)
     speed = env.k.vehicle.get_speed(veh_id)
     prev_speed = env.k.vehicle.get_previous_speed(veh_id)
-
-    accel = abs(speed - prev_speed) / env.sim_step
-
-    power += M * speed * accel + M * g * Cr * speed + 0.5 * rho * A * Ca * speed ** 3
-
-    return -gain * power
+    return -gain * vr.power(speed, prev_speed, env.sim_step)
 
 
 def miles_per_megajoule(env, veh_ids=None, gain=.001):
@@ -374,29 +322,11 @@ def miles_per_megajoule(env, veh_ids=None, gain=.001):
     gain : float
         scaling factor for the reward
     """
-    mpj = 0
-    counter = 0
-    if veh_ids is None:
-        veh_ids = env.k.vehicle.get_ids()
-    elif not isinstance(veh_ids, list):
+    if veh_ids is not None and not isinstance(veh_ids, list):
         veh_ids = [veh_ids]
-    for veh_id in veh_ids:
-        speed = env.k.vehicle.get_speed(veh_id)
-        # convert to be positive since the function called is a penalty
-        power = -veh_energy_consumption(env, veh_id, gain=1.0)
-        if power > 0 and speed >= 0.0:
-            counter += 1
-            # meters / joule is (v * \delta t) / (power * \delta t)
-            mpj += speed / power
-    if counter > 0:
-        mpj /= counter
-
-    # convert from meters per joule to miles per joule
-    mpj /= 1609.0
-    # convert from miles per joule to miles per megajoule
-    mpj *= 10**6
-
-    return mpj * gain
+    state = _step_state(env, veh_ids)
+    return vr.miles_per_megajoule(
+        state.speed, state.prev_speed, state.sim_step, gain)
 
 
 def miles_per_gallon(env, veh_ids=None, gain=.001):
@@ -416,23 +346,7 @@ def miles_per_gallon(env, veh_ids=None, gain=.001):
     gain : float
         scaling factor for the reward
     """
-    mpg = 0
-    counter = 0
-    if veh_ids is None:
-        veh_ids = env.k.vehicle.get_ids()
-    elif not isinstance(veh_ids, list):
+    if veh_ids is not None and not isinstance(veh_ids, list):
         veh_ids = [veh_ids]
-    for veh_id in veh_ids:
-        speed = env.k.vehicle.get_speed(veh_id)
-        gallons_per_s = env.k.vehicle.get_fuel_consumption(veh_id)
-        if gallons_per_s > 0 and speed >= 0.0:
-            counter += 1
-            # meters / gallon is (v * \delta t) / (gallons_per_s * \delta t)
-            mpg += speed / gallons_per_s
-    if counter > 0:
-        mpg /= counter
-
-    # convert from meters per gallon to miles per gallon
-    mpg /= 1609.0
-
-    return mpg * gain
+    state = _step_state(env, veh_ids)
+    return vr.miles_per_gallon(state.speed, state.fuel, gain)
@@ -2,9 +2,13 @@
 
 import csv
 import errno
+import heapq
 import os
+import shutil
+import tempfile
+from contextlib import ExitStack
+import numpy as np
 from lxml import etree
-from xml.etree import ElementTree
 
 
 def makexml(name, nsl):
@@ -32,13 +36,65 @@ def ensure_dir(path):
     return path
 
 
-def emission_to_csv(emission_path, output_path=None):
+# columns of the csv files generated from sumo emission files. Every element
+# consists of the name of the column, the attribute of the vehicle element in
+# the emission file it is computed from, and the type of the column.
+EMISSION_XML_COLUMNS = (
+    ('time', None, float),
+    ('CO', 'CO', float),
+    ('y', 'y', float),
+    ('CO2', 'CO2', float),
+    ('electricity', 'electricity', float),
+    ('type', 'type', str),
+    ('id', 'id', str),
+    ('eclass', 'eclass', str),
+    ('waiting', 'waiting', float),
+    ('NOx', 'NOx', float),
+    ('fuel', 'fuel', float),
+    ('HC', 'HC', float),
+    ('x', 'x', float),
+    ('route', 'route', str),
+    ('relative_position', 'pos', float),
+    ('noise', 'noise', float),
+    ('angle', 'angle', float),
+    ('PMx', 'PMx', float),
+    ('speed', 'speed', float),
+    ('edge_id', 'lane', str),
+    ('lane_number', 'lane', int),
+)
+
+# maximum number of sorted temporary files that are merged at once when
+# emission files are converted to csv files sorted by vehicle id
+MAX_MERGED_RUNS = 64
+
+
+def emission_to_csv(emission_path,
+                    output_path=None,
+                    columns=None,
+                    start_time=None,
+                    end_time=None,
+                    output_format='csv',
+                    sort_by_id=True,
+                    batch_size=100000):
     """Convert an emission file generated by sumo into a csv file.
 
     Note that the emission file contains information generated by sumo, not
     flow. This means that some data, such as absolute position, is not
     immediately available from the emission file, but can be recreated.
 
+    The emission file is parsed incrementally, one time step at a time, and
+    the parsed data is stored in typed numpy arrays, so that large emission
+    files can be converted without loading the entire xml tree into memory.
+    Vehicles missing any of the requested attributes are skipped.
+
+    Csv files are generated with memory proportional to `batch_size`. If the
+    rows are sorted by vehicle id, every batch of rows is sorted and written
+    to a temporary file in the directory of the output file, and the
+    temporary files are then merged, which requires additional disk space
+    about the size of the output file. The npz and parquet formats are
+    instead built in memory, which requires memory proportional to the size
+    of the generated file.
+
     Parameters
     ----------
     emission_path : str
@@ -46,54 +102,200 @@ def emission_to_csv(emission_path, output_path=None):
     output_path : str
         path to the csv file that will be generated, default is the same
         directory as the emission file, with the same name
+    columns : list of str, optional
+        names of the columns to store (see EMISSION_XML_COLUMNS), defaults to
+        all columns
+    start_time : float, optional
+        time (in seconds) of the first time step to store, defaults to the
+        start of the emission file
+    end_time : float, optional
+        time (in seconds) of the last time step to store, defaults to the end
+        of the emission file
+    output_format : str, optional
+        format of the generated file, one of:
+
+        * "csv": a csv file with a header
+        * "npz": a numpy .npz archive with one array per column
+        * "parquet": a parquet file (requires pandas and pyarrow)
+    sort_by_id : bool, optional
+        whether to sort the rows by vehicle id (the order of the time steps
+        of a given vehicle is preserved). If set to False, csv files are
+        written while the emission file is parsed, and rows are sorted by
+        time.
+    batch_size : int, optional
+        number of rows that are parsed before being converted to arrays (and
+        written to disk if the output is a csv file)
+
+    Returns
+    -------
+    str
+        path to the generated file
+
+    Raises
+    ------
+    ValueError
+        if the output format or one of the columns is not valid
     """
-    parser = etree.XMLParser(recover=True)
-    tree = ElementTree.parse(emission_path, parser=parser)
-    root = tree.getroot()
-
-    # parse the xml data into a dict
-    out_data = []
-    for time in root.findall('timestep'):
-        t = float(time.attrib['time'])
-
-        for car in time:
-            out_data.append(dict())
-            try:
-                out_data[-1]['time'] = t
-                out_data[-1]['CO'] = float(car.attrib['CO'])
-                out_data[-1]['y'] = float(car.attrib['y'])
-                out_data[-1]['CO2'] = float(car.attrib['CO2'])
-                out_data[-1]['electricity'] = float(car.attrib['electricity'])
-                out_data[-1]['type'] = car.attrib['type']
-                out_data[-1]['id'] = car.attrib['id']
-                out_data[-1]['eclass'] = car.attrib['eclass']
-                out_data[-1]['waiting'] = float(car.attrib['waiting'])
-                out_data[-1]['NOx'] = float(car.attrib['NOx'])
-                out_data[-1]['fuel'] = float(car.attrib['fuel'])
-                out_data[-1]['HC'] = float(car.attrib['HC'])
-                out_data[-1]['x'] = float(car.attrib['x'])
-                out_data[-1]['route'] = car.attrib['route']
-                out_data[-1]['relative_position'] = float(car.attrib['pos'])
-                out_data[-1]['noise'] = float(car.attrib['noise'])
-                out_data[-1]['angle'] = float(car.attrib['angle'])
-                out_data[-1]['PMx'] = float(car.attrib['PMx'])
-                out_data[-1]['speed'] = float(car.attrib['speed'])
-                out_data[-1]['edge_id'] = car.attrib['lane'].rpartition('_')[0]
-                out_data[-1]['lane_number'] = car.attrib['lane'].\
-                    rpartition('_')[-1]
-            except KeyError:
-                del out_data[-1]
-
-    # sort the elements of the dictionary by the vehicle id
-    out_data = sorted(out_data, key=lambda k: k['id'])
+    if output_format not in ('csv', 'npz', 'parquet'):
+        raise ValueError('Unknown output format: {}'.format(output_format))
+
+    specs = {name: (attr, dtype) for name, attr, dtype in EMISSION_XML_COLUMNS}
+    if columns is None:
+        columns = [name for name, _, _ in EMISSION_XML_COLUMNS]
+    for name in columns:
+        if name not in specs:
+            raise ValueError('Unknown emission column: {}'.format(name))
+
+    # the id column is needed to sort the rows
+    parsed_columns = list(columns)
+    if sort_by_id and 'id' not in parsed_columns:
+        parsed_columns.append('id')
 
     # default output path
     if output_path is None:
-        output_path = emission_path[:-3] + 'csv'
-
-    # output the dict data into a csv file
-    keys = out_data[0].keys()
-    with open(output_path, 'w') as output_file:
-        dict_writer = csv.DictWriter(output_file, keys)
-        dict_writer.writeheader()
-        dict_writer.writerows(out_data)
+        output_path = emission_path[:-3] + output_format
+
+    chunks = _iter_emission_chunks(emission_path, parsed_columns, specs,
+                                   start_time, end_time, batch_size)
+
+    # csv files are written while parsing if the rows do not need sorting,
+    # and are otherwise sorted one batch at a time and merged
+    if output_format == 'csv':
+        if sort_by_id:
+            _write_sorted_csv(chunks, output_path, columns)
+        else:
+            with open(output_path, 'w') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for chunk in chunks:
+                    writer.writerows(zip(*[chunk[name].tolist()
+                                           for name in columns]))
+        return output_path
+
+    chunks = list(chunks)
+    data = {name: np.concatenate([chunk[name] for chunk in chunks])
+            if len(chunks) > 0 else np.array([], dtype=specs[name][1])
+            for name in parsed_columns}
+
+    # sort the elements of the data by the vehicle id
+    if sort_by_id:
+        order = np.argsort(data['id'], kind='stable')
+        data = {name: data[name][order] for name in columns}
+
+    if output_format == 'npz':
+        # np.savez appends the extension if it is missing
+        with open(output_path, 'wb') as f:
+            np.savez(f, **data)
+    else:
+        import pandas as pd
+        pd.DataFrame(data, columns=columns).to_parquet(output_path)
+
+    return output_path
+
+
+def _write_sorted_csv(chunks, output_path, columns):
+    """Write the rows of an emission file to a csv file, sorted by vehicle id.
+
+    Every chunk of rows is sorted by vehicle id, and written to a temporary
+    csv file (a sorted run) whose first column is the id. The runs are then
+    merged, at most MAX_MERGED_RUNS files at a time. Both the sort and the
+    merge are stable, so the rows of a given vehicle remain sorted by time.
+    """
+    tmp_dir = tempfile.mkdtemp(
+        dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        runs = []
+        for chunk in chunks:
+            order = np.argsort(chunk['id'], kind='stable')
+            runs.append(os.path.join(tmp_dir, 'run{}.csv'.format(len(runs))))
+            with open(runs[-1], 'w', newline='') as f:
+                csv.writer(f).writerows(zip(
+                    chunk['id'][order].tolist(),
+                    *[chunk[name][order].tolist() for name in columns]))
+
+        # merge consecutive runs until they can be merged at once
+        num_merged = 0
+        while len(runs) > MAX_MERGED_RUNS:
+            merged_runs = []
+            for i in range(0, len(runs), MAX_MERGED_RUNS):
+                path = os.path.join(tmp_dir, 'merged{}.csv'.format(num_merged))
+                num_merged += 1
+                with open(path, 'w', newline='') as f:
+                    _merge_sorted_runs(
+                        runs[i:i + MAX_MERGED_RUNS], csv.writer(f), True)
+                merged_runs.append(path)
+            for path in runs:
+                os.remove(path)
+            runs = merged_runs
+
+        with open(output_path, 'w') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            _merge_sorted_runs(runs, writer, False)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def _merge_sorted_runs(paths, writer, keep_id):
+    """Merge csv files sorted by their first column into a csv writer.
+
+    The first column is only written if keep_id is set to True.
+    """
+    with ExitStack() as stack:
+        readers = [csv.reader(stack.enter_context(open(path, newline='')))
+                   for path in paths]
+        for row in heapq.merge(*readers, key=lambda row: row[0]):
+            writer.writerow(row if keep_id else row[1:])
+
+
+def _iter_emission_chunks(emission_path, columns, specs, start_time,
+                          end_time, batch_size):
+    """Yield the typed data of an emission file, batch_size rows at a time.
+
+    The time steps of the emission file are parsed one at a time, and cleared
+    once they are processed.
+    """
+    attrs = [(name,) + specs[name] for name in columns]
+    required = {attr for _, attr, _ in attrs if attr is not None}
+    values = {name: [] for name in columns}
+    num_rows = 0
+
+    context = etree.iterparse(
+        emission_path, events=('end',), tag='timestep', recover=True)
+    for _, timestep in context:
+        t = float(timestep.attrib['time'])
+        if end_time is not None and t > end_time:
+            break
+
+        if start_time is None or t >= start_time:
+            for car in timestep:
+                attrib = car.attrib
+                if not required.issubset(attrib.keys()):
+                    continue
+                for name, attr, _ in attrs:
+                    if attr is None:
+                        values[name].append(t)
+                    elif name == 'edge_id':
+                        values[name].append(attrib[attr].rpartition('_')[0])
+                    elif name == 'lane_number':
+                        values[name].append(attrib[attr].rpartition('_')[-1])
+                    else:
+                        values[name].append(attrib[attr])
+                num_rows += 1
+
+        # free the memory used by the parsed elements
+        timestep.clear()
+        while timestep.getprevious() is not None:
+            del timestep.getparent()[0]
+
+        if num_rows >= batch_size:
+            yield {name: np.array(values[name], dtype=dtype)
+                   for name, _, dtype in attrs}
+            values = {name: [] for name in columns}
+            num_rows = 0
+
+    del context
+
+    if num_rows > 0:
+        yield {name: np.array(values[name], dtype=dtype)
+               for name, _, dtype in attrs}
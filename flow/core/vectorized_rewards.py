@@ -0,0 +1,405 @@
+"""Array-based implementations of the reward functions in flow.core.rewards.
+
+The functions in this module operate on arrays containing the state of all
+vehicles at a given time step (e.g. their speeds), rather than on the
+environment. The arrays are typically collected once per step through a
+RewardState object, which queries the vehicle kernel for every column only
+when it is first needed, and may then be shared by several reward functions.
+
+Usage
+-----
+>>> state = RewardState(env)
+>>> min_delay(state.speed, state.max_speed, state.sim_step)
+>>> energy_consumption(state.speed, state.prev_speed, state.sim_step)
+"""
+
+import numpy as np
+
+# epsilon term (to deal with ZeroDivisionError exceptions)
+EPS = np.finfo(np.float32).eps
+
+# parameters of the energy model, which assumes an average sized vehicle
+M = 1200  # mass of average sized vehicle (kg)
+G = 9.81  # gravitational acceleration (m/s^2)
+CR = 0.005  # rolling resistance coefficient
+CA = 0.3  # aerodynamic drag coefficient
+RHO = 1.225  # air density (kg/m^3)
+A = 2.6  # vehicle cross sectional area (m^2)
+
+
+class RewardState(object):
+    """Snapshot of the vehicle data used to compute rewards at a time step.
+
+    Every column is collected from the kernel the first time it is accessed,
+    and then stored for the remainder of the snapshot's lifetime. A new
+    snapshot should therefore be created at every time step.
+
+    Attributes
+    ----------
+    env : flow.envs.Env
+        the environment the data is collected from
+    veh_ids : list of str or None
+        ids of the vehicles in the snapshot. None means all vehicles in the
+        network, in the order of `get_ids()`.
+    sim_step : float
+        simulation step size
+    """
+
+    def __init__(self, env, veh_ids=None):
+        """Instantiate the snapshot.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the environment the data is collected from
+        veh_ids : list of str, optional
+            ids of the vehicles in the snapshot, defaults to all vehicles
+        """
+        self.env = env
+        self.veh_ids = veh_ids
+        self.sim_step = env.sim_step
+        self._columns = {}
+
+    def _column(self, name, func):
+        if name not in self._columns:
+            self._columns[name] = func()
+        return self._columns[name]
+
+    @property
+    def num_vehicles(self):
+        """Return the number of vehicles in the snapshot."""
+        return len(self.speed)
+
+    @property
+    def speed(self):
+        """Return the speed of every vehicle (-1001 if not available)."""
+        return self._column("speed", lambda: self.env.k.vehicle.
+                            get_speed_array(self.veh_ids, error=-1001))
+
+    @property
+    def prev_speed(self):
+        """Return the speed of every vehicle at the previous step."""
+        return self._column("prev_speed", lambda: np.array(
+            self.env.k.vehicle.get_previous_speed(self._ids()), dtype=float))
+
+    @property
+    def fuel(self):
+        """Return the fuel consumption of every vehicle (in gallons/s)."""
+        return self._column("fuel", lambda: np.array(
+            self.env.k.vehicle.get_fuel_consumption(self._ids()),
+            dtype=float))
+
+    @property
+    def edge(self):
+        """Return the edge index of every vehicle.
+
+        Edges are indexed by their position in the network kernel's
+        `get_edge_list() + get_junction_list()`, and unknown edges by -1.
+        """
+        return self._column("edge", lambda: np.asarray(
+            self.env.k.vehicle.get_edge_index(self.veh_ids)))
+
+    @property
+    def on_edge(self):
+        """Return whether every vehicle is on an edge (not a junction)."""
+        return self._column("on_edge", lambda: (self.edge >= 0) & (
+            self.edge < len(self.env.k.network.get_edge_list())))
+
+    @property
+    def speed_limit(self):
+        """Return the speed limit at the position of every vehicle.
+
+        Vehicles located on unknown edges are assigned a speed limit of NaN.
+        """
+        def speed_limit():
+            limits = np.append(
+                self.env.k.network.speed_limit_array(), np.nan)
+            return limits[self.edge]
+        return self._column("speed_limit", speed_limit)
+
+    @property
+    def max_speed(self):
+        """Return the maximum speed limit of the edges of the network."""
+        def max_speed():
+            network = self.env.k.network
+            limits = network.speed_limit_array()
+            return np.max(limits[:len(network.get_edge_list())])
+        return self._column("max_speed", max_speed)
+
+    def _ids(self):
+        if self.veh_ids is None:
+            return self.env.k.vehicle.get_ids()
+        return self.veh_ids
+
+
+def desired_velocity(speed, target_vel, fail=False):
+    """Compute the desired velocity reward (see flow.core.rewards).
+
+    Parameters
+    ----------
+    speed : np.ndarray
+        speed of every vehicle
+    target_vel : float
+        desired velocity of the vehicles
+    fail : bool, optional
+        specifies if any crash or other failure occurred in the system
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    num_vehicles = len(speed)
+    if fail or num_vehicles == 0 or np.any(speed < -100):
+        return 0.
+
+    max_cost = np.linalg.norm(np.full(num_vehicles, target_vel))
+    cost = np.linalg.norm(speed - target_vel)
+
+    return max(max_cost - cost, 0) / (max_cost + EPS)
+
+
+def average_velocity(speed, fail=False):
+    """Compute the average velocity reward (see flow.core.rewards).
+
+    Parameters
+    ----------
+    speed : np.ndarray
+        speed of every vehicle
+    fail : bool, optional
+        specifies if any crash or other failure occurred in the system
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    if fail or len(speed) == 0 or np.any(speed < -100):
+        return 0.
+    return np.mean(speed)
+
+
+def min_delay(speed, v_top, sim_step):
+    """Compute the scaled delay reward (see flow.core.rewards.min_delay).
+
+    Parameters
+    ----------
+    speed : np.ndarray
+        speed of every vehicle. Negative speeds are ignored.
+    v_top : float
+        maximum speed limit in the network
+    sim_step : float
+        simulation step size
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    speed = speed[speed >= -1e-6]
+    max_cost = sim_step * len(speed)
+    cost = sim_step * np.sum((v_top - speed) / v_top)
+    return max((max_cost - cost) / (max_cost + EPS), 0)
+
+
+def min_delay_unscaled(speed, v_top, sim_step, num_vehicles):
+    """Compute the average delay (see flow.core.rewards.min_delay_unscaled).
+
+    Parameters
+    ----------
+    speed : np.ndarray
+        speed of every vehicle. Negative speeds are ignored.
+    v_top : float
+        maximum speed limit in the network
+    sim_step : float
+        simulation step size
+    num_vehicles : int
+        number of vehicles the delay is averaged over
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    speed = speed[speed >= -1e-6]
+    cost = sim_step * np.sum((v_top - speed) / v_top)
+    return cost / (num_vehicles + EPS)
+
+
+def total_delay(speed, speed_limit, sim_step):
+    """Compute the delay of a set of vehicles relative to the speed limits.
+
+    Parameters
+    ----------
+    speed : np.ndarray
+        speed of every vehicle
+    speed_limit : np.ndarray
+        speed limit at the position of every vehicle
+    sim_step : float
+        simulation step size
+
+    Returns
+    -------
+    float
+        sum of the delays of all vehicles
+    """
+    return sim_step * np.sum((speed_limit - speed) / speed_limit)
+
+
+def penalize_standstill(speed, gain=1):
+    """Penalize the number of vehicles at a standstill.
+
+    Parameters
+    ----------
+    speed : np.ndarray
+        speed of every vehicle
+    gain : float, optional
+        multiplicative factor on the penalty
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    return -gain * np.count_nonzero(speed == 0)
+
+
+def penalize_near_standstill(speed, thresh=0.3, gain=1):
+    """Penalize the number of vehicles below a velocity threshold.
+
+    Parameters
+    ----------
+    speed : np.ndarray
+        speed of every vehicle
+    thresh : float, optional
+        the velocity threshold below which penalties are applied
+    gain : float, optional
+        multiplicative factor on the penalty
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    return -gain * np.count_nonzero(speed < thresh)
+
+
+def headway_variance(headways,
+                     normalization=1,
+                     penalty_gain=1,
+                     penalty_exponent=1):
+    """Compute the (negative) variance of the normalized headways.
+
+    See flow.core.rewards.penalize_headway_variance for a description of the
+    parameters.
+    """
+    return -np.var(penalty_gain * np.power(
+        headways / normalization, penalty_exponent))
+
+
+def power(speed, prev_speed, sim_step):
+    """Compute the power consumed by every vehicle.
+
+    Assumes vehicles are average sized vehicles. The power calculated here is
+    the lower bound of the actual power consumed by a vehicle.
+
+    Parameters
+    ----------
+    speed : np.ndarray
+        speed of every vehicle
+    prev_speed : np.ndarray
+        speed of every vehicle at the previous time step
+    sim_step : float
+        simulation step size
+
+    Returns
+    -------
+    np.ndarray
+        power consumed by every vehicle
+    """
+    accel = np.abs(speed - prev_speed) / sim_step
+    return M * speed * accel + M * G * CR * speed \
+        + 0.5 * RHO * A * CA * speed ** 3
+
+
+def energy_consumption(speed, prev_speed, sim_step, gain=.001):
+    """Compute the (negative) total power consumed by a set of vehicles.
+
+    Parameters
+    ----------
+    speed : np.ndarray
+        speed of every vehicle
+    prev_speed : np.ndarray
+        speed of every vehicle at the previous time step
+    sim_step : float
+        simulation step size
+    gain : float, optional
+        scaling factor for the reward
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    return -gain * np.sum(power(speed, prev_speed, sim_step))
+
+
+def miles_per_megajoule(speed, prev_speed, sim_step, gain=.001):
+    """Compute the average miles per mega-joule of a set of vehicles.
+
+    Vehicles that do not consume any power, or have a negative speed, are not
+    included in the average.
+
+    Parameters
+    ----------
+    speed : np.ndarray
+        speed of every vehicle
+    prev_speed : np.ndarray
+        speed of every vehicle at the previous time step
+    sim_step : float
+        simulation step size
+    gain : float, optional
+        scaling factor for the reward
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    veh_power = power(speed, prev_speed, sim_step)
+    valid = (veh_power > 0) & (speed >= 0)
+
+    # meters / joule is (v * \delta t) / (power * \delta t)
+    mpj = np.mean(speed[valid] / veh_power[valid]) if np.any(valid) else 0
+
+    # convert from meters per joule to miles per megajoule
+    return mpj / 1609.0 * 10 ** 6 * gain
+
+
+def miles_per_gallon(speed, fuel, gain=.001):
+    """Compute the average miles per gallon of a set of vehicles.
+
+    Vehicles that do not consume any fuel, or have a negative speed, are not
+    included in the average.
+
+    Parameters
+    ----------
+    speed : np.ndarray
+        speed of every vehicle
+    fuel : np.ndarray
+        fuel consumption of every vehicle, in gallons/s
+    gain : float, optional
+        scaling factor for the reward
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    valid = (fuel > 0) & (speed >= 0)
+
+    # meters / gallon is (v * \delta t) / (gallons_per_s * \delta t)
+    mpg = np.mean(speed[valid] / fuel[valid]) if np.any(valid) else 0
+
+    # convert from meters per gallon to miles per gallon
+    return mpg / 1609.0 * gain
@@ -11,6 +11,8 @@ import random
 import shutil
 import subprocess
 from flow.renderer.pyglet_renderer import PygletRenderer as Renderer
+from flow.renderer.numpy_renderer import NumpyRenderer
+from flow.renderer.frame_buffer import FrameBuffer
 from flow.utils.flow_warnings import deprecated_attribute
 
 import gym
@@ -24,6 +26,7 @@ import sumolib
 
 from flow.core.util import ensure_dir
 from flow.core.kernel import Kernel
+from flow.controllers.base_controller import BaseController
 from flow.utils.exceptions import FatalFlowError
 
 
@@ -98,6 +101,12 @@ class Env(gym.Env, metaclass=ABCMeta):
         renderer class, used to collect image-based representations of the
         traffic network. This attribute is set to None if `sim_params.render`
         is set to True or False.
+    frame_buffer : flow.renderer.frame_buffer.FrameBuffer
+        history of the frames rendered by the renderer, sampled every
+        `sim_params.render_buffer_stride` steps
+    sights_buffer : flow.renderer.frame_buffer.FrameBuffer
+        history of the local observations of the observed vehicles, sampled
+        with the frames
     """
 
     def __init__(self,
@@ -131,9 +140,11 @@ class Env(gym.Env, metaclass=ABCMeta):
         self.net_params = self.network.net_params
         self.initial_config = self.network.initial_config
         self.sim_params = deepcopy(sim_params)
-        # check whether we should be rendering
+        # check whether we should be rendering. The gui is only started upon
+        # reset, while the pyglet/numpy render modes are set up below.
         self.should_render = self.sim_params.render
-        self.sim_params.render = False
+        if self.should_render is True:
+            self.sim_params.render = False
         time_stamp = ''.join(str(time.time()).split('.'))
         if os.environ.get("TEST_FLAG", 0):
             # 1.0 works with stress_test_start 10k times
@@ -146,6 +157,9 @@ class Env(gym.Env, metaclass=ABCMeta):
         self.step_counter = 0
         # initial_state:
         self.initial_state = {}
+        # sumo state file containing the initial vehicles, and the types of
+        # these vehicles (see SumoParams.bulk_reset)
+        self._reset_state = None
         self.state = None
         self.obs_var_labels = []
 
@@ -208,8 +222,13 @@ class Env(gym.Env, metaclass=ABCMeta):
                 lane_poly = [i for pt in _lane_poly for i in pt]
                 network.append(lane_poly)
 
-            # instantiate a pyglet renderer
-            self.renderer = Renderer(
+            # instantiate a pyglet renderer, or an offscreen renderer if
+            # requested
+            if getattr(self.sim_params, "render_backend", "pyglet") == "numpy":
+                renderer_class = NumpyRenderer
+            else:
+                renderer_class = Renderer
+            self.renderer = renderer_class(
                 network,
                 self.sim_params.render,
                 save_render,
@@ -217,6 +236,11 @@ class Env(gym.Env, metaclass=ABCMeta):
                 pxpm=pxpm,
                 show_radius=show_radius)
 
+            # history of the rendered frames
+            buffer_length = getattr(self.sim_params, "render_buffer_length", 5)
+            self.frame_buffer = FrameBuffer(buffer_length)
+            self.sights_buffer = FrameBuffer(buffer_length)
+
             # render a frame
             self.render(reset=True)
         elif self.sim_params.render in [True, False]:
@@ -245,12 +269,6 @@ class Env(gym.Env, metaclass=ABCMeta):
         render : bool, optional
             specifies whether to use the gui
         """
-        self.k.close()
-
-        # killed the sumo process if using sumo/TraCI
-        if self.simulator == 'traci':
-            self.k.simulation.sumo_proc.kill()
-
         if render is not None:
             self.sim_params.render = render
 
@@ -258,10 +276,27 @@ class Env(gym.Env, metaclass=ABCMeta):
             ensure_dir(sim_params.emission_path)
             self.sim_params.emission_path = sim_params.emission_path
 
+        # reuse the running sumo instance if possible (warm restart)
+        warm_restart = self.simulator == 'traci' and \
+            self.k.simulation.can_reload(self.sim_params)
+
+        if warm_restart:
+            self.k.network.close()
+        else:
+            self.k.close()
+
+            # killed the sumo process if using sumo/TraCI
+            if self.simulator == 'traci':
+                self.k.simulation.sumo_proc.kill()
+
         self.k.network.generate_network(self.network)
         self.k.vehicle.initialize(deepcopy(self.network.vehicles))
-        kernel_api = self.k.simulation.start_simulation(
-            network=self.k.network, sim_params=self.sim_params)
+        if warm_restart:
+            kernel_api = self.k.simulation.reload_simulation(
+                network=self.k.network, sim_params=self.sim_params)
+        else:
+            kernel_api = self.k.simulation.start_simulation(
+                network=self.k.network, sim_params=self.sim_params)
         self.k.pass_api(kernel_api)
 
         self.setup_initial_state()
@@ -277,6 +312,9 @@ class Env(gym.Env, metaclass=ABCMeta):
         if self.initial_config.shuffle:
             random.shuffle(self.initial_ids)
 
+        # the initial vehicles need to be inserted again
+        self._reset_state = None
+
         # generate starting position for vehicles in the network
         start_pos, start_lanes = self.k.network.generate_starting_positions(
             initial_config=self.initial_config,
@@ -322,70 +360,80 @@ class Env(gym.Env, metaclass=ABCMeta):
         info : dict
             contains other diagnostic information from the previous action
         """
+        # timers of the different phases of the step (see
+        # flow.core.profiler.StepProfiler)
+        profiler = self.k.profiler
+        step_start = time.perf_counter()
+
         for _ in range(self.env_params.sims_per_step):
             self.time_counter += 1
             self.step_counter += 1
 
             # perform acceleration actions for controlled human-driven vehicles
             if len(self.k.vehicle.get_controlled_ids()) > 0:
-                accel = []
-                for veh_id in self.k.vehicle.get_controlled_ids():
-                    action = self.k.vehicle.get_acc_controller(
-                        veh_id).get_action(self)
-                    accel.append(action)
-                self.k.vehicle.apply_acceleration(
-                    self.k.vehicle.get_controlled_ids(), accel)
+                with profiler.phase("controller_actions"):
+                    # vehicles that share a controller class and parameters
+                    # are evaluated together (see BaseController.get_actions)
+                    accel = BaseController.get_actions(
+                        self, self.k.vehicle.get_controlled_ids())
+                    self.k.vehicle.apply_acceleration(
+                        self.k.vehicle.get_controlled_ids(), accel)
 
             # perform lane change actions for controlled human-driven vehicles
             if len(self.k.vehicle.get_controlled_lc_ids()) > 0:
-                direction = []
-                for veh_id in self.k.vehicle.get_controlled_lc_ids():
-                    target_lane = self.k.vehicle.get_lane_changing_controller(
-                        veh_id).get_action(self)
-                    direction.append(target_lane)
-                self.k.vehicle.apply_lane_change(
-                    self.k.vehicle.get_controlled_lc_ids(),
-                    direction=direction)
-
-            # perform (optionally) routing actions for all vehicles in the
-            # network, including RL and SUMO-controlled vehicles
-            routing_ids = []
-            routing_actions = []
-            for veh_id in self.k.vehicle.get_ids():
-                if self.k.vehicle.get_routing_controller(veh_id) \
-                        is not None:
-                    routing_ids.append(veh_id)
-                    route_contr = self.k.vehicle.get_routing_controller(
-                        veh_id)
-                    routing_actions.append(route_contr.choose_route(self))
-
-            self.k.vehicle.choose_routes(routing_ids, routing_actions)
-
-            self.apply_rl_actions(rl_actions)
-
-            self.additional_command()
+                with profiler.phase("lane_change_actions"):
+                    direction = []
+                    for veh_id in self.k.vehicle.get_controlled_lc_ids():
+                        target_lane = self.k.vehicle.\
+                            get_lane_changing_controller(veh_id).\
+                            get_action(self)
+                        direction.append(target_lane)
+                    self.k.vehicle.apply_lane_change(
+                        self.k.vehicle.get_controlled_lc_ids(),
+                        direction=direction)
+
+            # perform (optionally) routing actions for the vehicles in the
+            # network, including RL and SUMO-controlled vehicles. Event-driven
+            # routers only act on vehicles that changed edge or lane.
+            with profiler.phase("routing"):
+                routing_ids = self.k.vehicle.get_routing_ids()
+                routing_actions = [
+                    self.k.vehicle.get_routing_controller(veh_id).
+                    choose_route(self) for veh_id in routing_ids]
+                self.k.vehicle.choose_routes(routing_ids, routing_actions)
+
+            with profiler.phase("apply_rl_actions"):
+                self.apply_rl_actions(rl_actions)
+
+            with profiler.phase("additional_command"):
+                self.additional_command()
 
             # advance the simulation in the simulator by one step
-            self.k.simulation.simulation_step()
+            with profiler.phase("simulation_step"):
+                self.k.simulation.simulation_step()
 
             # store new observations in the vehicles and traffic lights class
+            # (timed by the kernel, see Kernel.update)
             self.k.update(reset=False)
 
-            # update the colors of vehicles
-            if self.sim_params.render:
+            # update the colors of vehicles (only displayed by sumo-gui)
+            if self.sim_params.render is True:
                 self.k.vehicle.update_vehicle_colors()
 
             # crash encodes whether the simulator experienced a collision
-            crash = self.k.simulation.check_collision()
+            with profiler.phase("check_collision"):
+                crash = self.k.simulation.check_collision()
 
             # stop collecting new simulation steps if there is a collision
             if crash:
                 break
 
             # render a frame
-            self.render()
+            with profiler.phase("render"):
+                self.render()
 
-        states = self.get_state()
+        with profiler.phase("get_state"):
+            states = self.get_state()
 
         # collect information of the state of the network based on the
         # environment class used
@@ -404,11 +452,15 @@ class Env(gym.Env, metaclass=ABCMeta):
         infos = {}
 
         # compute the reward
-        if self.env_params.clip_actions:
-            rl_clipped = self.clip_actions(rl_actions)
-            reward = self.compute_reward(rl_clipped, fail=crash)
-        else:
-            reward = self.compute_reward(rl_actions, fail=crash)
+        with profiler.phase("compute_reward"):
+            if self.env_params.clip_actions:
+                rl_clipped = self.clip_actions(rl_actions)
+                reward = self.compute_reward(rl_clipped, fail=crash)
+            else:
+                reward = self.compute_reward(rl_actions, fail=crash)
+
+        if profiler.enabled:
+            profiler.record("step", step_start, time.perf_counter())
 
         return next_observation, reward, done, infos
 
@@ -433,7 +485,7 @@ class Env(gym.Env, metaclass=ABCMeta):
 
         # Now that we've passed the possibly fake init steps some rl libraries
         # do, we can feel free to actually render things
-        if self.should_render:
+        if self.should_render is True:
             self.sim_params.render = True
             # got to restart the simulation to make it actually display anything
             self.restart_simulation(self.sim_params)
@@ -468,6 +520,72 @@ class Env(gym.Env, metaclass=ABCMeta):
         elif self.initial_config.shuffle:
             self.setup_initial_state()
 
+        # reintroduce the initial vehicles to the network
+        self._reset_vehicles()
+
+        # update the colors of vehicles (only displayed by sumo-gui)
+        if self.sim_params.render is True:
+            self.k.vehicle.update_vehicle_colors()
+
+        if self.simulator == 'traci':
+            initial_ids = self.k.kernel_api.vehicle.getIDList()
+        else:
+            initial_ids = self.initial_ids
+
+        # check to make sure all vehicles have been spawned
+        if len(self.initial_ids) > len(initial_ids):
+            missing_vehicles = list(set(self.initial_ids) - set(initial_ids))
+            msg = '\nNot enough vehicles have spawned! Bad start?\n' \
+                  'Missing vehicles / initial state:\n'
+            for veh_id in missing_vehicles:
+                msg += '- {}: {}\n'.format(veh_id, self.initial_state[veh_id])
+            raise FatalFlowError(msg=msg)
+
+        states = self.get_state()
+
+        # collect information of the state of the network based on the
+        # environment class used
+        self.state = np.asarray(states).T
+
+        # observation associated with the reset (no warm-up steps)
+        observation = np.copy(states)
+
+        # perform (optional) warm-up steps before training
+        for _ in range(self.env_params.warmup_steps):
+            observation, _, _, _ = self.step(rl_actions=None)
+
+        # render a frame
+        self.render(reset=True)
+
+        return observation
+
+    def _reset_vehicles(self):
+        """Reintroduce the initial vehicles to the network.
+
+        All vehicles are removed from the network and the vehicles class, and
+        the initial vehicles are added again at their starting positions. The
+        simulation is then advanced by one step, so that the vehicles enter
+        the network, and the kernel is updated.
+
+        If "bulk_reset" is set in SumoParams, the network as it is after the
+        vehicles are inserted is saved in a sumo state file. The following
+        resets then load this state, which restores all the vehicles at once
+        instead of adding them one at a time. The state is saved again when
+        the initial state of the vehicles changes (see setup_initial_state).
+        """
+        bulk_reset = self.simulator == 'traci' and self.sim_params.bulk_reset
+
+        if bulk_reset and self._reset_state is not None:
+            # do any additional resetting of the vehicle class needed
+            self.k.vehicle.reset()
+
+            # restore the network as it was after the vehicles were inserted
+            self.k.load_state(*self._reset_state)
+
+            # update the information in each kernel to match the current state
+            self.k.update(reset=True)
+            return
+
         # clear all vehicles from the network and the vehicles class
         if self.simulator == 'traci':
             for veh_id in self.k.kernel_api.vehicle.getIDList():  # FIXME: hack
@@ -521,44 +639,18 @@ class Env(gym.Env, metaclass=ABCMeta):
         # advance the simulation in the simulator by one step
         self.k.simulation.simulation_step()
 
+        if bulk_reset:
+            state_path = os.path.join(
+                self.k.network.cfg_path, self.k.network.statefn)
+            self.k.simulation.save_state(state_path)
+
         # update the information in each kernel to match the current state
         self.k.update(reset=True)
 
-        # update the colors of vehicles
-        if self.sim_params.render:
-            self.k.vehicle.update_vehicle_colors()
-
-        if self.simulator == 'traci':
-            initial_ids = self.k.kernel_api.vehicle.getIDList()
-        else:
-            initial_ids = self.initial_ids
-
-        # check to make sure all vehicles have been spawned
-        if len(self.initial_ids) > len(initial_ids):
-            missing_vehicles = list(set(self.initial_ids) - set(initial_ids))
-            msg = '\nNot enough vehicles have spawned! Bad start?\n' \
-                  'Missing vehicles / initial state:\n'
-            for veh_id in missing_vehicles:
-                msg += '- {}: {}\n'.format(veh_id, self.initial_state[veh_id])
-            raise FatalFlowError(msg=msg)
-
-        states = self.get_state()
-
-        # collect information of the state of the network based on the
-        # environment class used
-        self.state = np.asarray(states).T
-
-        # observation associated with the reset (no warm-up steps)
-        observation = np.copy(states)
-
-        # perform (optional) warm-up steps before training
-        for _ in range(self.env_params.warmup_steps):
-            observation, _, _, _ = self.step(rl_actions=None)
-
-        # render a frame
-        self.render(reset=True)
-
-        return observation
+        if bulk_reset:
+            veh_types = {veh_id: self.k.vehicle.get_type(veh_id)
+                         for veh_id in self.k.vehicle.get_ids()}
+            self._reset_state = (state_path, veh_types)
 
     def additional_command(self):
         """Additional commands that may be performed by the step method."""
@@ -707,31 +799,41 @@ class Env(gym.Env, metaclass=ABCMeta):
             # Skip automatic termination. Connection is probably already closed
             print(traceback.format_exc())
 
-    def render(self, reset=False, buffer_length=5):
+    def render(self, reset=False, buffer_length=None):
         """Render a frame.
 
+        The frame and sights are stored in `frame_buffer` and `sights_buffer`
+        every `sim_params.render_buffer_stride` steps (every simulated second
+        by default).
+
         Parameters
         ----------
         reset : bool
             set to True to reset the buffer
-        buffer_length : int
-            length of the buffer
+        buffer_length : int, optional
+            length of the buffer, defaults to `sim_params.render_buffer_length`
         """
         if self.sim_params.render in ['gray', 'dgray', 'rgb', 'drgb']:
             # render a frame
             self.pyglet_render()
 
+            if buffer_length is not None and \
+                    buffer_length != self.frame_buffer.length:
+                self.frame_buffer = FrameBuffer(buffer_length)
+                self.sights_buffer = FrameBuffer(buffer_length)
+                reset = True
+
             # cache rendering
             if reset:
-                self.frame_buffer = [self.frame.copy() for _ in range(5)]
-                self.sights_buffer = [self.sights.copy() for _ in range(5)]
+                self.frame_buffer.reset(self.frame)
+                self.sights_buffer.reset(self.sights)
             else:
-                if self.step_counter % int(1/self.sim_step) == 0:
-                    self.frame_buffer.append(self.frame.copy())
-                    self.sights_buffer.append(self.sights.copy())
-                if len(self.frame_buffer) > buffer_length:
-                    self.frame_buffer.pop(0)
-                    self.sights_buffer.pop(0)
+                stride = getattr(self.sim_params, "render_buffer_stride", None)
+                if stride is None:
+                    stride = int(1/self.sim_step)
+                if self.step_counter % stride == 0:
+                    self.frame_buffer.append(self.frame)
+                    self.sights_buffer.append(self.sights)
         elif (self.sim_params.render is True) and self.sim_params.save_render:
             # sumo-gui render
             self.k.kernel_api.gui.screenshot("View #0", self.path+"/frame_%06d.png" % self.time_counter)
@@ -787,18 +889,9 @@ class Env(gym.Env, metaclass=ABCMeta):
                                           human_logs,
                                           machine_logs)
 
-        # get local observation of RL vehicles
-        self.sights = []
-        for id in human_idlist:
-            # Force tracking human vehicles by adding "track" in vehicle id.
-            # The tracked human vehicles will be treated as machine vehicles.
-            if "track" in id:
-                orientation = self.k.vehicle.get_orientation(id)
-                sight = self.renderer.get_sight(
-                    orientation, id)
-                self.sights.append(sight)
-        for id in machine_idlist:
-            orientation = self.k.vehicle.get_orientation(id)
-            sight = self.renderer.get_sight(
-                orientation, id)
-            self.sights.append(sight)
+        # get local observation of RL vehicles (and tracked human vehicles,
+        # whose orientations were collected above)
+        sight_ids = [id for id in human_idlist if "track" in id] + \
+            list(machine_idlist)
+        self.sights = self.renderer.get_sights(
+            machine_orientations, sight_ids)
@@ -228,7 +228,7 @@ class BayBridgeEnv(Env):
     # TODO: decide on a good reward function
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
-        return np.mean(self.k.vehicle.get_speed(self.k.vehicle.get_ids()))
+        return self.k.metrics.mean_speed
 
     ###########################################################################
     #         The below methods need to be updated by child classes.          #
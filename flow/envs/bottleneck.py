@@ -8,12 +8,7 @@ Control through Deep-RL: Applications to Bottleneck Decongestion," IEEE
 Intelligent Transportation Systems Conference (ITSC), 2018.
 """
 
-from flow.controllers.rlcontroller import RLController
-from flow.controllers.lane_change_controllers import SimLaneChangeController
-from flow.controllers.routing_controllers import ContinuousRouter
-from flow.core.params import InFlows, NetParams
-from flow.core.params import SumoCarFollowingParams, SumoLaneChangeParams
-from flow.core.params import VehicleParams
+from flow.core.params import InFlows
 
 from copy import deepcopy
 
@@ -21,6 +16,7 @@ import numpy as np
 from gym.spaces.box import Box
 
 from flow.core import rewards
+from flow.core.observations import ObservationBuffer
 from flow.envs.base import Env
 
 MAX_LANES = 4  # base number of largest number of lanes in the network
@@ -481,7 +477,7 @@ class BottleneckEnv(Env):
 
     def compute_reward(self, rl_actions, **kwargs):
         """Outflow rate over last ten seconds normalized to max of 1."""
-        reward = self.k.vehicle.get_outflow_rate(10 * self.sim_step) / \
+        reward = self.k.metrics.outflow_rate(10 * self.sim_step) / \
             (2000.0 * self.scaling)
         return reward
 
@@ -806,6 +802,9 @@ class BottleneckDesiredVelocityEnv(BottleneckEnv):
             self.obs_slices[edge] = np.linspace(0, edge_length,
                                                 num_segments + 1)
 
+        # preallocated buffer of the observations
+        self._obs = ObservationBuffer()
+
         # self.symmetric is True if all lanes in a segment
         # have same action, else False
         self.symmetric = additional_params.get("symmetric")
@@ -891,59 +890,59 @@ class BottleneckDesiredVelocityEnv(BottleneckEnv):
         Finally, we also append the total outflow of the bottleneck over the
         last 20 * self.sim_step seconds.
         """
-        num_vehicles_list = []
-        num_rl_vehicles_list = []
-        vehicle_speeds_list = []
-        rl_speeds_list = []
+        veh = self.k.vehicle
+        rl_ids = set(veh.get_rl_ids())
+
+        # the lane-segments of every edge are stored contiguously, sorted by
+        # segment and then by lane
+        num_lane_segments = [
+            num_segments * self.k.network.num_lanes(edge)
+            for edge, num_segments in zip(EDGE_LIST, self.num_obs_segments)]
+        offsets = np.cumsum([0] + num_lane_segments)
+        total = int(offsets[-1])
+
+        self._obs.allocate([
+            ("num_vehicles", total), ("num_rl_vehicles", total),
+            ("mean_speed", total), ("mean_rl_speed", total), ("outflow", 1)])
+
+        # lane-segment of every vehicle on the observed edges
+        ids = []
+        lane_segment = [np.zeros(0, dtype=int)]
         for i, edge in enumerate(EDGE_LIST):
-            num_lanes = self.k.network.num_lanes(edge)
-            num_vehicles = np.zeros((self.num_obs_segments[i], num_lanes))
-            num_rl_vehicles = np.zeros((self.num_obs_segments[i], num_lanes))
-            vehicle_speeds = np.zeros((self.num_obs_segments[i], num_lanes))
-            rl_vehicle_speeds = np.zeros((self.num_obs_segments[i], num_lanes))
-            ids = self.k.vehicle.get_ids_by_edge(edge)
-            lane_list = self.k.vehicle.get_lane(ids)
-            pos_list = self.k.vehicle.get_position(ids)
-            for i, id in enumerate(ids):
-                segment = np.searchsorted(self.obs_slices[edge],
-                                          pos_list[i]) - 1
-                if id in self.k.vehicle.get_rl_ids():
-                    rl_vehicle_speeds[segment, lane_list[i]] \
-                        += self.k.vehicle.get_speed(id)
-                    num_rl_vehicles[segment, lane_list[i]] += 1
-                else:
-                    vehicle_speeds[segment, lane_list[i]] \
-                        += self.k.vehicle.get_speed(id)
-                    num_vehicles[segment, lane_list[i]] += 1
-
-            # normalize
-
-            num_vehicles /= NUM_VEHICLE_NORM
-            num_rl_vehicles /= NUM_VEHICLE_NORM
-            num_vehicles_list += num_vehicles.flatten().tolist()
-            num_rl_vehicles_list += num_rl_vehicles.flatten().tolist()
-            vehicle_speeds_list += vehicle_speeds.flatten().tolist()
-            rl_speeds_list += rl_vehicle_speeds.flatten().tolist()
-
-        unnorm_veh_list = np.asarray(num_vehicles_list) * NUM_VEHICLE_NORM
-        unnorm_rl_list = np.asarray(num_rl_vehicles_list) * NUM_VEHICLE_NORM
-
-        # compute the mean speed if the speed isn't zero
-        num_rl = len(num_rl_vehicles_list)
-        num_veh = len(num_vehicles_list)
-        mean_speed = np.nan_to_num([
-            vehicle_speeds_list[i] / unnorm_veh_list[i]
-            if int(unnorm_veh_list[i]) else 0 for i in range(num_veh)
-        ])
-        mean_speed_norm = mean_speed / 50
-        mean_rl_speed = np.nan_to_num([
-            rl_speeds_list[i] / unnorm_rl_list[i]
-            if int(unnorm_rl_list[i]) else 0 for i in range(num_rl)
-        ]) / 50
-        outflow = np.asarray(
-            self.k.vehicle.get_outflow_rate(20 * self.sim_step) / 2000.0)
-        return np.concatenate((num_vehicles_list, num_rl_vehicles_list,
-                               mean_speed_norm, mean_rl_speed, [outflow]))
+            edge_ids = veh.get_ids_by_edge(edge)
+            if len(edge_ids) == 0:
+                continue
+            segment = np.searchsorted(
+                self.obs_slices[edge], veh.get_position_array(edge_ids)) - 1
+            # vehicles at the very start of an edge are counted in its last
+            # segment
+            segment[segment < 0] += self.num_obs_segments[i]
+            lane_segment.append(
+                offsets[i] + segment * self.k.network.num_lanes(edge)
+                + veh.get_lane_array(edge_ids))
+            ids += edge_ids
+        lane_segment = np.concatenate(lane_segment).astype(int)
+
+        speeds = veh.get_speed_array(ids)
+        is_rl = np.array([veh_id in rl_ids for veh_id in ids], dtype=bool)
+
+        for name, speed_name, mask in [
+                ("num_vehicles", "mean_speed", ~is_rl),
+                ("num_rl_vehicles", "mean_rl_speed", is_rl)]:
+            count = np.bincount(lane_segment[mask], minlength=total)
+            total_speed = np.bincount(
+                lane_segment[mask], weights=speeds[mask], minlength=total)
+
+            np.divide(count, NUM_VEHICLE_NORM, out=self._obs[name])
+            # compute the mean speed if the speed isn't zero
+            mean_speed = self._obs[speed_name]
+            np.divide(total_speed, count, out=mean_speed, where=count > 0)
+            mean_speed /= 50
+
+        self._obs["outflow"][0] = \
+            self.k.metrics.outflow_rate(20 * self.sim_step) / 2000.0
+
+        return self._obs.data
 
     def _apply_rl_actions(self, rl_actions):
         """
@@ -966,11 +965,12 @@ class BottleneckDesiredVelocityEnv(BottleneckEnv):
                         # find what segment we fall into
                         bucket = np.searchsorted(self.slices[edge], pos) - 1
                         action = rl_actions[int(lane) + bucket * num_lanes +
-                                            self.action_index[edge]]
+                                            self.action_index[edge][0]]
                     else:
                         # find what segment we fall into
                         bucket = np.searchsorted(self.slices[edge], pos) - 1
-                        action = rl_actions[bucket + self.action_index[edge]]
+                        action = rl_actions[
+                            bucket + self.action_index[edge][0]]
 
                     max_speed_curr = self.k.vehicle.get_max_speed(rl_id)
                     next_max = np.clip(max_speed_curr + action, 0.01, 23.0)
@@ -984,11 +984,11 @@ class BottleneckDesiredVelocityEnv(BottleneckEnv):
         """Outflow rate over last ten seconds normalized to max of 1."""
         if self.env_params.evaluate:
             if self.time_counter == self.env_params.horizon:
-                reward = self.k.vehicle.get_outflow_rate(500)
+                reward = self.k.metrics.outflow_rate(500)
             else:
                 return 0
         else:
-            reward = self.k.vehicle.get_outflow_rate(10 * self.sim_step) / \
+            reward = self.k.metrics.outflow_rate(10 * self.sim_step) / \
                 (2000.0 * self.scaling)
         return reward
 
@@ -996,11 +996,15 @@ class BottleneckDesiredVelocityEnv(BottleneckEnv):
         """Reset the environment with a new inflow rate.
 
         The diverse set of inflows are used to generate a policy that is more
-        robust with respect to the inflow rate. The inflow rate is update by
-        creating a new network similar to the previous one, but with a new
-        Inflow object with a rate within the additional environment parameter
-        "inflow_range", which is a list consisting of the smallest and largest
-        allowable inflow rates.
+        robust with respect to the inflow rate. The inflow rate is updated by
+        replacing the inflows of the network with an Inflow object with a rate
+        within the additional environment parameter "inflow_range", which is a
+        list consisting of the smallest and largest allowable inflow rates.
+
+        The network is not regenerated. If `runtime_inflows` is set in the
+        simulation parameters, the new inflows are added by the vehicle kernel
+        of the running simulation. Otherwise, they are written to the route
+        file when the simulation is restarted (see `restart_instance`).
 
         **WARNING**: The inflows assume there are vehicles of type
         "followerstopper" and "human" within the VehicleParams object.
@@ -1011,77 +1015,24 @@ class BottleneckDesiredVelocityEnv(BottleneckEnv):
             flow_rate = np.random.uniform(
                 min(inflow_range), max(inflow_range)) * self.scaling
 
-            # We try this for 100 trials in case unexpected errors during
-            # instantiation.
-            for _ in range(100):
-                try:
-                    # introduce new inflows within the pre-defined inflow range
-                    inflow = InFlows()
-                    inflow.add(
-                        veh_type="followerstopper",  # FIXME: make generic
-                        edge="1",
-                        vehs_per_hour=flow_rate * .1,
-                        departLane="random",
-                        departSpeed=10)
-                    inflow.add(
-                        veh_type="human",
-                        edge="1",
-                        vehs_per_hour=flow_rate * .9,
-                        departLane="random",
-                        departSpeed=10)
-
-                    # all other network parameters should match the previous
-                    # environment (we only want to change the inflow)
-                    additional_net_params = {
-                        "scaling": self.scaling,
-                        "speed_limit": self.net_params.
-                        additional_params['speed_limit']
-                    }
-                    net_params = NetParams(
-                        inflows=inflow,
-                        additional_params=additional_net_params)
-
-                    vehicles = VehicleParams()
-                    vehicles.add(
-                        veh_id="human",  # FIXME: make generic
-                        car_following_params=SumoCarFollowingParams(
-                            speed_mode=9,
-                        ),
-                        lane_change_controller=(SimLaneChangeController, {}),
-                        routing_controller=(ContinuousRouter, {}),
-                        lane_change_params=SumoLaneChangeParams(
-                            lane_change_mode=0,  # 1621,#0b100000101,
-                        ),
-                        num_vehicles=1 * self.scaling)
-                    vehicles.add(
-                        veh_id="followerstopper",
-                        acceleration_controller=(RLController, {}),
-                        lane_change_controller=(SimLaneChangeController, {}),
-                        routing_controller=(ContinuousRouter, {}),
-                        car_following_params=SumoCarFollowingParams(
-                            speed_mode=9,
-                        ),
-                        lane_change_params=SumoLaneChangeParams(
-                            lane_change_mode=0,
-                        ),
-                        num_vehicles=1 * self.scaling)
-
-                    # recreate the network object
-                    self.network = self.network.__class__(
-                        name=self.network.orig_name,
-                        vehicles=vehicles,
-                        net_params=net_params,
-                        initial_config=self.initial_config,
-                        traffic_lights=self.network.traffic_lights)
-                    observation = super().reset()
-
-                    # reset the timer to zero
-                    self.time_counter = 0
-
-                    return observation
-
-                except Exception as e:
-                    print('error on reset ', e)
+            # introduce new inflows within the pre-defined inflow range
+            inflow = InFlows()
+            inflow.add(
+                veh_type="followerstopper",  # FIXME: make generic
+                edge="1",
+                vehs_per_hour=flow_rate * .1,
+                depart_lane="random",
+                depart_speed=10)
+            inflow.add(
+                veh_type="human",
+                edge="1",
+                vehs_per_hour=flow_rate * .9,
+                depart_lane="random",
+                depart_speed=10)
+
+            # all other network parameters remain unchanged (we only want to
+            # change the inflow)
+            self.net_params.inflows = inflow
 
         # perform the generic reset function
         observation = super().reset()
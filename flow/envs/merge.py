@@ -7,6 +7,8 @@ TODO(ak): add paper after it has been published.
 
 from flow.envs.base import Env
 from flow.core import rewards
+from flow.core.observations import ObservationBuffer, \
+    lead_follow_observations
 
 from gym.spaces.box import Box
 
@@ -90,6 +92,9 @@ class MergePOEnv(Env):
         self.leader = []
         self.follower = []
 
+        # preallocated buffer of the observations
+        self._obs = ObservationBuffer()
+
         super().__init__(env_params, sim_params, network, simulator)
 
     @property
@@ -116,51 +121,17 @@ class MergePOEnv(Env):
 
     def get_state(self, rl_id=None, **kwargs):
         """See class definition."""
-        self.leader = []
-        self.follower = []
+        # the observations of missing rl vehicles are set to zero
+        state = self._obs.allocate([("rl", 5)], num_rows=self.num_rl)
+        self.leader, self.follower = lead_follow_observations(
+            self, self.rl_veh, state[:len(self.rl_veh)])
 
-        # normalizing constants
-        max_speed = self.k.network.max_speed()
-        max_length = self.k.network.length()
-
-        observation = [0 for _ in range(5 * self.num_rl)]
-        for i, rl_id in enumerate(self.rl_veh):
-            this_speed = self.k.vehicle.get_speed(rl_id)
-            lead_id = self.k.vehicle.get_leader(rl_id)
-            follower = self.k.vehicle.get_follower(rl_id)
-
-            if lead_id in ["", None]:
-                # in case leader is not visible
-                lead_speed = max_speed
-                lead_head = max_length
-            else:
-                self.leader.append(lead_id)
-                lead_speed = self.k.vehicle.get_speed(lead_id)
-                lead_head = self.k.vehicle.get_x_by_id(lead_id) \
-                    - self.k.vehicle.get_x_by_id(rl_id) \
-                    - self.k.vehicle.get_length(rl_id)
-
-            if follower in ["", None]:
-                # in case follower is not visible
-                follow_speed = 0
-                follow_head = max_length
-            else:
-                self.follower.append(follower)
-                follow_speed = self.k.vehicle.get_speed(follower)
-                follow_head = self.k.vehicle.get_headway(follower)
-
-            observation[5 * i + 0] = this_speed / max_speed
-            observation[5 * i + 1] = (lead_speed - this_speed) / max_speed
-            observation[5 * i + 2] = lead_head / max_length
-            observation[5 * i + 3] = (this_speed - follow_speed) / max_speed
-            observation[5 * i + 4] = follow_head / max_length
-
-        return observation
+        return state.reshape(-1)
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
         if self.env_params.evaluate:
-            return np.mean(self.k.vehicle.get_speed(self.k.vehicle.get_ids()))
+            return self.k.metrics.mean_speed
         else:
             # return a reward of 0 if a collision occurred
             if kwargs["fail"]:
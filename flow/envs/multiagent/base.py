@@ -3,15 +3,13 @@
 from copy import deepcopy
 import numpy as np
 import random
-import traceback
+import time
 from gym.spaces import Box
 
-from traci.exceptions import FatalTraCIError
-from traci.exceptions import TraCIException
-
 from ray.rllib.env import MultiAgentEnv
 
 from flow.envs.base import Env
+from flow.controllers.base_controller import BaseController
 from flow.utils.exceptions import FatalFlowError
 
 
@@ -48,64 +46,75 @@ class MultiEnv(MultiAgentEnv, Env):
         info : dict
             contains other diagnostic information from the previous action
         """
+        # timers of the different phases of the step (see
+        # flow.core.profiler.StepProfiler)
+        profiler = self.k.profiler
+        step_start = time.perf_counter()
+
         for _ in range(self.env_params.sims_per_step):
             self.time_counter += 1
             self.step_counter += 1
 
             # perform acceleration actions for controlled human-driven vehicles
             if len(self.k.vehicle.get_controlled_ids()) > 0:
-                accel = []
-                for veh_id in self.k.vehicle.get_controlled_ids():
-                    accel_contr = self.k.vehicle.get_acc_controller(veh_id)
-                    action = accel_contr.get_action(self)
-                    accel.append(action)
-                self.k.vehicle.apply_acceleration(
-                    self.k.vehicle.get_controlled_ids(), accel)
+                with profiler.phase("controller_actions"):
+                    # vehicles that share a controller class and parameters
+                    # are evaluated together (see BaseController.get_actions)
+                    accel = BaseController.get_actions(
+                        self, self.k.vehicle.get_controlled_ids())
+                    self.k.vehicle.apply_acceleration(
+                        self.k.vehicle.get_controlled_ids(), accel)
 
             # perform lane change actions for controlled human-driven vehicles
             if len(self.k.vehicle.get_controlled_lc_ids()) > 0:
-                direction = []
-                for veh_id in self.k.vehicle.get_controlled_lc_ids():
-                    target_lane = self.k.vehicle.get_lane_changing_controller(
-                        veh_id).get_action(self)
-                    direction.append(target_lane)
-                self.k.vehicle.apply_lane_change(
-                    self.k.vehicle.get_controlled_lc_ids(),
-                    direction=direction)
-
-            # perform (optionally) routing actions for all vehicle in the
-            # network, including rl and sumo-controlled vehicles
-            routing_ids = []
-            routing_actions = []
-            for veh_id in self.k.vehicle.get_ids():
-                if self.k.vehicle.get_routing_controller(veh_id) is not None:
-                    routing_ids.append(veh_id)
-                    route_contr = self.k.vehicle.get_routing_controller(veh_id)
-                    routing_actions.append(route_contr.choose_route(self))
-            self.k.vehicle.choose_routes(routing_ids, routing_actions)
-
-            self.apply_rl_actions(rl_actions)
-
-            self.additional_command()
+                with profiler.phase("lane_change_actions"):
+                    direction = []
+                    for veh_id in self.k.vehicle.get_controlled_lc_ids():
+                        target_lane = self.k.vehicle.\
+                            get_lane_changing_controller(veh_id).\
+                            get_action(self)
+                        direction.append(target_lane)
+                    self.k.vehicle.apply_lane_change(
+                        self.k.vehicle.get_controlled_lc_ids(),
+                        direction=direction)
+
+            # perform (optionally) routing actions for the vehicles in the
+            # network, including RL and SUMO-controlled vehicles. Event-driven
+            # routers only act on vehicles that changed edge or lane.
+            with profiler.phase("routing"):
+                routing_ids = self.k.vehicle.get_routing_ids()
+                routing_actions = [
+                    self.k.vehicle.get_routing_controller(veh_id).
+                    choose_route(self) for veh_id in routing_ids]
+                self.k.vehicle.choose_routes(routing_ids, routing_actions)
+            with profiler.phase("apply_rl_actions"):
+                self.apply_rl_actions(rl_actions)
+
+            with profiler.phase("additional_command"):
+                self.additional_command()
 
             # advance the simulation in the simulator by one step
-            self.k.simulation.simulation_step()
+            with profiler.phase("simulation_step"):
+                self.k.simulation.simulation_step()
 
             # store new observations in the vehicles and traffic lights class
+            # (timed by the kernel, see Kernel.update)
             self.k.update(reset=False)
 
-            # update the colors of vehicles
-            if self.sim_params.render:
+            # update the colors of vehicles (only displayed by sumo-gui)
+            if self.sim_params.render is True:
                 self.k.vehicle.update_vehicle_colors()
 
             # crash encodes whether the simulator experienced a collision
-            crash = self.k.simulation.check_collision()
+            with profiler.phase("check_collision"):
+                crash = self.k.simulation.check_collision()
 
             # stop collecting new simulation steps if there is a collision
             if crash:
                 break
 
-        states = self.get_state()
+        with profiler.phase("get_state"):
+            states = self.get_state()
         done = {key: key in self.k.vehicle.get_arrived_ids()
                 for key in states.keys()}
         if crash or (self.time_counter >= self.env_params.sims_per_step *
@@ -116,17 +125,21 @@ class MultiEnv(MultiAgentEnv, Env):
         infos = {key: {} for key in states.keys()}
 
         # compute the reward
-        if self.env_params.clip_actions:
-            clipped_actions = self.clip_actions(rl_actions)
-            reward = self.compute_reward(clipped_actions, fail=crash)
-        else:
-            reward = self.compute_reward(rl_actions, fail=crash)
+        with profiler.phase("compute_reward"):
+            if self.env_params.clip_actions:
+                clipped_actions = self.clip_actions(rl_actions)
+                reward = self.compute_reward(clipped_actions, fail=crash)
+            else:
+                reward = self.compute_reward(rl_actions, fail=crash)
 
         for rl_id in self.k.vehicle.get_arrived_rl_ids(self.env_params.sims_per_step):
             done[rl_id] = True
             reward[rl_id] = 0
             states[rl_id] = np.zeros(self.observation_space.shape[0])
 
+        if profiler.enabled:
+            profiler.record("step", step_start, time.perf_counter())
+
         return states, reward, done, infos
 
     def reset(self, new_inflow_rate=None):
@@ -150,7 +163,7 @@ class MultiEnv(MultiAgentEnv, Env):
 
         # Now that we've passed the possibly fake init steps some rl libraries
         # do, we can feel free to actually render things
-        if self.should_render:
+        if self.should_render is True:
             self.sim_params.render = True
             # got to restart the simulation to make it actually display anything
             self.restart_simulation(self.sim_params)
@@ -185,64 +198,11 @@ class MultiEnv(MultiAgentEnv, Env):
         elif self.initial_config.shuffle:
             self.setup_initial_state()
 
-        # clear all vehicles from the network and the vehicles class
-        if self.simulator == 'traci':
-            for veh_id in self.k.kernel_api.vehicle.getIDList():  # FIXME: hack
-                try:
-                    self.k.vehicle.remove(veh_id)
-                except (FatalTraCIError, TraCIException):
-                    print(traceback.format_exc())
-
-        # clear all vehicles from the network and the vehicles class
-        # FIXME (ev, ak) this is weird and shouldn't be necessary
-        for veh_id in list(self.k.vehicle.get_ids()):
-            # do not try to remove the vehicles from the network in the first
-            # step after initializing the network, as there will be no vehicles
-            if self.step_counter == 0:
-                continue
-            try:
-                self.k.vehicle.remove(veh_id)
-            except (FatalTraCIError, TraCIException):
-                print("Error during start: {}".format(traceback.format_exc()))
-
-        # do any additional resetting of the vehicle class needed
-        self.k.vehicle.reset()
-
         # reintroduce the initial vehicles to the network
-        for veh_id in self.initial_ids:
-            type_id, edge, lane_index, pos, speed = \
-                self.initial_state[veh_id]
-
-            try:
-                self.k.vehicle.add(
-                    veh_id=veh_id,
-                    type_id=type_id,
-                    edge=edge,
-                    lane=lane_index,
-                    pos=pos,
-                    speed=speed)
-            except (FatalTraCIError, TraCIException):
-                # if a vehicle was not removed in the first attempt, remove it
-                # now and then reintroduce it
-                self.k.vehicle.remove(veh_id)
-                if self.simulator == 'traci':
-                    self.k.kernel_api.vehicle.remove(veh_id)  # FIXME: hack
-                self.k.vehicle.add(
-                    veh_id=veh_id,
-                    type_id=type_id,
-                    edge=edge,
-                    lane=lane_index,
-                    pos=pos,
-                    speed=speed)
-
-        # advance the simulation in the simulator by one step
-        self.k.simulation.simulation_step()
-
-        # update the information in each kernel to match the current state
-        self.k.update(reset=True)
-
-        # update the colors of vehicles
-        if self.sim_params.render:
+        self._reset_vehicles()
+
+        # update the colors of vehicles (only displayed by sumo-gui)
+        if self.sim_params.render is True:
             self.k.vehicle.update_vehicle_colors()
 
         # check to make sure all vehicles have been spawned
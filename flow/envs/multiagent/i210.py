@@ -3,12 +3,18 @@
 from gym.spaces import Box
 import numpy as np
 
+from flow.core.observations import ObservationBuffer
 from flow.core.rewards import average_velocity
 from flow.envs.multiagent.base import MultiEnv
 
 # largest number of lanes on any given edge in the network
 MAX_LANES = 6
 
+# observations of the vehicles in the lanes around an autonomous vehicle, in
+# the order in which they are stored in the state
+LANE_OBSERVATIONS = ["headway", "tailway", "leader_speed", "follower_speed",
+                     "leader_is_rl", "follower_is_rl"]
+
 ADDITIONAL_ENV_PARAMS = {
     # maximum acceleration for autonomous vehicles, in m/s^2
     "max_accel": 1,
@@ -60,6 +66,9 @@ class I210MultiEnv(MultiEnv):
         super().__init__(env_params, sim_params, network, simulator)
         self.lead_obs = env_params.additional_params.get("lead_obs")
 
+        # preallocated buffer of the observations
+        self._obs = ObservationBuffer()
+
     @property
     def observation_space(self):
         """See class definition."""
@@ -113,20 +122,38 @@ class I210MultiEnv(MultiEnv):
 
     def get_state(self):
         """See class definition."""
+        veh = self.k.vehicle
+        rl_ids = veh.get_rl_ids()
+
         if self.lead_obs:
-            veh_info = {}
-            for rl_id in self.k.vehicle.get_rl_ids():
-                speed = self.k.vehicle.get_speed(rl_id)
-                headway = self.k.vehicle.get_headway(rl_id)
-                lead_speed = self.k.vehicle.get_speed(self.k.vehicle.get_leader(rl_id))
-                if lead_speed == -1001:
-                    lead_speed = 0
-                veh_info.update({rl_id: np.array([speed / 50.0, headway / 1000.0, lead_speed / 50.0])})
+            state = self._obs.allocate(
+                [("speed", 1), ("headway", 1), ("lead_speed", 1)],
+                num_rows=len(rl_ids), fill=None)
+            lead = veh.get_leader_index(rl_ids)
+            lead_speed = np.where(lead >= 0, veh.get_speed_array()[lead], 0)
+
+            np.divide(veh.get_speed_array(rl_ids), 50.0,
+                      out=self._obs["speed"][:, 0])
+            np.divide(veh.get_headway_array(rl_ids), 1000.0,
+                      out=self._obs["headway"][:, 0])
+            np.divide(lead_speed, 50.0, out=self._obs["lead_speed"][:, 0])
         else:
-            veh_info = {rl_id: np.concatenate((self.state_util(rl_id),
-                                               self.veh_statistics(rl_id)))
-                        for rl_id in self.k.vehicle.get_rl_ids()}
-        return veh_info
+            # the minus 1 disambiguates missing cars from missing lanes
+            state = self._obs.allocate(
+                [(name, MAX_LANES) for name in LANE_OBSERVATIONS] +
+                [("speed", 1), ("lane", 1)],
+                num_rows=len(rl_ids), fill=-1)
+            self._lane_observations(rl_ids)
+
+            # speed and lane of the vehicle itself
+            np.divide(veh.get_speed_array(rl_ids), 100.0,
+                      out=self._obs["speed"][:, 0])
+            np.divide(veh.get_lane_array(rl_ids) + 1, 10.0,
+                      out=self._obs["lane"][:, 0])
+
+        # the observations are copied, as the buffer is reused by the next
+        # call and the agents may keep their observations
+        return dict(zip(rl_ids, state.copy()))
 
     def compute_reward(self, rl_actions, **kwargs):
         # TODO(@evinitsky) we need something way better than this. Something that adds
@@ -184,42 +211,52 @@ class I210MultiEnv(MultiEnv):
             if follow_id:
                 self.k.vehicle.set_observed(follow_id)
 
-    def state_util(self, rl_id):
-        """Return an array of headway, tailway, leader speed, follower speed.
+    def _lane_observations(self, rl_ids):
+        """Write the headway, tailway, leader and follower speed in each lane.
+
+        Also write a 1 if the leader is rl 0 otherwise, a 1 if the follower is
+        rl 0 otherwise. The observations are written in the rows of the
+        observation buffer, in which the entries of missing lanes (if there
+        are fewer than MAX_LANES) are left to -1.
 
-        Also return a 1 if leader is rl 0 otherwise, a 1 if follower is rl 0 otherwise.
-        If there are fewer than MAX_LANES the extra
-        entries are filled with -1 to disambiguate from zeros.
+        Parameters
+        ----------
+        rl_ids : list of str
+            the autonomous vehicles, in the order of the rows of the buffer
         """
         veh = self.k.vehicle
-        lane_headways = veh.get_lane_headways(rl_id).copy()
-        lane_tailways = veh.get_lane_tailways(rl_id).copy()
-        lane_leader_speed = veh.get_lane_leaders_speed(rl_id).copy()
-        lane_follower_speed = veh.get_lane_followers_speed(rl_id).copy()
-        leader_ids = veh.get_lane_leaders(rl_id).copy()
-        follower_ids = veh.get_lane_followers(rl_id).copy()
-        rl_ids = self.k.vehicle.get_rl_ids()
-        is_leader_rl = [1 if l_id in rl_ids else 0 for l_id in leader_ids]
-        is_follow_rl = [1 if f_id in rl_ids else 0 for f_id in follower_ids]
-        diff = MAX_LANES - len(is_leader_rl)
-        if diff > 0:
-            # the minus 1 disambiguates missing cars from missing lanes
-            lane_headways += diff * [-1]
-            lane_tailways += diff * [-1]
-            lane_leader_speed += diff * [-1]
-            lane_follower_speed += diff * [-1]
-            is_leader_rl += diff * [-1]
-            is_follow_rl += diff * [-1]
-        lane_headways = np.asarray(lane_headways) / 1000
-        lane_tailways = np.asarray(lane_tailways) / 1000
-        lane_leader_speed = np.asarray(lane_leader_speed) / 100
-        lane_follower_speed = np.asarray(lane_follower_speed) / 100
-        return np.concatenate((lane_headways, lane_tailways, lane_leader_speed,
-                               lane_follower_speed, is_leader_rl,
-                               is_follow_rl))
-
-    def veh_statistics(self, rl_id):
-        """Return speed, edge information, and x, y about the vehicle itself."""
-        speed = self.k.vehicle.get_speed(rl_id) / 100.0
-        lane = (self.k.vehicle.get_lane(rl_id) + 1) / 10.0
-        return np.array([speed, lane])
+        is_rl = set(veh.get_rl_ids())
+
+        leader_ids, leader_index = [], ([], [])
+        follower_ids, follower_index = [], ([], [])
+        for i, rl_id in enumerate(rl_ids):
+            lane_headways = veh.get_lane_headways(rl_id)[:MAX_LANES]
+            lane_tailways = veh.get_lane_tailways(rl_id)[:MAX_LANES]
+            self._obs["headway"][i, :len(lane_headways)] = lane_headways
+            self._obs["tailway"][i, :len(lane_tailways)] = lane_tailways
+
+            leaders = veh.get_lane_leaders(rl_id)[:MAX_LANES]
+            followers = veh.get_lane_followers(rl_id)[:MAX_LANES]
+            self._obs["leader_is_rl"][i, :len(leaders)] = \
+                [l_id in is_rl for l_id in leaders]
+            self._obs["follower_is_rl"][i, :len(followers)] = \
+                [f_id in is_rl for f_id in followers]
+
+            # rows and lanes of the leaders and followers in the buffer
+            leader_ids += leaders
+            leader_index[0].extend([i] * len(leaders))
+            leader_index[1].extend(range(len(leaders)))
+            follower_ids += followers
+            follower_index[0].extend([i] * len(followers))
+            follower_index[1].extend(range(len(followers)))
+
+        # missing leaders and followers have a speed of 0
+        self._obs["leader_speed"][leader_index] = \
+            veh.get_speed_array(leader_ids, error=0)
+        self._obs["follower_speed"][follower_index] = \
+            veh.get_speed_array(follower_ids, error=0)
+
+        self._obs["headway"][:] /= 1000
+        self._obs["tailway"][:] /= 1000
+        self._obs["leader_speed"][:] /= 100
+        self._obs["follower_speed"][:] /= 100
@@ -2,6 +2,8 @@
 
 from flow.envs.multiagent.base import MultiEnv
 from flow.core import rewards
+from flow.core.observations import ObservationBuffer, \
+    lead_follow_observations
 from gym.spaces.box import Box
 import numpy as np
 
@@ -71,6 +73,9 @@ class MultiAgentMergePOEnv(MultiEnv):
         self.leader = []
         self.follower = []
 
+        # preallocated buffer of the observations
+        self._obs = ObservationBuffer()
+
         super().__init__(env_params, sim_params, network, simulator)
 
     @property
@@ -97,53 +102,19 @@ class MultiAgentMergePOEnv(MultiEnv):
 
     def get_state(self, rl_id=None, **kwargs):
         """See class definition."""
-        observation = {}
-        self.leader = []
-        self.follower = []
+        rl_ids = self.k.vehicle.get_rl_ids()
+        state = self._obs.allocate([("rl", 5)], num_rows=len(rl_ids))
+        self.leader, self.follower = lead_follow_observations(
+            self, rl_ids, state)
 
-        # normalizing constants
-        max_speed = self.k.network.max_speed()
-        max_length = self.k.network.length()
-
-        for rl_id in self.k.vehicle.get_rl_ids():
-            this_speed = self.k.vehicle.get_speed(rl_id)
-            lead_id = self.k.vehicle.get_leader(rl_id)
-            follower = self.k.vehicle.get_follower(rl_id)
-
-            if lead_id in ["", None]:
-                # in case leader is not visible
-                lead_speed = max_speed
-                lead_head = max_length
-            else:
-                self.leader.append(lead_id)
-                lead_speed = self.k.vehicle.get_speed(lead_id)
-                lead_head = self.k.vehicle.get_x_by_id(lead_id) \
-                    - self.k.vehicle.get_x_by_id(rl_id) \
-                    - self.k.vehicle.get_length(rl_id)
-
-            if follower in ["", None]:
-                # in case follower is not visible
-                follow_speed = 0
-                follow_head = max_length
-            else:
-                self.follower.append(follower)
-                follow_speed = self.k.vehicle.get_speed(follower)
-                follow_head = self.k.vehicle.get_headway(follower)
-
-            observation[rl_id] = np.array([
-                this_speed / max_speed,
-                (lead_speed - this_speed) / max_speed,
-                lead_head / max_length,
-                (this_speed - follow_speed) / max_speed,
-                follow_head / max_length
-            ])
-
-        return observation
+        # the observations are copied, as the buffer is reused by the next
+        # call and the agents may keep their observations
+        return dict(zip(rl_ids, state.copy()))
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
         if self.env_params.evaluate:
-            return np.mean(self.k.vehicle.get_speed(self.k.vehicle.get_ids()))
+            return self.k.metrics.mean_speed
         else:
             # return a reward of 0 if a collision occurred
             if kwargs["fail"]:
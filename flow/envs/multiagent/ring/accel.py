@@ -3,6 +3,8 @@ import numpy as np
 from gym.spaces import Box
 
 from flow.core import rewards
+from flow.core.observations import ObservationBuffer, \
+    lead_follow_observations
 from flow.envs.ring.accel import AccelEnv
 from flow.envs.multiagent.base import MultiEnv
 
@@ -65,8 +67,7 @@ class AdversarialAccelEnv(AccelEnv, MultiEnv):
         the adversary receives the negative of the agent reward
         """
         if self.env_params.evaluate:
-            reward = np.mean(self.k.vehicle.get_speed(
-                self.k.vehicle.get_ids()))
+            reward = self.k.metrics.mean_speed
             return {'av': reward, 'adversary': -reward}
         else:
             reward = rewards.desired_velocity(self, fail=kwargs['fail'])
@@ -131,6 +132,9 @@ class MultiAgentAccelPOEnv(MultiEnv):
         self.leader = []
         self.follower = []
 
+        # preallocated buffer of the observations
+        self._obs = ObservationBuffer()
+
         super().__init__(env_params, sim_params, network, simulator)
 
     @property
@@ -162,51 +166,17 @@ class MultiAgentAccelPOEnv(MultiEnv):
 
     def get_state(self, **kwargs):  # FIXME
         """See class definition."""
-        self.leader = []
-        self.follower = []
-        obs = {}
-
-        # normalizing constants
-        max_speed = self.k.network.max_speed()
-        max_length = self.k.network.length()
-
-        for rl_id in self.k.vehicle.get_rl_ids():
-            this_pos = self.k.vehicle.get_x_by_id(rl_id)
-            this_speed = self.k.vehicle.get_speed(rl_id)
-            lead_id = self.k.vehicle.get_leader(rl_id)
-            follower = self.k.vehicle.get_follower(rl_id)
-
-            if lead_id in ["", None]:
-                # in case leader is not visible
-                lead_speed = max_speed
-                lead_head = max_length
-            else:
-                self.leader.append(lead_id)
-                lead_speed = self.k.vehicle.get_speed(lead_id)
-                lead_head = self.k.vehicle.get_x_by_id(lead_id) \
-                    - self.k.vehicle.get_x_by_id(rl_id) \
-                    - self.k.vehicle.get_length(rl_id)
-
-            if follower in ["", None]:
-                # in case follower is not visible
-                follow_speed = 0
-                follow_head = max_length
-            else:
-                self.follower.append(follower)
-                follow_speed = self.k.vehicle.get_speed(follower)
-                follow_head = self.k.vehicle.get_headway(follower)
-
-            # Add the next observation.
-            obs[rl_id] = np.array([
-                this_pos / max_length,
-                this_speed / max_speed,
-                (lead_speed - this_speed) / max_speed,
-                lead_head / max_length,
-                (this_speed - follow_speed) / max_speed,
-                follow_head / max_length
-            ])
-
-        return obs
+        rl_ids = self.k.vehicle.get_rl_ids()
+        state = self._obs.allocate(
+            [("pos", 1), ("lead_follow", 5)], num_rows=len(rl_ids))
+        np.divide(self.k.vehicle.get_x_array(rl_ids),
+                  self.k.network.length(), out=self._obs["pos"][:, 0])
+        self.leader, self.follower = lead_follow_observations(
+            self, rl_ids, self._obs["lead_follow"])
+
+        # the observations are copied, as the buffer is reused by the next
+        # call and the agents may keep their observations
+        return dict(zip(rl_ids, state.copy()))
 
     def additional_command(self):
         """See parent class.
@@ -1,6 +1,7 @@
 """Environment for training the acceleration behavior of vehicles in a ring."""
 
 from flow.core import rewards
+from flow.core.observations import ObservationBuffer
 from flow.envs.base import Env
 
 from gym.spaces.box import Box
@@ -77,6 +78,9 @@ class AccelEnv(Env):
         self.prev_pos = dict()
         self.absolute_position = dict()
 
+        # preallocated buffer of the observations
+        self._obs = ObservationBuffer()
+
         super().__init__(env_params, sim_params, network, simulator)
 
     @property
@@ -109,18 +113,21 @@ class AccelEnv(Env):
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
         if self.env_params.evaluate:
-            return np.mean(self.k.vehicle.get_speed(self.k.vehicle.get_ids()))
+            return self.k.metrics.mean_speed
         else:
             return rewards.desired_velocity(self, fail=kwargs['fail'])
 
     def get_state(self):
         """See class definition."""
-        speed = [self.k.vehicle.get_speed(veh_id) / self.k.network.max_speed()
-                 for veh_id in self.sorted_ids]
-        pos = [self.k.vehicle.get_x_by_id(veh_id) / self.k.network.length()
-               for veh_id in self.sorted_ids]
-
-        return np.array(speed + pos)
+        num_veh = len(self.sorted_ids)
+        state = self._obs.allocate(
+            [("speed", num_veh), ("pos", num_veh)], fill=None)
+        np.divide(self.k.vehicle.get_speed_array(self.sorted_ids),
+                  self.k.network.max_speed(), out=self._obs["speed"])
+        np.divide(self.k.vehicle.get_x_array(self.sorted_ids),
+                  self.k.network.length(), out=self._obs["pos"])
+
+        return state
 
     def additional_command(self):
         """See parent class.
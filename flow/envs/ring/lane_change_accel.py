@@ -120,14 +120,18 @@ class LaneChangeAccelEnv(AccelEnv):
             self.k.network.num_lanes(edge)
             for edge in self.k.network.get_edge_list())
 
-        speed = [self.k.vehicle.get_speed(veh_id) / max_speed
-                 for veh_id in self.sorted_ids]
-        pos = [self.k.vehicle.get_x_by_id(veh_id) / length
-               for veh_id in self.sorted_ids]
-        lane = [self.k.vehicle.get_lane(veh_id) / max_lanes
-                for veh_id in self.sorted_ids]
-
-        return np.array(speed + pos + lane)
+        num_veh = len(self.sorted_ids)
+        state = self._obs.allocate(
+            [("speed", num_veh), ("pos", num_veh), ("lane", num_veh)],
+            fill=None)
+        np.divide(self.k.vehicle.get_speed_array(self.sorted_ids), max_speed,
+                  out=self._obs["speed"])
+        np.divide(self.k.vehicle.get_x_array(self.sorted_ids), length,
+                  out=self._obs["pos"])
+        np.divide(self.k.vehicle.get_lane_array(self.sorted_ids), max_lanes,
+                  out=self._obs["lane"])
+
+        return state
 
     def _apply_rl_actions(self, actions):
         """See class definition."""
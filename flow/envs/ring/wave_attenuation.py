@@ -10,6 +10,7 @@ abs/1710.05465, 2017. [Online]. Available: https://arxiv.org/abs/1710.05465
 
 from flow.core.params import InitialConfig
 from flow.core.params import NetParams
+from flow.core.observations import ObservationBuffer
 from flow.envs.base import Env
 
 from gym.spaces.box import Box
@@ -84,6 +85,9 @@ class WaveAttenuationEnv(Env):
                 raise KeyError(
                     'Environment parameter \'{}\' not supplied'.format(p))
 
+        # preallocated buffer of the observations
+        self._obs = ObservationBuffer()
+
         super().__init__(env_params, sim_params, network, simulator)
 
     @property
@@ -140,12 +144,15 @@ class WaveAttenuationEnv(Env):
 
     def get_state(self):
         """See class definition."""
-        speed = [self.k.vehicle.get_speed(veh_id) / self.k.network.max_speed()
-                 for veh_id in self.k.vehicle.get_ids()]
-        pos = [self.k.vehicle.get_x_by_id(veh_id) / self.k.network.length()
-               for veh_id in self.k.vehicle.get_ids()]
-
-        return np.array(speed + pos)
+        num_veh = self.k.vehicle.num_vehicles
+        state = self._obs.allocate(
+            [("speed", num_veh), ("pos", num_veh)], fill=None)
+        np.divide(self.k.vehicle.get_speed_array(),
+                  self.k.network.max_speed(), out=self._obs["speed"])
+        np.divide(self.k.vehicle.get_x_array(),
+                  self.k.network.length(), out=self._obs["pos"])
+
+        return state
 
     def additional_command(self):
         """Define which vehicles are observed for visualization purposes."""
@@ -12,6 +12,7 @@ from gym.spaces.discrete import Discrete
 from gym.spaces import Tuple
 
 from flow.core import rewards
+from flow.core.observations import ObservationBuffer
 from flow.envs.base import Env
 
 ADDITIONAL_ENV_PARAMS = {
@@ -123,6 +124,11 @@ class TrafficLightGridEnv(Env):
         self.num_traffic_lights = self.rows * self.cols
         self.tl_type = env_params.additional_params.get('tl_type')
 
+        # preallocated buffer of the observations
+        self._obs = ObservationBuffer()
+        # properties of the edges occupied by vehicles, see _edge_state
+        self._edge_info = {}
+
         super().__init__(env_params, sim_params, network, simulator)
 
         # Saving env variables for plotting
@@ -214,28 +220,27 @@ class TrafficLightGridEnv(Env):
                        grid_array["long_length"],
                        grid_array["inner_length"])
 
-        # get the state arrays
-        speeds = [
-            self.k.vehicle.get_speed(veh_id) / self.k.network.max_speed()
-            for veh_id in self.k.vehicle.get_ids()
-        ]
-        dist_to_intersec = [
-            self.get_distance_to_intersection(veh_id) / max_dist
-            for veh_id in self.k.vehicle.get_ids()
-        ]
-        edges = [
-            self._convert_edge(self.k.vehicle.get_edge(veh_id)) /
-            (self.k.network.network.num_edges - 1)
-            for veh_id in self.k.vehicle.get_ids()
-        ]
-
-        state = [
-            speeds, dist_to_intersec, edges,
-            self.last_change.flatten().tolist(),
-            self.direction.flatten().tolist(),
-            self.currently_yellow.flatten().tolist()
-        ]
-        return np.array(state)
+        # the vehicle and traffic light states are concatenated
+        num_veh = len(self.k.vehicle.get_ids())
+        state = self._obs.allocate([
+            ("speed", num_veh), ("dist", num_veh), ("edge", num_veh),
+            ("last_change", self.num_traffic_lights),
+            ("direction", self.num_traffic_lights),
+            ("currently_yellow", self.num_traffic_lights),
+        ], fill=None)
+
+        np.divide(self.k.vehicle.get_speed_array(),
+                  self.k.network.max_speed(), out=self._obs["speed"])
+        dist_to_intersec, edges = self._edge_state()
+        np.divide(dist_to_intersec, max_dist, out=self._obs["dist"])
+        np.divide(edges, self.k.network.network.num_edges - 1,
+                  out=self._obs["edge"])
+
+        self._obs["last_change"][:] = self.last_change[:, 0]
+        self._obs["direction"][:] = self.direction[:, 0]
+        self._obs["currently_yellow"][:] = self.currently_yellow[:, 0]
+
+        return state
 
     def _apply_rl_actions(self, rl_actions):
         """See class definition."""
@@ -323,6 +328,48 @@ class TrafficLightGridEnv(Env):
         dist = edge_len - relative_pos
         return dist
 
+    def _edge_state(self):
+        """Return the edge-based state of all vehicles.
+
+        This is a vectorized version of `find_intersection_dist` and
+        `_convert_edge`, in which the properties of every edge are only
+        computed the first time a vehicle is located on it.
+
+        Returns
+        -------
+        np.ndarray
+            distance from every vehicle to the intersection it is heading
+            toward
+        np.ndarray
+            number of the edge every vehicle is located on
+        """
+        veh_ids = self.k.vehicle.get_ids()
+        edges, inverse = np.unique(
+            np.asarray(self.k.vehicle.get_edge(veh_ids), dtype=str),
+            return_inverse=True)
+
+        # distance from the start of the edge to the intersection, whether
+        # this distance is reduced by the position of the vehicle, and number
+        # of the edge
+        for edge in edges:
+            if edge not in self._edge_info:
+                if edge == "":
+                    info = (-10, False, self._split_edge(edge))
+                elif 'center' in edge:
+                    info = (0, False, self._split_edge(edge))
+                else:
+                    info = (self.k.network.edge_length(edge), True,
+                            self._split_edge(edge))
+                self._edge_info[edge] = info
+
+        info = np.array([self._edge_info[edge] for edge in edges],
+                        dtype=float).reshape(-1, 3)[inverse.reshape(-1)]
+        dist = np.where(info[:, 1] > 0,
+                        info[:, 0] - self.k.vehicle.get_position_array(veh_ids),
+                        info[:, 0])
+
+        return dist, info[:, 2]
+
     def _convert_edge(self, edges):
         """Convert the string edge to a number.
 
@@ -697,14 +744,13 @@ class TrafficLightGridPOEnv(TrafficLightGridEnv):
         density = []
         velocity_avg = []
         for edge in self.k.network.get_edge_list():
-            ids = self.k.vehicle.get_ids_by_edge(edge)
-            if len(ids) > 0:
+            num_ids = self.k.metrics.edge_count(edge)
+            if num_ids > 0:
                 vehicle_length = 5
-                density += [vehicle_length * len(ids) /
+                density += [vehicle_length * num_ids /
                             self.k.network.edge_length(edge)]
-                velocity_avg += [np.mean(
-                    [self.k.vehicle.get_speed(veh_id) for veh_id in
-                     ids]) / max_speed]
+                velocity_avg += [
+                    self.k.metrics.edge_mean_speed(edge) / max_speed]
             else:
                 density += [0]
                 velocity_avg += [0]
@@ -0,0 +1,187 @@
+"""Contains a wrapper that steps several environments from one process."""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from flow.utils.registry import make_create_env
+
+
+class FlowVecEnv(object):
+    """Vectorized environment stepping several Flow environments at once.
+
+    Each environment runs its own simulator instance. The environments are
+    stepped concurrently by a pool of threads: while a thread waits for its
+    simulator to complete a simulation step, the other threads may issue the
+    commands of their own environments, so that the simulation steps of all
+    instances overlap. Observations, rewards and dones are returned as
+    batched arrays, whose first dimension is the index of the environment,
+    so that policies may compute the actions of all environments at once.
+
+    Environments that are done are reset automatically, in which case the
+    returned observation is the first observation of the new rollout, and
+    the last observation of the previous rollout is stored under
+    "terminal_observation" in the info dict of the environment.
+
+    Only single-agent environments are supported.
+
+    Usage
+    -----
+    >>> vec_env = FlowVecEnv.from_flow_params(flow_params, num_envs=8)
+    >>> obs = vec_env.reset()
+    >>> for _ in range(1000):
+    ...     actions = policy(obs)  # one batched inference for all envs
+    ...     obs, rewards, dones, infos = vec_env.step(actions)
+    >>> vec_env.close()
+
+    Attributes
+    ----------
+    envs : list of flow.envs.Env
+        the environments
+    num_envs : int
+        number of environments
+    observation_space : gym.spaces.*
+        observation space of a single environment
+    action_space : gym.spaces.*
+        action space of a single environment
+    """
+
+    def __init__(self, env_fns, num_threads=None):
+        """Instantiate the vectorized environment.
+
+        Parameters
+        ----------
+        env_fns : list of callable
+            functions creating each environment. The environments are
+            created sequentially, so that each simulator instance is assigned
+            a distinct port.
+        num_threads : int, optional
+            number of threads stepping the environments, defaults to one
+            thread per environment
+        """
+        self.envs = [env_fn() for env_fn in env_fns]
+        self.num_envs = len(self.envs)
+        self.observation_space = self.envs[0].observation_space
+        self.action_space = self.envs[0].action_space
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=num_threads or self.num_envs)
+        self._futures = None
+
+    @classmethod
+    def from_flow_params(cls, flow_params, num_envs, num_threads=None):
+        """Create a vectorized environment from flow-specific parameters.
+
+        Parameters
+        ----------
+        flow_params : dict
+            flow-specific parameters (see flow.utils.registry.make_create_env)
+        num_envs : int
+            number of environments
+        num_threads : int, optional
+            number of threads stepping the environments
+
+        Returns
+        -------
+        FlowVecEnv
+            the vectorized environment
+        """
+        env_fns = [make_create_env(flow_params, version=i)[0]
+                   for i in range(num_envs)]
+        return cls(env_fns, num_threads=num_threads)
+
+    def reset(self):
+        """Reset all environments.
+
+        Returns
+        -------
+        np.ndarray
+            the initial observations of all environments
+        """
+        self.wait()
+        return np.stack(list(self._executor.map(lambda env: env.reset(),
+                                                self.envs)))
+
+    def step_async(self, actions):
+        """Start stepping all environments.
+
+        The results are collected by `step_wait`, so that other computations
+        may be performed while the simulators advance.
+
+        Parameters
+        ----------
+        actions : array_like or None
+            the actions of every environment, indexed by environment. If set
+            to None, no actions are applied to any environment.
+        """
+        self.wait()
+        if actions is None:
+            actions = [None] * self.num_envs
+        self._futures = [self._executor.submit(self._step_env, env, action)
+                         for env, action in zip(self.envs, actions)]
+
+    def step_wait(self):
+        """Collect the results of the steps started by `step_async`.
+
+        Returns
+        -------
+        np.ndarray
+            observations of all environments
+        np.ndarray
+            rewards of all environments
+        np.ndarray
+            whether each environment reached the end of its rollout
+        list of dict
+            info dicts of all environments
+        """
+        results = [future.result() for future in self._futures]
+        self._futures = None
+
+        obs, rewards, dones, infos = zip(*results)
+        return np.stack(obs), np.asarray(rewards, dtype=float), \
+            np.asarray(dones, dtype=bool), list(infos)
+
+    def step(self, actions):
+        """Advance all environments by one step.
+
+        Parameters
+        ----------
+        actions : array_like or None
+            the actions of every environment, indexed by environment
+
+        Returns
+        -------
+        np.ndarray
+            observations of all environments
+        np.ndarray
+            rewards of all environments
+        np.ndarray
+            whether each environment reached the end of its rollout
+        list of dict
+            info dicts of all environments
+        """
+        self.step_async(actions)
+        return self.step_wait()
+
+    def wait(self):
+        """Wait for any pending steps to complete, discarding their results."""
+        if self._futures is not None:
+            for future in self._futures:
+                future.result()
+            self._futures = None
+
+    def close(self):
+        """Terminate all environments."""
+        self.wait()
+        for env in self.envs:
+            env.terminate()
+        self._executor.shutdown()
+
+    @staticmethod
+    def _step_env(env, action):
+        """Step a single environment, and reset it if it is done."""
+        obs, reward, done, info = env.step(action)
+        if done:
+            info = dict(info)
+            info["terminal_observation"] = obs
+            obs = env.reset()
+        return obs, reward, done, info
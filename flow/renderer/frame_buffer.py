@@ -0,0 +1,113 @@
+"""Contains the buffer used to store the history of rendered frames."""
+
+import numpy as np
+
+
+class FrameBuffer(object):
+    """Preallocated ring buffer of the most recent frames (or sights).
+
+    The buffer stores the last `length` arrays appended to it, which must all
+    have the same shape and type. Appending an array copies it into the
+    preallocated storage and overwrites the oldest one, without any memory
+    allocation.
+
+    Every array is stored twice, `length` slots apart, so that the stored
+    arrays are always available as a contiguous block in chronological order.
+    `stacked` thus returns a view of the history, of shape (length,) + shape
+    of the arrays, without copying it.
+
+    Usage
+    -----
+    >>> buffer = FrameBuffer(length=5)
+    >>> buffer.reset(frame)  # fill the buffer with the first frame
+    >>> buffer.append(next_frame)
+    >>> obs = buffer.stacked()  # oldest to most recent frame
+    >>> buffer[-1]  # most recent frame
+
+    Attributes
+    ----------
+    length : int
+        number of arrays stored in the buffer
+    """
+
+    def __init__(self, length=5):
+        """Instantiate the buffer.
+
+        Parameters
+        ----------
+        length : int, optional
+            number of arrays stored in the buffer
+        """
+        if length < 1:
+            raise ValueError("The length of the buffer must be positive.")
+        self.length = length
+        self._data = None
+        self._start = 0
+
+    def reset(self, item):
+        """Fill the buffer with copies of an array.
+
+        The storage is only reallocated if the shape or type of the array
+        differs from the ones of the arrays previously stored.
+
+        Parameters
+        ----------
+        item : array_like
+            the array the buffer is filled with
+        """
+        item = np.asarray(item)
+        if self._data is None or self._data.shape[1:] != item.shape or \
+                self._data.dtype != item.dtype:
+            self._data = np.empty((2 * self.length,) + item.shape,
+                                  dtype=item.dtype)
+        self._data[:] = item
+        self._start = 0
+
+    def append(self, item):
+        """Append an array to the buffer, overwriting the oldest one.
+
+        If the array differs in shape or type from the arrays stored in the
+        buffer (e.g. if the number of observed vehicles changed), the buffer
+        is reset with the array.
+
+        Parameters
+        ----------
+        item : array_like
+            the array to append
+        """
+        item = np.asarray(item)
+        if self._data is None or self._data.shape[1:] != item.shape or \
+                self._data.dtype != item.dtype:
+            self.reset(item)
+            return
+
+        self._data[self._start] = item
+        self._data[self._start + self.length] = item
+        self._start = (self._start + 1) % self.length
+
+    def stacked(self):
+        """Return the stored arrays, from the oldest to the most recent.
+
+        Returns
+        -------
+        numpy.ndarray
+            read-only view of the stored arrays, of shape (length,) + shape
+            of the arrays. The view is overwritten by subsequent appends.
+        """
+        if self._data is None:
+            raise ValueError("The buffer is empty.")
+        view = self._data[self._start:self._start + self.length]
+        view.flags.writeable = False
+        return view
+
+    def __len__(self):
+        """Return the number of arrays in the buffer."""
+        return 0 if self._data is None else self.length
+
+    def __getitem__(self, index):
+        """Return a stored array, indexed from the oldest one."""
+        return self.stacked()[index]
+
+    def __iter__(self):
+        """Iterate over the stored arrays, from the oldest one."""
+        return iter(self.stacked() if self._data is not None else [])
@@ -0,0 +1,526 @@
+"""Contains the offscreen numpy renderer class."""
+
+import matplotlib.cm as cm
+import matplotlib.colors as colors
+import numpy as np
+import cv2
+import os
+from os.path import expanduser
+import time
+import copy
+HOME = expanduser("~")
+
+# background color of the frames (same as the pyglet renderer)
+BACKGROUND_COLOR = 32
+
+# color of the lanes (same as the pyglet renderer)
+LANE_COLOR = 224
+
+
+class NumpyRenderer(object):
+    """Offscreen renderer based on numpy.
+
+    Drop-in replacement for flow.renderer.pyglet_renderer.PygletRenderer that
+    does not require a display or OpenGL, and is thus suitable for
+    pixel-based learning on headless machines. The frames have the same size,
+    coordinates, and colors as the frames of the pyglet renderer (up to
+    rasterization details).
+
+    The road network is rasterized once, when the renderer is created. Every
+    call to `render` then copies it and stamps all vehicles at once, and the
+    local observations of several vehicles are extracted from the frame in a
+    single vectorized gather (see `get_sights`).
+
+    Attributes
+    ----------
+    data : list
+        A list of rendering data to be saved when save_render is set to
+        True.
+    mode : str
+
+        * "gray": static grayscale rendering, which is good for training
+        * "dgray": dynamic grayscale rendering
+        * "rgb": static RGB rendering
+        * "drgb": dynamic RGB rendering, which is good for visualization
+
+    save_render : bool
+        Specify whether to save rendering data to disk
+    path : str
+        Specify where to store the rendering data
+    sight_radius : int
+        Set the radius of observation for RL vehicles (meter)
+    show_radius : bool
+        Specify whether to render the radius of RL observation
+    time : int
+        Rendering time that increments by one with every render() call
+    lane_polys : list
+        A list of road network polygons, in pixels
+    width : int
+        Width of the frame
+    height : int
+        Height of the frame
+    x_shift : float
+        The shift substracted to the input x coordinate
+    x_scale : float
+        The scale multiplied to the input x coordinate
+    y_shift : float
+        The shift substracted to the input y coordinate
+    y_scale : float
+        The scale multiplied to the input y coordinate
+    network : numpy.array
+        The frame containing only the road network, of size height x width x 3
+    frame : numpy.array
+        The last rendered frame, of size height x width x 3 (in BGR order)
+    pxpm : int
+        Specify rendering resolution (pixel / meter)
+    """
+
+    def __init__(self, network, mode,
+                 save_render=False,
+                 path=HOME+"/flow_rendering",
+                 sight_radius=50,
+                 show_radius=False,
+                 pxpm=2,
+                 alpha=1.0):
+        """Initialize the numpy renderer.
+
+        Parameters
+        ----------
+        network : list of list
+            A list of road network polygons. Each polygon is expressed as
+            a list of x and y coordinates, e.g., [x1, y1, x2, y2, ...]
+        mode : str
+            One of "gray", "dgray", "rgb", or "drgb"
+        save_render : bool
+            Specify whether to save rendering data to disk
+        path : str
+            Specify where to store the rendering data
+        sight_radius : int
+            Set the radius of observation for RL vehicles (meter)
+        show_radius : bool
+            Specify whether to render the radius of RL observation
+        pxpm : int
+            Specify rendering resolution (pixel / meter)
+        alpha : int
+            Specify opacity of the vehicles and lanes.
+            1.0 is fully opaque; 0.0 is fully transparent.
+        """
+        self.mode = mode
+        if self.mode not in ["rgb", "drgb", "gray", "dgray"]:
+            raise ValueError("Mode %s is not supported!" % self.mode)
+        self.save_render = save_render
+        self.path = path + '/' + time.strftime("%Y-%m-%d-%H%M%S")
+        if self.save_render:
+            if not os.path.exists(path):
+                os.mkdir(path)
+            os.mkdir(self.path)
+            self.data = [network]
+        self.sight_radius = sight_radius
+        self.pxpm = pxpm  # Pixel per meter
+        self.show_radius = show_radius
+        self.alpha = alpha
+        self.time = 0
+
+        lane_polys_flat = [pt for poly in network for pt in poly]
+
+        polys_x = np.asarray(lane_polys_flat[::2])
+        width = int(polys_x.max() - polys_x.min())
+        shift = polys_x.min() - 2
+        scale = (width - 4) / width
+        self.width = (width + 2*self.sight_radius) * self.pxpm
+        self.x_shift = shift - self.sight_radius
+        self.x_scale = scale
+
+        polys_y = np.asarray(lane_polys_flat[1::2])
+        height = int(polys_y.max() - polys_y.min())
+        shift = polys_y.min() - 2
+        scale = (height - 4) / height
+        self.height = (height + 2*self.sight_radius) * self.pxpm
+        self.y_shift = shift - self.sight_radius
+        self.y_scale = scale
+
+        self.lane_polys = []
+        for lane_poly in network:
+            x, y = self._to_pixels(np.asarray(lane_poly[::2], dtype=float),
+                                   np.asarray(lane_poly[1::2], dtype=float))
+            self.lane_polys.append(np.stack([x, y], axis=1))
+
+        # draw the static layer of the frames
+        self.network = np.full((self.height, self.width, 3),
+                               BACKGROUND_COLOR, dtype=np.uint8)
+        if len(self.lane_polys) > 0:
+            starts = np.concatenate([p[:-1] for p in self.lane_polys])
+            ends = np.concatenate([p[1:] for p in self.lane_polys])
+            self._draw_lines(self.network, starts, ends,
+                             np.full((len(starts), 3), LANE_COLOR))
+        self.frame = self.network.copy()
+
+        # pixel offsets of the sight windows, relative to their corner
+        radius = self.sight_radius * self.pxpm
+        size = 2 * int(radius)
+        self._sight_cols, self._sight_rows = np.meshgrid(
+            np.arange(size), np.arange(size))
+        self._sight_mask = (self._sight_cols - int(radius)) ** 2 + \
+            (self._sight_rows - int(radius)) ** 2 <= int(radius) ** 2
+
+    def render(self,
+               human_orientations,
+               machine_orientations,
+               human_dynamics,
+               machine_dynamics,
+               human_logs,
+               machine_logs):
+        """Update the rendering frame.
+
+        Parameters
+        ----------
+        human_orientations : list
+            A list contains orientations of all human vehicles
+            An orientation is a list contains [x, y, angle].
+        machine_orientations : list
+            A list contains orientations of all RL vehicles
+            An orientation is a list contains [x, y, angle].
+        human_dynamics : list
+            A list contains the speed of all human vehicles normalized by
+            max speed, i.e., speed/max_speed
+            This is used to dynamically color human vehicles based on its
+            velocity.
+        machine_dynamics : list
+            A list contains the speed of all RL vehicles normalized by
+            max speed, i.e., speed/max_speed
+            This is used to dynamically color RL vehicles based on its
+            velocity.
+        human_logs : list
+            A list contains the timestep (ms), timedelta (ms), and id of
+            all human vehicles
+        machine_logs : list
+            A list contains the timestep (ms), timedelta (ms), and id of
+            all RL vehicles
+
+        Returns
+        -------
+        numpy.array
+            the frame, of size height x width (x 3 in rgb modes)
+        """
+        if self.save_render:
+            _human_orientations = copy.deepcopy(human_orientations)
+            _machine_orientations = copy.deepcopy(machine_orientations)
+            _human_dynamics = copy.deepcopy(human_dynamics)
+            _machine_dynamics = copy.deepcopy(machine_dynamics)
+            _human_logs = copy.deepcopy(human_logs)
+            _machine_logs = copy.deepcopy(machine_logs)
+
+        self.time += 1
+
+        human_colors, machine_colors = self._vehicle_colors(
+            np.asarray(human_dynamics, dtype=float),
+            np.asarray(machine_dynamics, dtype=float))
+
+        orientations = np.asarray(
+            list(human_orientations) + list(machine_orientations),
+            dtype=float).reshape(-1, 3)
+        vehicle_colors = np.concatenate([human_colors, machine_colors])
+
+        self.frame = self.network.copy()
+        if len(orientations) > 0:
+            x, y = self._to_pixels(orientations[:, 0], orientations[:, 1])
+            self._draw_triangles(x, y, orientations[:, 2], vehicle_colors)
+            if self.show_radius and len(machine_orientations) > 0:
+                num_humans = len(human_orientations)
+                self._draw_circles(x[num_humans:], y[num_humans:],
+                                   self.sight_radius, machine_colors)
+
+        if self.save_render:
+            cv2.imwrite("%s/frame_%06d.png" %
+                        (self.path, self.time), self.frame)
+            self.data.append([_human_orientations, _machine_orientations,
+                              _human_dynamics, _machine_dynamics,
+                              _human_logs, _machine_logs])
+        if "gray" in self.mode:
+            return self.frame[:, :, 0]
+        else:
+            return self.frame
+
+    def close(self):
+        """Terminate the renderer."""
+        save_path = ''
+        if self.save_render:
+            save_path = '%s/data_%06d.npy' % (self.path, self.time)
+            # the rendering data is ragged, and is saved as an object array
+            data = np.empty(len(self.data), dtype=object)
+            for i, value in enumerate(self.data):
+                data[i] = value
+            np.save(save_path, data)
+        return save_path
+
+    def get_sight(self, orientation, veh_id):
+        """Return the local observation of a vehicle.
+
+        Parameters
+        ----------
+        orientation : list
+            An orientation is a list contains [x, y, angle]
+        veh_id : str
+            The vehicle to observe for
+        """
+        return self.get_sights([orientation], [veh_id])[0]
+
+    def get_sights(self, orientations, veh_ids):
+        """Return the local observations of several vehicles.
+
+        The observation of a vehicle is the disk of radius sight_radius around
+        it, rotated by the angle of the vehicle. The observations of all
+        vehicles are gathered from the current frame at once.
+
+        Parameters
+        ----------
+        orientations : list
+            A list of orientations
+            An orientation is a list contains [x, y, angle].
+        veh_ids : list of str
+            The vehicles to observe for
+
+        Returns
+        -------
+        numpy.array
+            the observation of every vehicle, of size num_vehicles x
+            2*sight_radius*pxpm x 2*sight_radius*pxpm (x 3 in rgb modes)
+        """
+        size = self._sight_mask.shape[0]
+        channels = self.frame.shape[2]
+        if len(orientations) == 0:
+            sights = np.zeros((0, size, size, channels), dtype=np.uint8)
+        else:
+            orientations = np.asarray(orientations, dtype=float)
+            x, y = self._to_pixels(orientations[:, 0], orientations[:, 1])
+            radius = self.sight_radius * self.pxpm
+            col_min = (x - radius).astype(int)
+            row_min = (self.height - y - radius).astype(int)
+
+            # rotate the windows around their center by the angle of the
+            # vehicles (counter-clockwise, like imutils.rotate)
+            ang = np.radians(orientations[:, 2])[:, None, None]
+            center = size // 2
+            dc = self._sight_cols - center
+            dr = self._sight_rows - center
+            cols = np.rint(np.cos(ang) * dc - np.sin(ang) * dr + center)
+            rows = np.rint(np.sin(ang) * dc + np.cos(ang) * dr + center)
+
+            # pixels outside the frame are black, as are the pixels outside
+            # the disk of the observation
+            cols = cols.astype(int) + col_min[:, None, None]
+            rows = rows.astype(int) + row_min[:, None, None]
+            valid = (cols >= 0) & (cols < self.width) & (rows >= 0) & \
+                (rows < self.height) & self._sight_mask
+            sights = np.where(
+                valid[..., None],
+                self.frame[np.clip(rows, 0, self.height - 1),
+                           np.clip(cols, 0, self.width - 1)],
+                0).astype(np.uint8)
+
+        if self.save_render:
+            for veh_id, sight in zip(veh_ids, sights):
+                cv2.imwrite("%s/sight_%s_%06d.png" %
+                            (self.path, veh_id, self.time), sight)
+        if "gray" in self.mode:
+            return sights[..., 0]
+        else:
+            return sights
+
+    def _to_pixels(self, x, y):
+        """Convert network coordinates into (sub)pixel coordinates.
+
+        The y axis points upwards, i.e. y = 0 is the bottom of the frame.
+        """
+        return (x - self.x_shift) * self.x_scale * self.pxpm, \
+            (y - self.y_shift) * self.y_scale * self.pxpm
+
+    def _vehicle_colors(self, human_dynamics, machine_dynamics):
+        """Return the RGB colors of the human and RL vehicles."""
+        if "drgb" in self.mode:
+            human_cmap = self._truncate_colormap(cm.Greens, 0.2, 0.8)
+            machine_cmap = self._truncate_colormap(cm.Blues, 0.2, 0.8)
+        elif "dgray" in self.mode:
+            human_cmap = self._truncate_colormap(cm.binary, 0.55, 0.95)
+            machine_cmap = self._truncate_colormap(cm.binary, 0.05, 0.45)
+        elif "rgb" in self.mode:
+            return np.tile([0, 225, 0], (len(human_dynamics), 1)), \
+                np.tile([0, 150, 200], (len(machine_dynamics), 1))
+        else:
+            return np.tile([100, 100, 100], (len(human_dynamics), 1)), \
+                np.tile([150, 150, 150], (len(machine_dynamics), 1))
+
+        return (255 * human_cmap(human_dynamics)[:, :3]).astype(np.uint8), \
+            (255 * machine_cmap(machine_dynamics)[:, :3]).astype(np.uint8)
+
+    def _blend(self, frame, rows, cols, rgb):
+        """Draw pixels of the given RGB color(s) into a (BGR) frame."""
+        bgr = np.asarray(rgb, dtype=float)[..., ::-1]
+        if self.alpha >= 1:
+            frame[rows, cols] = bgr
+        else:
+            frame[rows, cols] = np.rint(self.alpha * bgr + (1 - self.alpha)
+                                        * frame[rows, cols])
+
+    def _pixels(self, x, y):
+        """Return the pixels containing a set of points.
+
+        Parameters
+        ----------
+        x : numpy.array
+            x pixel coordinate of every point
+        y : numpy.array
+            y pixel coordinate of every point
+
+        Returns
+        -------
+        numpy.array
+            the row of the pixel of every point
+        numpy.array
+            the column of the pixel of every point
+        numpy.array
+            whether every point is located within the frame
+        """
+        cols = np.floor(x).astype(int)
+        rows = self.height - 1 - np.floor(y).astype(int)
+        inside = (cols >= 0) & (cols < self.width) & (rows >= 0) & \
+            (rows < self.height)
+        return rows, cols, inside
+
+    def _draw_lines(self, frame, starts, ends, rgb):
+        """Draw a set of line segments.
+
+        Every segment is sampled at intervals of at most half a pixel.
+
+        Parameters
+        ----------
+        frame : numpy.array
+            the frame the segments are drawn into
+        starts : numpy.array
+            (x, y) pixel coordinates of the first point of every segment
+        ends : numpy.array
+            (x, y) pixel coordinates of the last point of every segment
+        rgb : numpy.array
+            color of every segment
+        """
+        length = np.linalg.norm(ends - starts, axis=1)
+        num_samples = np.ceil(2 * length).astype(int) + 1
+        segment = np.repeat(np.arange(len(starts)), num_samples)
+
+        # position of every sample along its segment, between 0 and 1
+        first = np.cumsum(num_samples) - num_samples
+        step = np.arange(len(segment)) - first[segment]
+        t = step / np.maximum(num_samples - 1, 1)[segment]
+        points = starts[segment] + t[:, None] * (ends - starts)[segment]
+
+        rows, cols, inside = self._pixels(points[:, 0], points[:, 1])
+        self._blend(frame, rows[inside], cols[inside],
+                    np.asarray(rgb)[segment[inside]])
+
+    def _draw_triangles(self, x, y, angle, rgb):
+        """Draw every vehicle as a filled triangle.
+
+        The triangles match the ones drawn by PygletRenderer._add_triangle.
+
+        Parameters
+        ----------
+        x : numpy.array
+            x pixel coordinate of every vehicle
+        y : numpy.array
+            y pixel coordinate of every vehicle
+        angle : numpy.array
+            angle of every vehicle, in degrees
+        rgb : numpy.array
+            color of every vehicle
+        """
+        ang = np.radians(angle)
+        s = 5 * self.pxpm
+        x1 = x - s * self.x_scale * np.sin(ang)
+        y1 = y - s * self.y_scale * np.cos(ang)
+        dx = 0.25 * s * self.x_scale * np.sin(np.pi/2 - ang)
+        dy = 0.25 * s * self.y_scale * np.cos(np.pi/2 - ang)
+        # vertices of every triangle, of shape (num_vehicles, 3)
+        vx = np.stack([x, x1 + dx, x1 - dx], axis=1)
+        vy = np.stack([y, y1 - dy, y1 + dy], axis=1)
+
+        # test whether the centers of the pixels in a window around every
+        # triangle are on the same side of its three edges
+        x_min = np.floor(vx.min(axis=1)).astype(int)
+        y_min = np.floor(vy.min(axis=1)).astype(int)
+        size = int(np.ceil(max(np.ptp(vx, axis=1).max(),
+                               np.ptp(vy, axis=1).max()))) + 2
+        px = (x_min[:, None] + np.arange(size))[:, None, :] + 0.5
+        py = (y_min[:, None] + np.arange(size))[:, :, None] + 0.5
+
+        inside_pos = np.ones((len(x), size, size), dtype=bool)
+        inside_neg = inside_pos.copy()
+        for i in range(3):
+            j = (i + 1) % 3
+            edge = (vx[:, j] - vx[:, i])[:, None, None] * \
+                (py - vy[:, i][:, None, None]) - \
+                (vy[:, j] - vy[:, i])[:, None, None] * \
+                (px - vx[:, i][:, None, None])
+            inside_pos &= edge >= 0
+            inside_neg &= edge <= 0
+        veh, row_off, col_off = np.nonzero(inside_pos | inside_neg)
+
+        rows, cols, inside = self._pixels(
+            x_min[veh] + col_off, y_min[veh] + row_off)
+        self._blend(self.frame, rows[inside], cols[inside],
+                    np.asarray(rgb)[veh[inside]])
+
+    def _draw_circles(self, x, y, radius, rgb):
+        """Draw the outline of a circle around every vehicle.
+
+        The circles match the ones drawn by PygletRenderer._add_circle.
+
+        Parameters
+        ----------
+        x : numpy.array
+            x pixel coordinate of every vehicle
+        y : numpy.array
+            y pixel coordinate of every vehicle
+        radius : float
+            radius of the circles, in meters
+        rgb : numpy.array
+            color of every vehicle
+        """
+        radius = radius * self.pxpm
+        num_points = int(self.pxpm * 50)
+        angle = np.radians(np.arange(num_points) / num_points * 360.0)
+        # vertices of the circles, of shape (num_vehicles, num_points, 2)
+        points = np.stack([
+            radius * self.x_scale * np.cos(angle) + x[:, None],
+            radius * self.y_scale * np.sin(angle) + y[:, None],
+        ], axis=2)
+        self._draw_lines(
+            self.frame,
+            points.reshape(-1, 2),
+            np.roll(points, -1, axis=1).reshape(-1, 2),
+            np.repeat(np.asarray(rgb), num_points, axis=0))
+
+    @staticmethod
+    def _truncate_colormap(cmap, minval=0.25, maxval=0.75, n=100):
+        """Truncate a matplotlib colormap.
+
+        Parameters
+        ----------
+        cmap : matplotlib.colors.LinearSegmentedColormap
+            Original colormap
+        minval : float
+            Minimum value of the truncated colormap
+        maxval : float
+            Maximum value of the truncated colormap
+        n : int
+            Number of RGB quantization levels of the truncated colormap
+
+        Returns
+        -------
+        matplotlib.colors.LinearSegmentedColormap
+            truncated colormap
+        """
+        new_cmap = colors.LinearSegmentedColormap.from_list(
+            'trunc({n},{a:.2f},{b:.2f})'
+            .format(n=cmap.name, a=minval, b=maxval),
+            cmap(np.linspace(minval, maxval, n)))
+        return new_cmap
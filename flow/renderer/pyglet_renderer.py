@@ -351,6 +351,25 @@ class PygletRenderer(object):
         else:
             return rotated_sight
 
+    def get_sights(self, orientations, veh_ids):
+        """Return the local observations of several vehicles.
+
+        Parameters
+        ----------
+        orientations : list
+            A list of orientations
+            An orientation is a list contains [x, y, angle].
+        veh_ids : list of str
+            The vehicles to observe for
+
+        Returns
+        -------
+        list of numpy.array
+            the local observation of every vehicle (see get_sight)
+        """
+        return [self.get_sight(orientation, veh_id)
+                for orientation, veh_id in zip(orientations, veh_ids)]
+
     def _add_lane_polys(self):
         """Render road network polygons."""
         for lane_poly, lane_color in zip(self.lane_polys, self.lane_colors):
@@ -5,7 +5,7 @@ import struct
 
 import flow.utils.aimsun.constants as ac
 import flow.utils.aimsun.struct as aimsun_struct
-from flow.core.kernel.vehicle.aimsun import INFOS_ATTR_BY_INDEX
+import flow.utils.aimsun.bulk as bulk
 
 
 def create_client(port, print_status=False):
@@ -61,6 +61,11 @@ class FlowAimsunAPI(object):
     deprecated in the future. An server/client connection is created between
     Flow and the Aimsun run script. The client is passed to this object and
     commands are accordingly provided to the Aimsun sever via this client.
+
+    Commands concerning several vehicles are sent as bulk commands (see
+    flow/utils/aimsun/bulk.py), which only require a single round trip. In
+    particular, speeds and lane changes issued via `queue_speed` and
+    `queue_lane_change` are sent together before the next simulation step.
     """
 
     def __init__(self, port):
@@ -74,6 +79,10 @@ class FlowAimsunAPI(object):
         self.port = port
         self.s = create_client(port, print_status=True)
 
+        # speeds and lane changes sent before the next simulation step
+        self._queued_speeds = []
+        self._queued_lane_changes = []
+
     def _send_command(self, command_type, in_format, values, out_format):
         """Send an arbitrary command via the connection.
 
@@ -154,12 +163,36 @@ class FlowAimsunAPI(object):
 
             return unpacked_data
 
+    def _send_frame(self, command_type, payload):
+        """Send a bulk command via the connection.
+
+        Unlike `_send_command`, the command type and values are sent in a
+        single frame, and the server replies with a single frame.
+
+        Parameters
+        ----------
+        command_type : flow.utils.aimsun.constants.*
+            the bulk command the client would like Aimsun to execute
+        payload : bytes
+            the packed values of the command
+
+        Returns
+        -------
+        bytes
+            the payload of the response
+        """
+        self.s.sendall(bulk.pack_frame(command_type, payload))
+        _, response = bulk.recv_frame(self.s)
+        return response
+
     def simulation_step(self):
         """Advance the simulation by one step.
 
-        Since the connection is lost when this happens, this method also waits
-        for and reconnects to the server.
+        Any queued speeds and lane changes are applied first. Since the
+        connection is lost when this happens, this method also waits for and
+        reconnects to the server.
         """
+        self.flush_actions()
         self._send_command(ac.SIMULATION_STEP,
                            in_format=None, values=None, out_format=None)
 
@@ -267,6 +300,59 @@ class FlowAimsunAPI(object):
                            values=(veh_id, speed),
                            out_format='i')
 
+    def queue_speed(self, veh_id, speed):
+        """Set the speed of a specific vehicle before the next step.
+
+        Parameters
+        ----------
+        veh_id : int
+            name of the vehicle in Aimsun
+        speed : float
+            target speed
+        """
+        self._queued_speeds.append((veh_id, speed))
+
+    def queue_lane_change(self, veh_id, direction):
+        """Set the lane change action of a vehicle before the next step.
+
+        Parameters
+        ----------
+        veh_id : int
+            name of the vehicle in Aimsun
+        direction : int
+            target direction
+        """
+        self._queued_lane_changes.append((veh_id, direction))
+
+    def flush_actions(self):
+        """Apply all queued speeds and lane changes."""
+        if len(self._queued_speeds) > 0 or len(self._queued_lane_changes) > 0:
+            self.apply_vehicle_actions(self._queued_speeds,
+                                       self._queued_lane_changes)
+            self._queued_speeds = []
+            self._queued_lane_changes = []
+
+    def apply_vehicle_actions(self, speeds=None, lane_changes=None):
+        """Set the speeds and lane change actions of several vehicles.
+
+        All actions are sent in a single bulk command.
+
+        Parameters
+        ----------
+        speeds : list of (int, float), optional
+            names of the vehicles in Aimsun and their target speeds
+        lane_changes : list of (int, int), optional
+            names of the vehicles in Aimsun and their target directions
+
+        Returns
+        -------
+        int
+            status (should be 0)
+        """
+        payload = bulk.pack_actions_request(speeds or [], lane_changes or [])
+        response = self._send_frame(ac.VEH_APPLY_ACTIONS_BULK, payload)
+        return struct.unpack('<i', response)[0]
+
     def apply_lane_change(self, veh_id, direction):
         """Set the lane change action of a specific vehicle.
 
@@ -496,13 +582,65 @@ class FlowAimsunAPI(object):
         # place these tracking info into a struct
         ret = aimsun_struct.InfVeh()
         count = 0
-        for map_index in range(len(INFOS_ATTR_BY_INDEX)):
+        for map_index in range(len(bulk.TRACKING_INFO_ATTRS)):
             if info_bitmap[map_index] == '1':
-                setattr(ret, INFOS_ATTR_BY_INDEX[map_index], info[count])
+                setattr(ret, bulk.TRACKING_INFO_ATTRS[map_index], info[count])
                 count += 1
 
         return ret
 
+    def get_vehicles_tracking_info(self, veh_ids, info_bitmap):
+        """Return the tracking information of several tracked vehicles.
+
+        This collects, in a single bulk command, the tracking information of
+        each vehicle, as well as its leader, follower and next section, and
+        the position and length of its leader.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            names of the vehicles in Aimsun
+        info_bitmap : str
+            bitmap representing the tracking info to be returned
+            (cf function make_bitmap_for_tracking in vehicle/aimsun.py)
+
+        Returns
+        -------
+        list of tuple
+            for each vehicle: (tracking info, leader, follower, next section,
+            tracking info of the leader, length of the leader). The tracking
+            info of the leader only contains the attributes in
+            flow.utils.aimsun.bulk.LEADER_INFO_ATTRS, and is only meaningful
+            if the vehicle has a leader.
+        """
+        if len(veh_ids) == 0:
+            return []
+
+        response = self._send_frame(
+            ac.VEH_GET_TRACKING_BULK,
+            bulk.pack_tracking_request(info_bitmap, veh_ids))
+
+        attrs = [bulk.TRACKING_INFO_ATTRS[i] for i in range(len(info_bitmap))
+                 if info_bitmap[i] == '1']
+        num_attrs = len(attrs)
+        num_leader_attrs = len(bulk.LEADER_INFO_ATTRS)
+
+        ret = []
+        for record in bulk.unpack_tracking_response(info_bitmap, response):
+            info = aimsun_struct.InfVeh()
+            for attr, value in zip(attrs, record):
+                setattr(info, attr, value)
+            leader, follower, next_section = record[num_attrs:num_attrs + 3]
+            leader_info = aimsun_struct.InfVeh()
+            for attr, value in zip(bulk.LEADER_INFO_ATTRS,
+                                   record[num_attrs + 3:]):
+                setattr(leader_info, attr, value)
+            leader_length = record[num_attrs + 3 + num_leader_attrs]
+            ret.append((info, leader, follower, next_section, leader_info,
+                        leader_length))
+
+        return ret
+
     def get_vehicle_leader(self, veh_id):
         """Return the leader of a specific vehicle.
 
@@ -0,0 +1,284 @@
+"""Binary frames used by the bulk commands of the Aimsun API.
+
+Regular commands of the Flow/Aimsun API are exchanged in several stages (the
+command type, an acknowledgement, and then the values), and only concern a
+single vehicle. Bulk commands (e.g. ac.VEH_GET_TRACKING_BULK) instead send a
+single frame containing the data of all vehicles, and receive a single frame
+in response, i.e. one round trip per command regardless of the number of
+vehicles.
+
+Every frame starts with a header containing FRAME_MAGIC (which distinguishes
+it from the command types of regular commands), the command type, and the
+size of the payload in bytes. Payloads are packed in little-endian order with
+standard sizes.
+
+This module is imported by both Flow and the Aimsun run script, and must thus
+remain compatible with Python 2.7.
+"""
+import struct
+
+#: first bytes of every bulk frame
+FRAME_MAGIC = b'FBLK'
+
+#: header of every bulk frame: magic, command type, and size of the payload
+FRAME_HEADER = struct.Struct('<4sii')
+
+#: attributes of the tracking info objects (in the order of the bitmaps)
+TRACKING_INFO_ATTRS = [
+    'CurrentPos', 'distance2End', 'xCurrentPos', 'yCurrentPos', 'zCurrentPos',
+    'xCurrentPosBack', 'yCurrentPosBack', 'zCurrentPosBack', 'CurrentSpeed',
+    'TotalDistance', 'SectionEntranceT', 'CurrentStopTime', 'stopped',
+    'idSection', 'segment', 'numberLane', 'idJunction', 'idSectionFrom',
+    'idLaneFrom', 'idSectionTo', 'idLaneTo'
+]
+
+#: attributes of the tracking info of the leaders, followed by their length
+LEADER_INFO_ATTRS = [
+    'CurrentPos', 'distance2End', 'idSection', 'idJunction', 'idSectionFrom',
+    'idSectionTo'
+]
+
+# formats of the leader, follower and next section of a vehicle, and of the
+# information of its leader
+_LINKS_FORMAT = 'iii'
+_LEADER_FORMAT = 'ffiiiif'
+
+# bitmap and number of vehicles of the tracking requests
+_TRACKING_REQUEST = struct.Struct('<{}si'.format(len(TRACKING_INFO_ATTRS)))
+
+# number of speeds and lane changes of the action requests
+_ACTIONS_REQUEST = struct.Struct('<ii')
+
+
+def pack_frame(command_type, payload):
+    """Return a frame containing a payload.
+
+    Parameters
+    ----------
+    command_type : flow.utils.aimsun.constants.*
+        the bulk command
+    payload : bytes
+        the packed values of the command
+
+    Returns
+    -------
+    bytes
+        the frame
+    """
+    return FRAME_HEADER.pack(FRAME_MAGIC, command_type, len(payload)) + \
+        payload
+
+
+def is_frame(data):
+    """Return whether a message received by the server starts a frame."""
+    return data[:len(FRAME_MAGIC)] == FRAME_MAGIC
+
+
+def recv_exact(conn, size, data=b''):
+    """Receive an exact number of bytes from a socket.
+
+    Parameters
+    ----------
+    conn : socket.socket
+        socket connection
+    size : int
+        number of bytes to receive
+    data : bytes, optional
+        bytes that were already received
+
+    Returns
+    -------
+    bytes
+        the received bytes
+
+    Raises
+    ------
+    IOError
+        If the connection is closed before all bytes are received.
+    """
+    chunks = [data]
+    received = len(data)
+    while received < size:
+        chunk = conn.recv(min(size - received, 65536))
+        if not chunk:
+            raise IOError('Connection closed while receiving a frame.')
+        chunks.append(chunk)
+        received += len(chunk)
+    return b''.join(chunks)
+
+
+def recv_frame(conn, data=b''):
+    """Receive a frame from a socket.
+
+    Parameters
+    ----------
+    conn : socket.socket
+        socket connection
+    data : bytes, optional
+        first bytes of the frame, if they were already received
+
+    Returns
+    -------
+    int
+        the command type of the frame
+    bytes
+        the payload of the frame
+    """
+    header = recv_exact(conn, FRAME_HEADER.size, data[:FRAME_HEADER.size])
+    magic, command_type, size = FRAME_HEADER.unpack(header)
+    if magic != FRAME_MAGIC:
+        raise IOError('Invalid frame header: {!r}'.format(header))
+    payload = recv_exact(conn, size, data[FRAME_HEADER.size:])
+    return command_type, payload
+
+
+def tracking_info_format(info_bitmap):
+    """Return the struct format of the tracking info specified by a bitmap.
+
+    Parameters
+    ----------
+    info_bitmap : str
+        bitmap representing the tracking info to be returned (cf function
+        make_bitmap_for_tracking in flow/core/kernel/vehicle/aimsun.py)
+
+    Returns
+    -------
+    str
+        the struct format, without byte order
+    """
+    # the first 13 attributes are floats, the other ones are integers
+    return ''.join('f' if i <= 12 else 'i'
+                   for i in range(len(TRACKING_INFO_ATTRS))
+                   if info_bitmap[i] == '1')
+
+
+def tracking_record_format(info_bitmap):
+    """Return the struct format of the response for a single vehicle.
+
+    Each record contains the tracking info specified by the bitmap, the ids of
+    the leader and follower of the vehicle, the next section of the vehicle,
+    and the attributes in LEADER_INFO_ATTRS and the length of the leader.
+
+    Parameters
+    ----------
+    info_bitmap : str
+        bitmap representing the tracking info to be returned
+
+    Returns
+    -------
+    str
+        the struct format, without byte order
+    """
+    return tracking_info_format(info_bitmap) + _LINKS_FORMAT + _LEADER_FORMAT
+
+
+def pack_tracking_request(info_bitmap, veh_ids):
+    """Pack the payload of a VEH_GET_TRACKING_BULK request.
+
+    Parameters
+    ----------
+    info_bitmap : str
+        bitmap representing the tracking info to be returned
+    veh_ids : list of int
+        names of the vehicles in Aimsun
+
+    Returns
+    -------
+    bytes
+        the payload
+    """
+    return _TRACKING_REQUEST.pack(info_bitmap.encode('ascii'), len(veh_ids)) \
+        + struct.pack('<{}i'.format(len(veh_ids)), *veh_ids)
+
+
+def unpack_tracking_request(payload):
+    """Unpack the payload of a VEH_GET_TRACKING_BULK request.
+
+    Returns
+    -------
+    str
+        bitmap representing the tracking info to be returned
+    list of int
+        names of the vehicles in Aimsun
+    """
+    info_bitmap, num_vehicles = _TRACKING_REQUEST.unpack(
+        payload[:_TRACKING_REQUEST.size])
+    veh_ids = struct.unpack('<{}i'.format(num_vehicles),
+                            payload[_TRACKING_REQUEST.size:])
+    return info_bitmap.decode('ascii'), list(veh_ids)
+
+
+def pack_tracking_response(info_bitmap, records):
+    """Pack the payload of the response to a VEH_GET_TRACKING_BULK request.
+
+    Parameters
+    ----------
+    info_bitmap : str
+        bitmap representing the tracking info to be returned
+    records : list of tuple
+        values of every vehicle, in the order of tracking_record_format
+
+    Returns
+    -------
+    bytes
+        the payload
+    """
+    values = [value for record in records for value in record]
+    return struct.pack(
+        '<' + tracking_record_format(info_bitmap) * len(records), *values)
+
+
+def unpack_tracking_response(info_bitmap, payload):
+    """Unpack the payload of the response to a VEH_GET_TRACKING_BULK request.
+
+    Returns
+    -------
+    list of tuple
+        values of every vehicle, in the order of tracking_record_format
+    """
+    record = struct.Struct('<' + tracking_record_format(info_bitmap))
+    return [record.unpack_from(payload, offset)
+            for offset in range(0, len(payload), record.size)]
+
+
+def pack_actions_request(speeds, lane_changes):
+    """Pack the payload of a VEH_APPLY_ACTIONS_BULK request.
+
+    Parameters
+    ----------
+    speeds : list of (int, float)
+        names of the vehicles in Aimsun and their target speeds
+    lane_changes : list of (int, int)
+        names of the vehicles in Aimsun and their target lanes
+
+    Returns
+    -------
+    bytes
+        the payload
+    """
+    values = [value for pair in speeds for value in pair] + \
+        [value for pair in lane_changes for value in pair]
+    return _ACTIONS_REQUEST.pack(len(speeds), len(lane_changes)) + \
+        struct.pack('<' + 'if' * len(speeds) + 'ii' * len(lane_changes),
+                    *values)
+
+
+def unpack_actions_request(payload):
+    """Unpack the payload of a VEH_APPLY_ACTIONS_BULK request.
+
+    Returns
+    -------
+    list of (int, float)
+        names of the vehicles in Aimsun and their target speeds
+    list of (int, int)
+        names of the vehicles in Aimsun and their target lanes
+    """
+    num_speeds, num_lane_changes = _ACTIONS_REQUEST.unpack(
+        payload[:_ACTIONS_REQUEST.size])
+    values = struct.unpack(
+        '<' + 'if' * num_speeds + 'ii' * num_lane_changes,
+        payload[_ACTIONS_REQUEST.size:])
+    speeds = [values[2 * i:2 * i + 2] for i in range(num_speeds)]
+    lane_changes = [values[2 * i:2 * i + 2]
+                    for i in range(num_speeds, num_speeds + num_lane_changes)]
+    return speeds, lane_changes
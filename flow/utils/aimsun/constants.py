@@ -105,3 +105,14 @@ TL_SET_STATE = 0x1B
 
 #: get traffic light state
 TL_GET_STATE = 0x1C
+
+
+###############################################################################
+#                                Bulk Commands                                #
+###############################################################################
+
+#: get the tracking info, leader, and follower of several vehicles
+VEH_GET_TRACKING_BULK = 0x1D
+
+#: apply the speeds and lane changes of several vehicles
+VEH_APPLY_ACTIONS_BULK = 0x1E
@@ -8,6 +8,7 @@ sys.path.append(os.path.join(config.AIMSUN_NEXT_PATH,
                              'programming/Aimsun Next API/AAPIPython/Micro'))
 
 import flow.utils.aimsun.constants as ac
+import flow.utils.aimsun.bulk as bulk
 import AAPI as aimsun_api
 from AAPI import *
 from PyANGKernel import *
@@ -100,6 +101,72 @@ def retrieve_message(conn, out_format):
     return unpacked_data
 
 
+def get_tracking_bulk(payload):
+    """Collect the tracking info of several vehicles.
+
+    Parameters
+    ----------
+    payload : bytes
+        payload of a VEH_GET_TRACKING_BULK frame
+
+    Returns
+    -------
+    bytes
+        payload of the response frame
+    """
+    info_bitmap, veh_ids = bulk.unpack_tracking_request(payload)
+    attrs = [attr for attr, bit in zip(bulk.TRACKING_INFO_ATTRS, info_bitmap)
+             if bit == '1']
+
+    records = []
+    for veh_id in veh_ids:
+        tracking_info = aimsun_api.AKIVehTrackedGetInf(veh_id)
+        record = [getattr(tracking_info, attr) for attr in attrs]
+
+        leader = aimsun_api.AKIVehGetLeaderId(veh_id)
+        follower = aimsun_api.AKIVehGetFollowerId(veh_id)
+        if tracking_info.idSection != -1:
+            next_section = AKIVehInfPathGetNextSection(
+                veh_id, tracking_info.idSection)
+        else:
+            next_section = -1
+        record.extend([leader, follower, next_section])
+
+        # position and length of the leader, used to compute headways
+        if leader < -1:
+            record.extend([0, 0, -1, -1, -1, -1, 0])
+        else:
+            leader_info = aimsun_api.AKIVehGetInf(leader)
+            record.extend(getattr(leader_info, attr)
+                          for attr in bulk.LEADER_INFO_ATTRS)
+            record.append(aimsun_api.AKIVehGetStaticInf(leader).length)
+
+        records.append(record)
+
+    return bulk.pack_tracking_response(info_bitmap, records)
+
+
+def apply_actions_bulk(payload):
+    """Apply the speeds and lane changes of several vehicles.
+
+    Parameters
+    ----------
+    payload : bytes
+        payload of a VEH_APPLY_ACTIONS_BULK frame
+
+    Returns
+    -------
+    bytes
+        payload of the response frame
+    """
+    speeds, lane_changes = bulk.unpack_actions_request(payload)
+    for veh_id, speed in speeds:
+        aimsun_api.AKIVehTrackedModifySpeed(veh_id, speed * 3.6)
+    for veh_id, target_lane in lane_changes:
+        aimsun_api.AKIVehTrackedModifyLane(veh_id, target_lane)
+    return struct.pack('<i', 0)
+
+
 def threaded_client(conn):
     """Create a threaded process.
 
@@ -124,6 +191,19 @@ def threaded_client(conn):
             if data == '':
                 continue
 
+            # bulk commands are sent in a single frame, and answered with a
+            # single frame
+            if bulk.is_frame(data):
+                command_type, payload = bulk.recv_frame(conn, data)
+                if command_type == ac.VEH_GET_TRACKING_BULK:
+                    response = get_tracking_bulk(payload)
+                elif command_type == ac.VEH_APPLY_ACTIONS_BULK:
+                    response = apply_actions_bulk(payload)
+                else:
+                    response = struct.pack('<i', -1001)
+                conn.sendall(bulk.pack_frame(command_type, response))
+                continue
+
             # convert to integer
             data = int(data)
 
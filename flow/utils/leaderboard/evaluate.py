@@ -6,10 +6,15 @@ flow/benchmarks, as well as method for importing neural network controllers
 from rllib.
 """
 
+import multiprocessing
+import warnings
+
 from flow.core.experiment import Experiment
 from flow.core.params import InitialConfig
 from flow.core.params import TrafficLightParams
+from flow.utils.rllib import compute_multiagent_actions
 from flow.utils.rllib import get_flow_params, get_rllib_config
+from flow.utils.rllib import get_rllib_pkl
 from flow.utils.registry import make_create_env
 from flow.utils.exceptions import FatalFlowError
 
@@ -33,6 +38,9 @@ import numpy as np
 # number of simulations to execute when computing performance scores
 NUM_RUNS = 10
 
+# default number of processes the simulations are distributed over
+NUM_WORKERS = min(NUM_RUNS, multiprocessing.cpu_count())
+
 # dictionary containing all available benchmarks and their meta-parameters
 AVAILABLE_BENCHMARKS = {
     "grid0": grid0,
@@ -49,7 +57,8 @@ AVAILABLE_BENCHMARKS = {
 }
 
 
-def evaluate_policy(benchmark, _get_actions, _get_states=None):
+def evaluate_policy(benchmark, _get_actions, _get_states=None,
+                    num_workers=None):
     """Evaluate the performance of a controller on a predefined benchmark.
 
     Parameters
@@ -63,6 +72,15 @@ def evaluate_policy(benchmark, _get_actions, _get_states=None):
         a mapping from the environment object in Flow to some state, which
         overrides the _get_states method of the environment. Note that the
         same cannot be done for the actions.
+    num_workers : int, optional
+        number of processes the simulations are distributed over (see
+        flow.core.experiment.Experiment.run), defaults to NUM_WORKERS. Set to
+        1 if the controller cannot be used from forked processes. The
+        processes are forked, which is not safe once ray has been
+        initialized in this process, so the simulations are then performed
+        sequentially. Note that the policies returned by
+        get_compute_action_rllib only initialize ray when they are first
+        called, i.e. in the worker processes.
 
     Returns
     -------
@@ -100,26 +118,10 @@ def evaluate_policy(benchmark, _get_actions, _get_states=None):
     module = __import__("flow.networks", fromlist=[flow_params["network"]])
     network_class = getattr(module, flow_params["network"])
 
-    # recreate the network and environment
-    network = network_class(
-        name=exp_tag,
-        vehicles=vehicles,
-        net_params=net_params,
-        initial_config=initial_config,
-        traffic_lights=traffic_lights)
-
     # make sure the _get_states method of the environment is the one
     # specified by the user
     if _get_states is not None:
-
-        class _env_class(env_class):
-            def get_state(self):
-                return _get_states(self)
-
-        env_class = _env_class
-
-    env = env_class(
-        env_params=env_params, sim_params=sim_params, network=network)
+        env_class = _evaluation_env_class(env_class, _get_states)
 
     flow_params = dict(
         # name of the experiment
@@ -157,25 +159,45 @@ def evaluate_policy(benchmark, _get_actions, _get_states=None):
         tls=traffic_lights,
     )
 
-    # number of time steps
-    flow_params['env'].horizon = env.env_params.horizon
+    # forking processes after ray has started its threads and sockets may
+    # deadlock them or corrupt their ray client
+    if num_workers is None:
+        num_workers = NUM_WORKERS
+    if num_workers > 1 and ray.is_initialized():
+        warnings.warn(
+            "Ray is initialized, so the simulations are not distributed over "
+            "several processes.")
+        num_workers = 1
 
     # create a Experiment object. Note that the state may not be that which is
     # specified by the environment.
     exp = Experiment(flow_params)
-    exp.env = env
-
-    exp = Experiment(flow_params)
-    exp.env = env
 
     # run the experiment and return the reward
     res = exp.run(
         num_runs=NUM_RUNS,
-        rl_actions=_get_actions)
+        rl_actions=_get_actions,
+        num_workers=num_workers)
 
     return np.mean(res["returns"]), np.std(res["returns"])
 
 
+def _evaluation_env_class(env_class, get_states):
+    """Return a subclass of an environment whose states are overridden.
+
+    The subclass is stored in this module under a fixed name, so that the
+    environment can be created through its entry point in the gym registry
+    (e.g. by the worker processes of the experiment).
+    """
+    global _EvaluationEnv
+
+    class _EvaluationEnv(env_class):
+        def get_state(self):
+            return get_states(self)
+
+    return _EvaluationEnv
+
+
 def get_compute_action_rllib(path_to_dir, checkpoint_num, alg):
     """Collect the compute_action method from RLlib's serialized files.
 
@@ -193,12 +215,37 @@ def get_compute_action_rllib(path_to_dir, checkpoint_num, alg):
     -------
     method
         the compute_action method from the algorithm along with the trained
-        parameters
+        parameters. For multi-agent policies, the method maps the
+        observations of all agents to their actions, with one call to every
+        policy per step (see flow.utils.rllib.compute_multiagent_actions).
+        Ray is initialized and the policy is restored when the method is
+        first called, so that the processes of parallel evaluations (see
+        evaluate_policy) are forked before ray is initialized, and each
+        restore their own policy.
     """
+    compute_action = None
+
+    def lazy_compute_action(*args, **kwargs):
+        nonlocal compute_action
+        if compute_action is None:
+            compute_action = _restore_compute_action_rllib(
+                path_to_dir, checkpoint_num, alg)
+        return compute_action(*args, **kwargs)
+
+    return lazy_compute_action
+
+
+def _restore_compute_action_rllib(path_to_dir, checkpoint_num, alg):
+    """Restore the compute_action method of get_compute_action_rllib."""
     # collect the configuration information from the RLlib checkpoint
     result_dir = path_to_dir if path_to_dir[-1] != '/' else path_to_dir[:-1]
     config = get_rllib_config(result_dir)
 
+    # the policy mapping of multi-agent policies is only stored in the pkl
+    multiagent = bool(config.get('multiagent', {}).get('policies', None))
+    if multiagent:
+        config['multiagent'] = get_rllib_pkl(result_dir)['multiagent']
+
     # run on only one cpu for rendering purposes
     ray.init(num_cpus=1)
     config["num_workers"] = 1
@@ -217,4 +264,13 @@ def get_compute_action_rllib(path_to_dir, checkpoint_num, alg):
     checkpoint = result_dir + '/checkpoint-{}'.format(checkpoint_num)
     agent._restore(checkpoint)
 
+    if multiagent:
+        policy_mapping_fn = config['multiagent']['policy_mapping_fn']
+
+        def compute_action(observations):
+            return compute_multiagent_actions(
+                agent, observations, policy_mapping_fn)[0]
+
+        return compute_action
+
     return agent.compute_action
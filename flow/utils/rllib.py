@@ -8,6 +8,9 @@ from copy import deepcopy
 import os
 import sys
 
+import numpy as np
+from gym.spaces import Box
+
 import flow.envs
 from flow.core.params import SumoLaneChangeParams, SumoCarFollowingParams, \
     SumoParams, InitialConfig, EnvParams, NetParams, InFlows
@@ -221,3 +224,83 @@ def get_rllib_pkl(path):
     with open(config_path, 'rb') as f:
         config = cloudpickle.load(f)
     return config
+
+
+def compute_multiagent_actions(agent,
+                               observations,
+                               policy_mapping_fn,
+                               states=None,
+                               explore=None):
+    """Compute the actions of all agents with one inference call per policy.
+
+    This is equivalent to calling `agent.compute_action` for every agent,
+    but the observations of the agents that share a policy are stacked into
+    a single batch, so that the cost of running the policy is paid once per
+    policy rather than once per agent.
+
+    Parameters
+    ----------
+    agent : ray.rllib.agents.trainer.Trainer
+        the trained RLlib agent
+    observations : dict <str, array_like>
+        the observation of every agent
+    policy_mapping_fn : callable
+        maps agent ids to the ids of their policies
+    states : dict <str, list of np.ndarray>, optional
+        recurrent state of every agent, for policies with a recurrent model
+        (e.g. an LSTM). Agents that are not in the dict start from the
+        initial state of their policy. If not specified, the policies are
+        assumed to be stateless.
+    explore : bool, optional
+        whether to sample exploratory actions, defaults to the exploration
+        setting of the agent's configuration
+
+    Returns
+    -------
+    dict <str, Any>
+        the action of every agent
+    dict <str, list of np.ndarray>
+        the updated recurrent state of every agent (empty if states is None)
+    """
+    worker = agent.workers.local_worker()
+    clip_actions = agent.config.get("clip_actions", False)
+
+    # group the agents by policy
+    policy_agents = {}
+    for agent_id in observations.keys():
+        policy_agents.setdefault(
+            policy_mapping_fn(agent_id), []).append(agent_id)
+
+    actions = {}
+    new_states = {}
+    for policy_id, agent_ids in policy_agents.items():
+        policy = agent.get_policy(policy_id)
+        preprocessor = worker.preprocessors[policy_id]
+        obs_filter = worker.filters[policy_id]
+
+        obs_batch = np.stack([
+            obs_filter(preprocessor.transform(observations[agent_id]),
+                       update=False)
+            for agent_id in agent_ids])
+
+        state_batches = []
+        if states is not None:
+            initial_state = policy.get_initial_state()
+            agent_states = [states.get(agent_id, initial_state)
+                            for agent_id in agent_ids]
+            state_batches = [np.stack(batch)
+                             for batch in zip(*agent_states)]
+
+        batch_actions, state_out, _ = policy.compute_actions(
+            obs_batch, state_batches=state_batches, explore=explore)
+
+        if clip_actions and isinstance(policy.action_space, Box):
+            batch_actions = np.clip(batch_actions, policy.action_space.low,
+                                    policy.action_space.high)
+
+        for i, agent_id in enumerate(agent_ids):
+            actions[agent_id] = batch_actions[i]
+            if states is not None:
+                new_states[agent_id] = [batch[i] for batch in state_out]
+
+    return actions, new_states
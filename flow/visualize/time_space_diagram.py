@@ -6,7 +6,9 @@ being the time (in seconds), the y-axis being the position of a vehicle, and
 color representing the speed of te vehicles.
 
 If the number of simulation steps is too dense, you can plot every nth step in
-the plot by setting the input `--steps=n`.
+the plot by setting the input `--steps=n`. Large emission files are best
+converted to the .npz or .parquet formats beforehand (see
+flow.core.util.emission_to_csv), which are loaded faster than .csv files.
 
 Note: This script assumes that the provided network has only one lane on the
 each edge, or one lane on the main highway in the case of MergeNetwork.
@@ -16,11 +18,13 @@ Usage
 ::
     python time_space_diagram.py </path/to/emission>.csv </path/to/params>.json
 """
+from flow.core.emission import load_emission
 from flow.utils.rllib import get_flow_params
 from flow.networks import RingNetwork, FigureEightNetwork, MergeNetwork, I210SubNetwork, HighwayNetwork
 
 import argparse
 from collections import defaultdict
+import os
 try:
     from matplotlib import pyplot as plt
 except ImportError:
@@ -43,14 +47,35 @@ ACCEPTABLE_NETWORKS = [
     HighwayNetwork
 ]
 
-
-def import_data_from_trajectory(fp, params=dict()):
+# columns of the trajectory data used to generate the time-space diagrams,
+# and the types they are loaded with. Other columns are not loaded.
+TRAJECTORY_DTYPES = {
+    'time': np.float64,
+    'time_step': np.float64,
+    'id': 'category',
+    'edge_id': 'category',
+    'lane_number': np.int64,
+    'lane_id': np.int64,
+    'relative_position': np.float64,
+    'distance': np.float64,
+    'speed': np.float64,
+    'x': np.float64,
+}
+
+
+def import_data_from_trajectory(fp, params=dict(), steps=1):
     r"""Import and preprocess data from the Flow trajectory (.csv) file.
 
+    Emission data converted to the .npz or .parquet formats (see
+    flow.core.util.emission_to_csv), as well as directories of emission
+    shards (see flow.core.emission.EmissionRecorder), are also supported.
+    Only the columns listed in TRAJECTORY_DTYPES are loaded.
+
     Parameters
     ----------
     fp : str
-        file path (for the .csv formatted file)
+        file path (for the .csv, .npz or .parquet formatted file, or the
+        directory of emission shards)
     params : dict
         flow-specific parameters, including:
 
@@ -60,13 +85,27 @@ def import_data_from_trajectory(fp, params=dict()):
         * "net_params" (flow.core.params.NetParams): network-specific
           parameters. This is used to collect the lengths of various network
           links.
+    steps : int, optional
+        rate at which steps are plotted. Only every `steps`-th sample of
+        every vehicle is kept, and the segments join the kept samples.
 
     Returns
     -------
     pd.DataFrame
     """
-    # Read trajectory csv into pandas dataframe
-    df = pd.read_csv(fp)
+    # Read trajectory data into pandas dataframe
+    if os.path.isdir(fp):
+        df = pd.DataFrame(load_emission(fp))
+    elif fp.endswith('.npz'):
+        with np.load(fp) as data:
+            df = pd.DataFrame({key: data[key] for key in data.files
+                               if key in TRAJECTORY_DTYPES})
+    elif fp.endswith('.parquet'):
+        df = pd.read_parquet(fp)
+    else:
+        df = pd.read_csv(fp, usecols=lambda col: col in TRAJECTORY_DTYPES,
+                         dtype=TRAJECTORY_DTYPES)
+    df = df[[col for col in df.columns if col in TRAJECTORY_DTYPES]]
 
     # Convert column names for backwards compatibility using emissions csv
     column_conversions = {
@@ -77,8 +116,12 @@ def import_data_from_trajectory(fp, params=dict()):
     if 'distance' not in df.columns:
         df['distance'] = _get_abs_pos(df, params)
 
+    # Only keep every nth sample of every vehicle
+    if steps > 1:
+        df = df[df.groupby('id', observed=True).cumcount() % steps == 0]
+
     # Compute line segment ends by shifting dataframe by 1 row
-    df[['next_pos', 'next_time']] = df.groupby('id')[['distance', 'time_step']].shift(-1)
+    df[['next_pos', 'next_time']] = df.groupby('id', observed=True)[['distance', 'time_step']].shift(-1)
 
     # Remove nans from data
     df = df[df['next_time'].notna()]
@@ -371,7 +414,10 @@ def _get_abs_pos(df, params):
     else:
         edgestarts = defaultdict(float)
 
-    ret = df.apply(lambda x: x['relative_position'] + edgestarts[x['edge_id']], axis=1)
+    # look up the start of every edge once, and index it by edge code
+    edges = df['edge_id'].astype('category').cat
+    offsets = np.array([edgestarts[edge] for edge in edges.categories] + [np.nan])
+    ret = pd.Series(df['relative_position'].values + offsets[edges.codes.values], index=df.index)
 
     if params['network'] == FigureEightNetwork:
         # reorganize data for space-time plot
@@ -470,7 +516,8 @@ if __name__ == '__main__':
 
     # required arguments
     parser.add_argument('trajectory_path', type=str,
-                        help='path to the Flow trajectory csv file.')
+                        help='path to the Flow trajectory csv (or npz, '
+                             'parquet) file.')
     parser.add_argument('flow_params', type=str,
                         help='path to the flow_params json file.')
 
@@ -504,7 +551,7 @@ if __name__ == '__main__':
     my_cmap = colors.LinearSegmentedColormap('my_colormap', cdict, 1024)
 
     # Read trajectory csv into pandas dataframe
-    traj_df = import_data_from_trajectory(args.trajectory_path, flow_params)
+    traj_df = import_data_from_trajectory(args.trajectory_path, flow_params, args.steps)
 
     # Convert df data into segments for plotting
     segs, traj_df = get_time_space_data(traj_df, flow_params)
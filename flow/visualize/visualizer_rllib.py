@@ -28,6 +28,7 @@ from ray.tune.registry import register_env
 
 from flow.core.util import emission_to_csv
 from flow.utils.registry import make_create_env
+from flow.utils.rllib import compute_multiagent_actions
 from flow.utils.rllib import get_flow_params
 from flow.utils.rllib import get_rllib_config
 from flow.utils.rllib import get_rllib_pkl
@@ -172,23 +173,7 @@ def visualizer_rllib(args):
     else:
         rets = []
 
-    if config['model']['use_lstm']:
-        use_lstm = True
-        if multiagent:
-            state_init = {}
-            # map the agent id to its policy
-            policy_map_fn = config['multiagent']['policy_mapping_fn']
-            size = config['model']['lstm_cell_size']
-            for key in config['multiagent']['policies'].keys():
-                state_init[key] = [np.zeros(size, np.float32),
-                                   np.zeros(size, np.float32)]
-        else:
-            state_init = [
-                np.zeros(config['model']['lstm_cell_size'], np.float32),
-                np.zeros(config['model']['lstm_cell_size'], np.float32)
-            ]
-    else:
-        use_lstm = False
+    use_lstm = config['model']['use_lstm']
 
     # if restart_instance, don't restart here because env.reset will restart later
     if not sim_params.restart_instance:
@@ -204,6 +189,8 @@ def visualizer_rllib(args):
         state = env.reset()
         if multiagent:
             ret = {key: [0] for key in rets.keys()}
+            # recurrent state of every agent, if the policies use an LSTM
+            lstm_states = {} if use_lstm else None
         else:
             ret = 0
         for _ in range(env_params.horizon):
@@ -215,16 +202,12 @@ def visualizer_rllib(args):
                 vel.append(np.mean(speeds))
 
             if multiagent:
-                action = {}
-                for agent_id in state.keys():
-                    if use_lstm:
-                        action[agent_id], state_init[agent_id], logits = \
-                            agent.compute_action(
-                            state[agent_id], state=state_init[agent_id],
-                            policy_id=policy_map_fn(agent_id))
-                    else:
-                        action[agent_id] = agent.compute_action(
-                            state[agent_id], policy_id=policy_map_fn(agent_id))
+                # the actions of all agents sharing a policy are computed
+                # with a single call to the policy
+                action, new_lstm_states = compute_multiagent_actions(
+                    agent, state, policy_map_fn, states=lstm_states)
+                if use_lstm:
+                    lstm_states = new_lstm_states
             else:
                 action = agent.compute_action(state)
             state, reward, done, _ = env.step(action)
@@ -11,11 +11,13 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import flow.utils.aimsun.constants as ac  # noqa
+import flow.utils.aimsun.bulk as bulk  # noqa
 
 PORT = 9999
 entered_vehicles = [1, 2, 3, 4, 5]
 exited_vehicles = [6, 7, 8, 9, 10]
 tl_ids = [1, 2, 3, 4, 5]
+speeds = {}
 
 
 def send_message(conn, in_format, values):
@@ -96,6 +98,47 @@ def retrieve_message(conn, out_format):
     return unpacked_data
 
 
+def dummy_tracking_info(veh_id, attr):
+    """Return a dummy tracking info attribute of a vehicle.
+
+    The speed of vehicles is the last speed set by a bulk command, and the
+    other attributes are 100 * veh_id + the index of the attribute.
+    """
+    if attr == 'CurrentSpeed' and veh_id in speeds:
+        return speeds[veh_id]
+    return 100 * veh_id + bulk.TRACKING_INFO_ATTRS.index(attr)
+
+
+def bulk_command(command_type, payload):
+    """Return dummy responses to bulk commands.
+
+    For testing purposes. The leader and follower of a vehicle are the
+    vehicles with the next and previous ids, its next section is 7, and the
+    length of its leader is 4.
+    """
+    if command_type == ac.VEH_GET_TRACKING_BULK:
+        info_bitmap, veh_ids = bulk.unpack_tracking_request(payload)
+        attrs = [attr for attr, bit in zip(bulk.TRACKING_INFO_ATTRS,
+                                           info_bitmap) if bit == '1']
+        records = []
+        for veh_id in veh_ids:
+            record = [dummy_tracking_info(veh_id, attr) for attr in attrs]
+            record.extend([veh_id + 1, veh_id - 1, 7])
+            record.extend(dummy_tracking_info(veh_id + 1, attr)
+                          for attr in bulk.LEADER_INFO_ATTRS)
+            record.append(4)
+            records.append(record)
+        return bulk.pack_tracking_response(info_bitmap, records)
+
+    elif command_type == ac.VEH_APPLY_ACTIONS_BULK:
+        veh_speeds, _ = bulk.unpack_actions_request(payload)
+        speeds.update(veh_speeds)
+        return struct.pack('<i', 0)
+
+    # in case the command is unknown, return -1001
+    return struct.pack('<i', -1001)
+
+
 def threaded_client(conn):
     """Create a dummy threaded process.
 
@@ -119,6 +162,12 @@ def threaded_client(conn):
             if data == '':
                 continue
 
+            if bulk.is_frame(data):
+                command_type, payload = bulk.recv_frame(conn, data)
+                conn.sendall(bulk.pack_frame(
+                    command_type, bulk_command(command_type, payload)))
+                continue
+
             # convert to integer
             data = int(data)
 
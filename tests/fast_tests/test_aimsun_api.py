@@ -3,6 +3,8 @@ import flow.config as config
 import flow.utils.aimsun.constants
 from flow.utils.aimsun.api import FlowAimsunAPI
 from flow.utils.aimsun.struct import InfVeh
+from flow.core.kernel.vehicle.aimsun import INFOS_ATTR_BY_INDEX
+import flow.utils.aimsun.bulk as bulk
 import unittest
 import os
 import subprocess
@@ -64,6 +66,59 @@ class TestStruct(unittest.TestCase):
             self.assertIn(val, obj.__dict__.keys())
 
 
+class TestBulk(unittest.TestCase):
+    """Tests for the frames in flow/utils/aimsun/bulk.py."""
+
+    def test_tracking_attrs(self):
+        """Verify that the attributes match the tracking bitmaps."""
+        self.assertListEqual(bulk.TRACKING_INFO_ATTRS, INFOS_ATTR_BY_INDEX)
+
+    def test_tracking_frames(self):
+        """Verify that tracking requests and responses are recovered."""
+        info_bitmap = '1' + '0' * 8 + '1' + '0' * 3 + '1' + '0' * 7
+        self.assertEqual(bulk.tracking_info_format(info_bitmap), 'ffi')
+
+        payload = bulk.pack_tracking_request(info_bitmap, [3, 1, 2])
+        self.assertEqual(bulk.unpack_tracking_request(payload),
+                         (info_bitmap, [3, 1, 2]))
+
+        records = [(0.5, 1.5, 10, 4, 2, 11, 2.5, 3.5, 10, -1, 12, 13, 5.0),
+                   (1.0, 2.0, 11, -2, 3, -1, 0., 0., -1, -1, -1, -1, 0.)]
+        payload = bulk.pack_tracking_response(info_bitmap, records)
+        self.assertListEqual(
+            bulk.unpack_tracking_response(info_bitmap, payload), records)
+        self.assertListEqual(bulk.unpack_tracking_response(info_bitmap, b''),
+                             [])
+
+    def test_actions_frames(self):
+        """Verify that action requests are recovered."""
+        payload = bulk.pack_actions_request([(1, 2.5), (2, 0.)], [(3, 1)])
+        self.assertEqual(bulk.unpack_actions_request(payload),
+                         ([(1, 2.5), (2, 0.)], [(3, 1)]))
+
+        payload = bulk.pack_actions_request([], [])
+        self.assertEqual(bulk.unpack_actions_request(payload), ([], []))
+
+    def test_frame(self):
+        """Verify that frames are received from partial messages."""
+        frame = bulk.pack_frame(0x1E, b'abcdef')
+        self.assertTrue(bulk.is_frame(frame))
+        self.assertFalse(bulk.is_frame(b'30'))
+
+        class Socket(object):
+            def __init__(self, data):
+                self.data = data
+
+            def recv(self, size):
+                size = min(size, 2)
+                ret, self.data = self.data[:size], self.data[size:]
+                return ret
+
+        self.assertEqual(bulk.recv_frame(Socket(frame[5:]), frame[:5]),
+                         (0x1E, b'abcdef'))
+        self.assertRaises(IOError, bulk.recv_frame, Socket(frame[:8]))
+
+
 class TestDummyAPI(unittest.TestCase):
     """Tests the functionality of FlowAimsunAPI.
 
@@ -165,6 +220,36 @@ class TestDummyAPI(unittest.TestCase):
         tl_ids = self.kernel_api.get_traffic_light_ids()
         self.assertEqual(len(tl_ids), 0)
 
+    def test_bulk_methods(self):
+        info_bitmap = '1' * 21
+        infos = self.kernel_api.get_vehicles_tracking_info(
+            [1, 5], info_bitmap)
+        self.assertEqual(len(infos), 2)
+
+        info, leader, follower, next_section, leader_info, leader_length = \
+            infos[1]
+        self.assertEqual(info.CurrentPos, 500)
+        self.assertEqual(info.CurrentSpeed, 508)
+        self.assertEqual(info.idLaneTo, 520)
+        self.assertEqual(leader, 6)
+        self.assertEqual(follower, 4)
+        self.assertEqual(next_section, 7)
+        self.assertEqual(leader_info.CurrentPos, 600)
+        self.assertEqual(leader_info.idSectionTo, 619)
+        self.assertEqual(leader_length, 4)
+
+        # test that queued speeds are applied in a single command
+        self.kernel_api.queue_speed(1, 2.5)
+        self.kernel_api.queue_speed(5, 0.5)
+        self.kernel_api.queue_lane_change(5, 1)
+        self.kernel_api.flush_actions()
+        infos = self.kernel_api.get_vehicles_tracking_info(
+            [1, 5], info_bitmap)
+        self.assertEqual(infos[0][0].CurrentSpeed, 2.5)
+        self.assertEqual(infos[1][0].CurrentSpeed, 0.5)
+        self.assertEqual(self.kernel_api.get_vehicles_tracking_info(
+            [], info_bitmap), [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -5,11 +5,13 @@ from flow.core.params import EnvParams, InitialConfig, NetParams
 from flow.core.params import VehicleParams
 from flow.core.params import SumoCarFollowingParams
 
-from flow.controllers.routing_controllers import ContinuousRouter
+from flow.controllers.routing_controllers import ContinuousRouter, \
+    alias_table, sample_route
 from flow.controllers.car_following_models import IDMController, \
     OVMController, BCMController, LinearOVM, CFMController, LACController, \
     GippsController, BandoFTLController
 from flow.controllers import FollowerStopper, PISaturation, NonLocalFollowerStopper
+from flow.controllers import BaseController
 from tests.setup_scripts import ring_road_exp_setup
 import os
 import numpy as np
@@ -988,5 +990,164 @@ class TestBandoFTLController(unittest.TestCase):
         np.testing.assert_array_almost_equal(requested_accel, expected_accel)
 
 
+class TestRouteSampling(unittest.TestCase):
+    """Tests the sampling of routes with alias tables."""
+
+    def test_alias_table(self):
+        for weights in [[1], [0.5, 0.5], [0.2, 0.3, 0.5], [1, 0, 3, 4]]:
+            prob, alias = alias_table(weights)
+            # recover the probability of every outcome from the table
+            probs = np.array(prob) / len(prob)
+            for i, j in enumerate(alias):
+                probs[j] += (1 - prob[i]) / len(prob)
+            np.testing.assert_array_almost_equal(
+                probs, np.array(weights) / np.sum(weights))
+
+    def test_sample_route(self):
+        routes = [(["a", "b"], 0.2), (["a", "c"], 0.8)]
+        self.assertListEqual(sample_route(routes[:1]), ["a", "b"])
+
+        np.random.seed(0)
+        samples = [sample_route(routes)[1] for _ in range(10000)]
+        self.assertAlmostEqual(samples.count("b") / 10000, 0.2, delta=0.02)
+        self.assertEqual(len(set(samples)), 2)
+
+
+class TestBatchedControllers(unittest.TestCase):
+    """
+    Tests that the batched evaluation of controllers (used by Env.step)
+    matches their per-vehicle evaluation.
+    """
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="idm",
+            acceleration_controller=(IDMController, {
+                "fail_safe": ["instantaneous", "safe_velocity",
+                              "feasible_accel", "obey_speed_limit"],
+                "display_warnings": False}),
+            routing_controller=(ContinuousRouter, {}),
+            car_following_params=SumoCarFollowingParams(
+                accel=1, decel=5),
+            num_vehicles=4)
+        vehicles.add(
+            veh_id="ovm",
+            acceleration_controller=(OVMController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            car_following_params=SumoCarFollowingParams(
+                accel=20, decel=5),
+            num_vehicles=2)
+        vehicles.add(
+            veh_id="fs",
+            acceleration_controller=(FollowerStopper, {"v_des": 7.5}),
+            routing_controller=(ContinuousRouter, {}),
+            car_following_params=SumoCarFollowingParams(
+                accel=20, decel=5),
+            num_vehicles=2)
+        vehicles.add(
+            veh_id="nlfs",
+            acceleration_controller=(NonLocalFollowerStopper, {}),
+            routing_controller=(ContinuousRouter, {}),
+            car_following_params=SumoCarFollowingParams(
+                accel=20, decel=5),
+            num_vehicles=2)
+
+        # create the environment and network classes for a ring road
+        self.env, _, _ = ring_road_exp_setup(vehicles=vehicles)
+
+    def tearDown(self):
+        # terminate the traci instance
+        self.env.terminate()
+
+        # free data used by the class
+        self.env = None
+
+    def test_batch_key(self):
+        self.env.reset()
+        contr = {veh_id: self.env.k.vehicle.get_acc_controller(veh_id)
+                 for veh_id in self.env.k.vehicle.get_ids()}
+
+        # controllers with the same class and parameters share a key
+        self.assertIsNotNone(contr["idm_0"].batch_key())
+        self.assertEqual(contr["idm_0"].batch_key(),
+                         contr["idm_1"].batch_key())
+        self.assertNotEqual(contr["idm_0"].batch_key(),
+                            contr["ovm_0"].batch_key())
+
+        # subclasses that override get_accel are evaluated separately
+        self.assertIsNone(contr["nlfs_0"].batch_key())
+
+    def test_get_actions(self):
+        self.env.reset()
+        ids = self.env.k.vehicle.get_ids()
+
+        test_headways = [1, 5, 10, 15, 20, 25, 5, 10, 15, 20]
+        test_speeds = [5, 7.5, 7.5, 8, 7, 0, 5, 7.5, 7.5, 8]
+        for i, veh_id in enumerate(ids):
+            self.env.k.vehicle.set_headway(veh_id, test_headways[i])
+            self.env.k.vehicle.test_set_speed(veh_id, test_speeds[i])
+
+        for _ in range(2):
+            expected_accel = [
+                self.env.k.vehicle.get_acc_controller(
+                    veh_id).get_action(self.env)
+                for veh_id in ids
+            ]
+            expected_stored = [
+                self.env.k.vehicle.get_accel(veh_id, noise, failsafe)
+                for veh_id in ids
+                for noise in [False, True]
+                for failsafe in [False, True]
+            ]
+
+            requested_accel = BaseController.get_actions(self.env, ids)
+            requested_stored = [
+                self.env.k.vehicle.get_accel(veh_id, noise, failsafe)
+                for veh_id in ids
+                for noise in [False, True]
+                for failsafe in [False, True]
+            ]
+
+            # None actions (controlled by sumo) are compared as NaN values
+            np.testing.assert_array_almost_equal(
+                np.array(requested_accel, dtype=float),
+                np.array(expected_accel, dtype=float))
+            np.testing.assert_array_almost_equal(
+                np.array(requested_stored, dtype=float),
+                np.array(expected_stored, dtype=float))
+
+            # test with the state produced by the simulation as well
+            self.env.step(rl_actions=[])
+            ids = self.env.k.vehicle.get_ids()
+
+    def test_noise(self):
+        """Check that seeded noise matches the per-vehicle evaluation."""
+        self.env.reset()
+        self.env.step(rl_actions=[])
+        kv = self.env.k.vehicle
+        for veh_id in kv.get_ids():
+            kv.get_acc_controller(veh_id).accel_noise = 0.5
+
+        # interleave the batched groups and the vehicles evaluated separately
+        ids = ["ovm_0", "idm_0", "nlfs_0", "idm_1", "fs_0", "ovm_1",
+               "idm_2", "nlfs_1", "fs_1", "idm_3"]
+
+        np.random.seed(0)
+        expected_accel = [
+            kv.get_acc_controller(veh_id).get_action(self.env)
+            for veh_id in ids
+        ]
+        expected_sample = np.random.normal()
+        np.random.seed(0)
+        requested_accel = BaseController.get_actions(self.env, ids)
+
+        np.testing.assert_array_almost_equal(
+            np.array(requested_accel, dtype=float),
+            np.array(expected_accel, dtype=float))
+        # the same number of random samples were drawn
+        self.assertEqual(np.random.normal(), expected_sample)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -10,9 +10,11 @@ from flow.controllers import RLController
 from flow.envs.ring.accel import ADDITIONAL_ENV_PARAMS
 from flow.utils.exceptions import FatalFlowError
 from flow.envs import Env, TestEnv
+from flow.networks import Network
 
 from tests.setup_scripts import ring_road_exp_setup, highway_exp_setup
 import os
+import random
 import gym.spaces as spaces
 from gym.spaces.box import Box
 import numpy as np
@@ -339,6 +341,151 @@ class TestSimsPerStep(unittest.TestCase):
         self.assertEqual(t2 - t1, sims_per_step)
 
 
+class TestWarmRestart(unittest.TestCase):
+    """Tests the reuse of sumo instances when restarting the simulation, as
+    specified by flow.core.params.SumoParams.warm_restart"""
+
+    def run_rollouts(self, warm_restart):
+        # the seeds of the sumo instances are drawn from the random module
+        random.seed(0)
+        sim_params = SumoParams(
+            sim_step=0.1, restart_instance=True, warm_restart=warm_restart)
+        env, _, _ = ring_road_exp_setup(sim_params=sim_params)
+
+        pids, speeds = [], []
+        for _ in range(3):
+            env.reset()
+            for _ in range(10):
+                env.step(rl_actions=[])
+            pids.append(env.k.simulation.sumo_proc.pid)
+            speeds.append(env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
+
+        env.terminate()
+        return pids, speeds
+
+    def test_it_works(self):
+        # the sumo instance is reused if warm restarts are enabled
+        pids, warm_speeds = self.run_rollouts(warm_restart=True)
+        self.assertEqual(len(set(pids)), 1)
+
+        # a new instance is started otherwise
+        pids, cold_speeds = self.run_rollouts(warm_restart=False)
+        self.assertEqual(len(set(pids)), 3)
+
+        # both methods result in the same rollouts
+        np.testing.assert_array_almost_equal(warm_speeds, cold_speeds)
+
+    def test_can_reload(self):
+        env, _, _ = ring_road_exp_setup()
+        sim_params = env.sim_params
+        self.assertTrue(env.k.simulation.can_reload(sim_params))
+
+        # the sumo binary cannot change
+        sim_params.render = True
+        self.assertFalse(env.k.simulation.can_reload(sim_params))
+        sim_params.render = False
+
+        # warm restarts can be disabled
+        sim_params.warm_restart = False
+        self.assertFalse(env.k.simulation.can_reload(sim_params))
+
+        env.terminate()
+
+
+class TestBulkReset(unittest.TestCase):
+    """Tests the restoration of the initial vehicles from a saved sumo state,
+    as specified by flow.core.params.SumoParams.bulk_reset"""
+
+    def run_rollouts(self, env, num_rollouts=3):
+        ids, positions, speeds = [], [], []
+        for _ in range(num_rollouts):
+            env.reset()
+            ids.append(sorted(env.k.vehicle.get_ids()))
+            for _ in range(20):
+                env.step(rl_actions=None)
+            positions.append(env.k.vehicle.get_x_by_id(ids[-1]))
+            speeds.append(env.k.vehicle.get_speed(ids[-1]))
+
+        return ids, positions, speeds
+
+    def test_it_works(self):
+        env, _, _ = ring_road_exp_setup(sim_params=SumoParams(
+            sim_step=0.1, bulk_reset=True))
+        ids, positions, speeds = self.run_rollouts(env)
+
+        # the state is saved after the first reset
+        state_path, veh_types = env._reset_state
+        self.assertTrue(os.path.isfile(state_path))
+        self.assertListEqual(sorted(veh_types), ids[0])
+
+        # the following resets restore the same vehicles
+        for i in range(1, len(ids)):
+            self.assertListEqual(ids[i], ids[0])
+            np.testing.assert_array_almost_equal(positions[i], positions[0])
+            np.testing.assert_array_almost_equal(speeds[i], speeds[0])
+
+        # the state is saved again when the initial state changes
+        env.setup_initial_state()
+        self.assertIsNone(env._reset_state)
+        env.reset()
+        self.assertIsNotNone(env._reset_state)
+
+        env.terminate()
+        self.assertFalse(os.path.isfile(state_path))
+
+    def test_network_template(self):
+        # the vehicles of network templates are added after every reset
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        net_params = NetParams(template={
+            "net": os.path.join(dir_path, "test_files/fig8_test.net.xml"),
+            "rou": os.path.join(
+                dir_path, "test_files/fig8_vehicles_test.rou.xml"),
+            "vtype": os.path.join(dir_path, "test_files/fig8_test.add.xml")
+        })
+        network = Network(
+            name="template", net_params=net_params, vehicles=VehicleParams())
+        env = TestEnv(EnvParams(), SumoParams(bulk_reset=True), network)
+
+        ids, positions, _ = self.run_rollouts(env)
+        self.assertListEqual(
+            sorted(env.k.vehicle.get_ids()),
+            ["idm_0", "idm_1", "idm_2", "idm_3"])
+        np.testing.assert_array_almost_equal(positions[1], positions[0])
+
+        env.terminate()
+
+
+class TestProfiler(unittest.TestCase):
+    """Tests the timers of the phases of Env.step, as enabled by
+    flow.core.params.SimParams.profile"""
+
+    def test_it_works(self):
+        sim_params = SumoParams(sim_step=0.1, profile=True)
+        env, _, _ = ring_road_exp_setup(sim_params=sim_params)
+        env.reset()
+        for _ in range(5):
+            env.step(rl_actions=[])
+
+        stats = env.k.profiler.stats
+        for phase in ["step", "controller_actions", "routing",
+                      "apply_rl_actions", "simulation_step", "update.vehicle",
+                      "update.traffic_light", "update.network",
+                      "check_collision", "get_state", "compute_reward"]:
+            self.assertIn(phase, stats)
+        self.assertEqual(stats["step"].count, 5)
+        self.assertGreaterEqual(stats["step"].total,
+                                stats["simulation_step"].total)
+        env.terminate()
+
+    def test_disabled(self):
+        env, _, _ = ring_road_exp_setup()
+        env.reset()
+        env.step(rl_actions=[])
+        self.assertFalse(env.k.profiler.enabled)
+        self.assertDictEqual(env.k.profiler.stats, {})
+        env.terminate()
+
+
 class TestAbstractMethods(unittest.TestCase):
     """
     These series of tests are meant to ensure that the environment abstractions
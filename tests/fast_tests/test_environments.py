@@ -21,6 +21,8 @@ from flow.envs.multiagent import MultiAgentHighwayPOEnv
 from flow.envs.multiagent import MultiAgentAccelPOEnv
 from flow.envs.multiagent import MultiAgentWaveAttenuationPOEnv
 from flow.envs.multiagent import MultiAgentMergePOEnv
+from flow.envs.vec_env import FlowVecEnv
+from tests.setup_scripts import ring_road_exp_setup
 
 os.environ["TEST_FLAG"] = "True"
 
@@ -946,6 +948,135 @@ class TestBottleneckDesiredVelocityEnv(unittest.TestCase):
         self.assertAlmostEqual(
             env.k.vehicle.get_inflow_rate(250)/expected_inflow, 1, 1)
 
+    def test_reset_runtime_inflows(self):
+        """Tests that the inflows change upon reset when they are added by the
+        vehicle kernel, without restarting the simulation."""
+        np.random.seed(seed=123)
+
+        sim_params = SumoParams(sim_step=0.5, runtime_inflows=True)
+
+        vehicles = VehicleParams()
+        vehicles.add(veh_id="human")
+        vehicles.add(veh_id="followerstopper")
+
+        env_params = EnvParams(
+            additional_params={
+                "target_velocity": 40,
+                "disable_tb": True,
+                "disable_ramp_metering": True,
+                "controlled_segments": [("1", 1, False), ("2", 2, True),
+                                        ("3", 2, True), ("4", 2, True),
+                                        ("5", 1, False)],
+                "symmetric": False,
+                "observed_segments": [("1", 1), ("2", 3), ("3", 3), ("4", 3),
+                                      ("5", 1)],
+                "reset_inflow": True,
+                "lane_change_duration": 5,
+                "max_accel": 3,
+                "max_decel": 3,
+                "inflow_range": [1000, 2000]
+            }
+        )
+
+        inflow = InFlows()
+        inflow.add(veh_type="human",
+                   edge="1",
+                   vehs_per_hour=1500,
+                   departLane="random",
+                   departSpeed=10)
+
+        net_params = NetParams(
+            inflows=inflow,
+            additional_params={"scaling": 1, "speed_limit": 23})
+
+        network = BottleneckNetwork(
+            name="bay_bridge_toll",
+            vehicles=vehicles,
+            net_params=net_params)
+
+        env = BottleneckDesiredVelocityEnv(env_params, sim_params, network)
+        sumo_proc = env.k.simulation.sumo_proc
+
+        # expected inflows, just from checking the new inflows
+        for expected_inflow in [1353.6, 1728.0]:
+            # reset the environment and get a new inflow rate
+            env.reset()
+            for _ in range(500):
+                env.step(rl_actions=None)
+            self.assertAlmostEqual(
+                env.k.vehicle.get_inflow_rate(250)/expected_inflow, 1, 1)
+
+        # the simulation was not restarted
+        self.assertIs(env.k.simulation.sumo_proc, sumo_proc)
+
+        env.terminate()
+
+
+class TestFlowVecEnv(unittest.TestCase):
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add("rl", acceleration_controller=(RLController, {}),
+                     num_vehicles=1)
+        vehicles.add("human", acceleration_controller=(IDMController, {}),
+                     num_vehicles=2)
+        env_params = EnvParams(
+            horizon=5,
+            additional_params={
+                "target_velocity": 8,
+                "max_accel": 1,
+                "max_decel": 1,
+                "sort_vehicles": False,
+            })
+
+        def create_env():
+            env, _, _ = ring_road_exp_setup(
+                vehicles=vehicles, env_params=env_params)
+            return env
+
+        self.create_env = create_env
+        self.vec_env = FlowVecEnv([create_env] * 3)
+
+    def tearDown(self):
+        self.vec_env.close()
+
+    def test_step(self):
+        """Verify that the environments are stepped as separate envs are."""
+        env = self.create_env()
+        self.assertEqual(self.vec_env.num_envs, 3)
+        self.assertEqual(self.vec_env.observation_space,
+                         env.observation_space)
+
+        obs = self.vec_env.reset()
+        expected_obs = env.reset()
+        self.assertEqual(obs.shape, (3, 6))
+        np.testing.assert_array_almost_equal(obs[1], expected_obs)
+
+        actions = np.array([[1.], [0.5], [0.]])
+        for _ in range(4):
+            obs, rewards, dones, infos = self.vec_env.step(actions)
+            expected_obs, expected_reward, _, _ = env.step(actions[2])
+            self.assertEqual(rewards.shape, (3,))
+            self.assertFalse(any(dones))
+            np.testing.assert_array_almost_equal(obs[2], expected_obs)
+            self.assertAlmostEqual(rewards[2], expected_reward)
+
+        # the vehicles of the environments were accelerated differently
+        speeds = [vec_env.k.vehicle.get_speed("rl_0")
+                  for vec_env in self.vec_env.envs]
+        self.assertGreater(speeds[0], speeds[1])
+        self.assertGreater(speeds[1], speeds[2])
+
+        # environments are reset once they are done
+        obs, rewards, dones, infos = self.vec_env.step(actions)
+        expected_obs, _, _, _ = env.step(actions[2])
+        self.assertTrue(all(dones))
+        np.testing.assert_array_almost_equal(
+            infos[2]["terminal_observation"], expected_obs)
+        np.testing.assert_array_almost_equal(obs[2], env.reset())
+
+        env.terminate()
+
 
 class TestMultiAgentAccelPOEnv(unittest.TestCase):
     """Tests the MultiAgentAccelPOEnv environment in
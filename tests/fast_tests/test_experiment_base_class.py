@@ -2,6 +2,9 @@ import unittest
 import os
 import time
 import csv
+import shutil
+import multiprocessing
+from unittest import mock
 
 from flow.core.experiment import Experiment
 from flow.core.params import VehicleParams
@@ -210,5 +213,69 @@ class TestConvertToCSV(unittest.TestCase):
             exp.env.network.name)))
 
 
+class TestParallelRuns(unittest.TestCase):
+    """
+    Tests that runs distributed over several workers are merged in order, and
+    do not depend on the number of workers.
+    """
+
+    def test_parallel_runs(self):
+        dir_path = os.path.join(
+            os.path.dirname(os.path.realpath(__file__)), "parallel_runs")
+
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="idm",
+            acceleration_controller=(IDMController, {"noise": 0.5}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=5)
+
+        env, _, flow_params = ring_road_exp_setup(vehicles=vehicles)
+        env.terminate()
+        flow_params['sim'].emission_path = dir_path
+        flow_params['env'].horizon = 20
+
+        def speed(env):
+            return np.mean(env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
+
+        results = []
+        for num_workers in [2, 3]:
+            exp = Experiment(flow_params, custom_callables={"speed": speed})
+
+            # the environment of the experiment is terminated once, before
+            # the workers are forked
+            events = []
+            terminate = exp.env.terminate
+            get_context = multiprocessing.get_context
+
+            def terminate_env():
+                events.append("terminate")
+                terminate()
+
+            def get_fork_context(method):
+                events.append(method)
+                return get_context(method)
+
+            with mock.patch.object(exp.env, "terminate", terminate_env), \
+                    mock.patch("multiprocessing.get_context",
+                               get_fork_context):
+                results.append(exp.run(num_runs=3, num_workers=num_workers))
+            self.assertListEqual(events, ["terminate", "fork"])
+
+            # check that the emission data of every run was stored
+            self.assertListEqual(
+                sorted(os.listdir(dir_path)),
+                ["{}-{}_emission".format(exp.env.network.name, i)
+                 for i in range(3)])
+            shutil.rmtree(dir_path)
+
+        for key in ["returns", "velocities", "outflows", "speed"]:
+            self.assertEqual(len(results[0][key]), 3)
+            np.testing.assert_array_almost_equal(
+                results[0][key], results[1][key])
+        np.testing.assert_array_almost_equal(
+            results[0]["velocities"], results[0]["speed"])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,63 @@
+from flow.renderer.frame_buffer import FrameBuffer
+import numpy as np
+import unittest
+
+
+class TestFrameBuffer(unittest.TestCase):
+    """Tests frame_buffer"""
+
+    def test_init(self):
+        buffer = FrameBuffer(length=3)
+        self.assertEqual(buffer.length, 3)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(list(buffer), [])
+        self.assertRaises(ValueError, buffer.stacked)
+        self.assertRaises(ValueError, FrameBuffer, length=0)
+
+    def test_append(self):
+        buffer = FrameBuffer(length=3)
+        buffer.reset(np.zeros((2, 2)))
+        self.assertEqual(len(buffer), 3)
+        np.testing.assert_array_equal(buffer.stacked(), np.zeros((3, 2, 2)))
+
+        # the oldest frames are overwritten, and the frames remain in order
+        for i in range(1, 6):
+            buffer.append(np.full((2, 2), float(i)))
+            expected = [max(j, 0) for j in range(i - 2, i + 1)]
+            np.testing.assert_array_equal(buffer.stacked()[:, 0, 0], expected)
+            np.testing.assert_array_equal(buffer[-1], np.full((2, 2), i))
+        self.assertEqual([frame[0, 0] for frame in buffer], [3, 4, 5])
+
+        # appended frames are copied
+        frame = np.full((2, 2), 6.)
+        buffer.append(frame)
+        frame[:] = 0
+        self.assertEqual(buffer[-1][0, 0], 6)
+
+    def test_stacked(self):
+        buffer = FrameBuffer(length=4)
+        buffer.reset(np.zeros(5, dtype=np.uint8))
+        data = buffer._data
+        for i in range(10):
+            buffer.append(np.full(5, i, dtype=np.uint8))
+
+            # the history is a contiguous read-only view of the storage
+            stacked = buffer.stacked()
+            self.assertEqual(stacked.shape, (4, 5))
+            self.assertTrue(np.shares_memory(stacked, data))
+            self.assertTrue(stacked.flags.c_contiguous)
+            self.assertFalse(stacked.flags.writeable)
+
+        # the storage was not reallocated
+        self.assertIs(buffer._data, data)
+
+    def test_reset_on_shape_change(self):
+        buffer = FrameBuffer(length=2)
+        buffer.reset(np.ones((1, 3)))
+        buffer.append(np.ones((2, 3)))
+        self.assertEqual(buffer.stacked().shape, (2, 2, 3))
+        np.testing.assert_array_equal(buffer.stacked(), np.ones((2, 2, 3)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+from flow.renderer.numpy_renderer import NumpyRenderer as Renderer
+from flow.core.params import SumoParams, VehicleParams
+from flow.controllers import IDMController, RLController
+from tests.setup_scripts import ring_road_exp_setup
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestNumpyRenderer(unittest.TestCase):
+    """Tests numpy_renderer"""
+
+    def setUp(self):
+        path = os.path.dirname(os.path.abspath(__file__))[:-11]
+        self.data = np.load(
+            '{}/data/renderer_data/replay.npy'.format(path),
+            allow_pickle=True
+        )
+        # Default renderer parameters
+        self.network = self.data[0]
+        self.mode = "drgb"
+        self.save_render = False
+        self.sight_radius = 25
+        self.pxpm = 3
+        self.show_radius = True
+        self.alpha = 0.9
+
+    def make_renderer(self, **kwargs):
+        params = dict(
+            mode=self.mode,
+            save_render=self.save_render,
+            sight_radius=self.sight_radius,
+            pxpm=self.pxpm,
+            show_radius=self.show_radius,
+            alpha=self.alpha
+        )
+        params.update(kwargs)
+        return Renderer(self.network, **params)
+
+    def test_init(self):
+        renderer = self.make_renderer()
+
+        # Ensure that the attributes match their correct values
+        self.assertEqual(renderer.mode, self.mode)
+        self.assertEqual(renderer.save_render, self.save_render)
+        self.assertEqual(renderer.sight_radius, self.sight_radius)
+        self.assertEqual(renderer.pxpm, self.pxpm)
+        self.assertEqual(renderer.show_radius, self.show_radius)
+        self.assertEqual(renderer.alpha, self.alpha)
+
+        # the lanes are drawn on the background
+        self.assertEqual(renderer.network.shape, (378, 378, 3))
+        self.assertEqual(np.min(renderer.network), 32)
+        self.assertGreater(np.max(renderer.network), 32)
+
+        self.assertRaises(ValueError, self.make_renderer, mode=True)
+
+    def test_render(self):
+        shapes = {"drgb": (378, 378, 3), "rgb": (378, 378, 3),
+                  "dgray": (378, 378), "gray": (378, 378)}
+        for mode, shape in shapes.items():
+            renderer = self.make_renderer(mode=mode)
+            frame = renderer.render(*self.data[100])
+            self.assertEqual(frame.shape, shape)
+            self.assertEqual(frame.dtype, np.uint8)
+
+        # vehicles are drawn in the colors of the mode
+        renderer = self.make_renderer(mode="rgb", alpha=1.0)
+        frame = renderer.render(*self.data[100])
+        bgr = frame.reshape(-1, 3).tolist()
+        self.assertIn([0, 225, 0], bgr)
+        self.assertIn([200, 150, 0], bgr)
+
+        # the network layer is not modified
+        renderer.render([], [], [], [], [], [])
+        np.testing.assert_array_equal(renderer.frame, renderer.network)
+
+    def test_get_sights(self):
+        renderer = self.make_renderer()
+        renderer.render(*self.data[101])
+
+        orientations = self.data[101][0][:3]
+        ids = [log[-1] for log in self.data[101][4][:3]]
+        sights = renderer.get_sights(orientations, ids)
+        self.assertEqual(sights.shape, (3, 150, 150, 3))
+
+        # the batched observations match the individual ones
+        for i in range(3):
+            sight = renderer.get_sight(orientations[i], ids[i])
+            self.assertEqual(sight.shape, (150, 150, 3))
+            np.testing.assert_array_equal(sight, sights[i])
+
+        # pixels outside the disk of the observation are black
+        self.assertTrue(np.all(sights[:, 0, 0] == 0))
+        self.assertTrue(np.all(sights[:, 75, 75] > 0))
+
+        # an unrotated observation is a crop of the frame
+        x, y, _ = orientations[0]
+        sight = renderer.get_sight([x, y, 0], ids[0])
+        x, y = renderer._to_pixels(x, y)
+        row, col = int(renderer.height - y - 75), int(x - 75)
+        np.testing.assert_array_equal(
+            sight[75], renderer.frame[row + 75, col:col + 150])
+
+        self.assertEqual(renderer.get_sights([], []).shape, (0, 150, 150, 3))
+
+    def test_save_renderer(self):
+        path = tempfile.mkdtemp()
+        try:
+            renderer = self.make_renderer(save_render=True, path=path)
+            renderer.render(*self.data[101])
+
+            save_path = renderer.close()
+            saved_data = np.load(save_path, allow_pickle=True)
+
+            self.assertEqual(self.data[0], saved_data[0])
+            self.assertEqual(self.data[101], saved_data[1])
+            self.assertTrue(os.path.exists(
+                os.path.join(renderer.path, "frame_000001.png")))
+        finally:
+            shutil.rmtree(path)
+
+    def test_env(self):
+        """Tests rendering the observations of an environment offscreen."""
+        vehicles = VehicleParams()
+        vehicles.add("human", acceleration_controller=(IDMController, {}),
+                     num_vehicles=3)
+        vehicles.add("rl", acceleration_controller=(RLController, {}),
+                     num_vehicles=2)
+        sim_params = SumoParams(render="gray", render_backend="numpy",
+                                sight_radius=10, pxpm=2)
+        env, _, _ = ring_road_exp_setup(
+            sim_params=sim_params, vehicles=vehicles)
+        env.step(rl_actions=None)
+
+        self.assertIsInstance(env.renderer, Renderer)
+        self.assertEqual(env.frame.shape,
+                         (env.renderer.height, env.renderer.width))
+        self.assertEqual(env.sights.shape, (2, 40, 40))
+        self.assertEqual(len(env.frame_buffer), 5)
+        self.assertEqual(env.sights_buffer.stacked().shape, (5, 2, 40, 40))
+
+        env.terminate()
+
+    def test_env_buffer(self):
+        """Tests the length and stride of the buffer of rendered frames."""
+        sim_params = SumoParams(render="gray", render_backend="numpy",
+                                render_buffer_length=3,
+                                render_buffer_stride=2)
+        env, _, _ = ring_road_exp_setup(sim_params=sim_params)
+        self.assertEqual(len(env.frame_buffer), 3)
+
+        # a frame is stored every other step
+        env.frame_buffer.reset(np.zeros_like(env.frame))
+        for _ in range(4):
+            env.step(rl_actions=None)
+        frames = env.frame_buffer.stacked()
+        self.assertEqual(frames.shape, (3,) + env.frame.shape)
+        self.assertEqual(np.max(frames[0]), 0)
+        self.assertGreater(np.max(frames[1]), 0)
+        np.testing.assert_array_equal(frames[2], env.frame)
+
+        env.terminate()
+
+
+if __name__ == '__main__':
+    unittest.main()
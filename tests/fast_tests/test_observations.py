@@ -0,0 +1,119 @@
+import unittest
+import os
+import numpy as np
+
+from tests.setup_scripts import ring_road_exp_setup
+from flow.controllers import IDMController, RLController
+from flow.core.params import VehicleParams
+from flow.core.observations import ObservationBuffer, \
+    lead_follow_observations
+
+os.environ["TEST_FLAG"] = "True"
+
+
+class TestObservationBuffer(unittest.TestCase):
+    """Tests the ObservationBuffer class in flow/core/observations.py."""
+
+    def test_segments(self):
+        obs = ObservationBuffer()
+        state = obs.allocate([("speed", 3), ("pos", 2)])
+        self.assertEqual(state.shape, (5,))
+        self.assertEqual(state.dtype, np.float32)
+        np.testing.assert_array_equal(state, np.zeros(5))
+
+        # the segments are views of the buffer
+        obs["speed"][:] = [1, 2, 3]
+        obs["pos"][:] = [4, 5]
+        np.testing.assert_array_equal(state, [1, 2, 3, 4, 5])
+
+        # the buffer is reused if the layout does not change
+        self.assertIs(obs.allocate([("speed", 3), ("pos", 2)], fill=None),
+                      state)
+        np.testing.assert_array_equal(state, [1, 2, 3, 4, 5])
+        self.assertIs(obs.allocate([("speed", 3), ("pos", 2)], fill=-1),
+                      state)
+        np.testing.assert_array_equal(state, -np.ones(5))
+
+        # the buffer is reallocated otherwise
+        new_state = obs.allocate([("speed", 4), ("pos", 4)])
+        self.assertEqual(new_state.shape, (8,))
+        self.assertEqual(obs["pos"].shape, (4,))
+
+    def test_rows(self):
+        obs = ObservationBuffer()
+        state = obs.allocate([("pos", 1), ("lane", 2)], num_rows=3)
+        self.assertEqual(state.shape, (3, 3))
+        self.assertEqual(obs["lane"].shape, (3, 2))
+
+        obs["pos"][:, 0] = [1, 2, 3]
+        np.testing.assert_array_equal(state[:, 0], [1, 2, 3])
+        np.testing.assert_array_equal(state[:, 1:], np.zeros((3, 2)))
+
+
+class TestLeadFollowObservations(unittest.TestCase):
+    """Tests the lead_follow_observations method."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="human",
+            acceleration_controller=(IDMController, {}),
+            num_vehicles=5)
+        vehicles.add(
+            veh_id="rl",
+            acceleration_controller=(RLController, {}),
+            num_vehicles=2)
+
+        self.env, _, _ = ring_road_exp_setup(vehicles=vehicles)
+        self.env.reset()
+        for _ in range(10):
+            self.env.step(None)
+
+    def tearDown(self):
+        self.env.terminate()
+        self.env = None
+
+    def test_matches_getters(self):
+        env = self.env
+        kv = env.k.vehicle
+        max_speed = env.k.network.max_speed()
+        max_length = env.k.network.length()
+        rl_ids = kv.get_rl_ids()
+
+        out = np.zeros((len(rl_ids), 5), dtype=np.float32)
+        leaders, followers = lead_follow_observations(env, rl_ids, out)
+        self.assertListEqual(leaders, kv.get_leader(rl_ids))
+        self.assertListEqual(followers, kv.get_follower(rl_ids))
+
+        for i, rl_id in enumerate(rl_ids):
+            speed = kv.get_speed(rl_id)
+            lead_id = kv.get_leader(rl_id)
+            follower = kv.get_follower(rl_id)
+            expected = [
+                speed / max_speed,
+                (kv.get_speed(lead_id) - speed) / max_speed,
+                (kv.get_x_by_id(lead_id) - kv.get_x_by_id(rl_id) -
+                 kv.get_length(rl_id)) / max_length,
+                (speed - kv.get_speed(follower)) / max_speed,
+                kv.get_headway(follower) / max_length,
+            ]
+            np.testing.assert_array_almost_equal(out[i], expected)
+
+    def test_missing_neighbors(self):
+        env = self.env
+
+        # vehicles that are not in the network have no leaders or followers
+        out = np.zeros((1, 5), dtype=np.float32)
+        leaders, followers = lead_follow_observations(env, ["missing"], out)
+        self.assertListEqual(leaders, [])
+        self.assertListEqual(followers, [])
+        self.assertAlmostEqual(out[0, 2], 1)
+        self.assertAlmostEqual(out[0, 4], 1)
+
+        # no observations are written for an empty list of vehicles
+        out = np.zeros((0, 5), dtype=np.float32)
+        self.assertEqual(lead_follow_observations(env, [], out), ([], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
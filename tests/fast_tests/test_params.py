@@ -96,8 +96,11 @@ class TestSumoParams(unittest.TestCase):
              overtake_right=True,
              seed=204,
              restart_instance=True,
+             warm_restart=False,
+             runtime_inflows=True,
              print_warnings=False,
-             teleport_time=-1)
+             teleport_time=-1,
+             profile=True)
 
         # ensure that the attributes match their correct values
         self.assertEqual(params.port, None)
@@ -113,8 +116,28 @@ class TestSumoParams(unittest.TestCase):
         self.assertEqual(params.overtake_right, True)
         self.assertEqual(params.seed, 204)
         self.assertEqual(params.restart_instance, True)
+        self.assertEqual(params.warm_restart, False)
+        self.assertEqual(params.runtime_inflows, True)
         self.assertEqual(params.print_warnings, False)
         self.assertEqual(params.teleport_time, -1)
+        self.assertEqual(params.profile, True)
+
+    def test_positional_params(self):
+        """Tests that the parameters keep their original positions, so that
+        new parameters are not assigned the values of existing ones."""
+        params = SumoParams(
+            None, 0.125, None, None, True, False, False, 25, False, 2, False,
+            False, None, True, False, 100, 2, True, True)
+
+        self.assertEqual(params.restart_instance, True)
+        self.assertEqual(params.print_warnings, False)
+        self.assertEqual(params.teleport_time, 100)
+        self.assertEqual(params.num_clients, 2)
+        self.assertEqual(params.color_by_speed, True)
+        self.assertEqual(params.use_ballistic, True)
+        self.assertEqual(params.warm_restart, True)
+        self.assertEqual(params.bulk_reset, False)
+        self.assertEqual(params.runtime_inflows, False)
 
 
 class TestSumoCarFollowingParams(unittest.TestCase):
@@ -8,6 +8,9 @@ from flow.core.rewards import average_velocity, min_delay
 from flow.core.rewards import desired_velocity, boolean_action_penalty
 from flow.core.rewards import penalize_near_standstill, penalize_standstill
 from flow.core.rewards import energy_consumption
+from flow.core.rewards import avg_delay_specified_vehicles
+from flow.core.vectorized_rewards import RewardState
+import flow.core.vectorized_rewards as vr
 
 os.environ["TEST_FLAG"] = "True"
 
@@ -192,5 +195,127 @@ class TestRewards(unittest.TestCase):
         self.assertEqual(boolean_action_penalty(actions, gain=2), 4)
 
 
+class TestVectorizedRewards(unittest.TestCase):
+    """Tests the array-based rewards in flow/core/vectorized_rewards.py."""
+
+    def test_reward_state(self):
+        vehicles = VehicleParams()
+        vehicles.add("test", num_vehicles=10)
+        env, _, _ = ring_road_exp_setup(vehicles=vehicles)
+
+        env.k.vehicle.test_set_speed("test_0", 5)
+        state = RewardState(env)
+        self.assertEqual(state.num_vehicles, 10)
+        self.assertEqual(state.speed[0], 5)
+        np.testing.assert_array_equal(state.speed[1:], 0)
+
+        # the speed limits are collected from the edges of every vehicle
+        edges = env.k.vehicle.get_edge(env.k.vehicle.get_ids())
+        np.testing.assert_array_almost_equal(
+            state.speed_limit,
+            [env.k.network.speed_limit(edge) for edge in edges])
+        self.assertEqual(state.max_speed, env.k.network.max_speed())
+        self.assertTrue(np.all(state.on_edge == [edge[0] != ":"
+                                                 for edge in edges]))
+
+        # columns are only collected once
+        self.assertIs(state.speed, state.speed)
+
+        # snapshots of a subset of the vehicles
+        state = RewardState(env, ["test_1", "test_0"])
+        np.testing.assert_array_equal(state.speed, [0, 5])
+
+    def test_avg_delay_specified_vehicles(self):
+        vehicles = VehicleParams()
+        vehicles.add("test", num_vehicles=10)
+        env, _, _ = ring_road_exp_setup(vehicles=vehicles)
+
+        env.k.vehicle.test_set_speed("test_0", 10)
+        v_top = env.k.network.max_speed()
+        expected = env.sim_step * (10 - 10 / v_top) / 5
+        self.assertAlmostEqual(
+            avg_delay_specified_vehicles(env, ["test_{}".format(i)
+                                               for i in range(5)]),
+            expected)
+        self.assertEqual(avg_delay_specified_vehicles(env, []), 0)
+
+    def test_fuel_and_energy(self):
+        speed = np.array([0, 5, 10, -1001])
+        prev_speed = np.array([0, 4, 10, 0])
+
+        # power of the vehicles
+        power = vr.power(speed, prev_speed, 0.1)
+        self.assertEqual(power[0], 0)
+        self.assertAlmostEqual(
+            power[1], 1200 * 5 * 10 + 1200 * 9.81 * 0.005 * 5
+            + 0.5 * 1.225 * 2.6 * 0.3 * 5 ** 3)
+        self.assertAlmostEqual(
+            vr.energy_consumption(speed[:3], prev_speed[:3], 0.1, gain=1),
+            -np.sum(power[:3]))
+
+        # only vehicles with a positive power and speed are averaged
+        self.assertAlmostEqual(
+            vr.miles_per_megajoule(speed, prev_speed, 0.1, gain=1),
+            np.mean(speed[1:3] / power[1:3]) / 1609.0 * 10 ** 6)
+        self.assertEqual(vr.miles_per_megajoule(
+            speed[:1], prev_speed[:1], 0.1), 0)
+
+        fuel = np.array([0, 0.1, 0.2, 0.1])
+        self.assertAlmostEqual(vr.miles_per_gallon(speed, fuel, gain=1),
+                               (50 + 50) / 2 / 1609.0)
+        self.assertEqual(vr.miles_per_gallon(speed[:1], fuel[:1]), 0)
+
+
+class TestStepMetrics(unittest.TestCase):
+    """Tests the cache of metrics in flow/core/kernel/metrics.py."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add("test", num_vehicles=10)
+        self.env, _, _ = ring_road_exp_setup(vehicles=vehicles)
+
+    def tearDown(self):
+        self.env.terminate()
+        self.env = None
+
+    def test_metrics(self):
+        metrics = self.env.k.metrics
+        self.env.k.vehicle.test_set_speed("test_0", 10)
+
+        self.assertEqual(metrics.mean_speed, 1)
+        self.assertEqual(metrics.max_speed, 10)
+        self.assertIs(metrics.speed, metrics.speed)
+
+        # the vehicles are counted on the edge they are located on
+        edges = self.env.k.vehicle.get_edge(self.env.k.vehicle.get_ids())
+        for edge in set(edges):
+            self.assertEqual(metrics.edge_count(edge), edges.count(edge))
+        self.assertEqual(metrics.edge_count("unknown"), 0)
+        self.assertEqual(sum(metrics.edge_counts), 10)
+
+        edge_0 = self.env.k.vehicle.get_edge("test_0")
+        self.assertAlmostEqual(metrics.edge_mean_speed(edge_0),
+                               10 / edges.count(edge_0))
+
+    def test_invalidation(self):
+        metrics = self.env.k.metrics
+        self.assertEqual(average_velocity(self.env), 0)
+        self.assertEqual(metrics.cached("value", lambda: 1), 1)
+        self.assertEqual(metrics.cached("value", lambda: 2), 1)
+
+        # values are recomputed after the vehicles are modified
+        self.env.k.vehicle.test_set_speed("test_0", 10)
+        self.assertEqual(average_velocity(self.env), 1)
+        self.assertEqual(metrics.cached("value", lambda: 2), 2)
+
+        # ... and after every simulation step
+        self.env.step(rl_actions=None)
+        self.assertEqual(metrics.cached("value", lambda: 3), 3)
+        self.assertAlmostEqual(
+            metrics.mean_speed,
+            np.mean(self.env.k.vehicle.get_speed(
+                self.env.k.vehicle.get_ids())))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,11 @@
 import unittest
+from unittest import mock
 import os
+import shutil
+import tempfile
 import numpy as np
 
+import flow.config as config
 from flow.config import PROJECT_PATH
 from flow.core.params import InitialConfig
 from flow.core.params import NetParams
@@ -12,6 +16,7 @@ from flow.core.params import SumoCarFollowingParams
 from flow.networks.ring import RingNetwork, ADDITIONAL_NET_PARAMS
 from flow.envs import TestEnv
 from flow.networks import Network
+from flow.core.kernel.network.traci import _netconvert_version
 
 from flow.controllers.routing_controllers import ContinuousRouter
 from flow.controllers.car_following_models import IDMController
@@ -64,6 +69,21 @@ class TestGetX(unittest.TestCase):
         pos = 4.72
         self.assertAlmostEqual(self.env.k.network.get_x(edge, pos), -1001)
 
+    def test_getx_array(self):
+        network = self.env.k.network
+        edges = ["bottom", ":bottom", "", "right", "bottom", ":center_0"]
+        positions = [4.72, 0.1, 4.72, 3, 1, 2]
+        np.testing.assert_array_almost_equal(
+            network.get_x_array(edges, positions),
+            [network.get_x(edge, pos) for edge, pos in zip(edges, positions)])
+        self.assertEqual(network.get_x_array([], []).shape, (0,))
+
+        # the positions of several vehicles match their individual positions
+        ids = self.env.k.vehicle.get_ids()
+        self.assertListEqual(
+            self.env.k.vehicle.get_x_by_id(ids),
+            [self.env.k.vehicle.get_x_by_id(veh_id) for veh_id in ids])
+
 
 class TestGetEdge(unittest.TestCase):
     """
@@ -92,6 +112,31 @@ class TestGetEdge(unittest.TestCase):
         self.assertTupleEqual(
             self.env.k.network.get_edge(x2), (":bottom", 0.1))
 
+        # test for a position before the start of the network
+        self.assertIsNone(self.env.k.network.get_edge(-1))
+
+    def test_get_edge_array(self):
+        network = self.env.k.network
+        x = np.append(-1, np.linspace(0, network.length() + 5, 100))
+        edges, positions = network.get_edge_array(x)
+
+        # positions before the start of the network are on no edge
+        self.assertEqual(edges[0], "")
+        self.assertTrue(np.isnan(positions[0]))
+
+        for i in range(1, len(x)):
+            edge, pos = network.get_edge(x[i])
+            self.assertEqual(edges[i], edge)
+            self.assertAlmostEqual(positions[i], pos)
+
+        # the positions at the start of an edge are on this edge
+        edges, positions = network.get_edge_array(
+            [start for _, start in network.total_edgestarts])
+        self.assertListEqual(
+            list(edges), [network.get_edge(start)[0]
+                          for _, start in network.total_edgestarts])
+        np.testing.assert_array_equal(positions, 0)
+
 
 class TestEvenStartPos(unittest.TestCase):
     """
@@ -172,6 +217,33 @@ class TestEvenStartPos(unittest.TestCase):
         # delete the created environment
         self.tearDown_gen_start_pos()
 
+    def test_perturbation(self):
+        """
+        Tests that the perturbation of the starting positions does not move
+        vehicles outside of their edges.
+        """
+        self.setUp_gen_start_pos(InitialConfig(lanes_distribution=1))
+        network = self.env.k.network
+
+        initial_config = InitialConfig(lanes_distribution=1)
+        startpositions, _ = network.gen_even_start_pos(initial_config, 15)
+
+        np.random.seed(0)
+        initial_config = InitialConfig(lanes_distribution=1, perturbation=20)
+        perturbed, _ = network.gen_even_start_pos(initial_config, 15)
+
+        np.random.seed(0)
+        perturb = np.random.normal(0, 20, 15)
+        for (edge, pos), (perturbed_edge, perturbed_pos), delta in \
+                zip(startpositions, perturbed, perturb):
+            self.assertEqual(edge, perturbed_edge)
+            self.assertAlmostEqual(
+                perturbed_pos,
+                max(0, min(network.edge_length(edge), pos + delta)))
+
+        # delete the created environment
+        self.tearDown_gen_start_pos()
+
     def test_x0(self):
         """
         Tests that the vehicles are uniformly distributed and the initial
@@ -828,6 +900,95 @@ class TestGetJunctionList(unittest.TestCase):
         self.assertCountEqual(junction_list, expected_junction_list)
 
 
+class TestNetworkCache(unittest.TestCase):
+    """
+    Tests that the network files generated by netconvert, and the data parsed
+    from them, are cached and reused for identical networks.
+    """
+
+    def setUp(self):
+        self.cache_path = config.NET_CACHE_PATH
+        config.NET_CACHE_PATH = tempfile.mkdtemp()
+        self.env, _, _ = figure_eight_exp_setup()
+
+    def tearDown(self):
+        self.env.terminate()
+        self.env = None
+        shutil.rmtree(config.NET_CACHE_PATH)
+        config.NET_CACHE_PATH = self.cache_path
+
+    def test_cache(self):
+        network = self.env.k.network
+        edges = network._edges
+        connections = network._connections
+
+        # the network file and parsed data were added to the cache
+        self.assertEqual(len(os.listdir(config.NET_CACHE_PATH)), 2)
+
+        # netconvert is not called again for the same network
+        with mock.patch('subprocess.call') as call:
+            network.generate_network(self.env.network)
+            call.assert_not_called()
+
+        self.assertDictEqual(network._edges, edges)
+        self.assertDictEqual(network._connections, connections)
+        self.assertTrue(os.path.isfile(network.cfg_path + network.netfn))
+
+    def test_no_cache(self):
+        network = self.env.k.network
+        edges = network._edges
+
+        config.NET_CACHE_PATH, cache_path = None, config.NET_CACHE_PATH
+        try:
+            network.generate_network(self.env.network)
+        finally:
+            config.NET_CACHE_PATH = cache_path
+
+        self.assertDictEqual(network._edges, edges)
+
+    def test_untrusted_cache(self):
+        network = self.env.k.network
+
+        # files in a directory writable by other users are not used
+        os.chmod(config.NET_CACHE_PATH, 0o777)
+        with mock.patch('subprocess.call') as call:
+            network.generate_network(self.env.network)
+            call.assert_called_once()
+        self.assertIsNone(network._cached_path('test'))
+
+        # the cache is created with permissions restricted to the user
+        shutil.rmtree(config.NET_CACHE_PATH)
+        self.assertIsNotNone(network._cached_path('test'))
+        self.assertEqual(os.stat(config.NET_CACHE_PATH).st_mode & 0o077, 0)
+
+    def test_eviction(self):
+        network = self.env.k.network
+        for name in os.listdir(config.NET_CACHE_PATH):
+            os.remove(os.path.join(config.NET_CACHE_PATH, name))
+
+        cache_size = config.NET_CACHE_SIZE
+        config.NET_CACHE_SIZE = 20
+        try:
+            for i, name in enumerate(['a', 'b']):
+                network._store_cached_file(name, b'0123456789')
+                os.utime(os.path.join(config.NET_CACHE_PATH, name), (i, i))
+
+            # reading a file marks it as recently used
+            path = os.path.join(config.NET_CACHE_PATH, 'copy')
+            self.assertTrue(network._load_cached_file('a', path))
+            os.remove(path)
+
+            # the least recently used file is removed above the size limit
+            network._store_cached_file('c', b'0123456789')
+        finally:
+            config.NET_CACHE_SIZE = cache_size
+
+        self.assertCountEqual(os.listdir(config.NET_CACHE_PATH), ['a', 'c'])
+
+    def test_netconvert_version(self):
+        self.assertIn('netconvert', _netconvert_version())
+
+
 class TestNextPrevEdge(unittest.TestCase):
     """
     Tests that the next_edge() and prev_edge() methods returns the correct list
@@ -0,0 +1,79 @@
+import unittest
+from copy import deepcopy
+
+from flow.benchmarks.throughput import benchmark, compare, get_flow_params, \
+    ring_flow_params, report, sims_per_step_scaling, BENCHMARKS
+
+
+class TestThroughput(unittest.TestCase):
+    """Tests the simulator throughput benchmarks."""
+
+    def test_flow_params(self):
+        for name in BENCHMARKS:
+            self.assertIn("env_name", get_flow_params(name))
+
+        flow_params = ring_flow_params(num_vehicles=44, spacing=10)
+        self.assertEqual(flow_params["net"].additional_params["length"], 440)
+        self.assertEqual(flow_params["veh"].num_vehicles, 44)
+
+    def test_benchmark(self):
+        flow_params = ring_flow_params(num_vehicles=5)
+        results = benchmark(flow_params, num_steps=20, num_resets=2,
+                            warmup_steps=2)
+
+        # the flow parameters are not modified
+        self.assertFalse(flow_params["sim"].profile)
+
+        self.assertGreater(results["construction_time"], 0)
+        self.assertLessEqual(results["reset"]["min"], results["reset"]["max"])
+        self.assertEqual(results["step"]["count"], 20)
+        self.assertLessEqual(results["step"]["p50"], results["step"]["p99"])
+        self.assertAlmostEqual(results["steps_per_second"],
+                               1 / results["step"]["mean"])
+        self.assertEqual(results["num_vehicles"], 5)
+
+        # the phases of the measured steps are reported
+        phases = results["phases"]
+        self.assertEqual(phases["step"]["count"], 20)
+        self.assertAlmostEqual(phases["step"]["share"], 1)
+        self.assertLess(phases["simulation_step"]["share"], 1)
+
+        curve = sims_per_step_scaling(
+            flow_params, sims_per_step=[2], num_steps=5, num_resets=1)
+        self.assertEqual(curve[0]["value"], 2)
+        self.assertAlmostEqual(curve[0]["sim_steps_per_second"],
+                               2 * curve[0]["steps_per_second"])
+
+    def test_compare(self):
+        point = {
+            "construction_time": 1.,
+            "reset": {"mean": 0.1},
+            "step": {"p50": 0.01, "p99": 0.02},
+            "steps_per_second": 100.,
+            "num_vehicles": 10.,
+        }
+        baseline = {"benchmarks": {"merge0": point, "grid0": point},
+                    "scaling": {"num_vehicles": [dict(point, value=10)]}}
+
+        results = deepcopy(baseline)
+        results["benchmarks"]["merge0"]["step"]["p99"] = 0.03
+        results["benchmarks"]["merge0"]["steps_per_second"] = 95.
+        results["scaling"]["num_vehicles"][0]["steps_per_second"] = 150.
+        del results["benchmarks"]["grid0"]
+
+        comparison = compare(baseline, results, tolerance=0.1)
+        changes = {(c["benchmark"], c["metric"]): c["status"]
+                   for c in comparison}
+        self.assertEqual(len(changes), 10)
+        self.assertEqual(changes["merge0", "step.p99"], "regression")
+        self.assertEqual(changes["merge0", "steps_per_second"], "ok")
+        self.assertEqual(changes["num_vehicles=10", "steps_per_second"],
+                         "improvement")
+
+        table = report(results, comparison)
+        self.assertIn("num_vehicles=10", table)
+        self.assertIn("regression  merge0", table)
+
+
+if __name__ == '__main__':
+    unittest.main()
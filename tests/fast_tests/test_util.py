@@ -3,6 +3,12 @@ import csv
 import os
 import json
 import collections
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+from gym.spaces import Box
 
 from flow.envs import AccelEnv
 from flow.networks import FigureEightNetwork
@@ -12,10 +18,17 @@ from flow.controllers import IDMController, ContinuousRouter, RLController
 from flow.core.params import SumoParams, EnvParams, NetParams, InitialConfig, \
     InFlows, SumoCarFollowingParams
 from flow.core.util import emission_to_csv
+from flow.core.emission import EmissionRecorder, EMISSION_COLUMNS, \
+    emission_shards_to_csv, load_emission
+from flow.core.emission_dataset import EmissionDataset, \
+    EmissionDatasetWriter, add_emission
+from flow.core.profiler import StepProfiler, profiling_enabled
 from flow.envs import MergePOEnv
 from flow.networks import MergeNetwork
 from flow.utils.registry import make_create_env
-from flow.utils.rllib import FlowParamsEncoder, get_flow_params
+from flow.utils.rllib import FlowParamsEncoder, get_flow_params, \
+    compute_multiagent_actions
+from tests.setup_scripts import ring_road_exp_setup
 
 os.environ["TEST_FLAG"] = "True"
 
@@ -58,6 +71,396 @@ class TestEmissionToCSV(unittest.TestCase):
         # I don't think is a problem
         self.assertEqual(len(dict1), 104)
 
+    def test_emission_to_npz(self):
+        current_path = os.path.realpath(__file__).rsplit("/", 1)[0]
+        output_path = os.path.join(tempfile.mkdtemp(), "emission.npz")
+
+        # convert a subset of the columns and time steps
+        emission_to_csv(
+            current_path + "/test_files/test-emission.xml",
+            output_path=output_path,
+            columns=["time", "id", "speed", "lane_number"],
+            start_time=0.2,
+            end_time=0.5,
+            output_format="npz")
+
+        with np.load(output_path) as data:
+            self.assertCountEqual(
+                data.files, ["time", "id", "speed", "lane_number"])
+            self.assertEqual(data["time"].min(), 0.2)
+            self.assertEqual(data["time"].max(), 0.5)
+            self.assertEqual(data["lane_number"].dtype.kind, "i")
+            # rows are sorted by vehicle id
+            self.assertListEqual(
+                data["id"].tolist(), sorted(data["id"].tolist()))
+
+        shutil.rmtree(os.path.dirname(output_path))
+
+    def test_emission_to_csv_external_sort(self):
+        current_path = os.path.realpath(__file__).rsplit("/", 1)[0]
+        emission_path = current_path + "/test_files/test-emission.xml"
+        tmp_dir = tempfile.mkdtemp()
+
+        def convert(name, batch_size):
+            output_path = os.path.join(tmp_dir, name)
+            emission_to_csv(emission_path, output_path=output_path,
+                            columns=["time", "id", "speed"],
+                            batch_size=batch_size)
+            with open(output_path, "r") as f:
+                return list(csv.DictReader(f))
+
+        # sort the rows in memory, and in sorted runs of 10 rows that are
+        # merged in several passes
+        rows = convert("one_batch.csv", 1000)
+        with mock.patch("flow.core.util.MAX_MERGED_RUNS", 3):
+            self.assertListEqual(convert("several_batches.csv", 10), rows)
+
+        self.assertEqual(len(rows), 104)
+        self.assertListEqual(
+            [(row["id"], float(row["time"])) for row in rows],
+            sorted((row["id"], float(row["time"])) for row in rows))
+
+        # the sorted runs are removed
+        self.assertCountEqual(os.listdir(tmp_dir),
+                              ["one_batch.csv", "several_batches.csv"])
+        shutil.rmtree(tmp_dir)
+
+    def test_emission_to_csv_unsorted(self):
+        current_path = os.path.realpath(__file__).rsplit("/", 1)[0]
+        emission_path = current_path + "/test_files/test-emission.xml"
+        output_path = os.path.join(tempfile.mkdtemp(), "emission.csv")
+
+        # rows are written in the order of the time steps
+        emission_to_csv(emission_path, output_path=output_path,
+                        columns=["time", "id"], sort_by_id=False,
+                        batch_size=10)
+        with open(output_path, "r") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+
+        self.assertListEqual(reader.fieldnames, ["time", "id"])
+        self.assertEqual(len(rows), 104)
+        times = [float(row["time"]) for row in rows]
+        self.assertListEqual(times, sorted(times))
+
+        shutil.rmtree(os.path.dirname(output_path))
+
+        # invalid output formats and columns
+        self.assertRaises(ValueError, emission_to_csv, emission_path,
+                          output_format="json")
+        self.assertRaises(ValueError, emission_to_csv, emission_path,
+                          columns=["time", "foo"])
+
+
+class TestEmissionRecorder(unittest.TestCase):
+    """Tests the streaming emission recorder and its csv converter."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    @staticmethod
+    def _step_data(veh_ids):
+        data = {name: [0] * len(veh_ids) for name, _ in EMISSION_COLUMNS[1:]}
+        data.update({
+            "id": veh_ids,
+            "speed": list(range(len(veh_ids))),
+            "leader_id": [None] + veh_ids[:-1],
+            "target_accel_no_noise_no_failsafe": [None] * len(veh_ids),
+        })
+        return data
+
+    def test_shards(self):
+        path = os.path.join(self.path, "ring-0_emission")
+        recorder = EmissionRecorder(path, chunk_size=5)
+        for t in range(4):
+            recorder.append(time=t / 10, **self._step_data(["a", "b", "c"]))
+        recorder.close()
+
+        # 12 rows are written in shards of (at least) 5 rows
+        self.assertEqual(recorder.num_rows, 12)
+        self.assertEqual(recorder.num_shards, 2)
+
+        data = load_emission(path)
+        self.assertListEqual(
+            list(data.keys()), [name for name, _ in EMISSION_COLUMNS])
+        np.testing.assert_array_almost_equal(
+            data["time"], np.repeat([0, 0.1, 0.2, 0.3], 3))
+        self.assertListEqual(data["id"].tolist(), ["a", "b", "c"] * 4)
+        self.assertListEqual(data["leader_id"].tolist(), ["", "a", "b"] * 4)
+        self.assertTrue(
+            np.all(np.isnan(data["target_accel_no_noise_no_failsafe"])))
+
+        # load a subset of the columns
+        data = load_emission(path, columns=["speed"])
+        self.assertListEqual(list(data.keys()), ["speed"])
+        np.testing.assert_array_almost_equal(data["speed"], [0, 1, 2] * 4)
+
+    def test_same_time(self):
+        """Check that only the last sample appended at a given time is kept."""
+        path = os.path.join(self.path, "ring-0_emission")
+        recorder = EmissionRecorder(path, chunk_size=3)
+        recorder.append(time=0, **self._step_data(["a", "b", "c"]))
+        recorder.append(time=0, **self._step_data(["a", "b"]))
+        recorder.append(time=0.1, **self._step_data(["a"]))
+        recorder.close()
+
+        self.assertEqual(recorder.num_rows, 3)
+        data = load_emission(path)
+        self.assertListEqual(data["id"].tolist(), ["a", "b", "a"])
+        np.testing.assert_array_almost_equal(data["time"], [0, 0, 0.1])
+
+    def test_shards_to_csv(self):
+        path = os.path.join(self.path, "ring-0_emission")
+        recorder = EmissionRecorder(path, chunk_size=5)
+        for t in range(4):
+            recorder.append(time=t / 10, **self._step_data(["a", "b", "c"]))
+        recorder.close()
+
+        csv_path = emission_shards_to_csv(path, remove_shards=True)
+        self.assertEqual(csv_path, path + ".csv")
+        self.assertFalse(os.path.isdir(path))
+
+        with open(csv_path, "r") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+
+        self.assertListEqual(
+            reader.fieldnames, [name for name, _ in EMISSION_COLUMNS])
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(rows[4]["id"], "b")
+        self.assertEqual(rows[4]["leader_id"], "a")
+        self.assertEqual(float(rows[4]["time"]), 0.1)
+        self.assertEqual(rows[4]["target_accel_no_noise_no_failsafe"], "")
+
+    def test_simulation(self):
+        sim_params = SumoParams(sim_step=0.1, emission_path=self.path)
+        env, _, _ = ring_road_exp_setup(sim_params=sim_params)
+        env.reset()
+        for _ in range(10):
+            env.step(None)
+        env.k.simulation.save_emission(run_id=1)
+        env.terminate()
+
+        data = load_emission(os.path.join(
+            self.path, "{}-1_emission".format(env.network.name)))
+        # one row per time step
+        self.assertGreaterEqual(len(data["id"]), 10)
+        self.assertListEqual(data["id"].tolist(), ["idm_0"] * len(data["id"]))
+        np.testing.assert_array_almost_equal(np.diff(data["time"]), 0.1)
+        self.assertTrue(np.all(data["speed"] >= 0))
+
+
+class TestEmissionDataset(unittest.TestCase):
+    """Tests the partitioned emission dataset."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    @staticmethod
+    def _run_data(num_steps=300):
+        """Return 3 vehicles driving for num_steps steps of 1 second."""
+        time = np.repeat(np.arange(num_steps, dtype=float), 3)
+        return {
+            "time": time,
+            "id": np.tile(["a", "b", "c"], num_steps),
+            "edge_id": np.where(time < 150, "left", "right"),
+            "speed": np.arange(len(time), dtype=float),
+        }
+
+    def test_writer(self):
+        writer = EmissionDatasetWriter(
+            self.path, "ring", 0, time_window=100, chunk_size=200)
+        data = self._run_data()
+        # rows are written in several calls, in any order
+        writer.write({name: values[450:] for name, values in data.items()})
+        writer.write({name: values[:450] for name, values in data.items()})
+        writer.close()
+
+        dataset = EmissionDataset(self.path)
+        self.assertListEqual(dataset.experiments, ["ring"])
+        index = dataset.runs[0]
+        self.assertEqual(index["run"], 0)
+        self.assertListEqual(index["columns"],
+                             ["time", "id", "edge_id", "speed"])
+
+        # every window of 300 rows is split into 2 partitions
+        partitions = index["partitions"]
+        self.assertListEqual(
+            [p["name"] for p in partitions],
+            ["part-00000-000", "part-00000-001", "part-00001-000",
+             "part-00001-001", "part-00002-000", "part-00002-001"])
+        self.assertListEqual([p["num_rows"] for p in partitions],
+                             [200, 100] * 3)
+        self.assertEqual(partitions[2]["min_time"], 100)
+        self.assertEqual(partitions[3]["max_time"], 199)
+        self.assertListEqual(partitions[2]["edges"], ["left", "right"])
+        self.assertEqual(partitions[0]["min_id"], "a")
+        self.assertEqual(partitions[0]["max_id"], "c")
+
+        # the columns of the partitions are memory-mapped
+        part = dataset.partitions(run=0)[0]
+        columns = dataset.load_partition(part, ["time", "speed"])
+        self.assertIsInstance(columns["speed"], np.memmap)
+        np.testing.assert_array_equal(columns["speed"], np.arange(200))
+
+        # rewriting the run replaces its partitions
+        writer = EmissionDatasetWriter(self.path, "ring", 0)
+        writer.write(self._run_data(num_steps=10))
+        writer.close()
+        dataset.refresh()
+        self.assertEqual(len(dataset.runs[0]["partitions"]), 1)
+        self.assertEqual(len(os.listdir(writer.path)), 2)
+
+    def test_query(self):
+        for run in range(2):
+            writer = EmissionDatasetWriter(
+                self.path, "ring", run, time_window=100)
+            writer.write(self._run_data())
+            writer.close()
+        writer = EmissionDatasetWriter(self.path, "merge", 0)
+        writer.write(self._run_data())
+        writer.close()
+        dataset = EmissionDataset(self.path)
+
+        # partitions are pruned based on their statistics
+        self.assertEqual(len(dataset.partitions()), 9)
+        self.assertEqual(len(dataset.partitions(experiment="ring")), 6)
+        self.assertEqual(len(dataset.partitions(
+            experiment="ring", run=1, start_time=150, end_time=250)), 2)
+        self.assertEqual(len(dataset.partitions(
+            experiment="ring", edges=["left"])), 4)
+        self.assertEqual(len(dataset.partitions(ids=["d"])), 0)
+
+        data = dataset.query(columns=["run", "time", "id", "speed"],
+                             experiment="ring", start_time=140,
+                             end_time=160, edges=["right"], ids=["b"])
+        self.assertListEqual(data["run"].tolist(), [0] * 11 + [1] * 11)
+        np.testing.assert_array_equal(
+            data["time"], np.tile(np.arange(150, 161), 2))
+        self.assertListEqual(data["id"].tolist(), ["b"] * 22)
+        np.testing.assert_array_equal(
+            data["speed"], 3 * data["time"] + 1)
+
+        data = dataset.query(experiment="merge", start_time=10,
+                             end_time=10)
+        self.assertListEqual(sorted(data.keys()),
+                             ["edge_id", "id", "speed", "time"])
+        self.assertListEqual(data["id"].tolist(), ["a", "b", "c"])
+
+        self.assertDictEqual(dataset.query(experiment="highway"), {})
+
+    def test_add_emission(self):
+        # emission data stored as shards
+        path = os.path.join(self.path, "ring-0_emission")
+        recorder = EmissionRecorder(path, chunk_size=5)
+        for t in range(4):
+            recorder.append(
+                time=t / 10, **TestEmissionRecorder._step_data(["a", "b"]))
+        recorder.close()
+        root = os.path.join(self.path, "dataset")
+        add_emission(root, path, "ring", 0)
+
+        # emission data stored as a csv file
+        csv_path = emission_shards_to_csv(path)
+        add_emission(root, csv_path, "ring", 1, chunk_size=3)
+
+        dataset = EmissionDataset(root)
+        for run in range(2):
+            data = dataset.query(
+                columns=["time", "id", "leader_id"], run=run)
+            np.testing.assert_array_almost_equal(
+                data["time"], np.repeat([0, 0.1, 0.2, 0.3], 2))
+            self.assertListEqual(data["id"].tolist(), ["a", "b"] * 4)
+            self.assertListEqual(data["leader_id"].tolist(), ["", "a"] * 4)
+
+    def test_simulation(self):
+        sim_params = SumoParams(sim_step=0.1, emission_path=self.path)
+        env, _, _ = ring_road_exp_setup(sim_params=sim_params)
+        env.reset()
+        for _ in range(10):
+            env.step(None)
+        root = os.path.join(self.path, "dataset")
+        env.k.simulation.save_emission(run_id=1, to_csv=True, dataset=root)
+        env.terminate()
+
+        dataset = EmissionDataset(root)
+        data = dataset.query(columns=["experiment", "run", "time", "id"])
+        self.assertGreaterEqual(len(data["id"]), 10)
+        self.assertListEqual(data["experiment"].tolist(),
+                             [env.network.name] * len(data["id"]))
+        self.assertListEqual(data["run"].tolist(), [1] * len(data["id"]))
+        np.testing.assert_array_almost_equal(np.diff(data["time"]), 0.1)
+
+
+class TestStepProfiler(unittest.TestCase):
+    """Tests the timers in flow/core/profiler.py."""
+
+    def test_disabled(self):
+        profiler = StepProfiler(enabled=False)
+        with profiler.phase("step"):
+            pass
+        self.assertDictEqual(profiler.stats, {})
+        self.assertListEqual(profiler.events, [])
+
+    def test_phases(self):
+        profiler = StepProfiler(enabled=True, max_events=3)
+        for _ in range(2):
+            with profiler.phase("step"):
+                with profiler.phase("simulation_step"):
+                    pass
+        profiler.record("get_state", 1.0, 1.5)
+
+        summary = profiler.summary()
+        self.assertListEqual(list(summary["phases"].keys()),
+                             ["get_state", "simulation_step", "step"])
+        self.assertEqual(summary["phases"]["step"]["count"], 2)
+        self.assertEqual(summary["phases"]["get_state"]["total"], 0.5)
+        self.assertEqual(summary["phases"]["get_state"]["p50"], 0.5)
+        self.assertEqual(sum(summary["phases"]["step"]["histogram"]), 2)
+        self.assertGreaterEqual(summary["phases"]["step"]["min"],
+                                summary["phases"]["simulation_step"]["min"])
+
+        # only the first events are stored for traces
+        trace = profiler.chrome_trace()
+        self.assertEqual(len(trace["traceEvents"]), 3)
+        self.assertListEqual(
+            [event["name"] for event in trace["traceEvents"]],
+            ["simulation_step", "step", "simulation_step"])
+        self.assertEqual(trace["traceEvents"][0]["ph"], "X")
+
+        # export both formats
+        path = tempfile.mkdtemp()
+        profiler.save(os.path.join(path, "profile.json"))
+        profiler.save(os.path.join(path, "trace.json"), trace=True)
+        with open(os.path.join(path, "profile.json")) as f:
+            self.assertDictEqual(json.load(f), summary)
+        with open(os.path.join(path, "trace.json")) as f:
+            self.assertEqual(len(json.load(f)["traceEvents"]), 3)
+        shutil.rmtree(path)
+
+        profiler.reset()
+        self.assertDictEqual(profiler.stats, {})
+
+    def test_profiling_enabled(self):
+        flag = os.environ.pop("FLOW_PROFILE", None)
+        try:
+            self.assertFalse(profiling_enabled(SumoParams()))
+            self.assertTrue(profiling_enabled(SumoParams(profile=True)))
+            os.environ["FLOW_PROFILE"] = "1"
+            self.assertTrue(profiling_enabled(SumoParams()))
+            os.environ["FLOW_PROFILE"] = "0"
+            self.assertFalse(profiling_enabled(SumoParams()))
+        finally:
+            os.environ.pop("FLOW_PROFILE", None)
+            if flag is not None:
+                os.environ["FLOW_PROFILE"] = flag
+
 
 class TestRegistry(unittest.TestCase):
     """Tests the methods located in flow/utils/registry.py"""
@@ -322,6 +725,78 @@ class TestRllib(unittest.TestCase):
         self.assertTrue(search_dicts(imported_flow_params["veh"].__dict__,
                                      flow_params["veh"].__dict__))
 
+    def test_compute_multiagent_actions(self):
+        """Tests the batched inference of compute_multiagent_actions."""
+        class Policy(object):
+            action_space = Box(low=-1, high=1, shape=(1,))
+
+            def __init__(self):
+                self.batches = []
+
+            def get_initial_state(self):
+                return [np.zeros(1)]
+
+            def compute_actions(self, obs_batch, state_batches, explore):
+                self.batches.append(obs_batch)
+                return obs_batch.sum(axis=1, keepdims=True), \
+                    [state + 1 for state in state_batches], {}
+
+        class Filter(object):
+            def __call__(self, obs, update):
+                return 2 * np.asarray(obs)
+
+        class Preprocessor(object):
+            def transform(self, obs):
+                return obs
+
+        class Worker(object):
+            preprocessors = collections.defaultdict(Preprocessor)
+            filters = collections.defaultdict(Filter)
+
+        class Workers(object):
+            def local_worker(self):
+                return Worker()
+
+        class Agent(object):
+            config = {"clip_actions": True}
+            workers = Workers()
+            policies = {"av": Policy(), "adversary": Policy()}
+
+            def get_policy(self, policy_id):
+                return self.policies[policy_id]
+
+        agent = Agent()
+        observations = {"av_0": [0.1, 0.2], "av_1": [0.3, 0.4],
+                        "adversary": [0, 0]}
+
+        def policy_mapping_fn(agent_id):
+            return "adversary" if agent_id == "adversary" else "av"
+
+        actions, states = compute_multiagent_actions(
+            agent, observations, policy_mapping_fn,
+            states={"av_0": [np.ones(1)]})
+
+        # one batch per policy, containing the filtered observations
+        self.assertEqual(len(agent.policies["av"].batches), 1)
+        np.testing.assert_array_almost_equal(
+            agent.policies["av"].batches[0], [[0.2, 0.4], [0.6, 0.8]])
+        self.assertEqual(len(agent.policies["adversary"].batches), 1)
+
+        # the actions are clipped to the action space
+        np.testing.assert_array_almost_equal(actions["av_0"], [0.6])
+        np.testing.assert_array_almost_equal(actions["av_1"], [1])
+        np.testing.assert_array_almost_equal(actions["adversary"], [0])
+
+        # agents without a recurrent state start from the initial state
+        np.testing.assert_array_equal(states["av_0"], [[2]])
+        np.testing.assert_array_equal(states["av_1"], [[1]])
+        np.testing.assert_array_equal(states["adversary"], [[1]])
+
+        # no state is returned for stateless policies
+        _, states = compute_multiagent_actions(
+            agent, observations, policy_mapping_fn)
+        self.assertEqual(states, {})
+
 
 if __name__ == '__main__':
     unittest.main()
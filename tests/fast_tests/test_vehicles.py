@@ -1,14 +1,22 @@
 import unittest
+import inspect
 import os
 import numpy as np
+from traci.exceptions import TraCIException
 
 from flow.core.params import VehicleParams
 from flow.core.params import SumoCarFollowingParams, NetParams, \
-    InitialConfig, SumoParams, SumoLaneChangeParams
+    InitialConfig, SumoParams, SumoLaneChangeParams, InFlows
 from flow.controllers.car_following_models import IDMController, \
     SimCarFollowingController
 from flow.controllers.lane_change_controllers import StaticLaneChanger
 from flow.controllers.rlcontroller import RLController
+from flow.controllers.routing_controllers import ContinuousRouter
+from flow.core.kernel.vehicle.command_buffer import TraCICommandBuffer, \
+    _CONNECTION_ATTRIBUTES
+from flow.core.kernel.vehicle.headways import MultiLaneHeadways
+from flow.core.kernel.vehicle.inflows import InflowScheduler
+from flow.networks.highway import ADDITIONAL_NET_PARAMS as HIGHWAY_PARAMS
 
 from tests.setup_scripts import ring_road_exp_setup, highway_exp_setup
 
@@ -252,6 +260,113 @@ class TestMultiLaneData(unittest.TestCase):
         np.testing.assert_array_almost_equal(actual_lane_tail,
                                              expected_lane_tail)
 
+    def test_empty_lanes_and_wrap_around(self):
+        """
+        Test the above mentioned methods when vehicles only occupy one lane
+        of a ring, and their leaders and followers are on other edges.
+        """
+        additional_net_params = {
+            "length": 230,
+            "lanes": 3,
+            "speed_limit": 30,
+            "resolution": 40
+        }
+        net_params = NetParams(additional_params=additional_net_params)
+
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(RLController, {}),
+            num_vehicles=5)
+
+        # all vehicles start in the rightmost lane
+        initial_config = InitialConfig(lanes_distribution=1)
+
+        env, _, _ = ring_road_exp_setup(
+            net_params=net_params,
+            vehicles=vehicles,
+            initial_config=initial_config)
+        env.reset()
+        kv = env.k.vehicle
+        pos = {veh_id: kv.get_position(veh_id) for veh_id in kv.get_ids()}
+        self.assertListEqual(
+            [kv.get_edge(veh_id) for veh_id in sorted(pos)],
+            ["bottom", "bottom", "right", "top", "left"])
+
+        # distance between the start of consecutive edges (the length of an
+        # edge and of the junction that follows it)
+        edge = 57.5 + env.k.network.edge_length(":right_0")
+
+        # the other lanes have no leaders or followers
+        self.assertListEqual(kv.get_lane_leaders("test_1"),
+                             ["test_2", "", ""])
+        self.assertListEqual(kv.get_lane_followers("test_1"),
+                             ["test_0", "", ""])
+        np.testing.assert_array_almost_equal(
+            kv.get_lane_headways("test_1"),
+            [pos["test_2"] + edge - pos["test_1"] - 5, 1000, 1000])
+        np.testing.assert_array_almost_equal(
+            kv.get_lane_tailways("test_1"),
+            [pos["test_1"] - pos["test_0"] - 5, 1000, 1000])
+
+        # the leader of the last vehicle of the ring is the first vehicle,
+        # which also has the last vehicle as its follower
+        self.assertListEqual(kv.get_lane_leaders("test_4"),
+                             ["test_0", "", ""])
+        self.assertListEqual(kv.get_lane_followers("test_0"),
+                             ["test_4", "", ""])
+        np.testing.assert_array_almost_equal(
+            kv.get_lane_headways("test_4"),
+            [pos["test_0"] + edge - pos["test_4"] - 5, 1000, 1000])
+        np.testing.assert_array_almost_equal(
+            kv.get_lane_tailways("test_0"),
+            [pos["test_0"] + edge - pos["test_4"] - 5, 1000, 1000])
+
+        env.terminate()
+
+    def test_multi_lane_headways(self):
+        """
+        Test the batched computation of the above mentioned methods on a
+        network of two edges with dead ends.
+        """
+        class Network(object):
+            """Edge "a" (100m) is followed by edge "b" (50m)."""
+
+            def num_lanes(self, edge):
+                return 2
+
+            def edge_length(self, edge):
+                return {"a": 100, "b": 50}[edge]
+
+            def next_edge(self, edge, lane):
+                return [("b", lane)] if edge == "a" else []
+
+            def prev_edge(self, edge, lane):
+                return [("a", lane)] if edge == "b" else []
+
+        headways = MultiLaneHeadways(Network(), ["a", "b"])
+
+        # vehicles 0 and 1 are in lane 0 of "a", vehicle 2 in lane 1 of "b"
+        edge = np.array([0, 0, 1])
+        lane = np.array([0, 0, 1])
+        position = np.array([10., 30., 5.])
+        length = np.array([5., 5., 5.])
+        headways.sort(edge, lane, position)
+        num_lanes, headway, tailway, leader, follower = headways.query(
+            [0, 2], edge, lane, position, length)
+
+        np.testing.assert_array_equal(num_lanes, [2, 2])
+        # the leader of vehicle 0 in lane 1 is on the next edge, and vehicle
+        # 2 has no leaders as the network ends after edge "b"
+        np.testing.assert_array_equal(leader, [[1, 2], [-1, -1]])
+        np.testing.assert_array_almost_equal(
+            headway, [[15, 5 + 100 - 10 - 5], [1000, 1000]])
+        # vehicle 0 has no followers, and the follower of vehicle 2 in lane 0
+        # is on the previous edge, whose lane 1 is empty
+        np.testing.assert_array_equal(follower, [[-1, -1], [1, -1]])
+        np.testing.assert_array_almost_equal(
+            tailway, [[1000, 1000], [5 + 100 - 30 - 5, 1000]])
+
     def test_no_junctions_highway(self):
         additional_net_params = {
             "length": 100,
@@ -568,6 +683,343 @@ class TestIdsByEdge(unittest.TestCase):
         self.assertCountEqual(ids, expected_ids)
 
 
+class PolledRouter(ContinuousRouter):
+    """Continuous router that is called every step."""
+
+    event_driven = False
+
+
+class TestEdgeTransitions(unittest.TestCase):
+    """Tests the edge transitions and the vehicles routers act on."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(veh_id="event",
+                     acceleration_controller=(IDMController, {}),
+                     routing_controller=(ContinuousRouter, {}),
+                     num_vehicles=3)
+        vehicles.add(veh_id="polled",
+                     acceleration_controller=(IDMController, {}),
+                     routing_controller=(PolledRouter, {}),
+                     num_vehicles=1)
+        vehicles.add(veh_id="none",
+                     acceleration_controller=(IDMController, {}),
+                     num_vehicles=1)
+        self.env, _, _ = ring_road_exp_setup(vehicles=vehicles)
+
+    def tearDown(self):
+        self.env.terminate()
+        self.env = None
+
+    def test_edge_transitions(self):
+        kv = self.env.k.vehicle
+        self.env.reset()
+
+        # all vehicles are included after a reset
+        self.assertListEqual(kv.get_edge_transitions(), kv.get_ids())
+        self.assertCountEqual(kv.get_routing_ids(),
+                              ["event_0", "event_1", "event_2", "polled_0"])
+
+        num_transitions = 0
+        for _ in range(200):
+            edges = kv.get_edge(kv.get_ids())
+            self.env.step(None)
+            changed = [veh_id for veh_id, edge in zip(kv.get_ids(), edges)
+                       if kv.get_edge(veh_id) != edge]
+            self.assertListEqual(kv.get_edge_transitions(), changed)
+            num_transitions += len(changed)
+
+            # polled routers act every step, event-driven routers only after
+            # a transition
+            expected = [veh_id for veh_id in kv.get_ids()
+                        if veh_id == "polled_0" or (
+                            veh_id in changed and veh_id != "none_0")]
+            self.assertListEqual(kv.get_routing_ids(), expected)
+
+        self.assertGreater(num_transitions, 0)
+
+        # the vehicles were rerouted at the end of their routes, and are still
+        # in the network
+        self.assertEqual(len(kv.get_ids()), 5)
+        self.assertEqual(len(kv.get_arrived_ids()), 0)
+
+
+class TestVehicleArrays(unittest.TestCase):
+    """Tests the array-based getters of the vehicles class."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {}),
+            num_vehicles=10)
+
+        self.env, _, _ = ring_road_exp_setup(vehicles=vehicles)
+        self.env.reset()
+        for _ in range(5):
+            self.env.step(None)
+
+    def tearDown(self):
+        self.env.terminate()
+        self.env = None
+
+    def test_matches_getters(self):
+        """Check that the arrays match the values of the per-vehicle getters.
+        """
+        kv = self.env.k.vehicle
+        ids = kv.get_ids()
+
+        np.testing.assert_array_almost_equal(
+            kv.get_speed_array(), [kv.get_speed(veh_id) for veh_id in ids])
+        np.testing.assert_array_almost_equal(
+            kv.get_position_array(),
+            [kv.get_position(veh_id) for veh_id in ids])
+        np.testing.assert_array_equal(
+            kv.get_lane_array(), [kv.get_lane(veh_id) for veh_id in ids])
+        np.testing.assert_array_almost_equal(
+            kv.get_headway_array(),
+            [kv.get_headway(veh_id) for veh_id in ids])
+        np.testing.assert_array_almost_equal(
+            kv.get_length_array(), [kv.get_length(veh_id) for veh_id in ids])
+        np.testing.assert_array_almost_equal(
+            kv.get_x_array(), [kv.get_x_by_id(veh_id) for veh_id in ids])
+
+        # the list getters return the same values as before
+        self.assertListEqual(kv.get_speed(ids),
+                             [kv.get_speed(veh_id) for veh_id in ids])
+
+        # check the edge and leader indices
+        edges = self.env.k.network.get_edge_list() + \
+            self.env.k.network.get_junction_list()
+        self.assertListEqual(
+            [edges[i] for i in kv.get_edge_index()],
+            [kv.get_edge(veh_id) for veh_id in ids])
+        self.assertListEqual(
+            [ids[i] for i in kv.get_leader_index()],
+            [kv.get_leader(veh_id) for veh_id in ids])
+        self.assertListEqual(
+            [ids[i] for i in kv.get_follower_index()],
+            [kv.get_follower(veh_id) for veh_id in ids])
+
+    def test_remove(self):
+        """Check that removed vehicles are not returned by the arrays."""
+        kv = self.env.k.vehicle
+        leader = kv.get_leader("test_0")
+        kv.remove(leader)
+
+        self.assertEqual(len(kv.get_speed_array()), len(kv.get_ids()))
+        self.assertTrue(np.isnan(kv.get_speed_array([leader])[0]))
+        self.assertEqual(kv.get_speed([leader]), [-1001])
+
+        # the vehicle that was following the removed vehicle has no leader
+        self.assertEqual(
+            kv.get_leader_index()[kv.get_ids().index("test_0")], -1)
+        self.assertEqual(kv.get_x_array([leader])[0], 0)
+
+
+class TestCommandBuffer(unittest.TestCase):
+    """Tests the buffering of the TraCI commands issued by the vehicles class.
+    """
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {}),
+            num_vehicles=5)
+
+        self.env, _, _ = ring_road_exp_setup(vehicles=vehicles)
+        self.env.reset()
+
+    def tearDown(self):
+        self.env.terminate()
+        self.env = None
+
+    def test_apply_acceleration(self):
+        """Check that accelerations are sent when the buffer exits."""
+        kv = self.env.k.vehicle
+        ids = kv.get_ids()
+        buffer = TraCICommandBuffer(self.env.k.kernel_api)
+        self.assertTrue(buffer.enabled)
+
+        speeds = kv.get_speed(ids)
+        kv.apply_acceleration(ids, [1] * len(ids), smooth=False)
+        self.assertEqual(buffer.num_pending(), 0)
+        self.assertFalse(buffer.active())
+
+        self.env.k.simulation.simulation_step()
+        self.env.k.update(reset=False)
+        np.testing.assert_array_almost_equal(
+            kv.get_speed(ids), np.array(speeds) + self.env.sim_step)
+
+    def test_pending(self):
+        """Check that commands are pending until the outermost block exits."""
+        kv = self.env.k.vehicle
+        ids = kv.get_ids()
+        buffer = TraCICommandBuffer(self.env.k.kernel_api)
+
+        with buffer:
+            kv.choose_routes(ids, [None] + kv.get_route(ids[1:]))
+            self.assertEqual(buffer.num_pending(), 4)
+            with TraCICommandBuffer(self.env.k.kernel_api):
+                self.env.k.kernel_api.vehicle.setSpeed(ids[0], 0)
+            self.assertEqual(buffer.num_pending(), 5)
+            self.assertTrue(buffer.active())
+        self.assertEqual(buffer.num_pending(), 0)
+
+        # commands issued outside of the buffer are sent immediately
+        self.env.k.kernel_api.vehicle.setSpeed(ids[0], 0)
+        self.assertEqual(buffer.num_pending(), 0)
+
+    def test_errors(self):
+        """Check that errors are raised by the block of the failed command."""
+        kv = self.env.k.vehicle
+        ids = kv.get_ids()
+        kernel_api = self.env.k.kernel_api
+
+        with self.assertRaises(TraCIException):
+            with TraCICommandBuffer(kernel_api):
+                kernel_api.vehicle.setSpeed(ids[0], 5)
+                kernel_api.vehicle.setSpeed("unknown", 5)
+        self.assertEqual(TraCICommandBuffer(kernel_api).num_pending(), 0)
+
+        # the following commands are not affected by the error
+        kernel_api.vehicle.setColor(ids[0], (255, 0, 0, 255))
+        self.env.k.simulation.simulation_step()
+
+        # commands are dropped if the block is exited with an exception
+        with self.assertRaises(ValueError):
+            with TraCICommandBuffer(kernel_api):
+                kernel_api.vehicle.setSpeed("unknown", 5)
+                raise ValueError
+        self.assertEqual(TraCICommandBuffer(kernel_api).num_pending(), 0)
+        self.env.k.simulation.simulation_step()
+
+    def test_traci_internals(self):
+        """Check that the installed version of traci has the private
+        attributes that the buffer relies on."""
+        connection = self.env.k.kernel_api
+        for attr in _CONNECTION_ATTRIBUTES:
+            self.assertTrue(hasattr(connection, attr), attr)
+        self.assertEqual(
+            list(inspect.signature(type(connection)._sendExact).parameters),
+            ["self"])
+
+
+class TestInflowScheduler(unittest.TestCase):
+    """Tests the scheduling of the departures of runtime inflows."""
+
+    def test_period(self):
+        inflows = InFlows()
+        inflows.add(veh_type="human", edge="a", vehs_per_hour=1800,
+                    depart_lane="free", begin=1, number=3)
+        scheduler = InflowScheduler(inflows, {"a": ["a", "b"]}, sim_step=0.5)
+
+        departures = [scheduler.step() for _ in range(20)]
+        times = [i for i, dep in enumerate(departures) if dep]
+        # equally spaced departures from time "begin", until "number"
+        self.assertListEqual(times, [1, 5, 9])
+        self.assertListEqual(departures[5],
+                             [("flow_00.1", "routea_0", "human",
+                               {"departLane": "free", "departSpeed": "0"})])
+
+        # departures restart upon reset, and vehicle names remain unique
+        scheduler.reset()
+        departures = sum([scheduler.step() for _ in range(2)], [])
+        self.assertListEqual([dep[0] for dep in departures], ["flow_00.3"])
+
+    def test_routes(self):
+        inflows = InFlows()
+        inflows.add(veh_type="human", edge="a", period=1)
+        routes = {"a": [(["a", "b"], 0.75), (["a", "c"], 0.25)]}
+        scheduler = InflowScheduler(inflows, routes, sim_step=1)
+
+        departures = sum([scheduler.step() for _ in range(8)], [])
+        self.assertEqual(
+            sum(dep[1] == "routea_0" for dep in departures), 6)
+        self.assertEqual(
+            sum(dep[1] == "routea_1" for dep in departures), 2)
+        self.assertIn("flow_01.0", [dep[0] for dep in departures])
+
+    def test_probability(self):
+        np.random.seed(0)
+        inflows = InFlows()
+        inflows.add(veh_type="human", edge="a", probability=0.5, begin=1)
+        scheduler = InflowScheduler(inflows, {"a": ["a"]}, sim_step=0.1)
+
+        num_departures = [len(scheduler.step()) for _ in range(10000)]
+        self.assertLessEqual(max(num_departures), 1)
+        self.assertAlmostEqual(sum(num_departures) / 1000, 0.5, 1)
+
+    def test_set_inflows(self):
+        inflows = InFlows()
+        inflows.add(veh_type="human", edge="a", period=10)
+        scheduler = InflowScheduler(inflows, {"a": ["a"]}, sim_step=1)
+        for _ in range(30):
+            scheduler.step()
+
+        # the new inflows start at the next step, without a burst of the
+        # departures that would have occurred since "begin"
+        inflows = InFlows()
+        inflows.add(veh_type="rl", edge="a", period=2)
+        scheduler.set_inflows(inflows)
+        departures = sum([scheduler.step() for _ in range(4)], [])
+        self.assertListEqual([(dep[0], dep[2]) for dep in departures],
+                             [("flow_00.3", "rl"), ("flow_00.4", "rl")])
+
+
+class TestRuntimeInflows(unittest.TestCase):
+    """Tests the inflows added by the vehicle kernel during the simulation."""
+
+    def setUp(self):
+        inflows = InFlows()
+        inflows.add(veh_type="idm", edge="highway_0", vehs_per_hour=1800,
+                    depart_lane="free", depart_speed=10)
+        additional_net_params = HIGHWAY_PARAMS.copy()
+        additional_net_params["length"] = 500
+        self.net_params = NetParams(
+            inflows=inflows, additional_params=additional_net_params)
+
+    def run_inflows(self, runtime_inflows):
+        env, _, _ = highway_exp_setup(
+            sim_params=SumoParams(runtime_inflows=runtime_inflows),
+            net_params=self.net_params)
+        env.reset()
+        for _ in range(300):
+            env.step(rl_actions=None)
+        return env
+
+    def test_runtime_inflows(self):
+        # the runtime inflows match the inflows of the route file
+        env = self.run_inflows(runtime_inflows=False)
+        ids = env.k.vehicle.get_ids()
+        inflow_rate = env.k.vehicle.get_inflow_rate(20)
+        env.terminate()
+
+        env = self.run_inflows(runtime_inflows=True)
+        self.assertListEqual(env.k.vehicle.get_ids(), ids)
+        self.assertAlmostEqual(env.k.vehicle.get_inflow_rate(20), inflow_rate)
+        self.assertAlmostEqual(inflow_rate, 1800)
+
+        # the inflows may be changed during the simulation
+        inflows = InFlows()
+        inflows.add(veh_type="idm", edge="highway_0", vehs_per_hour=3600,
+                    depart_lane="free", depart_speed=10, name="fast")
+        env.k.vehicle.set_inflows(inflows)
+        for _ in range(300):
+            env.step(rl_actions=None)
+        self.assertAlmostEqual(env.k.vehicle.get_inflow_rate(20), 3600)
+        self.assertTrue(all(veh_id.startswith("fast_00.")
+                            for veh_id in env.k.vehicle.get_ids()))
+
+        # the inflows of the network are restored upon reset
+        env.reset()
+        for _ in range(300):
+            env.step(rl_actions=None)
+        self.assertAlmostEqual(env.k.vehicle.get_inflow_rate(20), 1800)
+        env.terminate()
+
+
 class TestObservedIDs(unittest.TestCase):
     """Tests the observed_ids methods, which are used for visualization."""
 
@@ -204,6 +204,37 @@ class TestPlotters(unittest.TestCase):
         for lane, expected_seg in expected_segs.items():
             np.testing.assert_array_almost_equal(segs[lane], expected_seg)
 
+    def test_time_space_diagram_steps(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        flow_params = tsd.get_flow_params(
+            os.path.join(dir_path, 'test_files/fig8.json'))
+        emission_data = tsd.import_data_from_trajectory(
+            os.path.join(dir_path, 'test_files/fig8_emission.csv'), flow_params,
+            steps=2)
+
+        segs, data = tsd.get_time_space_data(emission_data, flow_params)
+
+        # every other sample is kept, and the segments join the kept samples
+        expected_segs = np.array([
+          [[1., 60.], [3., 57.02]],
+          [[1., 23.8], [3., 20.83]],
+          [[1., 182.84166941], [3., 179.87166941]],
+          [[1., 154.07166941], [3., 151.10166941]],
+          [[1., 125.30166941], [3., 122.34166941]],
+          [[1., 96.54166941], [3., 93.56166941]],
+          [[1., -203.16166941], [3., -200.02166941]],
+          [[1., -174.40166941], [3., -171.43166941]],
+          [[1., -145.63166941], [3., -142.66166941]],
+          [[1., -116.86166941], [3., -113.89166941]],
+          [[1., -88.09166941], [3., -85.13166941]],
+          [[1., -59.33], [3., -56.36]],
+          [[1., -30.56], [3., -27.97]],
+          [[1., -1.79], [3., 208.64166941]]]
+        )
+
+        np.testing.assert_array_almost_equal(segs, expected_segs)
+        self.assertEqual(len(data['speed']), len(segs))
+
     def test_time_space_diagram_ring_road(self):
         dir_path = os.path.dirname(os.path.realpath(__file__))
         flow_params = tsd.get_flow_params(